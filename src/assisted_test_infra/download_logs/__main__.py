@@ -5,6 +5,7 @@ from collections import Counter
 
 from kubernetes.client import CustomObjectsApi
 
+import consts
 from assisted_test_infra.download_logs import gather_sosreport_data
 from assisted_test_infra.download_logs.download_logs import (
     download_cluster_logs,
@@ -14,8 +15,10 @@ from assisted_test_infra.download_logs.download_logs import (
     should_download_logs,
 )
 from assisted_test_infra.test_infra.helper_classes.kube_helpers import ClusterDeployment
+from assisted_test_infra.test_infra.tools.concurrently import run_concurrently
 from assisted_test_infra.test_infra.utils import get_env
 from service_client import ClientFactory, ServiceAccount, log
+from service_client.file_download import limit_concurrent_streams
 from tests.config import global_variables
 
 CONNECTION_TIMEOUT = 30
@@ -23,20 +26,25 @@ CONNECTION_TIMEOUT = 30
 
 def kube_api_logs(args):
     client = ClientFactory.create_kube_api_client(args.kubeconfig_path)
-    for item in ClusterDeployment.list_all_namespaces(CustomObjectsApi(client)).get("items", []):
-        if item["spec"]["clusterName"]:
-            download_logs_kube_api(
-                client,
-                item["spec"]["clusterName"],
-                item["metadata"]["namespace"],
-                args.dest,
-                args.must_gather,
-                args.kubeconfig_path,
-            )
+    jobs = [
+        (
+            download_logs_kube_api,
+            client,
+            item["spec"]["clusterName"],
+            item["metadata"]["namespace"],
+            args.dest,
+            args.must_gather,
+            args.kubeconfig_path,
+        )
+        for item in ClusterDeployment.list_all_namespaces(CustomObjectsApi(client))
+        if item["spec"]["clusterName"]
+    ]
+    run_concurrently(jobs, max_workers=args.workers)
 
 
 def main():
     args = handle_arguments()
+    limit_concurrent_streams(args.max_downloads)
 
     if args.sosreport:
         log.info("Sos report")
@@ -79,9 +87,14 @@ def main():
                 if get_cluster_installation_date_and_id(cluster) not in clusters_to_filter_out
             ]
 
-        for cluster in clusters:
-            if args.download_all or should_download_logs(cluster):
-                download_cluster_logs(client, cluster, args.dest, args.must_gather, args.update_by_events)
+        # Each cluster is downloaded by its own worker, the files of a cluster are fetched by a separate pool of
+        # download workers, and the number of concurrent downloads of the whole process is bounded by --max-downloads
+        jobs = [
+            (download_cluster_logs, client, cluster, args.dest, args.must_gather, args.update_by_events)
+            for cluster in clusters
+            if args.download_all or should_download_logs(cluster)
+        ]
+        run_concurrently(jobs, max_workers=args.workers)
 
         log.info("Cluster installation statuses: %s", dict(Counter(cluster["status"] for cluster in clusters).items()))
 
@@ -96,6 +109,18 @@ def handle_arguments():
     parser.add_argument("--must-gather", help="must-gather logs", action="store_true")
     parser.add_argument("--sosreport", help="gather sosreport from each node", action="store_true")
     parser.add_argument("--update-by-events", help="Update logs if cluster events were updated", action="store_true")
+    parser.add_argument(
+        "--workers",
+        help="Number of clusters to download logs of concurrently",
+        type=int,
+        default=consts.DOWNLOAD_LOGS_CLUSTER_WORKERS,
+    )
+    parser.add_argument(
+        "--max-downloads",
+        help="Maximal number of files to download at the same time, across all clusters",
+        type=int,
+        default=consts.DOWNLOAD_MAX_CONCURRENT_STREAMS,
+    )
     parser.add_argument("-ps", "--pull-secret", help="Pull secret", type=str, default="")
     parser.add_argument(
         "-kp",
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 
 import filecmp
+import functools
 import json
 import os
 import shutil
@@ -41,6 +42,7 @@ from assisted_test_infra.test_infra.utils import (
 from assisted_test_infra.test_infra.utils.kubeapi_utils import get_ip_for_single_node
 from consts import CensoredConfig, ClusterStatus, HostsProgressStages, env_defaults
 from service_client import InventoryClient, SuppressAndLog, log
+from service_client.file_download import DownloadJob, download_concurrently
 from tests.config import ClusterConfig, TerraformConfig
 
 private_ssh_key_path_default = os.path.join(os.getcwd(), str(env_defaults.DEFAULT_SSH_PRIVATE_KEY_PATH))
@@ -123,6 +125,51 @@ def download_cluster_logs(
     return download_logs_suite()
 
 
+class DownloadProgress:
+    """
+    Stages of a cluster logs download that were completed, persisted in the output folder so that an interrupted
+    download is resumed from the first stage that did not complete instead of starting over.
+    """
+
+    FILE_NAME = "download_progress.json"
+
+    def __init__(self, output_folder: str):
+        self.output_folder = output_folder
+        self._path = os.path.join(output_folder, self.FILE_NAME)
+        self._progress = {"stages": [], "complete": False}
+        if os.path.isfile(self._path):
+            with open(self._path, "rt") as f:
+                self._progress = json.load(f)
+
+    @property
+    def completed_stages(self) -> list[str]:
+        return list(self._progress["stages"])
+
+    def is_resumable(self) -> bool:
+        return os.path.isfile(self._path) and not self._progress["complete"]
+
+    def is_done(self, stage: str) -> bool:
+        return stage in self._progress["stages"]
+
+    def reset(self) -> None:
+        self._progress = {"stages": [], "complete": False}
+        self._save()
+
+    def mark_done(self, stage: str) -> None:
+        self._progress["stages"].append(stage)
+        self._save()
+
+    def mark_complete(self) -> None:
+        self._progress["complete"] = True
+        self._save()
+
+    def _save(self) -> None:
+        temp_path = f"{self._path}.tmp"
+        with open(temp_path, "wt") as f:
+            json.dump(self._progress, f, indent=4)
+        os.replace(temp_path, self._path)
+
+
 @JunitTestCase()
 def get_clusters(client, all_cluster):
     if all_cluster:
@@ -179,6 +226,53 @@ def download_manifests(client: InventoryClient, cluster_id: str, output_folder:
     client.download_manifests(cluster_id, manifests_path)
 
 
+def download_cluster_files(client: InventoryClient, cluster: dict, output_folder: str) -> None:
+    cluster_files_folder = os.path.join(output_folder, "cluster_files")
+    jobs = [
+        DownloadJob(
+            functools.partial(client.download_and_save_file, cluster["id"], cluster_file),
+            os.path.join(cluster_files_folder, cluster_file),
+        )
+        for cluster_file in ("bootstrap.ign", "master.ign", "worker.ign", "install-config.yaml")
+    ]
+    jobs += [
+        DownloadJob(
+            functools.partial(_download_host_ignition, client, host, cluster_files_folder),
+            os.path.join(cluster_files_folder, f"host_{host['id']}.ign"),
+        )
+        for host in cluster["hosts"]
+    ]
+
+    for result in download_concurrently(jobs):
+        if not result.ok:
+            if not isinstance(result.error, assisted_service_client.rest.ApiException):
+                raise result.error
+            log.warning(f"Failed to download {result.destination}: {result.error}")
+            continue
+
+        log.debug(f"Downloaded {result.destination} ({result.size} bytes) in {result.duration:.2f}s")
+        if result.destination.endswith(".ign"):
+            censor_sensitive_sources(result.destination)
+        else:
+            _censor_install_config(Path(result.destination))
+
+
+def _download_host_ignition(client: InventoryClient, host: dict, cluster_files_folder: str, _: str) -> None:
+    client.download_host_ignition(host["infra_env_id"], host["id"], cluster_files_folder)
+
+
+def _censor_install_config(install_config: Path) -> None:
+    install_config_content: dict = json.loads(install_config.read_text())
+
+    if "pullSecret" in install_config_content:
+        install_config_content["pullSecret"] = "censored"
+
+    install_config.write_text(
+        json.dumps(install_config_content, indent=2),
+        encoding="utf-8",
+    )
+
+
 def merge_events(event_paths: list[str]) -> str:
     events = []
 
@@ -234,102 +328,94 @@ def download_logs(
             )
 
     output_folder = get_logs_output_folder(dest, cluster)
-    if not is_update_needed(output_folder, update_by_events, client, cluster):
+    progress = DownloadProgress(output_folder)
+    if progress.is_resumable():
+        log.info(f"Resuming download into {output_folder}, completed stages: {progress.completed_stages}")
+    elif not is_update_needed(output_folder, update_by_events, client, cluster):
         log.info(f"Skipping, no need to update {output_folder}.")
         return
-
-    recreate_folder(output_folder)
-    recreate_folder(os.path.join(output_folder, "cluster_files"))
+    else:
+        recreate_folder(output_folder)
+        recreate_folder(os.path.join(output_folder, "cluster_files"))
+        progress.reset()
 
     try:
         infra_envs = client.get_infra_envs_by_cluster_id(cluster["id"])
-        write_metadata_file(client, cluster, infra_envs, os.path.join(output_folder, "metadata.json"))
-
-        for cluster_file in (
-            "bootstrap.ign",
-            "master.ign",
-            "worker.ign",
-        ):
-            with SuppressAndLog(assisted_service_client.rest.ApiException, KeyboardInterrupt):
-                file_path = os.path.join(output_folder, "cluster_files", cluster_file)
-                client.download_and_save_file(cluster["id"], cluster_file, file_path)
-                censor_sensitive_sources(file_path)
+        metadata_path = os.path.join(output_folder, "metadata.json")
+        stages = [
+            ("metadata", lambda: write_metadata_file(client, cluster, infra_envs, metadata_path)),
+            ("cluster_files", lambda: download_cluster_files(client, cluster, output_folder)),
+            ("manifests", lambda: _download_manifests_stage(client, cluster, output_folder)),
+            ("events", lambda: gather_event_files(client, cluster, infra_envs, output_folder)),
+            ("cluster_logs", lambda: _download_cluster_logs_stage(client, cluster, output_folder, retry_interval)),
+        ]
+        if must_gather:
+            stages.append(("must_gather", lambda: _must_gather_stage(client, cluster, output_folder)))
 
-        with SuppressAndLog(assisted_service_client.rest.ApiException, KeyboardInterrupt):
-            install_config = Path(output_folder) / "cluster_files" / "install-config.yaml"
-            client.download_and_save_file(cluster["id"], "install-config.yaml", str(install_config))
+        for stage_name, stage in stages:
+            if progress.is_done(stage_name):
+                log.debug(f"Skipping stage {stage_name} of {output_folder}, it was already completed")
+                continue
+            stage()
+            progress.mark_done(stage_name)
 
-            install_config_content: dict = json.loads(install_config.read_text())
+        progress.mark_complete()
+    finally:
+        run_command(f"chmod -R ugo+rx '{output_folder}'")
 
-            if "pullSecret" in install_config_content:
-                install_config_content["pullSecret"] = "censored"
 
-            install_config.write_text(
-                json.dumps(install_config_content, indent=2),
-                encoding="utf-8",
-            )
+def _download_manifests_stage(client: InventoryClient, cluster: dict, output_folder: str) -> None:
+    with SuppressAndLog(assisted_service_client.rest.ApiException, KeyboardInterrupt):
+        download_manifests(client, cluster["id"], output_folder)
 
-        with SuppressAndLog(assisted_service_client.rest.ApiException, KeyboardInterrupt):
-            download_manifests(client, cluster["id"], output_folder)
 
-        for host in cluster["hosts"]:
-            with SuppressAndLog(assisted_service_client.rest.ApiException, KeyboardInterrupt):
-                file_path = os.path.join(output_folder, "cluster_files", f"host_{host['id']}.ign")
-                client.download_host_ignition(
-                    host["infra_env_id"], host["id"], os.path.join(output_folder, "cluster_files")
+def _download_cluster_logs_stage(client: InventoryClient, cluster: dict, output_folder: str, retry_interval: int):
+    with SuppressAndLog(assisted_service_client.rest.ApiException, KeyboardInterrupt):
+        are_masters_in_configuring_state = are_host_progress_in_stage(
+            cluster["hosts"], [HostsProgressStages.CONFIGURING], 2
+        )
+        are_masters_in_join_or_done_state = are_host_progress_in_stage(
+            cluster["hosts"], [HostsProgressStages.JOINED, HostsProgressStages.DONE], 2
+        )
+        max_retries = MUST_GATHER_MAX_RETRIES if are_masters_in_join_or_done_state else MAX_RETRIES
+        is_controller_expected = cluster["status"] == ClusterStatus.INSTALLED or are_masters_in_configuring_state
+        min_number_of_logs = min_number_of_log_files(cluster, is_controller_expected)
+
+        for i in range(max_retries):
+            cluster_logs_tar = os.path.join(output_folder, f"cluster_{cluster['id']}_logs.tar")
+
+            with suppress(FileNotFoundError):
+                os.remove(cluster_logs_tar)
+
+            client.download_cluster_logs(cluster["id"], cluster_logs_tar)
+            try:
+                verify_logs_uploaded(
+                    cluster_logs_tar,
+                    min_number_of_logs,
+                    installation_success=(cluster["status"] == ClusterStatus.INSTALLED),
+                    check_oc=are_masters_in_join_or_done_state,
                 )
-                censor_sensitive_sources(file_path)
+                break
+            except AssertionError as ex:
+                log.warning("Cluster logs verification failed: %s", ex)
 
-        gather_event_files(client, cluster, infra_envs, output_folder)
+                # Skip sleeping on last retry
+                if i < MAX_RETRIES - 1:
+                    log.info(f"Going to retry in {retry_interval} seconds")
+                    time.sleep(retry_interval)
 
-        with SuppressAndLog(assisted_service_client.rest.ApiException, KeyboardInterrupt):
-            are_masters_in_configuring_state = are_host_progress_in_stage(
-                cluster["hosts"], [HostsProgressStages.CONFIGURING], 2
-            )
-            are_masters_in_join_or_done_state = are_host_progress_in_stage(
-                cluster["hosts"], [HostsProgressStages.JOINED, HostsProgressStages.DONE], 2
-            )
-            max_retries = MUST_GATHER_MAX_RETRIES if are_masters_in_join_or_done_state else MAX_RETRIES
-            is_controller_expected = cluster["status"] == ClusterStatus.INSTALLED or are_masters_in_configuring_state
-            min_number_of_logs = min_number_of_log_files(cluster, is_controller_expected)
-
-            for i in range(max_retries):
-                cluster_logs_tar = os.path.join(output_folder, f"cluster_{cluster['id']}_logs.tar")
-
-                with suppress(FileNotFoundError):
-                    os.remove(cluster_logs_tar)
-
-                client.download_cluster_logs(cluster["id"], cluster_logs_tar)
-                try:
-                    verify_logs_uploaded(
-                        cluster_logs_tar,
-                        min_number_of_logs,
-                        installation_success=(cluster["status"] == ClusterStatus.INSTALLED),
-                        check_oc=are_masters_in_join_or_done_state,
-                    )
-                    break
-                except AssertionError as ex:
-                    log.warning("Cluster logs verification failed: %s", ex)
-
-                    # Skip sleeping on last retry
-                    if i < MAX_RETRIES - 1:
-                        log.info(f"Going to retry in {retry_interval} seconds")
-                        time.sleep(retry_interval)
 
-        if must_gather:
-            with SuppressAndLog(assisted_service_client.rest.ApiException):
-                kubeconfig_path = os.path.join(output_folder, "kubeconfig-noingress")
-                client.download_kubeconfig_no_ingress(cluster["id"], kubeconfig_path)
-
-                config_etc_hosts(
-                    cluster["name"],
-                    cluster["base_dns_domain"],
-                    client.get_api_vip(cluster, cluster["id"]),
-                )
-                download_must_gather(kubeconfig_path, output_folder)
+def _must_gather_stage(client: InventoryClient, cluster: dict, output_folder: str) -> None:
+    with SuppressAndLog(assisted_service_client.rest.ApiException):
+        kubeconfig_path = os.path.join(output_folder, "kubeconfig-noingress")
+        client.download_kubeconfig_no_ingress(cluster["id"], kubeconfig_path)
 
-    finally:
-        run_command(f"chmod -R ugo+rx '{output_folder}'")
+        config_etc_hosts(
+            cluster["name"],
+            cluster["base_dns_domain"],
+            client.get_api_vip(cluster, cluster["id"]),
+        )
+        download_must_gather(kubeconfig_path, output_folder)
 
 
 @JunitTestCase()
@@ -450,7 +536,9 @@ def get_ui_url_from_api_url(api_url: str):
 @JunitTestCase()
 def download_must_gather(kubeconfig: str, dest_dir: str, describe_cluster_operators: bool = True):
     must_gather_dir = f"{dest_dir}/must-gather-dir"
-    os.mkdir(must_gather_dir)
+    # A resumed logs download runs this again, over whatever an interrupted run left behind
+    shutil.rmtree(must_gather_dir, ignore_errors=True)
+    os.makedirs(must_gather_dir)
 
     log.info(f"Downloading must-gather to {must_gather_dir}, kubeconfig {kubeconfig}")
     command = (
@@ -467,8 +555,10 @@ def download_must_gather(kubeconfig: str, dest_dir: str, describe_cluster_operat
         run_oc_describe_cluster_operators(kubeconfig, dest_dir)
 
     log.debug("Archiving %s...", must_gather_dir)
-    with tarfile.open(f"{dest_dir}/must-gather.tar.gz", "w:gz") as tar:
+    archive_path = f"{dest_dir}/must-gather.tar.gz"
+    with tarfile.open(f"{archive_path}.part", "w:gz") as tar:
         tar.add(must_gather_dir, arcname=os.path.sep)
+    os.replace(f"{archive_path}.part", archive_path)
 
     log.debug("Removing must-gather directory %s after we archived it", must_gather_dir)
     shutil.rmtree(must_gather_dir)
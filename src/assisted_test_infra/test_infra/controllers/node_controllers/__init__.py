@@ -4,6 +4,7 @@ from .kvm_s390x_controller import KVMs390xController
 from .libvirt_controller import LibvirtController
 from .node import Node
 from .node_controller import NodeController
+from .node_pool import NodePool, NodeShape
 from .oci_api_controller import OciApiController
 from .redfish_controller import RedfishController
 from .terraform_controller import TerraformController
@@ -20,4 +21,6 @@ __all__ = [
     "KVMs390xController",
     "RedfishController",
     "AdapterController",
+    "NodePool",
+    "NodeShape",
 ]
@@ -0,0 +1,362 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from contextlib import suppress
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Iterable, List, Optional
+from xml.etree.ElementTree import Element, SubElement, fromstring, tostring
+
+import libvirt
+
+import consts
+from assisted_test_infra.test_infra import utils
+from service_client import log
+
+_RECORD_FILE_NAME = "record.json"
+_HEADER_DIGEST_SIZE = 1024**2
+_TF_FILES = (consts.TFSTATE_FILE, consts.TFVARS_JSON_NAME)
+
+
+def _backing_chain(path: str) -> List[str]:
+    """The image and all its backing files, raises if the chain is broken"""
+    output, _, _ = utils.run_command(f"qemu-img info -U --backing-chain --output json {path}", shell=True)
+    return [image["filename"] for image in json.loads(output)]
+
+
+def _file_digest(path: str, size: Optional[int] = None) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as _file:
+        digest.update(_file.read(size) if size else _file.read())
+    return digest.hexdigest()
+
+
+@dataclass
+class DiskSnapshot:
+    target: str
+    # Copy of the image frozen by the snapshot, it's the backing file of every overlay the domain is restored with
+    path: str
+    size: int
+    mtime_ns: int
+    header_sha256: str
+
+    @classmethod
+    def of(cls, target: str, path: str) -> "DiskSnapshot":
+        stat = os.stat(path)
+        return cls(target, path, stat.st_size, stat.st_mtime_ns, _file_digest(path, _HEADER_DIGEST_SIZE))
+
+    def verify(self) -> Optional[str]:
+        """Returns why the image can't be restored from, if it can't"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return f"{self.path} is missing"
+
+        if (stat.st_size, stat.st_mtime_ns) != (self.size, self.mtime_ns):
+            return f"{self.path} changed since it was captured"
+        if _file_digest(self.path, _HEADER_DIGEST_SIZE) != self.header_sha256:
+            return f"{self.path} header doesn't match its checksum"
+
+        try:
+            _backing_chain(self.path)
+        except RuntimeError as e:
+            return f"the backing chain of {self.path} is broken: {e}"
+        return None
+
+
+@dataclass
+class SnapshotRecord:
+    key: str
+    cluster_name: str
+    phase: str
+    versions: dict
+    # assisted-service side of the snapshot, e.g. the cluster id and status
+    metadata: dict
+    domains: Dict[str, List[DiskSnapshot]]
+    # Name and checksum of the terraform files kept with the snapshot
+    tf_files: Dict[str, str] = field(default_factory=dict)
+    created_at: float = field(default_factory=time.time)
+
+    @classmethod
+    def from_dict(cls, record: dict) -> "SnapshotRecord":
+        domains = {name: [DiskSnapshot(**disk) for disk in disks] for name, disks in record.pop("domains").items()}
+        return cls(domains=domains, **record)
+
+
+class ClusterDiskSnapshots:
+    """
+    Captures the disks of all the domains of a cluster after a phase (e.g.
+    hosts discovered, cluster installed) so later runs can restore the
+    cluster to that phase instead of going through it again.
+
+    Capturing takes an external, disk only, libvirt snapshot of each domain:
+    its current images are frozen and the domain goes on writing to new qcow2
+    overlays. The frozen images are terraform volumes, which are deleted with
+    the cluster, so they are copied into the snapshot directory. A record with
+    the copies, the versions and the assisted-service metadata of the cluster,
+    and copies of the terraform state and variables, is kept per snapshot key.
+    Restoring puts fresh overlays on top of the copies, libvirt can't revert to
+    external snapshots by itself.
+
+    Snapshots are keyed by cluster name, phase and versions, so a version
+    change makes the previous snapshot of the phase stale. Stale snapshots,
+    snapshots whose images changed or are gone, and snapshots of clusters
+    whose domains are gone (cluster names are random, nothing would look them
+    up again) are dropped whenever snapshots are looked up or captured.
+    """
+
+    def __init__(
+        self, libvirt_uri: str = consts.DEFAULT_LIBVIRT_URI, snapshots_dir: str = consts.CLUSTER_DISK_SNAPSHOTS_DIR
+    ):
+        self._libvirt_uri = libvirt_uri
+        self._snapshots_dir = os.path.abspath(snapshots_dir)
+
+    @staticmethod
+    def key(cluster_name: str, phase: str, versions: dict) -> str:
+        key = json.dumps(dict(cluster_name=cluster_name, phase=phase, versions=versions), sort_keys=True)
+        return f"{cluster_name}-{phase}-{hashlib.sha256(key.encode()).hexdigest()[:12]}"
+
+    def _snapshot_dir(self, key: str) -> str:
+        return os.path.join(self._snapshots_dir, key)
+
+    def _write_record(self, record: SnapshotRecord) -> None:
+        # The record is written last and at once, a snapshot without a record was never completed
+        path = os.path.join(self._snapshot_dir(record.key), _RECORD_FILE_NAME)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "w") as _file:
+            json.dump(asdict(record), _file)
+        os.replace(temp_path, path)
+
+    def records(self) -> List[SnapshotRecord]:
+        records = []
+        if not os.path.isdir(self._snapshots_dir):
+            return records
+
+        for key in sorted(os.listdir(self._snapshots_dir)):
+            path = os.path.join(self._snapshot_dir(key), _RECORD_FILE_NAME)
+            try:
+                with open(path) as _file:
+                    records.append(SnapshotRecord.from_dict(json.load(_file)))
+            except FileNotFoundError:
+                continue
+            except (ValueError, TypeError) as e:
+                log.warning(f"Ignoring unreadable cluster snapshot record {path}: {e}")
+        return records
+
+    def _verify(self, record: SnapshotRecord) -> Optional[str]:
+        for disks in record.domains.values():
+            for disk in disks:
+                reason = disk.verify()
+                if reason:
+                    return reason
+
+        for name, checksum in record.tf_files.items():
+            path = os.path.join(self._snapshot_dir(record.key), name)
+            if not os.path.exists(path) or _file_digest(path) != checksum:
+                return f"terraform file {name} is missing or changed"
+        return None
+
+    def _domain_names(self) -> set:
+        connection = libvirt.open(self._libvirt_uri)
+        try:
+            return {domain.name() for domain in connection.listAllDomains()}
+        finally:
+            connection.close()
+
+    def prune(self) -> None:
+        """Delete the snapshots of the clusters that are gone, i.e. some of their domains no longer exist"""
+        domain_names = self._domain_names()
+        for record in self.records():
+            missing = sorted(set(record.domains) - domain_names)
+            if missing:
+                log.info(f"Dropping cluster snapshot {record.key}, domains {missing} of the cluster are gone")
+                self.delete(record)
+
+    def find(self, cluster_name: str, phase: str, versions: dict) -> Optional[SnapshotRecord]:
+        """The snapshot of the cluster phase with the given versions, if there is a valid one"""
+        self.prune()
+        key = self.key(cluster_name, phase, versions)
+        found = None
+        for record in self.records():
+            if (record.cluster_name, record.phase) != (cluster_name, phase):
+                continue
+
+            if record.key != key:
+                log.info(f"Dropping cluster snapshot {record.key}, it was captured with versions {record.versions}")
+                self.delete(record)
+                continue
+
+            reason = self._verify(record)
+            if reason:
+                log.warning(f"Dropping cluster snapshot {record.key}, {reason}")
+                self.delete(record)
+                continue
+            found = record
+        return found
+
+    @staticmethod
+    def _file_disks(root: Element) -> Dict[str, str]:
+        disks = {}
+        for disk in root.findall("./devices/disk[@device='disk']"):
+            source = disk.find("source")
+            if disk.get("type") == "file" and source is not None:
+                disks[disk.find("target").get("dev")] = source.get("file")
+        return disks
+
+    def _snapshot_xml(self, key: str, domain_name: str, root: Element) -> str:
+        snapshot = Element("domainsnapshot")
+        SubElement(snapshot, "name").text = key
+        disks = SubElement(snapshot, "disks")
+        file_disks = self._file_disks(root)
+        for target in root.findall("./devices/disk/target"):
+            dev = target.get("dev")
+            if dev not in file_disks:
+                SubElement(disks, "disk", name=dev, snapshot="no")
+                continue
+
+            disk = SubElement(disks, "disk", name=dev, snapshot="external")
+            SubElement(disk, "driver", type="qcow2")
+            # Unique, the domain may still run on an overlay of a previous capture of the key
+            overlay = os.path.join(self._snapshot_dir(key), f"{domain_name}-{dev}-{time.time_ns()}.qcow2")
+            SubElement(disk, "source", file=overlay)
+        return tostring(snapshot, encoding="unicode")
+
+    def capture(
+        self,
+        cluster_name: str,
+        phase: str,
+        domain_names: Iterable[str],
+        versions: dict,
+        metadata: dict,
+        tf_folder: Optional[str] = None,
+    ) -> SnapshotRecord:
+        self.prune()
+        key = self.key(cluster_name, phase, versions)
+        for record in self.records():
+            if record.key == key:
+                self.delete(record)
+        os.makedirs(self._snapshot_dir(key), exist_ok=True)
+
+        domains = {}
+        connection = libvirt.open(self._libvirt_uri)
+        try:
+            for name in domain_names:
+                domain = connection.lookupByName(name)
+                root = fromstring(domain.XMLDesc(0))
+                log.info(f"Capturing the disks of {name} for cluster snapshot {key}")
+                # The snapshot itself is described by the record, libvirt doesn't keep it so the domain can be
+                # undefined as usual
+                domain.snapshotCreateXML(
+                    self._snapshot_xml(key, name, root),
+                    libvirt.VIR_DOMAIN_SNAPSHOT_CREATE_DISK_ONLY
+                    | libvirt.VIR_DOMAIN_SNAPSHOT_CREATE_ATOMIC
+                    | libvirt.VIR_DOMAIN_SNAPSHOT_CREATE_NO_METADATA,
+                )
+                domains[name] = [
+                    self._copy_frozen_image(key, name, target, path) for target, path in self._file_disks(root).items()
+                ]
+        finally:
+            connection.close()
+
+        tf_files = {}
+        for name in _TF_FILES if tf_folder else ():
+            path = os.path.join(tf_folder, name)
+            if os.path.exists(path):
+                shutil.copyfile(path, os.path.join(self._snapshot_dir(key), name))
+                tf_files[name] = _file_digest(path)
+
+        record = SnapshotRecord(key, cluster_name, phase, versions, metadata, domains, tf_files)
+        self._write_record(record)
+        log.info(f"Captured cluster snapshot {key} of {len(domains)} domains")
+        return record
+
+    def _copy_frozen_image(self, key: str, domain_name: str, target: str, path: str) -> DiskSnapshot:
+        # Converted rather than copied, so the copy doesn't depend on the backing files of the volume either
+        copy_path = os.path.join(self._snapshot_dir(key), f"{domain_name}-{target}-frozen-{time.time_ns()}.qcow2")
+        utils.run_command(f"qemu-img convert -U -O qcow2 {path} {copy_path}", shell=True)
+        return DiskSnapshot.of(target, copy_path)
+
+    def restore(self, record: SnapshotRecord, tf_folder: Optional[str] = None, start: bool = True) -> None:
+        """Power off the domains and put them back on the disks of the snapshot, all writes since are discarded"""
+        connection = libvirt.open(self._libvirt_uri)
+        try:
+            for name, disks in record.domains.items():
+                domain = connection.lookupByName(name)
+                if domain.isActive():
+                    domain.destroy()
+
+                root = fromstring(domain.XMLDesc(0))
+                previous_overlays = self._file_disks(root)
+                overlays = {}
+                for disk in disks:
+                    overlays[disk.target] = os.path.join(
+                        self._snapshot_dir(record.key), f"{name}-{disk.target}-{time.time_ns()}.qcow2"
+                    )
+                    utils.run_command(
+                        f"qemu-img create -f qcow2 -F qcow2 -b {disk.path} {overlays[disk.target]}", shell=True
+                    )
+
+                for disk_element in root.findall("./devices/disk[@device='disk']"):
+                    target = disk_element.find("target").get("dev")
+                    if target in overlays:
+                        disk_element.find("source").set("file", overlays[target])
+                        # libvirt probes the new backing chain
+                        for backing_store in disk_element.findall("backingStore"):
+                            disk_element.remove(backing_store)
+                connection.defineXML(tostring(root, encoding="unicode"))
+                self._remove_unreferenced(previous_overlays.values())
+
+                if start:
+                    domain.create()
+        finally:
+            connection.close()
+
+        for name in record.tf_files if tf_folder else ():
+            shutil.copyfile(os.path.join(self._snapshot_dir(record.key), name), os.path.join(tf_folder, name))
+        log.info(f"Restored cluster snapshot {record.key}")
+
+    def _frozen_paths(self, exclude: Optional[SnapshotRecord] = None) -> set:
+        return {
+            disk.path
+            for record in self.records()
+            if exclude is None or record.key != exclude.key
+            for disks in record.domains.values()
+            for disk in disks
+        }
+
+    def _remove_unreferenced(self, paths: Iterable[str], exclude: Optional[SnapshotRecord] = None) -> None:
+        # Only the overlays created here are removed, and only while no snapshot is based on them
+        frozen = self._frozen_paths(exclude)
+        for path in paths:
+            if os.path.dirname(os.path.dirname(path)) == self._snapshots_dir and path not in frozen:
+                with suppress(FileNotFoundError):
+                    os.remove(path)
+
+    def delete(self, record: SnapshotRecord) -> None:
+        """Forget the snapshot, overlays it created are removed unless a domain or another snapshot uses them"""
+        snapshot_dir = self._snapshot_dir(record.key)
+        os.remove(os.path.join(snapshot_dir, _RECORD_FILE_NAME))
+
+        # Overlays the domains are running on, or that are backing them, must stay
+        in_use = set()
+        connection = libvirt.open(self._libvirt_uri)
+        try:
+            for name in record.domains:
+                try:
+                    sources = self._file_disks(fromstring(connection.lookupByName(name).XMLDesc(0))).values()
+                except libvirt.libvirtError:
+                    continue
+                for source in sources:
+                    in_use.update(_backing_chain(source))
+        finally:
+            connection.close()
+
+        overlays = [os.path.join(snapshot_dir, name) for name in os.listdir(snapshot_dir) if name.endswith(".qcow2")]
+        self._remove_unreferenced([path for path in overlays if path not in in_use], exclude=record)
+        for name in record.tf_files:
+            with suppress(FileNotFoundError):
+                os.remove(os.path.join(snapshot_dir, name))
+        if not os.listdir(snapshot_dir):
+            os.rmdir(snapshot_dir)
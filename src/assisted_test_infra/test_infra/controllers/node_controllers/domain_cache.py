@@ -0,0 +1,101 @@
+import threading
+from collections import defaultdict
+from typing import Dict, List
+from xml.etree.ElementTree import Element, fromstring
+
+import libvirt
+
+from service_client import log
+
+
+class DomainCache:
+    """
+    Per connection cache of libvirt domain handles and of the parsed XML
+    description of each domain. Entries are invalidated by the lifecycle and
+    device events libvirt emits for the domain, so changes made outside of this
+    process are seen as well. If the connection can't deliver events (e.g. the
+    event loop was not started before it was opened) nothing is cached.
+
+    The cached XML trees are shared, callers must not modify them.
+    """
+
+    def __init__(self, connection: libvirt.virConnect):
+        self._connection = connection
+        self._lock = threading.Lock()
+        self._domains: Dict[str, libvirt.virDomain] = {}
+        self._xmls: Dict[str, Element] = {}
+        # Bumped on every invalidation, a description fetched while its domain changed is not cached
+        self._generations: Dict[str, int] = defaultdict(int)
+        self._callback_ids: List[int] = []
+        self.hits = 0
+        self.misses = 0
+        self.enabled = self._register_events()
+
+    def _register_events(self) -> bool:
+        callbacks = {
+            libvirt.VIR_DOMAIN_EVENT_ID_LIFECYCLE: self._on_lifecycle_event,
+            libvirt.VIR_DOMAIN_EVENT_ID_DEVICE_ADDED: self._on_device_event,
+            libvirt.VIR_DOMAIN_EVENT_ID_DEVICE_REMOVED: self._on_device_event,
+        }
+        try:
+            for event_id, callback in callbacks.items():
+                self._callback_ids.append(self._connection.domainEventRegisterAny(None, event_id, callback, None))
+        except libvirt.libvirtError as e:
+            log.warning(f"Can't watch libvirt domain events ({e}), domains won't be cached")
+            self.close()
+            return False
+        return True
+
+    def close(self) -> None:
+        for callback_id in self._callback_ids:
+            try:
+                self._connection.domainEventDeregisterAny(callback_id)
+            except libvirt.libvirtError:
+                pass
+        self._callback_ids.clear()
+
+    def _on_lifecycle_event(self, connection, domain: libvirt.virDomain, event: int, detail: int, opaque) -> None:
+        self.invalidate(domain.name(), forget_domain=event == libvirt.VIR_DOMAIN_EVENT_UNDEFINED)
+
+    def _on_device_event(self, connection, domain: libvirt.virDomain, device_alias: str, opaque) -> None:
+        self.invalidate(domain.name())
+
+    def invalidate(self, name: str, forget_domain: bool = False) -> None:
+        with self._lock:
+            self._generations[name] += 1
+            self._xmls.pop(name, None)
+            if forget_domain:
+                self._domains.pop(name, None)
+
+    def add(self, domain: libvirt.virDomain) -> None:
+        """Keep a handle that was already obtained (e.g. by listing all the domains) to skip looking it up"""
+        if self.enabled:
+            with self._lock:
+                self._domains.setdefault(domain.name(), domain)
+
+    def domain(self, name: str) -> libvirt.virDomain:
+        with self._lock:
+            domain = self._domains.get(name)
+        if domain is not None:
+            return domain
+
+        domain = self._connection.lookupByName(name)
+        self.add(domain)
+        return domain
+
+    def xml(self, name: str) -> Element:
+        """The parsed XML description of the domain, equivalent to parsing XMLDesc(0)"""
+        with self._lock:
+            root = self._xmls.get(name)
+            generation = self._generations[name]
+            if root is not None:
+                self.hits += 1
+                return root
+            self.misses += 1
+
+        root = fromstring(self.domain(name).XMLDesc(0))
+        if self.enabled:
+            with self._lock:
+                if self._generations[name] == generation:
+                    self._xmls[name] = root
+        return root
@@ -11,16 +11,23 @@ from contextlib import contextmanager, suppress
 from pathlib import Path
 from typing import Callable, List, Tuple, Union
 from xml.dom import minidom
-from xml.etree.ElementTree import Element, SubElement, tostring
+from xml.etree.ElementTree import Element, SubElement, fromstring, tostring
 
 import libvirt
 import waiting
 
 import consts
 from assisted_test_infra.test_infra import BaseClusterConfig, BaseInfraEnvConfig, utils
+from assisted_test_infra.test_infra.controllers.node_controllers import libvirt_event_loop
 from assisted_test_infra.test_infra.controllers.node_controllers.disk import Disk, DiskSourceType
+from assisted_test_infra.test_infra.controllers.node_controllers.domain_cache import DomainCache
+from assisted_test_infra.test_infra.controllers.node_controllers.domain_operations import (
+    BulkDomainExecutor,
+    DomainOperationResult,
+)
 from assisted_test_infra.test_infra.controllers.node_controllers.node import Node
 from assisted_test_infra.test_infra.controllers.node_controllers.node_controller import NodeController
+from assisted_test_infra.test_infra.controllers.node_controllers.node_events import NodeEventsNotifier
 from assisted_test_infra.test_infra.helper_classes.config.base_nodes_config import BaseNodesConfig
 from service_client import log
 from tests.global_variables import DefaultVariables
@@ -44,12 +51,18 @@ class LibvirtController(NodeController, ABC):
             self.libvirt_uri = libvirt_uri
         log.info("Connection URI to KVM server: %s;", self.libvirt_uri)
         self.use_dhcp_for_libvirt: str = global_variables.use_dhcp_for_libvirt
+        # The event loop must be registered before the connection is opened for the domain cache to get events
+        libvirt_event_loop.start()
         self.libvirt_connection: libvirt.virConnect = libvirt.open(self.libvirt_uri)
+        self._domain_cache = DomainCache(self.libvirt_connection)
+        self._node_events = NodeEventsNotifier(self.libvirt_connection)
         self.private_ssh_key_path: Path = config.private_ssh_key_path
         self._setup_timestamp: str = utils.run_command('date +"%Y-%m-%d %T"')[0]
 
     def __del__(self):
         with suppress(Exception):
+            self._domain_cache.close()
+            self._node_events.close()
             self.libvirt_connection.close()
 
     @staticmethod
@@ -75,6 +88,7 @@ class LibvirtController(NodeController, ABC):
 
         domains = self.libvirt_connection.listAllDomains()
         for domain in domains:
+            self._domain_cache.add(domain)
             domain_name = domain.name()
             if name_filter and name_filter not in domain_name:
                 continue
@@ -92,16 +106,15 @@ class LibvirtController(NodeController, ABC):
         return self.libvirt_connection.listAllNetworks()
 
     @classmethod
-    def _list_disks(cls, node):
-        all_disks = minidom.parseString(node.XMLDesc()).getElementsByTagName("disk")
-        return [cls._disk_xml_to_disk_obj(disk_xml) for disk_xml in all_disks]
+    def _list_disks(cls, node_xml: Element) -> List[Disk]:
+        return [cls._disk_xml_to_disk_obj(disk_xml) for disk_xml in node_xml.iter("disk")]
 
     @classmethod
-    def _disk_xml_to_disk_obj(cls, disk_xml):
+    def _disk_xml_to_disk_obj(cls, disk_xml: Element) -> Disk:
         return Disk(
             # device_type indicates how the disk is to be exposed to the guest OS.
             # Possible values for this attribute are "floppy", "disk", "cdrom", and "lun", defaulting to "disk".
-            type=disk_xml.getAttribute("device"),
+            type=disk_xml.get("device", ""),
             alias=cls._get_disk_alias(disk_xml),
             wwn=cls._get_disk_wwn(disk_xml),
             **cls._get_disk_source_attributes(disk_xml),
@@ -109,33 +122,32 @@ class LibvirtController(NodeController, ABC):
         )
 
     @staticmethod
-    def _get_disk_source_attributes(disk_xml):
-        source_xml = disk_xml.getElementsByTagName("source")
+    def _get_disk_source_attributes(disk_xml: Element):
+        source_element = disk_xml.find(".//source")
 
         source_type = DiskSourceType.OTHER
         source_path = None
         source_pool = None
         source_volume = None
 
-        if source_xml:
-            disk_type = disk_xml.getAttribute("type")
-            source_element = source_xml[0]
+        if source_element is not None:
+            disk_type = disk_xml.get("type", "")
 
             if disk_type == "file":
                 source_type = DiskSourceType.FILE
-                source_path = source_element.getAttribute("file")
+                source_path = source_element.get("file", "")
             elif disk_type == "block":
                 source_type = DiskSourceType.BLOCK
-                source_path = source_element.getAttribute("dev")
+                source_path = source_element.get("dev", "")
             elif disk_type == "dir":
                 source_type = DiskSourceType.DIR
-                source_path = source_element.getAttribute("dir")
+                source_path = source_element.get("dir", "")
             elif disk_type == "network":
                 source_type = DiskSourceType.NETWORK
             elif disk_type == "volume":
                 source_type = DiskSourceType.VOLUME
-                source_pool = source_element.getAttribute("pool")
-                source_volume = source_element.getAttribute("volume")
+                source_pool = source_element.get("pool", "")
+                source_volume = source_element.get("volume", "")
             elif disk_type == "nvme":
                 source_type = DiskSourceType.NVME
 
@@ -147,28 +159,27 @@ class LibvirtController(NodeController, ABC):
         )
 
     @staticmethod
-    def _get_disk_target_data(disk_xml):
-        target_xml = disk_xml.getElementsByTagName("target")
+    def _get_disk_target_data(disk_xml: Element):
+        target_element = disk_xml.find(".//target")
         return dict(
-            bus=target_xml[0].getAttribute("bus") if target_xml else None,
-            target=target_xml[0].getAttribute("dev") if target_xml else None,
+            bus=target_element.get("bus", "") if target_element is not None else None,
+            target=target_element.get("dev", "") if target_element is not None else None,
         )
 
     @staticmethod
-    def _get_disk_wwn(disk_xml):
-        wwn_xml = disk_xml.getElementsByTagName("wwn")
-        wwn = wwn_xml[0].firstChild.data if wwn_xml else None
+    def _get_disk_wwn(disk_xml: Element):
+        wwn_element = disk_xml.find(".//wwn")
+        wwn = wwn_element.text if wwn_element is not None else None
         return wwn
 
     @staticmethod
-    def _get_disk_alias(disk_xml):
-        alias_xml = disk_xml.getElementsByTagName("alias")
-        alias = alias_xml[0].getAttribute("name") if alias_xml else None
+    def _get_disk_alias(disk_xml: Element):
+        alias_element = disk_xml.find(".//alias")
+        alias = alias_element.get("name", "") if alias_element is not None else None
         return alias
 
     def list_disks(self, node_name: str):
-        node = self.libvirt_connection.lookupByName(node_name)
-        return self._list_disks(node)
+        return self._list_disks(self._domain_cache.xml(node_name))
 
     def list_leases(self, network_name):
         with utils.file_lock_context():
@@ -204,10 +215,11 @@ class LibvirtController(NodeController, ABC):
         assert network_name is not None
         log.info("Wait till %s nodes will be ready and have ips", self._config.nodes_count)
         try:
-            waiting.wait(
+            self._node_events.watch_leases(self.libvirt_connection.networkLookupByName(network_name))
+            self._node_events.wait_for(
                 lambda: len(self.list_leases(network_name)) >= self._config.nodes_count,
-                timeout_seconds=consts.NODES_REGISTERED_TIMEOUT * self._config.nodes_count,
-                sleep_seconds=10,
+                timeout=consts.NODES_REGISTERED_TIMEOUT * self._config.nodes_count,
+                interval=10,
                 waiting_for="Nodes to have ips",
             )
             log.info("All nodes have booted and got ips")
@@ -220,31 +232,37 @@ class LibvirtController(NodeController, ABC):
 
     def shutdown_node(self, node_name):
         log.info("Going to shutdown %s", node_name)
-        node = self.libvirt_connection.lookupByName(node_name)
+        self._shutdown_domain(self._domain_cache.domain(node_name))
 
+    def _shutdown_domain(self, node: libvirt.virDomain) -> None:
         if node.isActive():
             node.destroy()
+            self._domain_cache.invalidate(node.name())
 
     def shutdown_all_nodes(self):
         log.info("Going to shutdown all the nodes")
         nodes = self.list_nodes()
 
-        for node in nodes:
-            self.shutdown_node(node.name)
+        self._run_on_nodes(
+            [node.name for node in nodes], self._shutdown_domain, "shutdown", is_done=lambda node: not node.isActive()
+        )
 
     def start_node(self, node_name, check_ips=True):
         log.info("Going to power-on %s, check ips flag %s", node_name, check_ips)
-        node = self.libvirt_connection.lookupByName(node_name)
+        self._start_domain(self._domain_cache.domain(node_name), check_ips)
 
+    def _start_domain(self, node: libvirt.virDomain, check_ips: bool = True) -> None:
         if not node.isActive():
             try:
                 node.create()
+                self._domain_cache.invalidate(node.name())
                 if check_ips:
                     self._wait_till_domain_has_ips(node)
             except waiting.exceptions.TimeoutExpired:
-                log.warning("Node %s failed to recive IP, retrying", node_name)
-                self.shutdown_node(node_name)
+                log.warning("Node %s failed to recive IP, retrying", node.name())
+                self._shutdown_domain(node)
                 node.create()
+                self._domain_cache.invalidate(node.name())
                 if check_ips:
                     self._wait_till_domain_has_ips(node)
 
@@ -252,10 +270,41 @@ class LibvirtController(NodeController, ABC):
         log.info("Going to power-on all the nodes")
         nodes = self.list_nodes()
 
-        for node in nodes:
-            self.start_node(node.name)
+        self._run_on_nodes(
+            [node.name for node in nodes], self._start_domain, "start", is_done=lambda node: node.isActive()
+        )
         return nodes
 
+    def _run_on_nodes(
+        self,
+        node_names: List[str],
+        operation: Callable[[libvirt.virDomain], None],
+        action: str,
+        is_done: Callable[[libvirt.virDomain], bool],
+    ) -> List[DomainOperationResult]:
+        """Run the operation on all the nodes concurrently and wait for all of them to reach the state it leads to.
+        Every node is handled even if some fail, the error of the first failed node is raised at the end."""
+        results = BulkDomainExecutor(self.libvirt_uri).run(node_names, operation)
+
+        succeeded = [result.name for result in results if result.ok]
+        self._node_events.wait_for(
+            lambda: all(is_done(self._domain_cache.domain(name)) for name in succeeded),
+            timeout=consts.LIBVIRT_BULK_OPERATION_STATE_TIMEOUT,
+            interval=consts.DEFAULT_CHECK_STATUSES_INTERVAL,
+            waiting_for=f"nodes {succeeded} to {action}",
+        )
+
+        for result in results:
+            if result.ok:
+                log.info("%s of %s took %.2fs", action, result.name, result.duration)
+            else:
+                log.error("%s of %s failed after %.2fs: %s", action, result.name, result.duration, result.error)
+
+        failed = [result for result in results if not result.ok]
+        if failed:
+            raise failed[0].error
+        return results
+
     @staticmethod
     def create_disk(disk_path, disk_size):
         command = f"qemu-img create -f qcow2 {disk_path} {disk_size}"
@@ -281,14 +330,14 @@ class LibvirtController(NodeController, ABC):
         cls.create_disk(disk_path, image_size)
 
     @classmethod
-    def _get_all_scsi_disks(cls, node):
-        return (disk for disk in cls._list_disks(node) if disk.bus == "scsi")
+    def _get_all_scsi_disks(cls, node_xml: Element):
+        return (disk for disk in cls._list_disks(node_xml) if disk.bus == "scsi")
 
     @classmethod
-    def _get_attached_test_disks(cls, node):
+    def _get_attached_test_disks(cls, node_xml: Element):
         return (
             disk
-            for disk in cls._get_all_scsi_disks(node)
+            for disk in cls._get_all_scsi_disks(node_xml)
             if disk.alias and disk.alias.startswith(cls.TEST_DISKS_PREFIX)
         )
 
@@ -300,11 +349,11 @@ class LibvirtController(NodeController, ABC):
         regex_by = disk.target[:2]
         return re.findall(rf"^{regex_by}(.*)$", disk.target)[0]
 
-    def _get_available_scsi_identifier(self, node):
+    def _get_available_scsi_identifier(self, node_xml: Element):
         """
         :return: Returns, for example, `d` if `sda`, `sdb`, `sdc`, `sde` are all already in use
         """
-        identifiers_in_use = [self._get_disk_scsi_identifier(disk) for disk in self._get_all_scsi_disks(node)]
+        identifiers_in_use = [self._get_disk_scsi_identifier(disk) for disk in self._get_all_scsi_disks(node_xml)]
 
         try:
             result = next(candidate for candidate in string.ascii_lowercase if candidate not in identifiers_in_use)
@@ -318,13 +367,13 @@ class LibvirtController(NodeController, ABC):
         Attaches a disk with the given size to the given node. All tests disks can later
         be detached with detach_all_test_disks
         """
-        node = self.libvirt_connection.lookupByName(node_name)
+        node = self._domain_cache.domain(node_name)
 
         # Prefixing the disk's target element's dev attribute with `sd` makes libvirt create an SCSI disk.
         # We don't use `vd` virtio disks because libvirt overwrites our aliases if we do so, coming up with
         # its own `virtio-<num>` aliases instead. Those aliases allow us to identify disks created by this
         # function when we perform `detach_all_test_disks` for cleanup.
-        target_dev = f"sd{self._get_available_scsi_identifier(node)}"
+        target_dev = f"sd{self._get_available_scsi_identifier(self._domain_cache.xml(node_name))}"
         disk_alias = f"{self.TEST_DISKS_PREFIX}-{target_dev}"
 
         with tempfile.NamedTemporaryFile() as f:
@@ -354,15 +403,17 @@ class LibvirtController(NodeController, ABC):
         """,
             attach_flags,
         )
+        self._domain_cache.invalidate(node_name)
 
         return tmp_disk
 
     def detach_all_test_disks(self, node_name):
-        node = self.libvirt_connection.lookupByName(node_name)
+        node = self._domain_cache.domain(node_name)
 
-        for test_disk in self._get_attached_test_disks(node):
+        for test_disk in list(self._get_attached_test_disks(self._domain_cache.xml(node_name))):
             assert test_disk.alias is not None, "A test disk has no alias. This should never happen"
             node.detachDeviceAlias(test_disk.alias)
+            self._domain_cache.invalidate(node_name)
 
             assert test_disk.source_path is not None, "A test disk has no source file. This should never happen"
             assert test_disk.source_path.startswith(
@@ -429,6 +480,7 @@ class LibvirtController(NodeController, ABC):
         )
 
         utils.run_command(command)
+        self._domain_cache.invalidate(node_name)
         try:
             waiting.wait(
                 lambda: len(self.list_leases(network_name)) > len(mac_addresses),
@@ -455,6 +507,7 @@ class LibvirtController(NodeController, ABC):
         log.info(f"Undefining an interface mac: {mac}, for node: {node_name}")
         command = f"virsh detach-interface {node_name} --type network --mac {mac}"
         utils.run_command(command, True)
+        self._domain_cache.invalidate(node_name)
         log.info("Successfully removed interface.")
 
     def restart_node(self, node_name):
@@ -478,11 +531,11 @@ class LibvirtController(NodeController, ABC):
         self.format_all_node_disks()
 
     def is_active(self, node_name):
-        node = self.libvirt_connection.lookupByName(node_name)
+        node = self._domain_cache.domain(node_name)
         return node.isActive()
 
     def get_node_ips_and_macs(self, node_name):
-        node = self.libvirt_connection.lookupByName(node_name)
+        node = self._domain_cache.domain(node_name)
         return self._get_domain_ips_and_macs(node)
 
     @staticmethod
@@ -520,12 +573,18 @@ class LibvirtController(NodeController, ABC):
         ips, _ = self._get_domain_ips_and_macs(domain)
         return ips
 
+    def _watch_domain_leases(self, domain: libvirt.virDomain) -> None:
+        for source in self._domain_cache.xml(domain.name()).iterfind(".//devices/interface/source[@network]"):
+            with suppress(libvirt.libvirtError):
+                self._node_events.watch_leases(self.libvirt_connection.networkLookupByName(source.get("network")))
+
     def _wait_till_domain_has_ips(self, domain, timeout=600, interval=10):
         log.info("Waiting till host %s will have ips", domain.name())
-        waiting.wait(
+        self._watch_domain_leases(domain)
+        self._node_events.wait_for(
             lambda: len(self._get_domain_ips(domain)) > 0,
-            timeout_seconds=timeout,
-            sleep_seconds=interval,
+            timeout=timeout,
+            interval=interval,
             waiting_for="Waiting for Ips",
             expected_exceptions=Exception,
         )
@@ -557,12 +616,14 @@ class LibvirtController(NodeController, ABC):
 
     def set_per_device_boot_order(self, node_name, key: Callable[[Disk], int]):
         log.info(f"Changing boot order for node: {node_name}")
-        node = self.libvirt_connection.lookupByName(node_name)
+        node = self._domain_cache.domain(node_name)
         current_xml = node.XMLDesc(0)
         xml = minidom.parseString(current_xml.encode("utf-8"))
         self._clean_domain_os_boot_data(xml)
         disks_xmls = xml.getElementsByTagName("disk")
-        disks_xmls.sort(key=lambda disk: key(self._disk_xml_to_disk_obj(disk)))
+        # Both parsers list the disks in document order
+        disks = self._list_disks(fromstring(current_xml))
+        disks_xmls = [disks_xmls[i] for i in sorted(range(len(disks)), key=lambda i: key(disks[i]))]
 
         for index, disk_xml in enumerate(disks_xmls):
             boot_element = xml.createElement("boot")
@@ -571,6 +632,7 @@ class LibvirtController(NodeController, ABC):
 
         # Apply new machine xml
         dom = self.libvirt_connection.defineXML(xml.toprettyxml())
+        self._domain_cache.invalidate(node_name)
         if dom is None:
             raise Exception(f"Failed to set boot order for node: {node_name}")
         log.info(f"Boot order set successfully: for node: {node_name}")
@@ -581,9 +643,7 @@ class LibvirtController(NodeController, ABC):
 
     def set_boot_order(self, node_name: str, cd_first: bool = False, cdrom_iso_path: str = None) -> None:
         log.info(f"Going to set the following boot order: cd_first: {cd_first}, " f"for node: {node_name}")
-        node = self.libvirt_connection.lookupByName(node_name)
-        current_xml = node.XMLDesc(0)
-        xml = minidom.parseString(current_xml.encode("utf-8"))
+        xml = self._get_xml(node_name)
         self._clean_domain_os_boot_data(xml)
         os_element = xml.getElementsByTagName("os")[0]
         # Set boot elements for hd and cdrom
@@ -599,29 +659,27 @@ class LibvirtController(NodeController, ABC):
 
         # Apply new machine xml
         dom = self.libvirt_connection.defineXML(xml.toprettyxml())
+        self._domain_cache.invalidate(node_name)
         if dom is None:
             raise Exception(f"Failed to set boot order cdrom first: {cd_first}, for node: {node_name}")
         log.info(f"Boot order set successfully: cdrom first: {cd_first}, for node: {node_name}")
 
     def get_host_id(self, node_name):
-        dom = self.libvirt_connection.lookupByName(node_name)
+        dom = self._domain_cache.domain(node_name)
         return dom.UUIDString()
 
     def get_cpu_cores(self, node_name):
-        xml = self._get_xml(node_name)
-        vcpu_element = xml.getElementsByTagName("vcpu")[0]
-        return int(vcpu_element.firstChild.nodeValue)
+        return int(self._domain_cache.xml(node_name).find(".//vcpu").text)
 
     def set_cpu_cores(self, node_name, core_count):
         log.info(f"Going to set vcpus to {core_count} for node: {node_name}")
-        dom = self.libvirt_connection.lookupByName(node_name)
+        dom = self._domain_cache.domain(node_name)
         dom.setVcpusFlags(core_count)
+        self._domain_cache.invalidate(node_name)
         log.info(f"Successfully set vcpus to {core_count} for node: {node_name}")
 
     def get_ram_kib(self, node_name):
-        xml = self._get_xml(node_name)
-        memory_element = xml.getElementsByTagName("currentMemory")[0]
-        return int(memory_element.firstChild.nodeValue)
+        return int(self._domain_cache.xml(node_name).find(".//currentMemory").text)
 
     def set_ram_kib(self, node_name, ram_kib):
         log.info(f"Going to set memory to {ram_kib} for node: {node_name}")
@@ -631,6 +689,7 @@ class LibvirtController(NodeController, ABC):
         current_memory_element = xml.getElementsByTagName("currentMemory")[0]
         current_memory_element.firstChild.replaceWholeText(ram_kib)
         dom = self.libvirt_connection.defineXML(xml.toprettyxml())
+        self._domain_cache.invalidate(node_name)
         if dom is None:
             raise Exception(f"Failed to set memory for node: {node_name}")
         log.info(f"Successfully set memory to {ram_kib} for node: {node_name}")
@@ -680,7 +739,8 @@ class LibvirtController(NodeController, ABC):
         )
 
     def _get_xml(self, node_name):
-        dom = self.libvirt_connection.lookupByName(node_name)
+        # A fresh document, callers modify it and define the domain with it
+        dom = self._domain_cache.domain(node_name)
         current_xml = dom.XMLDesc(0)
         return minidom.parseString(current_xml.encode("utf-8"))
 
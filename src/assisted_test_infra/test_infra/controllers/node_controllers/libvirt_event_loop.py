@@ -0,0 +1,31 @@
+import threading
+from typing import Optional
+
+import libvirt
+
+from service_client import log
+
+_lock = threading.Lock()
+_thread: Optional[threading.Thread] = None
+
+
+def _run() -> None:
+    while True:
+        try:
+            libvirt.virEventRunDefaultImpl()
+        except libvirt.libvirtError:
+            log.exception("libvirt event loop iteration failed")
+
+
+def start() -> None:
+    """Register the default libvirt event loop implementation and run it in a daemon thread, once per process.
+    Events are only delivered on connections that were opened after the event loop was registered."""
+    global _thread
+
+    with _lock:
+        if _thread is not None:
+            return
+
+        libvirt.virEventRegisterDefaultImpl()
+        _thread = threading.Thread(target=_run, name="libvirt-events", daemon=True)
+        _thread.start()
@@ -23,8 +23,8 @@ class Node:
         self.private_ssh_key_path = private_ssh_key_path
         self.username = username
         self.node_controller = node_controller
-        self.original_vcpu_count = self.get_cpu_cores()
-        self.original_ram_kib = self.get_ram_kib()
+        self._original_vcpu_count: Optional[int] = None
+        self._original_ram_kib: Optional[int] = None
         self._ips = []
         self._macs = []
         self._role = role
@@ -32,6 +32,19 @@ class Node:
     def __str__(self):
         return self.name
 
+    @property
+    def original_vcpu_count(self) -> int:
+        # Read on first use instead of on construction, listing nodes does not need to inspect every domain
+        if self._original_vcpu_count is None:
+            self._original_vcpu_count = self.get_cpu_cores()
+        return self._original_vcpu_count
+
+    @property
+    def original_ram_kib(self) -> int:
+        if self._original_ram_kib is None:
+            self._original_ram_kib = self.get_ram_kib()
+        return self._original_ram_kib
+
     @property
     def is_active(self):
         return self.node_controller.is_active(self.name)
@@ -185,6 +198,7 @@ class Node:
         return self.node_controller.get_cpu_cores(self.name)
 
     def set_cpu_cores(self, core_count):
+        _ = self.original_vcpu_count  # keep the count from before the first change
         self.node_controller.set_cpu_cores(self.name, core_count)
 
     def reset_cpu_cores(self):
@@ -194,6 +208,7 @@ class Node:
         return self.node_controller.get_ram_kib(self.name)
 
     def set_ram_kib(self, ram_kib):
+        _ = self.original_ram_kib  # keep the memory from before the first change
         self.node_controller.set_ram_kib(self.name, ram_kib)
 
     def reset_ram_kib(self):
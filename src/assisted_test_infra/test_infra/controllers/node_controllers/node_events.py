@@ -0,0 +1,184 @@
+import ctypes
+import os
+import select
+import struct
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import libvirt
+import waiting
+
+import consts
+from service_client import log
+
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_INOTIFY_EVENT = struct.Struct("iIII")
+
+
+class LeaseFileWatcher:
+    """
+    Calls on_change whenever the dnsmasq status file of a libvirt network
+    bridge, which holds the DHCP leases of the network, is written. The
+    directory is watched with inotify, as the file is replaced rather than
+    modified in place.
+    """
+
+    def __init__(self, path: str, on_change: Callable[[], None]):
+        self.path = path
+        self._on_change = on_change
+        self._stopped = threading.Event()
+        self._fd: Optional[int] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> bool:
+        """Returns whether the file is watched, it's not if the leases are kept on a remote host or without inotify"""
+        directory = os.path.dirname(self.path)
+        if not os.path.isdir(directory):
+            log.debug(f"Leases directory {directory} does not exist, not watching {self.path}")
+            return False
+
+        try:
+            libc = ctypes.CDLL(None, use_errno=True)
+            fd = libc.inotify_init1(os.O_CLOEXEC | os.O_NONBLOCK)
+            if (
+                fd < 0
+                or libc.inotify_add_watch(fd, directory.encode(), _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE) < 0
+            ):
+                raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+        except (AttributeError, OSError) as e:
+            log.debug(f"Can't watch {self.path} with inotify: {e}")
+            return False
+
+        self._fd = fd
+        self._thread = threading.Thread(target=self._run, name=f"leases-{os.path.basename(self.path)}", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _changed_names(self, buffer: bytes) -> List[str]:
+        names, offset = [], 0
+        while offset < len(buffer):
+            _, _, _, length = _INOTIFY_EVENT.unpack_from(buffer, offset)
+            offset += _INOTIFY_EVENT.size
+            names.append(buffer[offset : offset + length].rstrip(b"\0").decode())
+            offset += length
+        return names
+
+    def _run(self) -> None:
+        name = os.path.basename(self.path)
+        while not self._stopped.is_set():
+            readable, _, _ = select.select([self._fd], [], [], 1)
+            if not readable:
+                continue
+            if name in self._changed_names(os.read(self._fd, 4096)):
+                self._on_change()
+
+
+class NodeEventsNotifier:
+    """
+    Wakes up waiters of node readiness as soon as something that may affect
+    it happens: a domain lifecycle or guest agent event, or a change in the
+    DHCP leases of a watched network. Conditions that change without any event
+    (e.g. addresses learned through ARP) are still re-checked every interval.
+    """
+
+    def __init__(self, connection: libvirt.virConnect):
+        self._connection = connection
+        self._changed = threading.Condition()
+        self._version = 0
+        self._callback_ids: List[int] = []
+        self._lease_watchers: Dict[str, LeaseFileWatcher] = {}
+        self._lease_watchers_lock = threading.Lock()
+        self._register_events()
+
+    def _register_events(self) -> None:
+        try:
+            self._callback_ids.append(
+                self._connection.domainEventRegisterAny(
+                    None, libvirt.VIR_DOMAIN_EVENT_ID_LIFECYCLE, self._on_lifecycle_event, None
+                )
+            )
+            self._callback_ids.append(
+                self._connection.domainEventRegisterAny(
+                    None, libvirt.VIR_DOMAIN_EVENT_ID_AGENT_LIFECYCLE, self._on_agent_event, None
+                )
+            )
+        except libvirt.libvirtError as e:
+            log.warning(f"Can't watch libvirt domain events ({e}), waiting for nodes by polling")
+
+    def _on_lifecycle_event(self, connection, domain: libvirt.virDomain, event: int, detail: int, opaque) -> None:
+        self.notify()
+
+    def _on_agent_event(self, connection, domain: libvirt.virDomain, state: int, reason: int, opaque) -> None:
+        self.notify()
+
+    def notify(self) -> None:
+        with self._changed:
+            self._version += 1
+            self._changed.notify_all()
+
+    def watch_leases(self, network: libvirt.virNetwork) -> None:
+        bridge = network.bridgeName()
+        # Nodes are waited for from several threads at once, the same network must only be watched by one of them
+        with self._lease_watchers_lock:
+            if bridge in self._lease_watchers:
+                return
+
+            watcher = LeaseFileWatcher(os.path.join(consts.LIBVIRT_DNSMASQ_DIR, f"{bridge}.status"), self.notify)
+            if watcher.start():
+                self._lease_watchers[bridge] = watcher
+
+    def close(self) -> None:
+        for callback_id in self._callback_ids:
+            try:
+                self._connection.domainEventDeregisterAny(callback_id)
+            except libvirt.libvirtError:
+                pass
+        self._callback_ids.clear()
+
+        with self._lease_watchers_lock:
+            watchers = list(self._lease_watchers.values())
+            self._lease_watchers.clear()
+        for watcher in watchers:
+            watcher.stop()
+
+    def wait_for(
+        self,
+        predicate: Callable[[], Any],
+        timeout: float,
+        interval: float,
+        waiting_for: str,
+        expected_exceptions=(),
+    ) -> Any:
+        """Evaluate the predicate whenever an event arrives, and at least every interval seconds, until it returns a
+        truthy value. Raises waiting.TimeoutExpired on timeout, like waiting.wait does."""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._changed:
+                version = self._version
+
+            # The predicate queries libvirt, it's evaluated without blocking the events callbacks
+            try:
+                result = predicate()
+                if result:
+                    return result
+            except expected_exceptions:
+                pass
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise waiting.TimeoutExpired(timeout, waiting_for)
+
+            with self._changed:
+                if self._version == version:
+                    self._changed.wait(min(remaining, interval))
@@ -0,0 +1,293 @@
+import json
+import os
+import socket
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterable, List, Optional
+from xml.etree.ElementTree import Element, SubElement, fromstring, tostring
+
+import libvirt
+
+import consts
+from assisted_test_infra.test_infra import utils
+from assisted_test_infra.test_infra.tools import static_network
+from service_client import log
+
+
+@dataclass(frozen=True)
+class NodeShape:
+    vcpus: int
+    ram_mib: int
+    disk_size_gib: int
+    network_name: str
+
+    @property
+    def key(self) -> str:
+        return f"{self.vcpus}c-{self.ram_mib}m-{self.disk_size_gib}g-{self.network_name}"
+
+
+@dataclass
+class PoolAccounting:
+    shape: str
+    total: int
+    leased: int
+    free: int
+
+
+class NodePool:
+    """
+    Keeps pre-defined, stopped libvirt domains per node shape (CPU, RAM, disk
+    and network) so tests can lease them instead of creating new ones. The
+    disk of each domain is a qcow2 overlay on top of an empty base image of
+    the shape's size, resetting a released domain only recreates its overlay.
+
+    The pool is shared between processes: the domains and their leases are
+    kept in a state file that is modified under a file lock. A lease records
+    the process that holds it, leases of processes that are gone (e.g. a
+    crashed test run) are reclaimed on the next acquire, and domains deleted
+    outside of the pool (e.g. by make clean) are dropped from it.
+    """
+
+    def __init__(
+        self,
+        pool_dir: str = consts.NODE_POOL_DIR,
+        state_file: str = consts.NODE_POOL_STATE_PATH,
+        libvirt_uri: str = consts.DEFAULT_LIBVIRT_URI,
+    ):
+        self._pool_dir = pool_dir
+        self._state_file = state_file
+        self._lock_file = f"{state_file}.lock"
+        self._libvirt_uri = libvirt_uri
+        self._connection: Optional[libvirt.virConnect] = None
+        self._hostname = socket.gethostname()
+        # Domains taken from the pool and domains that had to be created because the pool had none left
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def connection(self) -> libvirt.virConnect:
+        if self._connection is None:
+            self._connection = libvirt.open(self._libvirt_uri)
+        return self._connection
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _load_state(self) -> Dict[str, dict]:
+        if not os.path.isfile(self._state_file):
+            return {}
+
+        with open(self._state_file) as fp:
+            return json.load(fp)
+
+    def _dump_state(self, state: Dict[str, dict]) -> None:
+        # Replaced at once, a process killed while writing it leaves the previous state behind
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(self._state_file) or ".")
+        with os.fdopen(fd, "w") as fp:
+            json.dump(state, fp)
+        os.replace(temp_path, self._state_file)
+
+    def _is_stale(self, lease: dict) -> bool:
+        if lease["hostname"] != self._hostname:
+            return False
+        try:
+            os.kill(lease["pid"], 0)
+        except ProcessLookupError:
+            return True
+        except PermissionError:
+            pass
+        return False
+
+    def _base_image_path(self, shape: NodeShape) -> str:
+        return os.path.join(self._pool_dir, f"base-{shape.disk_size_gib}g.qcow2")
+
+    def _overlay_path(self, name: str) -> str:
+        return os.path.join(self._pool_dir, f"{name}.qcow2")
+
+    def _create_overlay(self, shape: NodeShape, name: str) -> None:
+        base_image = self._base_image_path(shape)
+        if not os.path.exists(base_image):
+            utils.run_command(f"qemu-img create -f qcow2 {base_image} {shape.disk_size_gib}G", shell=True)
+        utils.run_command(f"qemu-img create -f qcow2 -F qcow2 -b {base_image} {self._overlay_path(name)}", shell=True)
+
+    def _domain_xml(self, shape: NodeShape, name: str) -> str:
+        domain = Element("domain", type="kvm")
+        SubElement(domain, "name").text = name
+        SubElement(domain, "memory", unit="MiB").text = str(shape.ram_mib)
+        SubElement(domain, "currentMemory", unit="MiB").text = str(shape.ram_mib)
+        SubElement(domain, "vcpu").text = str(shape.vcpus)
+        os_element = SubElement(domain, "os")
+        SubElement(os_element, "type").text = "hvm"
+        SubElement(os_element, "boot", dev="hd")
+        SubElement(os_element, "boot", dev="cdrom")
+        features = SubElement(domain, "features")
+        SubElement(features, "acpi")
+        SubElement(features, "apic")
+        SubElement(domain, "cpu", mode="host-passthrough")
+
+        devices = SubElement(domain, "devices")
+        disk = SubElement(devices, "disk", type="file", device="disk")
+        SubElement(disk, "driver", name="qemu", type="qcow2", discard="unmap")
+        SubElement(disk, "source", file=self._overlay_path(name))
+        SubElement(disk, "target", dev="vda", bus="virtio")
+        cdrom = SubElement(devices, "disk", type="file", device="cdrom")
+        SubElement(cdrom, "driver", name="qemu", type="raw")
+        SubElement(cdrom, "target", dev="sda", bus="sata")
+        SubElement(cdrom, "readonly")
+        interface = SubElement(devices, "interface", type="network")
+        SubElement(interface, "source", network=shape.network_name)
+        SubElement(interface, "mac", address=static_network.generate_macs(1)[0])
+        SubElement(interface, "model", type="virtio")
+        SubElement(devices, "console", type="pty")
+        SubElement(devices, "graphics", type="vnc", autoport="yes")
+        return tostring(domain, encoding="unicode")
+
+    def _create_domain(self, state: Dict[str, dict], shape: NodeShape) -> str:
+        index = 0
+        while f"{consts.NODE_POOL_DOMAIN_PREFIX}-{shape.key}-{index}" in state:
+            index += 1
+        name = f"{consts.NODE_POOL_DOMAIN_PREFIX}-{shape.key}-{index}"
+
+        log.info("Creating pool domain %s", name)
+        self._create_overlay(shape, name)
+        self.connection.defineXML(self._domain_xml(shape, name))
+        state[name] = dict(shape=asdict(shape), lease=None)
+        return name
+
+    def _reset_domain(self, name: str, shape: NodeShape) -> None:
+        """Power off the domain, discard everything written to its disk and eject its ISO"""
+        domain = self.connection.lookupByName(name)
+        if domain.isActive():
+            domain.destroy()
+
+        self._create_overlay(shape, name)
+        root = fromstring(domain.XMLDesc(0))
+        for cdrom in root.findall("./devices/disk[@device='cdrom']"):
+            source = cdrom.find("source")
+            if source is not None:
+                cdrom.remove(source)
+        self.connection.defineXML(tostring(root, encoding="unicode"))
+
+    def _rebind_domain(self, name: str, iso_path: str, macs: List[str]) -> None:
+        domain = self.connection.lookupByName(name)
+        root = fromstring(domain.XMLDesc(0))
+        cdrom = root.find("./devices/disk[@device='cdrom']")
+        source = cdrom.find("source")
+        if source is None:
+            source = SubElement(cdrom, "source")
+        source.set("file", iso_path)
+
+        for interface, mac in zip(root.findall("./devices/interface"), macs):
+            interface.find("mac").set("address", mac)
+        self.connection.defineXML(tostring(root, encoding="unicode"))
+
+    def _drop_missing_domains(self, state: Dict[str, dict]) -> None:
+        """Forget the domains that were deleted behind the pool's back (e.g. by make clean)"""
+        existing = {domain.name() for domain in self.connection.listAllDomains()}
+        for name in [name for name in state if name not in existing]:
+            log.info("Pool domain %s no longer exists, dropping it from the pool", name)
+            if os.path.exists(self._overlay_path(name)):
+                os.remove(self._overlay_path(name))
+            del state[name]
+
+    def _reclaim_stale_leases(self, state: Dict[str, dict]) -> None:
+        for name, entry in state.items():
+            lease = entry["lease"]
+            if lease is not None and self._is_stale(lease):
+                log.info("Reclaiming pool domain %s leased by gone process %s", name, lease["pid"])
+                self._reset_domain(name, NodeShape(**entry["shape"]))
+                entry["lease"] = None
+
+    def fill(self, shape: NodeShape, count: int) -> None:
+        """Make sure the pool has at least count domains (leased or not) of the given shape"""
+        with utils.file_lock_context(self._lock_file):
+            state = self._load_state()
+            existing = sum(1 for entry in state.values() if NodeShape(**entry["shape"]) == shape)
+            for _ in range(count - existing):
+                self._create_domain(state, shape)
+            self._dump_state(state)
+
+    def acquire(self, shape: NodeShape, count: int, iso_path: str, macs: Optional[List[str]] = None) -> List[str]:
+        """
+        Lease count stopped domains of the given shape, booting from iso_path
+        with the given MAC addresses (random ones if not given). Domains are
+        created if the pool doesn't have enough free ones. Returns their names.
+        """
+        macs = macs or static_network.generate_macs(count)
+        with utils.file_lock_context(self._lock_file):
+            state = self._load_state()
+            self._drop_missing_domains(state)
+            self._reclaim_stale_leases(state)
+
+            free = [
+                name
+                for name, entry in sorted(state.items())
+                if entry["lease"] is None and NodeShape(**entry["shape"]) == shape
+            ][:count]
+            try:
+                names = free + [self._create_domain(state, shape) for _ in range(count - len(free))]
+                # Leased only once all of them boot from the ISO, a failure leaves them all free in the pool
+                for name, mac in zip(names, macs):
+                    self._rebind_domain(name, iso_path, [mac])
+                for name in names:
+                    state[name]["lease"] = dict(hostname=self._hostname, pid=os.getpid(), since=time.time())
+            finally:
+                self._dump_state(state)
+
+        self.hits += len(free)
+        self.misses += count - len(free)
+        log.info("Leased pool domains %s (%d from the pool, %d created)", names, len(free), count - len(free))
+        return names
+
+    def release(self, names: Iterable[str]) -> None:
+        """Reset the given domains and return them to the pool"""
+        with utils.file_lock_context(self._lock_file):
+            state = self._load_state()
+            for name in names:
+                if name not in state:
+                    log.warning(f"Pool domain {name} was dropped from the pool, it can't be released")
+                    continue
+                self._reset_domain(name, NodeShape(**state[name]["shape"]))
+                state[name]["lease"] = None
+            self._dump_state(state)
+
+    def release_owned(self) -> None:
+        """Return all the domains leased by the current process"""
+        owner = (self._hostname, os.getpid())
+        self.release(
+            [
+                name
+                for name, entry in self._load_state().items()
+                if entry["lease"] and (entry["lease"]["hostname"], entry["lease"]["pid"]) == owner
+            ]
+        )
+
+    def drain(self) -> None:
+        """Delete all the free domains of the pool and their disks"""
+        with utils.file_lock_context(self._lock_file):
+            state = self._load_state()
+            for name in [name for name, entry in state.items() if entry["lease"] is None]:
+                log.info("Deleting pool domain %s", name)
+                try:
+                    self.connection.lookupByName(name).undefineFlags(libvirt.VIR_DOMAIN_UNDEFINE_NVRAM)
+                except libvirt.libvirtError as e:
+                    log.warning(f"Failed deleting pool domain {name}: {e}")
+                if os.path.exists(self._overlay_path(name)):
+                    os.remove(self._overlay_path(name))
+                del state[name]
+            self._dump_state(state)
+
+    def accounting(self) -> List[PoolAccounting]:
+        shapes: Dict[str, PoolAccounting] = {}
+        for entry in self._load_state().values():
+            key = NodeShape(**entry["shape"]).key
+            accounting = shapes.setdefault(key, PoolAccounting(shape=key, total=0, leased=0, free=0))
+            accounting.total += 1
+            if entry["lease"] is None:
+                accounting.free += 1
+            else:
+                accounting.leased += 1
+        return sorted(shapes.values(), key=lambda accounting: accounting.shape)
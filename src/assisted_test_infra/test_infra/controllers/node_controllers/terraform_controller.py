@@ -1,4 +1,3 @@
-import json
 import os
 import shutil
 import warnings
@@ -250,8 +249,7 @@ class TerraformController(LibvirtController):
         tfvars.update(self._params)
         tfvars.update(self._secondary_tfvars())
 
-        with open(os.path.join(self.tf_folder, consts.TFVARS_JSON_NAME), "w") as _file:
-            json.dump(tfvars, _file)
+        self.tf.write_variables_file(tfvars)
 
     def _secondary_tfvars(self):
         provisioning_cidr = self.get_provisioning_cidr()
@@ -18,6 +18,7 @@ from netaddr import IPAddress, IPNetwork
 import consts
 from assisted_test_infra.test_infra import BaseClusterConfig, BaseInfraEnvConfig, ClusterName, exceptions, utils
 from assisted_test_infra.test_infra.controllers.load_balancer_controller import LoadBalancerController
+from assisted_test_infra.test_infra.controllers.node_controllers.cluster_disk_snapshots import ClusterDiskSnapshots
 from assisted_test_infra.test_infra.helper_classes.base_cluster import BaseCluster
 from assisted_test_infra.test_infra.helper_classes.cluster_host import ClusterHost
 from assisted_test_infra.test_infra.helper_classes.infra_env import InfraEnv
@@ -361,10 +362,10 @@ class Cluster(BaseCluster):
             host_validation_ids=json.dumps(host_validation_ids) if host_validation_ids else None,
             cluster_validation_ids=json.dumps(cluster_validation_ids) if cluster_validation_ids else None,
         )
-        self.api_client.client.v2_set_ignored_validations(self.id, ignore_obj, **kwargs)
+        self.api_client.set_ignored_validations(self.id, ignore_obj, **kwargs)
 
     def get_ignored_validations(self, **kwargs) -> models.IgnoredValidations:
-        return self.api_client.client.v2_get_ignored_validations(self.id, **kwargs)
+        return self.api_client.get_ignored_validations(self.id, **kwargs)
 
     def set_odf(self, properties: str = None, update: bool = False):
         self.set_olm_operator(consts.OperatorType.ODF, properties=properties, update=update)
@@ -1092,6 +1093,48 @@ class Cluster(BaseCluster):
         )
         self.nodes.controller.log_configuration()
 
+    def _disk_snapshots(self) -> ClusterDiskSnapshots:
+        return ClusterDiskSnapshots(libvirt_uri=self.nodes.controller.libvirt_uri)
+
+    def _disk_snapshot_versions(self) -> dict:
+        return dict(service=self.api_client.get_versions(), openshift_version=self._config.openshift_version)
+
+    def capture_disk_snapshot(self, phase: str) -> None:
+        """Keep the disks of the cluster nodes as they are after the given phase, see restore_disk_snapshot"""
+        self._disk_snapshots().capture(
+            self.name,
+            phase,
+            [node.name for node in self.nodes],
+            versions=self._disk_snapshot_versions(),
+            metadata=dict(cluster_id=self.id, status=self.get_details().status, host_ids=sorted(self.get_host_ids())),
+            tf_folder=getattr(self.nodes.controller, "tf_folder", None),
+        )
+
+    def restore_disk_snapshot(self, phase: str) -> bool:
+        """
+        Bring the cluster nodes back to a snapshot of the given phase, instead of
+        going through it again. The snapshot must have been captured with the
+        same versions, for this cluster (e.g. reused by setting its id), and
+        the cluster must still be in the status it had. Returns False if there
+        is no such snapshot.
+        """
+        snapshots = self._disk_snapshots()
+        record = snapshots.find(self.name, phase, self._disk_snapshot_versions())
+        if record is None:
+            return False
+
+        status = self.get_details().status
+        if record.metadata["cluster_id"] != self.id or record.metadata["status"] != status:
+            log.info(
+                f"Cluster snapshot {record.key} of cluster {record.metadata['cluster_id']} in status "
+                f"{record.metadata['status']} doesn't match cluster {self.id} in status {status}"
+            )
+            return False
+
+        snapshots.restore(record, tf_folder=getattr(self.nodes.controller, "tf_folder", None))
+        self.nodes.drop_cache()
+        return True
+
     def prepare_networking(self):
         self.nodes.wait_for_networking()
         self._configure_networking_for_primary_stack()
@@ -1384,11 +1427,11 @@ class Cluster(BaseCluster):
 
     @staticmethod
     def get_ip_for_single_node(client, cluster_id, machine_cidr, ipv4_first=True):
-        cluster_info = client.cluster_get(cluster_id).to_dict()
-        if len(cluster_info["hosts"]) == 0:
+        hosts_nics_data = client.get_cluster_hosts_nics_data(cluster_id, ipv4_first=ipv4_first)
+        if len(hosts_nics_data) == 0:
             raise Exception("No host found")
         network = IPNetwork(machine_cidr)
-        interfaces = client.get_inventory_host_nics_data(cluster_info["hosts"][0], ipv4_first=ipv4_first)
+        interfaces = next(iter(hosts_nics_data.values()))
         for intf in interfaces:
             ip = intf.get("ip")
             if ip and IPAddress(ip) in network:
@@ -1402,9 +1445,8 @@ class Cluster(BaseCluster):
         return self.api_client.get_ips_for_role(cluster_id, network, consts.NodeRoles.WORKER)
 
     def get_host_disks(self, host, filter=None):
-        hosts = self.get_hosts()
-        selected_host = [h for h in hosts if h["id"] == host["id"]]
-        disks = json.loads(selected_host[0]["inventory"])["disks"]
+        selected_host = self.api_client.get_host_by_id(self.id, host["id"])
+        disks = json.loads(selected_host["inventory"])["disks"]
         if not filter:
             return [disk for disk in disks]
         else:
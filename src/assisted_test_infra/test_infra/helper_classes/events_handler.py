@@ -1,14 +1,174 @@
-from typing import List
+from collections import defaultdict, deque
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, Hashable, List, Optional, Tuple
 
 import waiting
 
+import consts
 from assisted_test_infra.test_infra.utils import utils
 from service_client import InventoryClient, log
 
 
+class EventsCursor:
+    """Incremental reader of the events of a cluster, host or infra-env.
+
+    The events API has no "since" filter, and its list is not append-only (e.g. events of deleted hosts are hidden),
+    so an offset can't be kept between polls. Each poll pages the events newest first, until it reaches events that
+    are older than the last seen event_time, and drops the ones that were already seen.
+    Seen events are kept in a bounded ring buffer, indexed by host id, severity and message prefix.
+    """
+
+    PAGE_SIZE = 1000
+    OVERLAP = 20
+    MESSAGE_PREFIX_LENGTH = 16
+
+    def __init__(
+        self,
+        api_client: InventoryClient,
+        cluster_id: str = "",
+        host_id: str = "",
+        infra_env_id: str = "",
+        categories: List[str] = None,
+        max_events: int = consts.EVENTS_CURSOR_BUFFER_SIZE,
+    ):
+        self.api_client = api_client
+        self._query = dict(cluster_id=cluster_id, host_id=host_id, infra_env_id=infra_env_id, categories=categories)
+        self._max_events = max_events
+        self._events: Deque[Dict[str, Any]] = deque()
+        self._fingerprints = set()
+        self._by_host: Dict[str, Deque[Dict[str, Any]]] = defaultdict(deque)
+        self._by_severity: Dict[str, Deque[Dict[str, Any]]] = defaultdict(deque)
+        self._by_message_prefix: Dict[str, Deque[Dict[str, Any]]] = defaultdict(deque)
+        self.last_event_time: Optional[str] = None
+        self._last_event_timestamp: Optional[datetime] = None
+
+    def __len__(self):
+        return len(self._events)
+
+    @property
+    def events(self) -> List[Dict[str, Any]]:
+        return list(self._events)
+
+    @staticmethod
+    def fingerprint(event: Dict[str, Any]) -> Hashable:
+        # Events have no id of their own, these fields together identify a single event
+        return (
+            event.get("event_time"),
+            event.get("name"),
+            event.get("host_id"),
+            event.get("severity"),
+            event.get("request_id"),
+            event.get("message"),
+        )
+
+    def _indexes_of(self, event: Dict[str, Any]) -> List[Tuple[Dict[str, Deque], str]]:
+        return [
+            (self._by_host, event.get("host_id") or ""),
+            (self._by_severity, event.get("severity") or ""),
+            (self._by_message_prefix, (event.get("message") or "")[: self.MESSAGE_PREFIX_LENGTH]),
+        ]
+
+    def _append(self, event: Dict[str, Any]) -> None:
+        if len(self._events) >= self._max_events:
+            self._evict()
+
+        self._events.append(event)
+        self._fingerprints.add(self.fingerprint(event))
+        for index, key in self._indexes_of(event):
+            index[key].append(event)
+
+    def _evict(self) -> None:
+        # The oldest event in the buffer is also the oldest one of every index it belongs to
+        event = self._events.popleft()
+        self._fingerprints.discard(self.fingerprint(event))
+        for index, key in self._indexes_of(event):
+            index[key].popleft()
+            if not index[key]:
+                del index[key]
+
+    @staticmethod
+    def _timestamp(event: Dict[str, Any]) -> datetime:
+        return datetime.strptime(event["event_time"], "%Y-%m-%dT%H:%M:%S.%fZ")
+
+    def _is_before_cursor(self, event: Dict[str, Any]) -> bool:
+        return self._last_event_timestamp is not None and self._timestamp(event) < self._last_event_timestamp
+
+    def _fetch_since_cursor(self) -> List[Dict[str, Any]]:
+        events = []
+        oldest = None
+        offset = 0
+        while True:
+            page = self.api_client.get_events(**self._query, order="descending", limit=self.PAGE_SIZE, offset=offset)
+            if offset and page and self._timestamp(page[0]) < oldest:
+                # Events were hidden since the previous page was fetched, this page skipped the ones that moved up
+                offset = max(offset - self.PAGE_SIZE + self.OVERLAP, 0)
+                continue
+
+            events.extend(page)
+            if page:
+                oldest = self._timestamp(page[-1]) if oldest is None else min(oldest, self._timestamp(page[-1]))
+            if len(page) < self.PAGE_SIZE or self._is_before_cursor(page[-1]):
+                break
+            offset += len(page) - self.OVERLAP
+
+        # Pages that were fetched again overlap, the sort is stable so events sharing an event_time keep their order
+        events.reverse()
+        return sorted(events, key=self._timestamp)
+
+    def poll(self) -> List[Dict[str, Any]]:
+        """Fetch the events that were added since the last poll, returns only the new ones"""
+        new_events = []
+        for event in self._fetch_since_cursor():
+            if self._is_before_cursor(event) or self.fingerprint(event) in self._fingerprints:
+                continue
+            self._append(event)
+            new_events.append(event)
+
+        if new_events:
+            self.last_event_time = new_events[-1].get("event_time")
+            self._last_event_timestamp = self._timestamp(new_events[-1])
+        return new_events
+
+    def by_host(self, host_id: str) -> List[Dict[str, Any]]:
+        return list(self._by_host.get(host_id, []))
+
+    def by_severity(self, severity: str) -> List[Dict[str, Any]]:
+        return list(self._by_severity.get(severity, []))
+
+    def by_message_prefix(self, prefix: str) -> List[Dict[str, Any]]:
+        if len(prefix) >= self.MESSAGE_PREFIX_LENGTH:
+            candidates = self._by_message_prefix.get(prefix[: self.MESSAGE_PREFIX_LENGTH], [])
+        else:
+            candidates = self._events
+        return [event for event in candidates if event["message"].startswith(prefix)]
+
+    def find(self, predicate: Callable[[Dict[str, Any]], bool], host_id: str = None) -> Optional[Dict[str, Any]]:
+        """Search the buffered events, optionally narrowed down to a host, for an event matching the predicate"""
+        candidates = self._events if host_id is None else self._by_host.get(host_id, [])
+        return next((event for event in candidates if predicate(event)), None)
+
+
 class EventsHandler:
     def __init__(self, api_client: InventoryClient):
         self.api_client = api_client
+        self._cursors: Dict[Tuple[str, str, str], EventsCursor] = {}
+
+    def get_cursor(self, host_id: str = "", cluster_id: str = "", infra_env_id: str = "") -> EventsCursor:
+        key = (host_id, cluster_id, infra_env_id)
+        if key not in self._cursors:
+            self._cursors[key] = EventsCursor(
+                self.api_client, cluster_id=cluster_id, host_id=host_id, infra_env_id=infra_env_id
+            )
+        return self._cursors[key]
+
+    @staticmethod
+    def _is_matching_event(event: Dict[str, Any], event_to_find: str, reference_time: int, params_list: List[str]):
+        if event_to_find not in event["message"]:
+            return False
+        # Adding a 2 sec buffer to account for a small time diff between the machine and the time on staging
+        if utils.to_utc(event["event_time"]) >= reference_time - 2:
+            return all(param in event["message"] for param in params_list)
+        return False
 
     def _find_event(
         self,
@@ -18,16 +178,15 @@ class EventsHandler:
         host_id: str = "",
         infra_env_id: str = "",
         cluster_id: str = "",
+        events_list: List[Dict[str, Any]] = None,
     ):
-        events_list = self.get_events(host_id=host_id, cluster_id=cluster_id, infra_env_id=infra_env_id)
+        if events_list is None:
+            events_list = self.get_cursor(host_id, cluster_id, infra_env_id).poll()
+
         for event in events_list:
-            if event_to_find not in event["message"]:
-                continue
-            # Adding a 2 sec buffer to account for a small time diff between the machine and the time on staging
-            if utils.to_utc(event["event_time"]) >= reference_time - 2:
-                if all(param in event["message"] for param in params_list):
-                    log.info(f"Event to find: {event_to_find} exists with its params")
-                    return True
+            if self._is_matching_event(event, event_to_find, reference_time, params_list or []):
+                log.info(f"Event to find: {event_to_find} exists with its params")
+                return True
         return False
 
     def get_events(self, host_id: str = "", cluster_id: str = "", infra_env_id: str = "", **kwargs):
@@ -46,6 +205,12 @@ class EventsHandler:
         log.info(f"Searching for event: {event_to_find}")
         if params_list is None:
             params_list = list()
+
+        # Events that were already fetched by previous waits are searched once, later polls only match the delta
+        cursor = self.get_cursor(host_id, cluster_id, infra_env_id)
+        if self._find_event(event_to_find, reference_time, params_list, events_list=cursor.events):
+            return
+
         waiting.wait(
             lambda: self._find_event(event_to_find, reference_time, params_list, host_id, infra_env_id, cluster_id),
             timeout_seconds=timeout,
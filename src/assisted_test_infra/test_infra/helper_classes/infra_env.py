@@ -11,6 +11,7 @@ from assisted_test_infra.test_infra import BaseInfraEnvConfig, utils
 from assisted_test_infra.test_infra.helper_classes.entity import Entity
 from assisted_test_infra.test_infra.helper_classes.nodes import Nodes
 from assisted_test_infra.test_infra.tools import static_network
+from assisted_test_infra.test_infra.utils.iso_cache import IsoCache
 from assisted_test_infra.test_infra.utils.waiting import wait_till_all_infra_env_hosts_are_in_status
 from service_client import InventoryClient, log
 
@@ -60,19 +61,26 @@ class InfraEnv(Entity):
 
     @JunitTestCase()
     def download_image(self, iso_download_path: str = None) -> Path:
-        iso_download_url = self.get_details().download_url
         iso_download_path = self.get_iso_download_path(iso_download_path)
 
         # ensure file path exists before downloading
         if not os.path.exists(iso_download_path):
             utils.recreate_folder(os.path.dirname(iso_download_path), force_recreate=False)
 
+        # The static network configuration is part of the ISO, update it before taking the details the cache key
+        # is computed from
         self._update_static_network()
+        details = self.get_details()
 
         self.nodes.get_controller().set_download_path(iso_download_path)
 
-        log.info(f"Downloading image {iso_download_url} to {iso_download_path}")
-        return utils.download_file(iso_download_url, iso_download_path, self._config.verify_download_iso_ssl)
+        log.info(f"Downloading image {details.download_url} to {iso_download_path}")
+        return IsoCache().get(
+            IsoCache.key_of(details, self._config.pull_secret),
+            details.download_url,
+            iso_download_path,
+            self._config.verify_download_iso_ssl,
+        )
 
     @JunitTestCase()
     def download_infra_env_file(self, file_name: str, file_path: str) -> Path:
@@ -118,8 +126,7 @@ class InfraEnv(Entity):
         if not self._config.host_installer_args:
             return
 
-        log.info(f"Updating host {host_id} with installer args: {self._config.host_installer_args}")
-        self.api_client.client.v2_update_host_installer_args(
+        self.api_client.update_host_installer_args(
             infra_env_id=self.id, host_id=host_id, installer_args_params=self._config.host_installer_args
         )
 
@@ -178,9 +185,9 @@ class InfraEnv(Entity):
     def deregister(self, deregister_hosts=True):
         log.info(f"Deregister infra env with id: {self.id}")
         if deregister_hosts:
-            for host in self.api_client.client.v2_list_hosts(self.id):
+            for host in self.api_client.get_infra_env_hosts(self.id):
                 log.info(f"Deregister infra_env host with id: {host['id']}")
-                self.api_client.client.v2_deregister_host(infra_env_id=self.id, host_id=host["id"])
+                self.api_client.deregister_host(infra_env_id=self.id, host_id=host["id"])
 
-        self.api_client.client.deregister_infra_env(self.id)
+        self.api_client.delete_infra_env(self.id)
         self._config.infra_env_id = None
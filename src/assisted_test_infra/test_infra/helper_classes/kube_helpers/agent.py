@@ -1,7 +1,6 @@
 from pprint import pformat
 from typing import List, Optional, Union
 
-import waiting
 from kubernetes.client import ApiClient, CustomObjectsApi
 
 import consts
@@ -19,6 +18,8 @@ class Agent(BaseCustomResource):
     In oder to start the installation, all assigned agents must be approved.
     """
 
+    _api_group = consts.CRD_API_GROUP
+    _api_version = consts.CRD_API_VERSION
     _plural = "agents"
 
     def __init__(
@@ -36,16 +37,12 @@ class Agent(BaseCustomResource):
         crd_api: CustomObjectsApi,
         cluster_deployment,
         agents_namespace=None,
+        label_selector: Optional[str] = None,
     ) -> List["Agent"]:
         agents_namespace = agents_namespace or cluster_deployment.ref.namespace
-        resources = crd_api.list_namespaced_custom_object(
-            group=consts.CRD_API_GROUP,
-            version=consts.CRD_API_VERSION,
-            plural=cls._plural,
-            namespace=agents_namespace,
-        )
+        resources = cls.list_paginated(crd_api, namespace=agents_namespace, label_selector=label_selector)
         assigned_agents = []
-        for item in resources.get("items", []):
+        for item in resources:
             if item["spec"].get("clusterDeploymentName") is None:
                 # Unbound late-binding agent, not part of the given cluster_deployment
                 continue
@@ -103,15 +100,10 @@ class Agent(BaseCustomResource):
         log.info("deleted agent %s", self.ref)
 
     def status(self, timeout: Union[int, float] = consts.DEFAULT_WAIT_FOR_CRD_STATUS_TIMEOUT) -> dict:
-        def _attempt_to_get_status() -> dict:
-            return self.get()["status"]
-
-        return waiting.wait(
-            _attempt_to_get_status,
-            sleep_seconds=0.5,
-            timeout_seconds=timeout,
+        return self.wait_for_watched(
+            lambda agent: agent["status"],
+            timeout=timeout,
             waiting_for=f"agent {self.ref} status",
-            expected_exceptions=KeyError,
         )
 
     @property
@@ -214,10 +206,11 @@ class Agent(BaseCustomResource):
         timeout: Union[int, float] = consts.DEFAULT_WAIT_FOR_CRD_STATUS_TIMEOUT,
         interval: int = 10,
     ) -> None:
-        waiting.wait(
+        cls._wait_for_agents(
+            agents,
             lambda: cls._are_agents_in_state(agents, expected_state),
-            timeout_seconds=timeout,
-            sleep_seconds=interval,
+            timeout=timeout,
+            interval=interval,
             waiting_for=f"Agents to be in state {expected_state}",
         )
 
@@ -249,19 +242,31 @@ class Agent(BaseCustomResource):
     ) -> None:
         log.info(f"Now Wait till agents have status as {status_type}")
 
-        waiting.wait(
+        Agent._wait_for_agents(
+            agents,
             lambda: Agent.are_agents_in_status(
                 agents,
                 status_type,
                 status=status,
             ),
-            timeout_seconds=timeout,
-            sleep_seconds=interval,
+            timeout=timeout,
+            interval=interval,
             waiting_for=f"Agents to have {status_type} status",
         )
 
+    @staticmethod
+    def _wait_for_agents(agents: List["Agent"], predicate, timeout, interval, waiting_for: str) -> None:
+        if not agents:
+            predicate()
+            return
+
+        # Woken up by changes of the watched agents, the interval only matters for agents of other namespaces
+        agents[0].watch_cache.wait_for(
+            predicate, timeout=timeout, waiting_for=waiting_for, expected_exceptions=KeyError, interval=interval
+        )
+
     @classmethod
     def _are_agents_in_state(cls, agents: List["Agent"], expected_state: str) -> bool:
-        agent_states = {agent.ref.name: agent.get()["status"]["debugInfo"]["state"] for agent in agents}
+        agent_states = {agent.ref.name: agent.get_watched()["status"]["debugInfo"]["state"] for agent in agents}
         log.info(f"Waiting for agents to have the state '{expected_state}' and currently agent state is {agent_states}")
         return all(agent_state == expected_state for agent_state in agent_states.values())
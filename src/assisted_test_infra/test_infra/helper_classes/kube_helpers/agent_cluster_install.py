@@ -204,15 +204,10 @@ class AgentClusterInstall(BaseCustomResource):
         log.info("deleted agentclusterinstall %s", self.ref)
 
     def status(self, timeout: Union[int, float] = consts.DEFAULT_WAIT_FOR_CRD_STATE_TIMEOUT) -> dict:
-        def _attempt_to_get_status() -> dict:
-            return self.get()["status"]
-
-        return waiting.wait(
-            _attempt_to_get_status,
-            sleep_seconds=0.5,
-            timeout_seconds=timeout,
+        return self.wait_for_watched(
+            lambda agent_cluster_install: agent_cluster_install["status"],
+            timeout=timeout,
             waiting_for=f"cluster {self.ref} status",
-            expected_exceptions=KeyError,
         )
 
     def wait_to_be_ready(
@@ -279,11 +274,10 @@ class AgentClusterInstall(BaseCustomResource):
             elif status == exception_status and reason == exception_reason:
                 raise Exception(f"Unexpected status and reason: {exception_status} {exception_reason}")
 
-        waiting.wait(
+        self.watch_cache.wait_for(
             _has_required_condition,
-            timeout_seconds=timeout,
+            timeout=timeout,
             waiting_for=f"agentclusterinstall {self.ref} condition " f"{cond_type} to be {required_status}",
-            sleep_seconds=10,
             expected_exceptions=waiting.exceptions.TimeoutExpired,
         )
 
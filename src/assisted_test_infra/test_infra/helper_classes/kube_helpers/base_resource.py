@@ -1,9 +1,14 @@
 import abc
 import contextlib
+from typing import Any, Callable, Iterator, Optional, Union
 
+from kubernetes.client import CustomObjectsApi
 from kubernetes.client.rest import ApiException
 
+import consts
+
 from .common import KubeAPIContext, ObjectReference
+from .watch_cache import WatchCache
 
 
 class BaseResource(abc.ABC):
@@ -46,8 +51,93 @@ class BaseCustomResource(BaseResource):
     """
     Base class for all CRDs, enforces basic methods that every resource must
     have e.g create, path, get, delete and status.
+    Sub classes define the group, version and plural of their CRD.
     """
 
+    _api_group: str
+    _api_version: str
+    _plural: str
+
+    @classmethod
+    def list_paginated(
+        cls,
+        crd_api: CustomObjectsApi,
+        namespace: Optional[str] = None,
+        label_selector: Optional[str] = None,
+        field_selector: Optional[str] = None,
+        limit: int = consts.DEFAULT_KUBE_LIST_PAGE_SIZE,
+        continue_token: Optional[str] = None,
+    ) -> Iterator[dict]:
+        """
+        Stream the resources of this kind, filtered by the API server with the
+        given selectors. Pages of at most limit resources are fetched one at a
+        time, only when the previous page was consumed, so memory is bounded by
+        the page size. Lists across all namespaces if namespace is not set.
+        """
+        kwargs = dict(group=cls._api_group, version=cls._api_version, plural=cls._plural, limit=limit)
+        if label_selector:
+            kwargs["label_selector"] = label_selector
+        if field_selector:
+            kwargs["field_selector"] = field_selector
+
+        while True:
+            if continue_token:
+                kwargs["_continue"] = continue_token
+
+            if namespace is None:
+                page = crd_api.list_cluster_custom_object(**kwargs)
+            else:
+                page = crd_api.list_namespaced_custom_object(namespace=namespace, **kwargs)
+
+            yield from page.get("items", [])
+
+            continue_token = page.get("metadata", {}).get("continue")
+            if not continue_token:
+                return
+
+    def apply(self, **kwargs):
+        # A deleted resource may still be held by its finalizers, creating it again before it is gone would conflict
+        with contextlib.suppress(ApiException):
+            self.delete()
+            self.wait_for_deletion()
+
+        self.create(**kwargs)
+
+    def wait_for_deletion(self, timeout: Union[int, float] = consts.DEFAULT_WAIT_FOR_CRD_DELETION_TIMEOUT) -> None:
+        self.watch_cache.wait_for(
+            lambda: self.watch_cache.get(self.ref.name) is None,
+            timeout=timeout,
+            waiting_for=f"{self._plural} {self.ref} to be deleted",
+        )
+
+    @property
+    def watch_cache(self) -> WatchCache:
+        return WatchCache.of(self.crd_api, self._api_group, self._api_version, self._plural, self.ref.namespace)
+
+    def get_watched(self) -> dict:
+        """Get the resource from the watch cache, without a request to the API server"""
+        obj = self.watch_cache.get(self.ref.name)
+        if obj is None:
+            raise KeyError(f"{self._plural} {self.ref} was not found")
+        return obj
+
+    def wait_for_watched(
+        self,
+        predicate: Callable[[dict], Any],
+        timeout: Union[int, float],
+        waiting_for: str,
+        expected_exceptions=KeyError,
+        interval: Optional[float] = None,
+    ) -> Any:
+        """Wait till the predicate, evaluated on each change of the watched resource, returns a truthy value"""
+        return self.watch_cache.wait_for(
+            lambda: predicate(self.get_watched()),
+            timeout=timeout,
+            waiting_for=waiting_for,
+            expected_exceptions=expected_exceptions,
+            interval=interval,
+        )
+
     @abc.abstractmethod
     def patch(self, **kwargs) -> None:
         pass
@@ -1,5 +1,5 @@
 from pprint import pformat
-from typing import List, Optional, Tuple, Union
+from typing import Iterator, List, Optional, Tuple, Union
 
 import waiting
 from kubernetes.client import ApiClient, CustomObjectsApi
@@ -21,6 +21,8 @@ class ClusterDeployment(BaseCustomResource):
     When has sufficient data installation will start automatically.
     """
 
+    _api_group = consts.HIVE_API_GROUP
+    _api_version = consts.HIVE_API_VERSION
     _plural = "clusterdeployments"
     _platform_field = {"platform": {"agentBareMetal": {"agentSelector": {}}}}
 
@@ -150,15 +152,10 @@ class ClusterDeployment(BaseCustomResource):
         controller in the service, it might take a few seconds before appears.
         """
 
-        def _attempt_to_get_status() -> dict:
-            return self.get()["status"]
-
-        return waiting.wait(
-            _attempt_to_get_status,
-            sleep_seconds=0.5,
-            timeout_seconds=timeout,
+        return self.wait_for_watched(
+            lambda cluster_deployment: cluster_deployment["status"],
+            timeout=timeout,
             waiting_for=f"cluster {self.ref} status",
-            expected_exceptions=KeyError,
         )
 
     def condition(
@@ -197,11 +194,10 @@ class ClusterDeployment(BaseCustomResource):
             required_reason,
         )
 
-        waiting.wait(
+        self.watch_cache.wait_for(
             _has_required_condition,
-            timeout_seconds=timeout,
+            timeout=timeout,
             waiting_for=f"cluster {self.ref} condition {cond_type} to be in {required_status}",
-            sleep_seconds=10,
             expected_exceptions=waiting.exceptions.TimeoutExpired,
         )
 
@@ -217,25 +213,21 @@ class ClusterDeployment(BaseCustomResource):
         return resources
 
     @classmethod
-    def list_all_namespaces(cls, crd_api: CustomObjectsApi) -> List["ClusterDeployment"]:
-        resources = crd_api.list_cluster_custom_object(
-            group=consts.HIVE_API_GROUP,
-            version=consts.HIVE_API_VERSION,
-            plural=cls._plural,
-        )
-        return resources
+    def list_all_namespaces(cls, crd_api: CustomObjectsApi, label_selector: Optional[str] = None) -> Iterator[dict]:
+        return cls.list_paginated(crd_api, label_selector=label_selector)
 
-    def list_agents(self, agents_namespace=None) -> List[Agent]:
-        return Agent.list(self.crd_api, self, agents_namespace)
+    def list_agents(self, agents_namespace=None, label_selector: Optional[str] = None) -> List[Agent]:
+        return Agent.list(self.crd_api, self, agents_namespace, label_selector=label_selector)
 
     def wait_for_agents(
         self,
         num_agents: int = 1,
         timeout: Union[int, float] = consts.DEFAULT_WAIT_FOR_AGENTS_TIMEOUT,
         agents_namespace=None,
+        label_selector: Optional[str] = None,
     ) -> List[Agent]:
         def _wait_for_sufficient_agents_number() -> List[Agent]:
-            agents = self.list_agents(agents_namespace)
+            agents = self.list_agents(agents_namespace, label_selector=label_selector)
             return agents if len(agents) == num_agents else []
 
         return waiting.wait(
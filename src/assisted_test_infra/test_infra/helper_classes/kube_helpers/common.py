@@ -3,11 +3,13 @@ import warnings
 from typing import Optional
 
 from kubernetes.client import ApiClient
-from kubernetes.client.rest import ApiException
 
 from assisted_test_infra.test_infra.helper_classes.kube_helpers.idict import IDict
 from service_client import ClientFactory, log
 
+from .teardown import ResourceTeardown
+from .watch_cache import WatchCache
+
 # silence kubernetes debug messages.
 logging.getLogger("kubernetes").setLevel(logging.INFO)
 
@@ -47,16 +49,12 @@ class KubeAPIContext:
         log.info("exiting kube api context")
         if self._clean_on_exit:
             self._delete_all_resources()
+        if self.api_client is not None:
+            WatchCache.stop_all(api_client=self.api_client)
 
     def _delete_all_resources(self, ignore_not_found: bool = True) -> None:
         log.info("deleting all resources")
-
-        for resource in self.resources:
-            try:
-                resource.delete()
-            except ApiException as e:
-                if not (e.reason == "Not Found" and ignore_not_found):
-                    raise
+        ResourceTeardown(self.resources, ignore_not_found=ignore_not_found).run()
 
 
 class ObjectReference(IDict):
@@ -57,6 +57,8 @@ class InfraEnv(BaseCustomResource):
     reconciled. Image download url will be exposed in the status.
     """
 
+    _api_group = consts.CRD_API_GROUP
+    _api_version = consts.CRD_API_VERSION
     _plural = "infraenvs"
 
     def __init__(
@@ -211,30 +213,20 @@ class InfraEnv(BaseCustomResource):
         controller in the service, it might take a few seconds before appears.
         """
 
-        def _attempt_to_get_status() -> dict:
-            return self.get()["status"]
-
-        return waiting.wait(
-            _attempt_to_get_status,
-            sleep_seconds=0.5,
-            timeout_seconds=timeout,
+        return self.wait_for_watched(
+            lambda infra_env: infra_env["status"],
+            timeout=timeout,
             waiting_for=f"infraEnv {self.ref} status",
-            expected_exceptions=KeyError,
         )
 
     def get_iso_download_url(
         self,
         timeout: Union[int, float] = consts.DEFAULT_WAIT_FOR_ISO_URL_TIMEOUT,
     ):
-        def _attempt_to_get_image_url() -> str:
-            return self.get()["status"]["isoDownloadURL"]
-
-        return waiting.wait(
-            _attempt_to_get_image_url,
-            sleep_seconds=3,
-            timeout_seconds=timeout,
+        return self.wait_for_watched(
+            lambda infra_env: infra_env["status"]["isoDownloadURL"],
+            timeout=timeout,
             waiting_for="image to be created",
-            expected_exceptions=KeyError,
         )
 
     def get_cluster_id(self):
@@ -319,13 +311,17 @@ class InfraEnv(BaseCustomResource):
             **kwargs,
         )
 
+    @property
+    def agents_label_selector(self) -> str:
+        """Selects the agents of the hosts booted from this infra-env, assisted-service labels them with its name"""
+        return f"infraenvs.agent-install.openshift.io={self.ref.name}"
+
     def list_agents(self) -> List[Agent]:
-        all_agents = self.crd_api.list_namespaced_custom_object(
-            group=consts.CRD_API_GROUP,
-            version=consts.CRD_API_VERSION,
-            plural=Agent._plural,
+        agents = Agent.list_paginated(
+            self.crd_api,
             namespace=self.ref.namespace,
-        ).get("items", [])
+            label_selector=self.agents_label_selector,
+        )
 
         return [
             Agent(
@@ -333,8 +329,7 @@ class InfraEnv(BaseCustomResource):
                 name=agent["metadata"]["name"],
                 namespace=agent["metadata"]["namespace"],
             )
-            for agent in all_agents
-            if agent["metadata"]["labels"].get("infraenvs.agent-install.openshift.io") == self.ref.name
+            for agent in agents
         ]
 
     def wait_for_agents(
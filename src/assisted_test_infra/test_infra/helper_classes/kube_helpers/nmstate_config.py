@@ -13,6 +13,8 @@ from .base_resource import BaseCustomResource
 class NMStateConfig(BaseCustomResource):
     """Configure nmstate (static IP) related settings for agents."""
 
+    _api_group = consts.CRD_API_GROUP
+    _api_version = consts.CRD_API_VERSION
     _plural = "nmstateconfigs"
 
     def __init__(
@@ -0,0 +1,137 @@
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Tuple
+
+import waiting
+from kubernetes.client.rest import ApiException
+
+import consts
+from service_client import log
+
+# Resources are deleted layer by layer, a layer only after all the resources of the previous ones are gone, so
+# dependents (e.g. agents) never outlive what they depend on. Kinds that are not listed here are deleted after
+# the cluster deployments, secrets are always deleted last as every other resource may reference them.
+TEARDOWN_ORDER = (
+    ("Agent",),
+    ("InfraEnv", "NMStateConfig"),
+    ("AgentClusterInstall",),
+    ("ClusterDeployment",),
+    ("ClusterImageSet",),
+    (),
+    ("Secret",),
+)
+_OTHER_KINDS_LAYER = TEARDOWN_ORDER.index(())
+
+
+def _kind_of(resource) -> str:
+    return type(resource).__name__
+
+
+def _layer_of(resource) -> int:
+    kind = _kind_of(resource)
+    return next((i for i, kinds in enumerate(TEARDOWN_ORDER) if kind in kinds), _OTHER_KINDS_LAYER)
+
+
+class ResourceTeardown:
+    """
+    Deletes a set of kube resources in dependency order. The resources of a
+    single layer are deleted concurrently by a bounded pool of workers, then
+    the deletion of custom resources, which may be delayed by finalizers, is
+    awaited with the shared watch cache of each kind instead of polling every
+    object. A failure to delete a resource doesn't stop the teardown, the
+    first error is raised once every resource was handled.
+    """
+
+    def __init__(
+        self,
+        resources: Iterable,
+        max_workers: int = consts.DEFAULT_KUBE_TEARDOWN_WORKERS,
+        timeout: float = consts.DEFAULT_WAIT_FOR_CRD_DELETION_TIMEOUT,
+        ignore_not_found: bool = True,
+    ):
+        self._resources = list(resources)
+        self._max_workers = max_workers
+        self._timeout = timeout
+        self._ignore_not_found = ignore_not_found
+        self.durations: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._errors: List[Exception] = []
+
+    def layers(self) -> List[List]:
+        layers = [[] for _ in TEARDOWN_ORDER]
+        for resource in self._resources:
+            layers[_layer_of(resource)].append(resource)
+        return [layer for layer in layers if layer]
+
+    def _finished(self, kind: str, started: float) -> None:
+        with self._lock:
+            self.durations[kind] = max(self.durations.get(kind, 0), time.monotonic() - started)
+
+    def _delete(self, resource, started: float) -> bool:
+        try:
+            resource.delete()
+        except ApiException as e:
+            if not (e.reason == "Not Found" and self._ignore_not_found):
+                raise
+            return False
+        finally:
+            self._finished(_kind_of(resource), started)
+        return True
+
+    def _wait_for_deletion(self, kind: str, resources: List, started: float) -> None:
+        cache = resources[0].watch_cache
+        names = [resource.ref.name for resource in resources]
+        try:
+            cache.wait_for(
+                lambda: all(cache.get(name) is None for name in names),
+                timeout=self._timeout,
+                waiting_for=f"{len(names)} {kind} resources in {resources[0].ref.namespace} to be deleted",
+            )
+        except waiting.TimeoutExpired:
+            remaining = [name for name in names if cache.get(name) is not None]
+            log.warning(f"{kind} resources {remaining} were not deleted after {self._timeout}s")
+        finally:
+            self._finished(kind, started)
+
+    def _failed(self, description: str, error: Exception) -> None:
+        log.error(f"failed to {description}: {error}")
+        self._errors.append(error)
+
+    def _teardown_layer(self, executor: ThreadPoolExecutor, layer: List) -> None:
+        started = time.monotonic()
+        futures = [(resource, executor.submit(self._delete, resource, started)) for resource in layer]
+
+        # Only custom resources may have finalizers, wait for them with one watch per kind and namespace.
+        # The class is checked as accessing the watch_cache property of a resource starts its cache.
+        deleted: Dict[Tuple[str, str], List] = defaultdict(list)
+        for resource, future in futures:
+            try:
+                if future.result() and hasattr(type(resource), "watch_cache"):
+                    deleted[(_kind_of(resource), resource.ref.namespace)].append(resource)
+            except Exception as e:
+                self._failed(f"delete {_kind_of(resource)} {resource.ref}", e)
+
+        waits = [
+            (kind, executor.submit(self._wait_for_deletion, kind, resources, started))
+            for (kind, _), resources in deleted.items()
+        ]
+        for kind, future in waits:
+            try:
+                future.result()
+            except Exception as e:
+                self._failed(f"wait for the deletion of {kind} resources", e)
+
+        for kind, count in sorted(Counter(_kind_of(resource) for resource in layer).items()):
+            log.info(f"deleted {count} {kind} resources in {self.durations[kind]:.2f}s")
+
+    def run(self) -> Dict[str, float]:
+        """Delete all the resources, returns the time in seconds it took to delete each kind"""
+        with ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="kube-teardown") as executor:
+            for layer in self.layers():
+                self._teardown_layer(executor, layer)
+
+        if self._errors:
+            raise self._errors[0]
+        return self.durations
@@ -0,0 +1,193 @@
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import waiting
+from kubernetes import watch
+from kubernetes.client import ApiClient, CustomObjectsApi
+from kubernetes.client.rest import ApiException
+
+import consts
+from service_client import log
+
+HTTP_STATUS_GONE = 410
+
+
+class _ResourceVersionExpired(Exception):
+    pass
+
+
+class WatchCache:
+    """
+    In-memory view of all the custom objects of a single kind in a namespace,
+    kept up to date by one kubernetes watch.
+
+    The cache lists the objects once, then watches from the list
+    resourceVersion and resumes from the last seen resourceVersion whenever
+    the watch request ends. If the resourceVersion is too old (410 Gone) the
+    objects are listed again. Waiters block on change notifications instead
+    of polling the API server.
+    """
+
+    _registry: Dict[Hashable, "WatchCache"] = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, crd_api: CustomObjectsApi, group: str, version: str, plural: str, namespace: str):
+        self.crd_api = crd_api
+        self.group = group
+        self.version = version
+        self.plural = plural
+        self.namespace = namespace
+        self.resource_version: Optional[str] = None
+        self.relist_count = 0
+        self._objects: Dict[str, dict] = {}
+        self._changed = threading.Condition()
+        self._version = 0
+        self._thread: Optional[threading.Thread] = None
+        self._watch: Optional[watch.Watch] = None
+        self._stopped = threading.Event()
+
+    @classmethod
+    def of(cls, crd_api: CustomObjectsApi, group: str, version: str, plural: str, namespace: str) -> "WatchCache":
+        """Get the shared, started, cache of the given kind and namespace"""
+        key = (id(crd_api.api_client), group, version, plural, namespace)
+        with cls._registry_lock:
+            if key not in cls._registry:
+                cls._registry[key] = cls(crd_api, group, version, plural, namespace)
+            cache = cls._registry[key]
+        cache.start()
+        return cache
+
+    @classmethod
+    def stop_all(cls, api_client: Optional[ApiClient] = None) -> None:
+        """Stop and forget the caches watching through the given api client, or all of them if it is not set"""
+        with cls._registry_lock:
+            keys = [key for key in cls._registry if api_client is None or key[0] == id(api_client)]
+            caches = [cls._registry.pop(key) for key in keys]
+
+        for cache in caches:
+            cache.stop()
+
+    def start(self) -> None:
+        with self._changed:
+            if self._thread is not None:
+                return
+            self._list()
+            self._thread = threading.Thread(target=self._run, name=f"watch-{self.plural}-{self.namespace}", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._watch is not None:
+            self._watch.stop()
+
+    def _list(self) -> None:
+        resources = self.crd_api.list_namespaced_custom_object(
+            group=self.group, version=self.version, plural=self.plural, namespace=self.namespace
+        )
+        with self._changed:
+            self._objects = {item["metadata"]["name"]: item for item in resources.get("items", [])}
+            self.resource_version = resources.get("metadata", {}).get("resourceVersion")
+            self.relist_count += 1
+            self._version += 1
+            self._changed.notify_all()
+
+    def _handle_event(self, event: dict) -> None:
+        obj = event["raw_object"]
+        if event["type"] == "ERROR":
+            if obj.get("code") == HTTP_STATUS_GONE:
+                raise _ResourceVersionExpired()
+            raise ApiException(status=obj.get("code"), reason=f"{obj.get('reason')}: {obj.get('message')}")
+
+        with self._changed:
+            name = obj["metadata"]["name"]
+            if event["type"] == "DELETED":
+                self._objects.pop(name, None)
+            elif event["type"] in ("ADDED", "MODIFIED"):
+                self._objects[name] = obj
+            self.resource_version = obj["metadata"].get("resourceVersion", self.resource_version)
+            self._version += 1
+            self._changed.notify_all()
+
+    def _watch_once(self) -> None:
+        self._watch = watch.Watch()
+        for event in self._watch.stream(
+            self.crd_api.list_namespaced_custom_object,
+            group=self.group,
+            version=self.version,
+            plural=self.plural,
+            namespace=self.namespace,
+            resource_version=self.resource_version,
+            timeout_seconds=consts.DEFAULT_KUBE_WATCH_TIMEOUT,
+        ):
+            self._handle_event(event)
+            if self._stopped.is_set():
+                break
+
+    def _run(self) -> None:
+        backoff = 1
+        while not self._stopped.is_set():
+            try:
+                self._watch_once()
+                backoff = 1
+            except _ResourceVersionExpired:
+                log.debug(f"watch on {self.plural} in {self.namespace} expired, listing again")
+                self._relist()
+            except ApiException as e:
+                if e.status == HTTP_STATUS_GONE:
+                    self._relist()
+                    continue
+                log.warning(f"watch on {self.plural} in {self.namespace} failed: {e}, retrying in {backoff}s")
+                self._stopped.wait(backoff)
+                backoff = min(backoff * 2, 30)
+            except Exception as e:
+                log.warning(f"watch on {self.plural} in {self.namespace} failed: {e}, retrying in {backoff}s")
+                self._stopped.wait(backoff)
+                backoff = min(backoff * 2, 30)
+
+    def _relist(self) -> None:
+        try:
+            self._list()
+        except ApiException as e:
+            log.warning(f"failed to list {self.plural} in {self.namespace}: {e}")
+            self._stopped.wait(1)
+
+    def get(self, name: str) -> Optional[dict]:
+        with self._changed:
+            return self._objects.get(name)
+
+    def items(self) -> Dict[str, dict]:
+        with self._changed:
+            return dict(self._objects)
+
+    def wait_for(
+        self,
+        predicate: Callable[[], Any],
+        timeout: float,
+        waiting_for: str = "watched objects",
+        expected_exceptions=(),
+        interval: Optional[float] = None,
+    ) -> Any:
+        """Evaluate the predicate on every change of the watched objects until it returns a truthy value.
+        If interval is set the predicate is also re-evaluated at least every interval seconds, for predicates
+        that depend on more than this cache. Raises waiting.TimeoutExpired on timeout, like waiting.wait does."""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._changed:
+                version = self._version
+
+            # The predicate may query the API server, it's evaluated without blocking the watch thread
+            try:
+                result = predicate()
+                if result:
+                    return result
+            except expected_exceptions:
+                pass
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise waiting.TimeoutExpired(timeout, waiting_for)
+
+            with self._changed:
+                if self._version == version:
+                    self._changed.wait(remaining if interval is None else min(remaining, interval))
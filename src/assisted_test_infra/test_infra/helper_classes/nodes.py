@@ -205,8 +205,10 @@ class Nodes:
         return self.nodes_as_dict[get_node_by_hostname]
 
     def get_cluster_host_obj_from_node(self, cluster, node):
-        mapping = self.create_nodes_cluster_hosts_mapping(cluster=cluster)
-        return mapping[node.name].cluster_host
+        cluster_host_object = cluster.api_client.get_cluster_snapshot(cluster.id).index.by_inventory_hostname(node.name)
+        if cluster_host_object is None:
+            raise KeyError(node.name)
+        return Munch.fromDict(cluster_host_object)
 
     @staticmethod
     def get_cluster_hostname(cluster_host_object):
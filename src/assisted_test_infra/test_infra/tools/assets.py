@@ -1,5 +1,6 @@
 import json
 import os
+from bisect import bisect_left, bisect_right
 from typing import Any, Dict, List, Optional, Union
 
 import libvirt
@@ -18,6 +19,34 @@ from tests.global_variables import DefaultVariables
 global_variables = DefaultVariables()
 
 
+class _AddressRanges:
+    """Taken addresses of one IP version, kept as sorted and disjoint ranges so lookups are binary searches"""
+
+    def __init__(self):
+        self._firsts: List[int] = []
+        self._lasts: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self._firsts)
+
+    def add(self, first: int, last: int) -> None:
+        # Ranges overlapping or adjacent to the new one are merged with it
+        start = bisect_left(self._lasts, first - 1)
+        end = bisect_right(self._firsts, last + 1)
+        if start < end:
+            first = min(first, self._firsts[start])
+            last = max(last, self._lasts[end - 1])
+        self._firsts[start:end] = [first]
+        self._lasts[start:end] = [last]
+
+    def overlapping_last(self, first: int, last: int) -> Optional[int]:
+        """The last address of the taken range overlapping first-last, None if they are all free"""
+        index = bisect_left(self._lasts, first)
+        if index < len(self._firsts) and self._firsts[index] <= last:
+            return self._lasts[index]
+        return None
+
+
 class LibvirtNetworkAssets:
     """An assets class that stores values based on the current available
     resources, in order to allow multiple installations while avoiding
@@ -45,15 +74,15 @@ class LibvirtNetworkAssets:
             self.ASSETS_LOCKFILE_DEFAULT_PATH, os.path.basename(assets_file) + ".lock"
         )
 
-        self._allocated_ips_objects = []
-        self._allocated_bridges = []
+        self._allocated_ips = {4: _AddressRanges(), 6: _AddressRanges()}
+        self._allocated_bridges = set()
         self._taken_assets = set([])
-        self._asset = base_asset.copy()
+        self._base_asset = base_asset
         self._default_variables = DefaultVariables()
         self._libvirt_uri = libvirt_uri
 
     def get(self) -> Munch:
-        self._verify_asset_fields()
+        self._verify_asset_fields(self._base_asset)
 
         with utils.file_lock_context(self._lock_file):
             assets_in_use = self._get_assets_in_use_from_assets_file()
@@ -62,23 +91,25 @@ class LibvirtNetworkAssets:
             self._fill_allocated_ips_and_bridges_by_interface()
             self._fill_virsh_allocated_ips_and_bridges()
 
-            self._override_ip_networks_values_if_not_free()
-            self._override_network_bridges_values_if_not_free()
+            asset = self._base_asset.copy()
+            self._override_ip_networks_values_if_not_free(asset)
+            self._override_network_bridges_values_if_not_free(asset)
 
-            self._taken_assets.add(str(self._asset))
-            assets_in_use.append(self._asset)
+            self._taken_assets.add(str(asset))
+            assets_in_use.append(asset)
 
             self._dump_all_assets_in_use_to_assets_file(assets_in_use)
 
         self._allocated_bridges.clear()
-        self._allocated_ips_objects.clear()
+        self._allocated_ips = {4: _AddressRanges(), 6: _AddressRanges()}
 
-        log.info("Taken asset: %s", self._asset)
-        return Munch.fromDict(self._asset)
+        log.info("Taken asset: %s", asset)
+        return Munch.fromDict(asset)
 
-    def _verify_asset_fields(self):
+    @staticmethod
+    def _verify_asset_fields(asset: Dict[str, Any]):
         for field in consts.REQUIRED_ASSET_FIELDS:
-            assert field in self._asset, f"missing field {field} in asset {self._asset}"
+            assert field in asset, f"missing field {field} in asset {asset}"
 
     def _fill_allocated_ips_and_bridges_by_interface(self):
         if self._libvirt_uri != DEFAULT_LIBVIRT_URI:
@@ -103,7 +134,7 @@ class LibvirtNetworkAssets:
 
     def _fill_allocated_ips_and_bridges_from_assets_file(self, assets_in_use: List[Dict]):
         for asset in assets_in_use:
-            self._verify_asset_fields()
+            self._verify_asset_fields(asset)
 
             for ip_network_field in consts.IP_NETWORK_ASSET_FIELDS:
                 self._add_allocated_ip(IPNetwork(asset[ip_network_field]))
@@ -127,31 +158,19 @@ class LibvirtNetworkAssets:
                 except libvirt.libvirtError:
                     log.info(f"Can not get dhcp leases from {net.name()}")
 
-    def _override_ip_networks_values_if_not_free(self):
-        log.info("IPs in use: %s", self._allocated_ips_objects)
+    def _override_ip_networks_values_if_not_free(self, asset: Dict[str, Any]):
+        log.info("IP ranges in use: %s", {version: len(ranges) for version, ranges in self._allocated_ips.items()})
 
         for ip_network_field in consts.IP_NETWORK_ASSET_FIELDS:
-            ip_network = IPNetwork(self._asset[ip_network_field])
-            self._set_next_available_ip_network(ip_network)
+            ip_network = self._next_available_ip_network(IPNetwork(asset[ip_network_field]))
             self._add_allocated_ip(ip_network)
-            self._asset[ip_network_field] = str(ip_network)
-
-    def _set_next_available_ip_network(self, ip_network: IPNetwork):
-        while self._is_ip_network_allocated(ip_network):
-            if ip_network.version == 6:  # IPv6
-                self._increment_ipv6_network_grp(ip_network)
-            else:
-                ip_network += 1
-
-    def _is_ip_network_allocated(self, ip_network: IPNetwork) -> bool:
-        for ip_addr in self._allocated_ips_objects:
-            if ip_addr in ip_network:
-                return True
-
-        return False
+            asset[ip_network_field] = str(ip_network)
 
     @staticmethod
-    def _increment_ipv6_network_grp(ip_network: IPNetwork):
+    def _ip_network_step(ip_network: IPNetwork) -> int:
+        if ip_network.version == 4:
+            return ip_network.size
+
         # IPNetwork contains an IPAddress object which represents the global
         # routing prefix (GRP), the subnet id and the host address.
         # To increment the IPNetwork while keeping its validity we should update
@@ -159,22 +178,41 @@ class LibvirtNetworkAssets:
         # The third hextet starts at the 72th bit of the IPAddress, means that
         # there are 2^72 possibilities within the other 5 hextets. This number
         # is needed to be added to the IPAddress to effect the GRP section.
-        five_hextets_ips_range = 2**72
-        ip_network += five_hextets_ips_range
+        # Note that incrementing an IPNetwork by n moves it by n networks of its size.
+        return 2**72 * ip_network.size
+
+    def _next_available_ip_network(self, ip_network: IPNetwork) -> IPNetwork:
+        """The first network, stepping from the given one, that doesn't overlap any allocated address"""
+        allocated = self._allocated_ips[ip_network.version]
+        step = self._ip_network_step(ip_network)
+        max_address = 2 ** (32 if ip_network.version == 4 else 128) - 1
+        first = ip_network.first
+
+        while (allocated_last := allocated.overlapping_last(first, first + ip_network.size - 1)) is not None:
+            # Skip all the steps that would still overlap the same allocated range
+            first += ((allocated_last - first) // step + 1) * step
+            if first + ip_network.size - 1 > max_address:
+                raise RuntimeError(f"No available IP network after {ip_network}")
+
+        address = IPAddress(first + ip_network.value - ip_network.first, ip_network.version)
+        return IPNetwork(f"{address}/{ip_network.prefixlen}")
 
     def _add_allocated_ip(self, ip: Union[IPNetwork, IPRange, IPAddress]):
-        self._allocated_ips_objects.append(ip)
+        if isinstance(ip, IPAddress):
+            self._allocated_ips[ip.version].add(int(ip), int(ip))
+        else:
+            self._allocated_ips[ip.version].add(ip.first, ip.last)
 
-    def _override_network_bridges_values_if_not_free(self):
+    def _override_network_bridges_values_if_not_free(self, asset: Dict[str, Any]):
         log.info("Bridges in use: %s", self._allocated_bridges)
 
-        if self._is_net_bridge_allocated(self._asset["libvirt_network_if"]):
-            self._asset["libvirt_network_if"] = self._get_next_available_net_bridge()
-            self._add_allocated_net_bridge(self._asset["libvirt_network_if"])
+        if self._is_net_bridge_allocated(asset["libvirt_network_if"]):
+            asset["libvirt_network_if"] = self._get_next_available_net_bridge()
+        self._add_allocated_net_bridge(asset["libvirt_network_if"])
 
-        if self._is_net_bridge_allocated(self._asset["libvirt_secondary_network_if"]):
-            net_bridge = self._get_next_available_net_bridge(prefix="stt")
-            self._asset["libvirt_secondary_network_if"] = net_bridge
+        if self._is_net_bridge_allocated(asset["libvirt_secondary_network_if"]):
+            asset["libvirt_secondary_network_if"] = self._get_next_available_net_bridge(prefix="stt")
+        self._add_allocated_net_bridge(asset["libvirt_secondary_network_if"])
 
     def _get_next_available_net_bridge(self, prefix: str = "tt") -> str:
         index = 0
@@ -187,7 +225,7 @@ class LibvirtNetworkAssets:
         return net_bridge in self._allocated_bridges
 
     def _add_allocated_net_bridge(self, net_bridge: str):
-        self._allocated_bridges.append(net_bridge)
+        self._allocated_bridges.add(net_bridge)
 
     def release_all(self):
         with utils.file_lock_context(self._lock_file):
@@ -1,8 +1,12 @@
+import hashlib
 import json
 import os
 import pathlib
+import tempfile
+import threading
 import time
-from typing import Any, Dict, List
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 import hcl2
 from python_terraform import IsFlagged, Terraform, TerraformCommandError, Tfstate
@@ -10,6 +14,7 @@ from retry import retry
 
 from consts import consts, env_defaults
 from service_client import log
+from service_client.file_download import DEFAULT_FILE_MODE
 
 
 class _Terraform(Terraform):
@@ -28,11 +33,126 @@ class _Terraform(Terraform):
         return self.cmd("destroy", *args, **options, capture_output=capture_output)
 
 
+def _file_mode(path: str) -> int:
+    try:
+        return os.stat(path).st_mode & 0o777
+    except FileNotFoundError:
+        return DEFAULT_FILE_MODE
+
+
+def _write_json_atomically(path: str, data: Any) -> None:
+    # Readers (e.g. a concurrent terraform run) see either the previous content or the new one, never a partial file
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=f".{os.path.basename(path)}.")
+    try:
+        with os.fdopen(fd, "w") as _file:
+            json.dump(data, _file)
+        os.chmod(temp_path, _file_mode(path))
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+class VariablesSchemaCache:
+    """
+    Names of the variables declared by each .tf file, keyed by the file path,
+    mtime and size so an edited file is parsed again. The names are kept in
+    memory and in a sidecar file next to the .tf files, which lets other
+    processes working on the same directory skip parsing them as well.
+    """
+
+    _lock = threading.Lock()
+    _entries: Dict[str, Tuple[int, int, List[str]]] = {}
+
+    @staticmethod
+    def _parse(tf_file: pathlib.Path) -> List[str]:
+        with open(tf_file, "r") as fp:
+            terraform_file_dict = hcl2.load(fp)
+        return [next(iter(variable)) for variable in terraform_file_dict.get("variable", [])]
+
+    @staticmethod
+    def _load_sidecar(path: str) -> Dict[str, list]:
+        try:
+            with open(path) as _file:
+                return json.load(_file)
+        except (OSError, ValueError):
+            return {}
+
+    @classmethod
+    def get_variables(cls, working_dir: str) -> List[str]:
+        sidecar_path = os.path.join(working_dir, consts.TF_VARIABLES_SCHEMA_CACHE_NAME)
+        sidecar: Optional[Dict[str, list]] = None
+        sidecar_changed = False
+        results = []
+
+        with cls._lock:
+            for tf_file in pathlib.Path(working_dir).glob("*.tf"):
+                stat = tf_file.stat()
+                key = str(tf_file.absolute())
+                cached = cls._entries.get(key)
+                if cached is None or cached[:2] != (stat.st_mtime_ns, stat.st_size):
+                    if sidecar is None:
+                        sidecar = cls._load_sidecar(sidecar_path)
+                    mtime_ns, size, variables = sidecar.get(tf_file.name) or (None, None, None)
+                    if (mtime_ns, size) != (stat.st_mtime_ns, stat.st_size):
+                        variables = cls._parse(tf_file)
+                        sidecar[tf_file.name] = [stat.st_mtime_ns, stat.st_size, variables]
+                        sidecar_changed = True
+                    cached = cls._entries[key] = (stat.st_mtime_ns, stat.st_size, variables)
+                results += cached[2]
+
+        if sidecar_changed:
+            try:
+                _write_json_atomically(sidecar_path, sidecar)
+            except OSError as e:
+                log.debug(f"Can't save the variables schema of {working_dir}: {e}")
+
+        return results
+
+
+class TfvarsWriter:
+    """Accumulates changes to the tfvars file and writes them with a single, atomic, read-modify-write"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._pending: Dict[str, Any] = {}
+        self._replace = False
+
+    @property
+    def has_pending(self) -> bool:
+        return self._replace or bool(self._pending)
+
+    def update(self, variables: Dict[str, Any]) -> None:
+        self._pending.update(variables)
+
+    def replace(self, variables: Dict[str, Any]) -> None:
+        """Discard the current content of the file, it's written with the given variables only"""
+        self._pending = dict(variables)
+        self._replace = True
+
+    def flush(self) -> None:
+        if not self.has_pending:
+            return
+
+        tfvars = dict()
+        if not self._replace:
+            with open(self.path, "r") as _file:
+                tfvars = json.load(_file)
+        tfvars.update(self._pending)
+        _write_json_atomically(self.path, tfvars)
+
+        self._pending = {}
+        self._replace = False
+
+
 class TerraformUtils:
     def __init__(self, working_dir: str, terraform_init: bool = True):
         log.info("TF FOLDER %s ", working_dir)
         self.working_dir = working_dir
         self.var_file_path = os.path.join(working_dir, consts.TFVARS_JSON_NAME)
+        self._variables_writer = TfvarsWriter(self.var_file_path)
+        self._batch_depth = 0
         self.tf = _Terraform(
             working_dir=working_dir,
             state=consts.TFSTATE_FILE,
@@ -52,14 +172,59 @@ class TerraformUtils:
         return {k: v for k, v in kwargs.items() if v is not None and k in supported_variables}
 
     def get_variable_list(self):
-        results = list()
+        return VariablesSchemaCache.get_variables(self.working_dir)
+
+    def inputs_fingerprint(self) -> str:
+        """
+        Digest of everything an apply depends on: the .tf files, the variables,
+        the providers lock and the state. The state is included so a destroy, or
+        any other change to it, makes the next apply run again.
+        """
+        digest = hashlib.sha256()
+        for tf_file in sorted(pathlib.Path(self.working_dir).glob("*.tf")):
+            digest.update(tf_file.name.encode())
+            digest.update(tf_file.read_bytes())
+
+        try:
+            with open(self.var_file_path) as _file:
+                digest.update(json.dumps(json.load(_file), sort_keys=True).encode())
+        except FileNotFoundError:
+            pass
+
+        for name in (consts.TF_PROVIDERS_LOCK_FILE, consts.TFSTATE_FILE):
+            path = pathlib.Path(self.working_dir, name)
+            digest.update(name.encode())
+            digest.update(path.read_bytes() if path.exists() else b"")
+
+        return digest.hexdigest()
+
+    @property
+    def _fingerprint_path(self) -> str:
+        return os.path.join(self.working_dir, consts.TFSTATE_FINGERPRINT_FILE)
 
-        for tf_file in pathlib.Path(self.working_dir).glob("*.tf"):
-            with open(tf_file, "r") as fp:
-                terraform_file_dict = hcl2.load(fp)
-                results += terraform_file_dict["variable"] if "variable" in terraform_file_dict else list()
+    def _is_applied(self, fingerprint: str) -> bool:
+        try:
+            with open(self._fingerprint_path) as _file:
+                return _file.read().strip() == fingerprint
+        except FileNotFoundError:
+            return False
 
-        return list(map(lambda d: next(iter(d)), results))
+    def _save_fingerprint(self) -> None:
+        with open(self._fingerprint_path, "w") as _file:
+            _file.write(self.inputs_fingerprint())
+
+    def _forget_fingerprint(self) -> None:
+        if os.path.exists(self._fingerprint_path):
+            os.remove(self._fingerprint_path)
+
+    def _plan_has_changes(self, refresh: bool) -> bool:
+        return_value, output, err = self.tf.plan(no_color=IsFlagged, refresh=refresh, input=False, capture_output=True)
+        # With -detailed-exitcode plan exits with 0 when there is nothing to change and with 2 when there is
+        if return_value == 0:
+            return False
+        if return_value != 2:
+            log.warning(f"Terraform plan failed with return value {return_value}, error {err}, applying anyway")
+        return True
 
     def apply(
         self,
@@ -68,6 +233,21 @@ class TerraformUtils:
         attempts: int = env_defaults.TF_APPLY_ATTEMPTS,
         interval: int = consts.TF_APPLY_ATTEMPTS_INTERVAL,
     ) -> None:
+        """Apply the terraform target, unless the plan is empty or, without a refresh, nothing changed since the last
+        successful apply. A refresh looks for changes made outside of terraform, which the inputs can't tell about,
+        so it always runs the plan."""
+        self._variables_writer.flush()
+        if not refresh and self._is_applied(self.inputs_fingerprint()):
+            log.info("Terraform inputs didn't change since the last successful apply, skipping it")
+            return
+
+        if not self._plan_has_changes(refresh):
+            log.info("Terraform plan has no changes, skipping apply")
+        else:
+            self._apply(refresh, capture_output, attempts, interval)
+        self._save_fingerprint()
+
+    def _apply(self, refresh: bool, capture_output: bool, attempts: int, interval: int) -> None:
         if os.getenv("DEBUG_TERRAFORM") is not None:
             capture_output = False
 
@@ -85,28 +265,44 @@ class TerraformUtils:
         log.warning(message)
         log.info(f"Attempting to re-apply terraform target (left attempts: {attempts})...")
         time.sleep(interval)
-        return self.apply(refresh, capture_output, attempts - 1, interval * 2)
+        return self._apply(refresh, capture_output, attempts - 1, interval * 2)
 
     def set_vars(self, **kwargs) -> None:
         defined_variables = self.select_defined_variables(**kwargs)
         self.update_variables_file(defined_variables)
 
     def set_and_apply(self, refresh: bool = True, **kwargs) -> None:
-        self.set_vars(**kwargs)
-        self.init_tf()
-        self.apply(refresh=refresh)
+        with self.batched_variables():
+            self.set_vars(**kwargs)
+            self.init_tf()
+            self.apply(refresh=refresh)
+
+    @contextmanager
+    def batched_variables(self) -> Iterator[None]:
+        """Variables changed within the context are written once, when it exits or when terraform is applied"""
+        self._batch_depth += 1
+        try:
+            yield
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                self._variables_writer.flush()
 
     def update_variables_file(self, variables: Dict[str, str]):
-        with open(self.var_file_path, "r+") as _file:
-            tfvars = json.load(_file)
-            tfvars.update(variables)
-            _file.seek(0)
-            _file.truncate()
-            json.dump(tfvars, _file)
+        self._variables_writer.update(variables)
+        if self._batch_depth == 0:
+            self._variables_writer.flush()
+
+    def write_variables_file(self, variables: Dict[str, Any]) -> None:
+        """Replace all the variables of the tfvars file"""
+        self._variables_writer.replace(variables)
+        if self._batch_depth == 0:
+            self._variables_writer.flush()
 
     def change_variables(self, variables: Dict[str, str], refresh: bool = True) -> None:
-        self.update_variables_file(variables=variables)
-        self.apply(refresh=refresh)
+        with self.batched_variables():
+            self.update_variables_file(variables=variables)
+            self.apply(refresh=refresh)
 
     def get_state(self) -> Tfstate:
         self.tf.read_state_file(consts.TFSTATE_FILE)
@@ -118,4 +314,5 @@ class TerraformUtils:
         return [resource for resource in resources if resource_type is None or resource["type"] == resource_type]
 
     def destroy(self, force: bool = True) -> None:
+        self._forget_fingerprint()
         self.tf.destroy(force=force, input=False, auto_approve=True)
@@ -0,0 +1,202 @@
+import threading
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+import waiting
+
+import consts
+from service_client import log
+from service_client.cluster_snapshot import ClusterSnapshot
+
+
+class _Subscriber:
+    def __init__(
+        self,
+        predicate: Callable[[Any], Any],
+        interval: float,
+        waiting_for: str,
+        ignore_fetch_errors: bool,
+    ):
+        self.predicate = predicate
+        self.interval = interval
+        self.waiting_for = waiting_for
+        self.ignore_fetch_errors = ignore_fetch_errors
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+    def resolve(self, result: Any) -> None:
+        self.result = result
+        self.done.set()
+
+    def fail(self, error: BaseException) -> None:
+        self.error = error
+        self.done.set()
+
+
+class ClusterStatusPoller:
+    """Single background fetch loop shared by any number of waiters of the same resource.
+
+    Every waiter subscribes with a predicate that is evaluated against each fetched snapshot, the first truthy
+    value resolves its wait. Predicate errors only fail their own subscriber, fetch errors fail every subscriber
+    that doesn't ignore them. Polling is adaptive: right after the watched state changed it polls every
+    `fast_interval` seconds, then backs off exponentially up to the shortest interval requested by the current
+    subscribers, so no waiter is ever served staler data than it asked for.
+    The loop thread exits once it has no subscribers left, and the poller is then dropped from the registry.
+    Subscribing and retiring are both done under the registry lock, so at most one loop runs per key.
+    Keys hold the client object itself rather than its id, the id of a collected client may be reused by a new
+    one that must not be served by the pollers of the former.
+    """
+
+    _registry: Dict[Hashable, "ClusterStatusPoller"] = {}
+    _registry_lock = threading.RLock()
+
+    def __init__(
+        self,
+        key: Hashable,
+        fetch: Callable[[], Any],
+        state_of: Callable[[Any], Hashable],
+        fast_interval: float = consts.CLUSTER_STATUS_POLLER_FAST_INTERVAL,
+    ):
+        self.key = key
+        # The client objects of the key are left out of the thread name and the logs
+        parts = key if isinstance(key, tuple) else (key,)
+        self._name = "-".join(str(part) for part in parts if isinstance(part, (str, int)))
+        self._fetch = fetch
+        self._state_of = state_of
+        self._fast_interval = fast_interval
+        self._subscribers: List[_Subscriber] = []
+        self._thread: Optional[threading.Thread] = None
+        self._wakeup = threading.Event()
+        self._last_state: Optional[Hashable] = None
+        self.fetch_count = 0
+
+    @classmethod
+    def get_or_create(cls, key: Hashable, fetch: Callable[[], Any], state_of: Callable[[Any], Hashable]):
+        with cls._registry_lock:
+            if key not in cls._registry:
+                cls._registry[key] = cls(key, fetch, state_of)
+            return cls._registry[key]
+
+    def wait(
+        self,
+        predicate: Callable[[Any], Any],
+        timeout: float,
+        interval: float = consts.DEFAULT_CHECK_STATUSES_INTERVAL,
+        waiting_for: str = "predicate",
+        ignore_fetch_errors: bool = False,
+    ) -> Any:
+        """Block until the predicate returns a truthy value for a fetched snapshot and return that value.
+        Raises waiting.TimeoutExpired on timeout, the same as waiting.wait does."""
+        subscriber = _Subscriber(predicate, interval, waiting_for, ignore_fetch_errors)
+        poller = self._subscribe(subscriber)
+        try:
+            if not subscriber.done.wait(timeout):
+                raise waiting.TimeoutExpired(timeout, waiting_for)
+        finally:
+            poller._unsubscribe(subscriber)
+
+        if subscriber.error is not None:
+            raise subscriber.error
+        return subscriber.result
+
+    def _subscribe(self, subscriber: _Subscriber) -> "ClusterStatusPoller":
+        """Subscribe to the poller registered for this key, which is not this instance if it was retired in the
+        meantime and another one was created. Returns the poller the subscriber was added to."""
+        with self._registry_lock:
+            poller = self._registry.setdefault(self.key, self)
+            poller._subscribers.append(subscriber)
+            if poller._thread is None:
+                poller._thread = threading.Thread(
+                    target=poller._run, name=f"cluster-status-poller-{poller._name}", daemon=True
+                )
+                poller._thread.start()
+            else:
+                # Fetch right away instead of letting the new subscriber wait for the next tick
+                poller._wakeup.set()
+            return poller
+
+    def _unsubscribe(self, subscriber: _Subscriber) -> None:
+        with self._registry_lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+    def _active_subscribers(self) -> List[_Subscriber]:
+        with self._registry_lock:
+            subscribers = [s for s in self._subscribers if not s.done.is_set()]
+            if not subscribers:
+                self._thread = None
+                if self._registry.get(self.key) is self:
+                    del self._registry[self.key]
+            return subscribers
+
+    def _notify(self, subscribers: List[_Subscriber], snapshot: Any, fetch_error: Optional[Exception]) -> None:
+        for subscriber in subscribers:
+            if fetch_error is not None:
+                if not subscriber.ignore_fetch_errors:
+                    subscriber.fail(fetch_error)
+                continue
+
+            try:
+                result = subscriber.predicate(snapshot)
+            except Exception as e:
+                subscriber.fail(e)
+                continue
+
+            if result:
+                subscriber.resolve(result)
+
+    def _run(self) -> None:
+        interval = self._fast_interval
+        while True:
+            subscribers = self._active_subscribers()
+            if not subscribers:
+                return
+
+            # Cleared before fetching, so a subscriber that arrives from now on triggers another fetch
+            self._wakeup.clear()
+            snapshot, fetch_error = None, None
+            try:
+                self.fetch_count += 1
+                snapshot = self._fetch()
+            except Exception as e:
+                log.warning(f"Cluster status poller {self._name} failed to fetch: {e}")
+                fetch_error = e
+
+            self._notify(subscribers, snapshot, fetch_error)
+
+            max_interval = min(s.interval for s in subscribers)
+            state = self._state_of(snapshot) if fetch_error is None else self._last_state
+            if state != self._last_state:
+                self._last_state = state
+                interval = min(self._fast_interval, max_interval)
+            else:
+                interval = min(interval * 2, max_interval)
+
+            self._wakeup.wait(interval)
+
+
+def _cluster_state(snapshot: ClusterSnapshot) -> Hashable:
+    cluster = snapshot.cluster
+    hosts = tuple(
+        (host.get("id"), host.get("status"), host.get("status_info"), str(host.get("progress")))
+        for host in snapshot.hosts
+    )
+    return cluster.status, cluster.status_info, hosts
+
+
+def _hosts_state(hosts: List[Dict[str, Any]]) -> Hashable:
+    return tuple(sorted((host["id"], host["status"], host["status_info"]) for host in hosts))
+
+
+def get_cluster_poller(client, cluster_id: str) -> ClusterStatusPoller:
+    def fetch() -> ClusterSnapshot:
+        return ClusterSnapshot(client.cluster_get(cluster_id))
+
+    return ClusterStatusPoller.get_or_create((client, "cluster", cluster_id), fetch, _cluster_state)
+
+
+def get_infra_env_poller(client, infra_env_id: str) -> ClusterStatusPoller:
+    def fetch() -> List[Dict[str, Any]]:
+        return client.get_infra_env_hosts(infra_env_id)
+
+    return ClusterStatusPoller.get_or_create((client, "infra_env", infra_env_id), fetch, _hosts_state)
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+import filelock
+from assisted_service_client import models
+
+import consts
+from assisted_test_infra.test_infra.utils.utils import download_file, file_lock_context
+from service_client import log
+
+# The ISO content is determined by these infra-env fields. The infra-env id is part of the key as well, since the
+# discovery ignition embedded in the ISO registers the hosts to that specific infra-env
+ISO_AFFECTING_FIELDS = (
+    "id",
+    "openshift_version",
+    "cpu_architecture",
+    "type",
+    "ssh_authorized_key",
+    "proxy",
+    "static_network_config",
+    "ignition_config_override",
+    "kernel_arguments",
+    "additional_trust_bundle",
+    "additional_ntp_sources",
+)
+ISO_URL_VERSION_PARAMS = ("version", "arch", "type")
+
+
+class IsoCache:
+    """
+    Content addressed cache of discovery ISOs, shared by all the test
+    processes of the machine. An ISO is downloaded once per key, then
+    hardlinked (or copied, across file systems) into the requested path.
+    Since the key includes the infra-env id, it saves the downloads of an
+    infra-env whose ISO is requested again, e.g. by prepare_nodes after the
+    test downloaded it, or for the nodes of another cluster.
+    The least recently used ISOs are evicted once the cache exceeds max_size.
+    """
+
+    _SUFFIX = ".iso"
+
+    def __init__(self, cache_dir: str = consts.ISO_CACHE_DIR, max_size: int = consts.ISO_CACHE_MAX_SIZE):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+
+    @staticmethod
+    def key_of(infra_env: models.InfraEnv, pull_secret: Optional[str] = None) -> str:
+        fields = {field: getattr(infra_env, field) for field in ISO_AFFECTING_FIELDS}
+        fields["proxy"] = fields["proxy"].to_dict() if fields["proxy"] is not None else None
+        fields["kernel_arguments"] = [arg.to_dict() for arg in fields["kernel_arguments"] or []]
+
+        # The url query also carries short-lived tokens, only the parameters describing the image are part of the key
+        query = parse_qs(urlparse(infra_env.download_url or "").query)
+        fields["url"] = {param: query.get(param) for param in ISO_URL_VERSION_PARAMS}
+        fields["pull_secret"] = hashlib.sha256((pull_secret or "").encode()).hexdigest()
+
+        return hashlib.sha256(json.dumps(fields, sort_keys=True, default=str).encode()).hexdigest()
+
+    def _path_of(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}{self._SUFFIX}")
+
+    def _lock_path(self, name: str) -> str:
+        return os.path.join(self.cache_dir, f".{name}.lock")
+
+    def get(self, key: str, url: str, destination: str, verify_ssl: bool = True) -> Path:
+        """Materialize the ISO of the given key into destination, downloading it from url on a cache miss"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        cached = self._path_of(key)
+
+        with file_lock_context(self._lock_path(key), timeout=consts.ISO_CACHE_LOCK_TIMEOUT):
+            if os.path.exists(cached):
+                log.info(f"Using cached image {cached} for {destination}")
+                os.utime(cached)
+            else:
+                log.info(f"Image {key} is not cached, downloading {url}")
+                download_file(url, cached, verify_ssl)
+
+            self._materialize(cached, destination)
+
+        self._evict(keep=cached)
+        return Path(destination)
+
+    @staticmethod
+    def _materialize(cached: str, destination: str) -> None:
+        # A unique temporary name, parallel workers may materialize the same destination
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(destination)), suffix=".iso.part")
+        os.close(fd)
+        try:
+            os.remove(temp_path)
+            try:
+                os.link(cached, temp_path)
+            except OSError as e:
+                log.debug(f"Can't hardlink {cached} to {destination} ({e}), copying it")
+                shutil.copyfile(cached, temp_path)
+
+            os.replace(temp_path, destination)
+        except BaseException:
+            if os.path.lexists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def _evict(self, keep: str) -> None:
+        with file_lock_context(self._lock_path("evict"), timeout=consts.ISO_CACHE_LOCK_TIMEOUT):
+            entries = []
+            for entry in os.scandir(self.cache_dir):
+                if entry.name.endswith(self._SUFFIX) and entry.is_file():
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+            total_size = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total_size <= self.max_size:
+                    break
+                if path == keep:
+                    continue
+
+                # An image that is being downloaded or materialized by another process is skipped
+                key = os.path.basename(path)[: -len(self._SUFFIX)]
+                try:
+                    with filelock.FileLock(self._lock_path(key), timeout=0):
+                        log.info(f"Evicting cached image {path} ({size} bytes)")
+                        os.remove(path)
+                except filelock.Timeout:
+                    continue
+                total_size -= size
@@ -1,12 +1,10 @@
-import contextlib
-import copy
+import functools
 import hashlib
 import os
-import shutil
 import tarfile
 import time
-from pathlib import Path
-from tempfile import TemporaryDirectory
+from collections import defaultdict
+from typing import IO, Callable, Dict, List, Tuple
 
 import waiting
 
@@ -18,71 +16,80 @@ OC_DOWNLOAD_LOGS_TIMEOUT = 60 * 60
 MAX_LOG_SIZE_BYTES = 1_000_000
 # based on '-- No entries --' size in file
 MIN_LOG_SIZE_BYTES = 17
+READ_CHUNK_SIZE = 1024 * 1024
 
 
-@contextlib.contextmanager
-def _safe_open_tar(tar_path: Path | str, destination_path: Path | str) -> None:
-    """Return a safe-to-be-extracted tarfile object.
+class _DigestReader:
+    """Read-only file object wrapper that hashes everything read through it"""
 
-    Handling CVE-2007-4559, which is relevant to extraction of tar files
-    that expand outside of destination directory. Basically it might attempt
-    extracting to sensitive paths such as /etc/passwd (assuming process is
-    having the proper permissions to do so) which means additional sanitization
-    is needed to be made before calling `extractall / extract`.
-    """
-    destination_path = Path(destination_path)
-    with tarfile.open(tar_path) as tar:
-        for member in tar.getmembers():
-            if not (destination_path / member.name).resolve().is_relative_to(destination_path.resolve()):
-                raise RuntimeError(f"Attempted writing into {member.name}, which is outside {destination_path}!")
+    def __init__(self, fileobj: IO[bytes]):
+        self._fileobj = fileobj
+        self._md5 = hashlib.md5()
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._fileobj.read(size)
+        self._md5.update(data)
+        return data
+
+    def hexdigest(self) -> str:
+        """Read whatever was not read yet, then return the digest of the whole content"""
+        while self.read(READ_CHUNK_SIZE):
+            pass
+        return self._md5.hexdigest()
+
+
+def _open_tar_stream(fileobj: IO[bytes]) -> tarfile.TarFile:
+    # Stream mode reads the archive sequentially, members are never extracted to disk and nested archives can be
+    # opened straight from the file object of their member
+    return tarfile.open(fileobj=fileobj, mode="r|*")
+
+
+def _member_path(member_name: str) -> List[str]:
+    return member_name.removeprefix("./").rstrip("/").split("/")
 
-        yield tar
 
+def _top_level_name(member_name: str) -> str:
+    return _member_path(member_name)[0]
 
-def _verify_duplicate_and_size_logs_file(dir_path: str) -> None:
+
+def _names_contained_in_others(names: List[str]) -> List[Tuple[str, str]]:
+    """Find the names that are a substring of another name, ex "m1" in [m1.copy, m1.1].
+    Instead of comparing every pair, every substring of each name whose length is the length of some name is looked
+    up in the set of names"""
+    names_set = set(names)
+    lengths = {len(name) for name in names_set}
+    found = []
+    for name in names:
+        for length in lengths:
+            for i in range(len(name) - length + 1):
+                candidate = name[i : i + length]
+                if candidate in names_set and candidate != name:
+                    found.append((candidate, name))
+    return found
+
+
+def _verify_duplicate_and_size_logs_file(files: Dict[str, Tuple[int, str]]) -> None:
     """Verify logs files with different content and minimal size
-    Assuming all files under directory are file type
     Checking:
-    Repeated names under directory
     Repeated md5sum under directory
     Included file name inside other files
     Exceed limit size (1MB) under directory
-    Minimal file size (17 Bytes) when '-- No entries --'
-    :param dir_path:
+    :param files: size and md5sum of each file, by name
     :return: None
     """
-    files = os.listdir(dir_path)
+    names = list(files)
     # assert if repeated md5sum means same files content or empty
-    md5_list = [_get_file_md5sum(dir_path, file) for file in files]
-    log.info(f"Checking repeated md5sum for files {str(files)}")
-    assert len(md5_list) == len(set(md5_list)), f"Repeated md5sum content file or empty logs {str(files)}"
+    log.info(f"Checking repeated md5sum for files {str(names)}")
+    md5_list = [md5sum for _, md5sum in files.values()]
+    assert len(md5_list) == len(set(md5_list)), f"Repeated md5sum content file or empty logs {str(names)}"
     # assert if one of the file larger than 1 MB
     log.info(f"Checking file size exceed {MAX_LOG_SIZE_BYTES} bytes")
-    size_list = list(
-        map(lambda the_file, the_dir=dir_path: os.stat(os.path.join(the_dir, the_file)).st_size, os.listdir(dir_path))
-    )
     assert not any(
-        size_file > MAX_LOG_SIZE_BYTES for size_file in size_list
-    ), f"exceed size limit {MAX_LOG_SIZE_BYTES} from {str(files)}"
+        size > MAX_LOG_SIZE_BYTES for size, _ in files.values()
+    ), f"exceed size limit {MAX_LOG_SIZE_BYTES} from {str(names)}"
     # check if file name exists in current list names, ex "m1" in [m1.copy, m1.1]
-    for f in files:
-        copy_files = copy.deepcopy(files)
-        copy_files.remove(f)
-        for copy_file in copy_files:
-            assert not (f in copy_file), f"{f} in {copy_files}"
-
-
-def _is_tar_archive(dir_path: str, file_name: str) -> bool:
-    file_path = os.path.join(dir_path, file_name)
-    return os.path.isfile(file_path) and tarfile.is_tarfile(file_path)
-
-
-def _get_file_md5sum(dir_path: str, file_path: str) -> str:
-    with open(os.path.join(dir_path, file_path), "rb") as file_to_check:
-        data = file_to_check.read()
-        md5_returned = hashlib.md5(data).hexdigest()
-        log.info(f"calculate md5sum for {os.path.join(dir_path, file_path)} is {md5_returned}")
-    return md5_returned
+    contained = _names_contained_in_others(names)
+    assert not contained, f"{contained[0][0]} in {contained[0][1]}"
 
 
 def verify_logs_uploaded(
@@ -130,40 +137,70 @@ def verify_logs_uploaded(
     """
     assert os.path.exists(cluster_tar_path), f"{cluster_tar_path} doesn't exist"
 
-    with TemporaryDirectory() as tempdir:
-        with _safe_open_tar(cluster_tar_path, tempdir) as tar:
-            log.info(f"downloaded logs: {tar.getnames()}")
-            assert len(tar.getnames()) >= expected_min_log_num, (
-                f"{tar.getnames()} " f"logs are less than minimum of {expected_min_log_num}"
-            )
-            assert len(tar.getnames()) == len(set(tar.getnames())), f"Repeated tar file names {str(tar.getnames())}"
-            tar.extractall(tempdir)
-            """Verify one level with duplication and size for extracted files, example for success installation:
-            ['test-infra-cluster-6c2d0ab7_master_test-infra-cluster-6c2d0ab7-master-2.tar',
-             'test-infra-cluster-6c2d0ab7_master_test-infra-cluster-6c2d0ab7-master-0.tar',
-             'test-infra-cluster-6c2d0ab7_bootstrap_test-infra-cluster-6c2d0ab7-master-1.tar',
-             'cluster_events.json', 'cluster_metadata.json', 'controller_logs.tar.gz']
-            """
-            _verify_duplicate_and_size_logs_file(tempdir)
-
-            # Exclude yaml file generated by manifest_system and non-tar entries (e.g. json metadata).
-            file_list = [
-                f
-                for f in os.listdir(tempdir)
-                if "manifest_system-generated_openshift" not in f and _is_tar_archive(tempdir, f)
-            ]
-            # Going over each tar file and base on condition check the expected content.
-            for file in file_list:
-                if verify_bootstrap_errors and "bootstrap" in file:
-                    _verify_bootstrap_logs_uploaded(tempdir, file, installation_success, verify_control_plane)
-                elif check_oc and "controller" in file:
-                    _verify_oc_logs_uploaded(os.path.join(tempdir, file))
-                elif "master" in file or "worker" in file:
-                    try:
-                        # check master, workers includes bootstrap(master)
-                        _verify_node_logs_uploaded(tempdir, file)
-                    except tarfile.ReadError as e:
-                        log.warning(f"could not verify file {tempdir}/{file} ({e})")
+    names = []
+    files = {}
+    with open(cluster_tar_path, "rb") as cluster_tar_file, _open_tar_stream(cluster_tar_file) as tar:
+        for member in tar:
+            names.append(member.name)
+            if not member.isfile():
+                continue
+
+            reader = _DigestReader(tar.extractfile(member))
+            # Exclude yaml file generated by manifest_system, base on the file name check the expected content
+            if "manifest_system-generated_openshift" not in member.name:
+                _verify_host_or_controller_logs(
+                    reader, member.name, installation_success, verify_control_plane, check_oc, verify_bootstrap_errors
+                )
+
+            md5sum = reader.hexdigest()
+            log.info(f"calculate md5sum for {member.name} is {md5sum}")
+            files[member.name] = (member.size, md5sum)
+
+    log.info(f"downloaded logs: {names}")
+    assert len(names) >= expected_min_log_num, f"{names} logs are less than minimum of {expected_min_log_num}"
+    assert len(names) == len(set(names)), f"Repeated tar file names {str(names)}"
+    """Verify one level with duplication and size for the archived files, example for success installation:
+    ['test-infra-cluster-6c2d0ab7_master_test-infra-cluster-6c2d0ab7-master-2.tar',
+     'test-infra-cluster-6c2d0ab7_master_test-infra-cluster-6c2d0ab7-master-0.tar',
+     'test-infra-cluster-6c2d0ab7_bootstrap_test-infra-cluster-6c2d0ab7-master-1.tar',
+     'cluster_events.json', 'cluster_metadata.json', 'controller_logs.tar.gz']
+    """
+    _verify_duplicate_and_size_logs_file(files)
+
+
+def _verify_host_or_controller_logs(
+    fileobj: IO[bytes],
+    file_name: str,
+    installation_success: bool,
+    verify_control_plane: bool,
+    check_oc: bool,
+    verify_bootstrap_errors: bool,
+) -> None:
+    if verify_bootstrap_errors and "bootstrap" in file_name:
+        verify = functools.partial(
+            _verify_bootstrap_logs_uploaded,
+            installation_success=installation_success,
+            verify_control_plane=verify_control_plane,
+        )
+    elif check_oc and "controller" in file_name:
+        verify = functools.partial(_verify_component_in_tar, "controller", verify_nested=_verify_must_gather_in_tar)
+    elif "master" in file_name or "worker" in file_name:
+        # check master, workers includes bootstrap(master)
+        verify = functools.partial(_verify_node_logs_uploaded, is_bootstrap="bootstrap" in file_name)
+    else:
+        return
+
+    try:
+        tar = _open_tar_stream(fileobj)
+    except tarfile.ReadError:
+        # Not an archive, nothing to verify in it
+        return
+
+    with tar:
+        try:
+            verify(tar)
+        except tarfile.ReadError as e:
+            log.warning(f"could not verify file {file_name} ({e})")
 
 
 def wait_and_verify_oc_logs_uploaded(cluster, cluster_tar_path):
@@ -191,11 +228,11 @@ def verify_logs_are_current(started_cluster_install_at, logs_collected_at):
 def verify_logs_not_uploaded(cluster_tar_path, category):
     assert os.path.exists(cluster_tar_path), f"{cluster_tar_path} doesn't exist"
 
-    with TemporaryDirectory() as tempdir:
-        with _safe_open_tar(cluster_tar_path, tempdir) as tar:
-            log.info(f"downloaded logs: {tar.getnames()}")
-            tar.extractall(tempdir)
-            assert category not in os.listdir(tempdir), f"{category} logs were found in uploaded logs"
+    with open(cluster_tar_path, "rb") as cluster_tar_file, _open_tar_stream(cluster_tar_file) as tar:
+        names = [member.name for member in tar]
+
+    log.info(f"downloaded logs: {names}")
+    assert category not in {_top_level_name(name) for name in names}, f"{category} logs were found in uploaded logs"
 
 
 def to_utc(timestr):
@@ -242,94 +279,106 @@ def wait_for_logs_complete(client, cluster_id, timeout, interval=60, check_host_
         raise
 
 
-def _check_entry_from_extracted_tar(component, tarpath, verify):
-    with TemporaryDirectory() as tempdir:
-        log.info(f"open tar file {tarpath}")
-        with _safe_open_tar(tarpath, tempdir) as tar:
-            log.info(f"verifying downloaded logs: {tar.getnames()}")
-            tar.extractall(tempdir)
-            extractedfiles = os.listdir(tempdir)
-            assert any(component in logfile for logfile in extractedfiles), f"can not find {component} in logs"
-            component_tars = [
-                logfile for logfile in extractedfiles if (component in logfile and logfile.endswith(".gz"))
-            ]
-            if component_tars:
-                verify(os.path.join(tempdir, component_tars[0]))
+def _verify_component_in_tar(
+    component: str, tar: tarfile.TarFile, verify_nested: Callable[[tarfile.TarFile], None] = None
+) -> None:
+    top_level_names = set()
+    verified_nested = False
+    for member in tar:
+        name = _top_level_name(member.name)
+        top_level_names.add(name)
+        is_component_archive = member.isfile() and len(_member_path(member.name)) == 1 and name.endswith(".gz")
+        if verify_nested and not verified_nested and component in name and is_component_archive:
+            log.info(f"verifying {member.name}")
+            with _open_tar_stream(tar.extractfile(member)) as nested_tar:
+                verify_nested(nested_tar)
+            verified_nested = True
+
+    log.info(f"verifying downloaded logs: {sorted(top_level_names)}")
+    assert any(component in name for name in top_level_names), f"can not find {component} in logs"
+
+
+def _verify_must_gather_in_tar(tar: tarfile.TarFile) -> None:
+    _verify_component_in_tar("must-gather", tar)
 
 
 def _verify_oc_logs_uploaded(cluster_tar_path):
-    _check_entry_from_extracted_tar(
-        "controller",
-        cluster_tar_path,
-        lambda path: _check_entry_from_extracted_tar("must-gather", path, lambda inner: None),
-    )
-
-
-def _verify_node_logs_uploaded(dir_path: str, file_path: str) -> None:
-    """Directory file conatains *.tar file - filtered caller
-    Extracting tar file to tar.gz file
-    Extracting tar.gz to directory
-    Accessing files inside the directory
-    :param dir_path:
-    :param file_path:
+    log.info(f"open tar file {cluster_tar_path}")
+    with open(cluster_tar_path, "rb") as cluster_tar_file, _open_tar_stream(cluster_tar_file) as tar:
+        _verify_component_in_tar("controller", tar, verify_nested=_verify_must_gather_in_tar)
+
+
+def _verify_node_logs_uploaded(tar: tarfile.TarFile, is_bootstrap: bool) -> None:
+    """The host tar file contains a single tar.gz file, holding a single log_host directory
+    Accessing files inside the directory, without extracting any of the archives
+    :param tar: the host tar file, opened as a stream
+    :param is_bootstrap:
     :return:
     """
-    with tarfile.open(os.path.join(dir_path, file_path)) as gz:
-        # Extract tar file into gz to the same directory
-        gz.extractall(path=dir_path)
-        tar_gz_file = gz.getnames()
-        assert len(tar_gz_file) == 1, f"Expecting for a single tar.gz file {tar_gz_file}"
-        tat_gz_file = tar_gz_file[0]
-
-        unpack_tar_gz_dir = os.path.join(dir_path, tat_gz_file.split(".tar.gz")[0])
-        # unpacking tar.gz into directory same name without tar.gz
-        shutil.unpack_archive(filename=os.path.join(dir_path, tat_gz_file), extract_dir=unpack_tar_gz_dir)
-        unpack_log_host_dir = os.listdir(unpack_tar_gz_dir)
-        assert len(unpack_log_host_dir) == 1, f"Expecting for a single tar.gz file {unpack_log_host_dir}"
-        unpack_log_host_dir = unpack_log_host_dir[0]
-
-        # files inside log_host directory
-        log_host_dir = os.path.join(unpack_tar_gz_dir, unpack_log_host_dir)
-        log_host_files = os.listdir(log_host_dir)
-
-        # Verify created logs files are not empty
-        for file in log_host_files:
-            file_name = os.path.join(log_host_dir, file)
-            file_size = os.stat(file_name).st_size
-            assert (
-                file_size > MIN_LOG_SIZE_BYTES
-            ), f"file {file_name} size is empty with size smaller than {MIN_LOG_SIZE_BYTES}"
-
-        # Verify all expected logs are in the directory
-        expected_log_files = ["agent.logs", "installer.logs", "mount.logs", "report.logs"]
-        expected_log_files.append("bootkube.logs") if "bootstrap" in file_path else expected_log_files
-        assert set(expected_log_files) == set(log_host_files)
-
-
-def _verify_bootstrap_logs_uploaded(dir_path, file_path, installation_success, verify_control_plane=False):
-    with _safe_open_tar(os.path.join(dir_path, file_path), dir_path) as gz:
-        logs = gz.getnames()
-        assert any("bootkube.logs" in s for s in logs), f"bootkube.logs isn't found in {logs}"
-        if not installation_success:
-            for logs_type in ["dmesg.logs", "log-bundle"]:
-                assert any(logs_type in s for s in logs), f"{logs_type} isn't found in {logs}"
-            # test that installer-gather gathered logs from all masters
-            lb_path = [s for s in logs if "log-bundle" in s][0]
-            gz.extract(lb_path, dir_path)
-            with _safe_open_tar(os.path.join(dir_path, lb_path), dir_path) as log_bundle:
-                log_bundle.extractall(dir_path)
-                cp_path = [s for s in log_bundle.getnames() if "control-plane" in s][0]
-                # if bootstrap able to ssh to other masters, test that control-plane directory is not empty
-                if verify_control_plane:
-                    cp_full_path = os.path.join(dir_path, cp_path)
-                    master_dirs = os.listdir(cp_full_path)
-                    assert len(master_dirs) == NUMBER_OF_MASTERS - 1, (
-                        f"expecting {cp_full_path} to have " f"{NUMBER_OF_MASTERS - 1} values"
-                    )
-                    log.info(f"control-plane directory has sub-directory for each master: {master_dirs}")
-                    for ip_dir in master_dirs:
-                        log.info(f"{ip_dir} content: {os.listdir(os.path.join(cp_full_path, ip_dir))}")
-                        assert len(os.listdir(os.path.join(cp_full_path, ip_dir))) > 0, f"{cp_path}/{ip_dir} is empty"
+    tar_gz_files = []
+    log_host_dirs = set()
+    log_host_files = {}
+    for member in tar:
+        tar_gz_files.append(member.name)
+        if len(tar_gz_files) > 1:
+            continue
+
+        with _open_tar_stream(tar.extractfile(member)) as tar_gz:
+            for log_member in tar_gz:
+                path = _member_path(log_member.name)
+                log_host_dirs.add(path[0])
+                if len(path) == 2:
+                    log_host_files[path[1]] = log_member
+
+    assert len(tar_gz_files) == 1, f"Expecting for a single tar.gz file {tar_gz_files}"
+    assert len(log_host_dirs) == 1, f"Expecting for a single tar.gz file {log_host_dirs}"
+
+    # Verify created logs files are not empty
+    for file_name, log_member in log_host_files.items():
+        assert (
+            not log_member.isfile() or log_member.size > MIN_LOG_SIZE_BYTES
+        ), f"file {file_name} size is empty with size smaller than {MIN_LOG_SIZE_BYTES}"
+
+    # Verify all expected logs are in the directory
+    expected_log_files = {"agent.logs", "installer.logs", "mount.logs", "report.logs"}
+    if is_bootstrap:
+        expected_log_files.add("bootkube.logs")
+    assert expected_log_files == set(log_host_files)
+
+
+def _verify_bootstrap_logs_uploaded(tar: tarfile.TarFile, installation_success, verify_control_plane=False):
+    logs = []
+    log_bundle_names = None
+    for member in tar:
+        logs.append(member.name)
+        if installation_success or log_bundle_names is not None or "log-bundle" not in member.name:
+            continue
+
+        # test that installer-gather gathered logs from all masters
+        with _open_tar_stream(tar.extractfile(member)) as log_bundle:
+            log_bundle_names = [bundle_member.name for bundle_member in log_bundle]
+
+    assert any("bootkube.logs" in s for s in logs), f"bootkube.logs isn't found in {logs}"
+    if installation_success:
+        return
+
+    for logs_type in ["dmesg.logs", "log-bundle"]:
+        assert any(logs_type in s for s in logs), f"{logs_type} isn't found in {logs}"
+
+    cp_path = [s for s in log_bundle_names if "control-plane" in s][0].rstrip("/")
+    # if bootstrap able to ssh to other masters, test that control-plane directory is not empty
+    if verify_control_plane:
+        master_dirs = defaultdict(list)
+        for name in log_bundle_names:
+            ip_dir, _, content = name.removeprefix(f"{cp_path}/").partition("/")
+            if name.startswith(f"{cp_path}/") and ip_dir:
+                master_dirs[ip_dir].extend([content] if content else [])
+
+        assert len(master_dirs) == NUMBER_OF_MASTERS - 1, f"expecting {cp_path} to have {NUMBER_OF_MASTERS - 1} values"
+        log.info(f"control-plane directory has sub-directory for each master: {list(master_dirs)}")
+        for ip_dir, content in master_dirs.items():
+            log.info(f"{ip_dir} content: {content}")
+            assert len(content) > 0, f"{cp_path}/{ip_dir} is empty"
 
 
 def _are_logs_in_status(client, cluster_id, statuses, check_host_logs_only=False):
@@ -33,16 +33,22 @@ from retry import retry
 import consts
 from assisted_test_infra.test_infra.utils import oc_utils
 from service_client import log
+from service_client.file_download import DownloadError, range_header, stream_to_file
 
 
 def download_file(url: str, local_filename: str, verify_ssl: bool, tries=5) -> Path:
-    @retry(exceptions=(RuntimeError, HTTPError), tries=tries, delay=10, logger=log)
+    def _open_stream(offset: int):
+        try:
+            r = requests.get(url, stream=True, verify=verify_ssl, headers=range_header(offset))
+        except requests.ConnectionError as e:
+            # stream_to_file reconnects on the builtin ConnectionError, which the one of requests doesn't derive from
+            raise ConnectionError(str(e)) from e
+        r.raise_for_status()
+        return r.raw
+
+    @retry(exceptions=(RuntimeError, HTTPError, DownloadError), tries=tries, delay=10, logger=log)
     def _download_file() -> Path:
-        with requests.get(url, stream=True, verify=verify_ssl) as r:
-            r.raise_for_status()
-            with open(local_filename, "wb") as f:
-                shutil.copyfileobj(r.raw, f)
-
+        stream_to_file(_open_stream, local_filename)
         return Path(local_filename)
 
     return _download_file()
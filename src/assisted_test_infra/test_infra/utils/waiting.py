@@ -1,17 +1,12 @@
-from typing import Any, Dict, List, Tuple
-
-import waiting
+from typing import Any, Dict, List, Optional, Tuple
 
 import consts
 from assisted_test_infra.test_infra import utils
 from assisted_test_infra.test_infra.exceptions import InstallationFailedError, InstallationPendingActionError
+from assisted_test_infra.test_infra.utils.cluster_status_poller import get_cluster_poller, get_infra_env_poller
 from service_client import log
 
 
-def _get_cluster_hosts_with_mac(client, cluster_id, macs):
-    return [client.get_host_by_mac(cluster_id, mac) for mac in macs]
-
-
 def _are_hosts_in_status(
     hosts, nodes_count, statuses, status_info="", fall_on_error_status=True, fall_on_pending_status=False
 ):
@@ -55,6 +50,18 @@ def _are_hosts_using_agent_image(hosts: List[Dict[str, Any]], image: str) -> boo
     return True
 
 
+def _get_cluster_status_if_in(cluster, statuses: List[str]) -> Optional[str]:
+    log.info("Is cluster %s in status %s", cluster.id, statuses)
+    if cluster.status in statuses:
+        return cluster.status
+
+    log.info(
+        f"Cluster not yet in its required status. "
+        f"Current status: {cluster.status}\n Info message: {cluster.status_info}"
+    )
+    return None
+
+
 def host_statuses(hosts) -> List[Tuple[int, str, str, str, str, str]]:
     return [
         (i, host["id"], host.get("requested_hostname"), host.get("role"), host["status"], host["status_info"])
@@ -73,15 +80,15 @@ def wait_till_hosts_with_macs_are_in_status(
 ):
     log.info("Wait till %s nodes are in one of the statuses %s", len(macs), statuses)
 
-    waiting.wait(
-        lambda: _are_hosts_in_status(
-            hosts=_get_cluster_hosts_with_mac(client, cluster_id, macs),
+    get_cluster_poller(client, cluster_id).wait(
+        lambda snapshot: _are_hosts_in_status(
+            hosts=[snapshot.index.by_mac(mac) for mac in macs],
             nodes_count=len(macs),
             statuses=statuses,
             fall_on_error_status=fall_on_error_status,
         ),
-        timeout_seconds=timeout,
-        sleep_seconds=interval,
+        timeout=timeout,
+        interval=interval,
         waiting_for=f"Nodes to be in of the statuses {statuses}",
     )
 
@@ -99,17 +106,17 @@ def wait_till_all_hosts_are_in_status(
 ):
     log.info("Wait till %s nodes are in one of the statuses %s", nodes_count, statuses)
 
-    waiting.wait(
-        lambda: _are_hosts_in_status(
-            hosts=client.get_cluster_hosts(cluster_id),
+    get_cluster_poller(client, cluster_id).wait(
+        lambda snapshot: _are_hosts_in_status(
+            hosts=snapshot.hosts,
             nodes_count=nodes_count,
             statuses=statuses,
             status_info=status_info,
             fall_on_error_status=fall_on_error_status,
             fall_on_pending_status=fall_on_pending_status,
         ),
-        timeout_seconds=timeout,
-        sleep_seconds=interval,
+        timeout=timeout,
+        interval=interval,
         waiting_for=f"Nodes to be in of the statuses {statuses}",
     )
 
@@ -123,13 +130,13 @@ def wait_till_all_hosts_use_agent_image(
 ) -> None:
     log.info("Wait till all nodes are using agent image %s", image)
 
-    waiting.wait(
-        lambda: _are_hosts_using_agent_image(
-            hosts=client.get_cluster_hosts(cluster_id),
+    get_cluster_poller(client, cluster_id).wait(
+        lambda snapshot: _are_hosts_using_agent_image(
+            hosts=snapshot.hosts,
             image=image,
         ),
-        timeout_seconds=timeout,
-        sleep_seconds=interval,
+        timeout=timeout,
+        interval=interval,
         waiting_for=f"Nodes to be using agent image {image}",
     )
 
@@ -145,15 +152,15 @@ def wait_till_all_infra_env_hosts_are_in_status(
 ):
     log.info("Wait till %s nodes are in one of the statuses %s", nodes_count, statuses)
 
-    waiting.wait(
-        lambda: _are_hosts_in_status(
-            hosts=client.get_infra_env_hosts(infra_env_id),
+    get_infra_env_poller(client, infra_env_id).wait(
+        lambda hosts: _are_hosts_in_status(
+            hosts=hosts,
             nodes_count=nodes_count,
             statuses=statuses,
             fall_on_error_status=fall_on_error_status,
         ),
-        timeout_seconds=timeout,
-        sleep_seconds=interval,
+        timeout=timeout,
+        interval=interval,
         waiting_for=f"Nodes to be in of the statuses {statuses}",
     )
 
@@ -171,17 +178,17 @@ def wait_till_at_least_one_host_is_in_status(
 ):
     log.info("Wait till 1 node is in one of the statuses %s", statuses)
 
-    waiting.wait(
-        lambda: _are_hosts_in_status(
-            hosts=client.get_cluster_hosts(cluster_id),
+    get_cluster_poller(client, cluster_id).wait(
+        lambda snapshot: _are_hosts_in_status(
+            hosts=snapshot.hosts,
             nodes_count=nodes_count,
             statuses=statuses,
             status_info=status_info,
             fall_on_error_status=fall_on_error_status,
             fall_on_pending_status=fall_on_pending_status,
         ),
-        timeout_seconds=timeout,
-        sleep_seconds=interval,
+        timeout=timeout,
+        interval=interval,
         waiting_for=f"Node to be in of the statuses {statuses}",
     )
 
@@ -199,16 +206,16 @@ def wait_till_specific_host_is_in_status(
 ):
     log.info(f"Wait till {nodes_count} host is in one of the statuses: {statuses} {status_info}")
 
-    waiting.wait(
-        lambda: _are_hosts_in_status(
-            hosts=[client.get_host_by_name(cluster_id, host_name)],
+    get_cluster_poller(client, cluster_id).wait(
+        lambda snapshot: _are_hosts_in_status(
+            hosts=[snapshot.index.by_name(host_name)],
             nodes_count=nodes_count,
             statuses=statuses,
             status_info=status_info,
             fall_on_error_status=fall_on_error_status,
         ),
-        timeout_seconds=timeout,
-        sleep_seconds=interval,
+        timeout=timeout,
+        interval=interval,
         waiting_for=f"Node to be in of the statuses {statuses}",
     )
 
@@ -223,14 +230,14 @@ def wait_till_at_least_one_host_is_in_stage(
 ):
     log.info(f"Wait till {nodes_count} node is in stage {stages}")
     try:
-        waiting.wait(
-            lambda: utils.are_host_progress_in_stage(
-                client.get_cluster_hosts(cluster_id),
+        get_cluster_poller(client, cluster_id).wait(
+            lambda snapshot: utils.are_host_progress_in_stage(
+                snapshot.hosts,
                 stages,
                 nodes_count,
             ),
-            timeout_seconds=timeout,
-            sleep_seconds=interval,
+            timeout=timeout,
+            interval=interval,
             waiting_for=f"Node to be in of the stage {stages}",
         )
     except BaseException:
@@ -254,14 +261,14 @@ def wait_till_specific_host_is_in_stage(
 ):
     log.info(f"Wait till {host_name} host is in stage {stages}")
     try:
-        waiting.wait(
-            lambda: utils.are_host_progress_in_stage(
-                [client.get_host_by_name(cluster_id, host_name)],
+        get_cluster_poller(client, cluster_id).wait(
+            lambda snapshot: utils.are_host_progress_in_stage(
+                [snapshot.index.by_name(host_name)],
                 stages,
                 nodes_count,
             ),
-            timeout_seconds=timeout,
-            sleep_seconds=interval,
+            timeout=timeout,
+            interval=interval,
             waiting_for=f"Node to be in of the stage {stages}",
         )
     except BaseException:
@@ -286,16 +293,15 @@ def wait_till_cluster_is_in_status(
     try:
         if break_statuses:
             statuses += break_statuses
-        waiting.wait(
-            lambda: utils.is_cluster_in_status(client=client, cluster_id=cluster_id, statuses=statuses),
-            timeout_seconds=timeout,
-            sleep_seconds=interval,
+        status = get_cluster_poller(client, cluster_id).wait(
+            lambda snapshot: _get_cluster_status_if_in(snapshot.cluster, statuses),
+            timeout=timeout,
+            interval=interval,
             waiting_for=f"Cluster to be in status {statuses}",
+            ignore_fetch_errors=True,
         )
-        if break_statuses and utils.is_cluster_in_status(client, cluster_id, break_statuses):
-            raise BaseException(
-                f"Stop installation process, " f"cluster is in status {client.cluster_get(cluster_id).status}"
-            )
+        if break_statuses and status in break_statuses:
+            raise BaseException(f"Stop installation process, " f"cluster is in status {status}")
     except BaseException:
         log.error("Cluster status is: %s", client.cluster_get(cluster_id).status)
         log.error("Hosts statuses are: %s", host_statuses(client.get_cluster_hosts(cluster_id)))
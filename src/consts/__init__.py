@@ -4,7 +4,11 @@ from .env_defaults import DEFAULT_SSH_PRIVATE_KEY_PATH, DEFAULT_SSH_PUBLIC_KEY_P
 from .kube_api import (
     CRD_API_GROUP,
     CRD_API_VERSION,
+    DEFAULT_KUBE_LIST_PAGE_SIZE,
+    DEFAULT_KUBE_TEARDOWN_WORKERS,
+    DEFAULT_KUBE_WATCH_TIMEOUT,
     DEFAULT_WAIT_FOR_AGENTS_TIMEOUT,
+    DEFAULT_WAIT_FOR_CRD_DELETION_TIMEOUT,
     DEFAULT_WAIT_FOR_CRD_STATE_TIMEOUT,
     DEFAULT_WAIT_FOR_CRD_STATUS_TIMEOUT,
     DEFAULT_WAIT_FOR_INSTALLATION_COMPLETE_TIMEOUT,
@@ -35,6 +39,10 @@ __all__ = [
     "HIVE_API_GROUP",
     "HIVE_API_VERSION",
     "DEFAULT_WAIT_FOR_ISO_URL_TIMEOUT",
+    "DEFAULT_KUBE_WATCH_TIMEOUT",
+    "DEFAULT_KUBE_LIST_PAGE_SIZE",
+    "DEFAULT_KUBE_TEARDOWN_WORKERS",
+    "DEFAULT_WAIT_FOR_CRD_DELETION_TIMEOUT",
     "NUMBER_OF_MASTERS",
     "IP_VERSIONS",
 ]
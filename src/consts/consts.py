@@ -78,14 +78,25 @@ class DiskEncryptionRoles:
 WORKING_DIR = "build"
 TF_FOLDER = f"{WORKING_DIR}/terraform"
 TFVARS_JSON_NAME = "terraform.tfvars.json"
+TF_VARIABLES_SCHEMA_CACHE_NAME = ".variables_schema.json"
 DEFAULT_LIBVIRT_URI = "qemu:///system"
 TFSTATE_FILE = "terraform.tfstate"
+TFSTATE_FINGERPRINT_FILE = "terraform.tfstate.fingerprint"
+TF_PROVIDERS_LOCK_FILE = ".terraform.lock.hcl"
 IMAGE_FOLDER = "/tmp/test_images"
 TF_MAIN_JSON_NAME = "main.tf"
 TF_APPLY_ATTEMPTS_INTERVAL = 15  # in seconds
 BASE_IMAGE_FOLDER = "/tmp/images"
 IMAGE_NAME = "installer-image.iso"
 STORAGE_PATH = "/var/lib/libvirt/openshift-images"
+LIBVIRT_DNSMASQ_DIR = "/var/lib/libvirt/dnsmasq"
+NODE_POOL_DIR = f"{STORAGE_PATH}/node-pool"
+NODE_POOL_STATE_PATH = "/tmp/tf_node_pool.json"
+NODE_POOL_DOMAIN_PREFIX = "test-infra-pool"
+CLUSTER_DISK_SNAPSHOTS_DIR = f"{STORAGE_PATH}/cluster-snapshots"
+ISO_CACHE_DIR = f"{IMAGE_FOLDER}/cache"
+ISO_CACHE_MAX_SIZE = 20 * 1024**3  # in bytes
+ISO_CACHE_LOCK_TIMEOUT = 30 * 60  # in seconds
 DEFAULT_CLUSTER_KUBECONFIG_DIR_PATH = "build/kubeconfig"
 ASSISTED_SERVICE_DATA_BASE_PATH = "assisted-service/data/"
 
@@ -95,6 +106,7 @@ TF_NETWORK_POOL_PATH = "/tmp/tf_network_pool.json"
 # Timeouts
 NODES_REGISTERED_TIMEOUT = 20 * MINUTE
 DEFAULT_CHECK_STATUSES_INTERVAL = 5
+CLUSTER_STATUS_POLLER_FAST_INTERVAL = 1
 CLUSTER_READY_FOR_INSTALL_TIMEOUT = 10 * MINUTE
 CLUSTER_INSTALLATION_TIMEOUT = HOUR
 CLUSTER_INSTALLATION_TIMEOUT_ODF = 95 * MINUTE
@@ -115,6 +127,23 @@ WAIT_FOR_BM_API = 15 * MINUTE
 DEFAULT_INSTALLATION_RETRIES_ON_FALLBACK = 3
 DURATION_BETWEEN_INSTALLATION_RETRIES = 30
 
+# assisted-service http connection pool
+HTTP_POOL_NUM_POOLS = 10
+HTTP_POOL_MAXSIZE = 20
+HTTP_POOL_RETRIES = 3
+HTTP_POOL_BACKOFF_FACTOR = 0.5
+CLUSTER_SNAPSHOT_TTL = 2  # in seconds
+EVENTS_CURSOR_BUFFER_SIZE = 20000
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_MAX_RESUMES = 5
+DOWNLOAD_MAX_WORKERS = 8
+DOWNLOAD_MAX_CONCURRENT_STREAMS = 16
+DOWNLOAD_LOGS_CLUSTER_WORKERS = 4
+DOWNLOAD_JOB_TRIES = 3
+DOWNLOAD_JOB_BACKOFF = 1  # in seconds
+LIBVIRT_BULK_OPERATION_WORKERS = 8
+LIBVIRT_BULK_OPERATION_STATE_TIMEOUT = 2 * MINUTE
+
 # Networking
 DEFAULT_CLUSTER_NETWORKS_IPV4: List[models.ClusterNetwork] = [
     models.ClusterNetwork(cidr="172.30.0.0/16", host_prefix=23)
@@ -244,6 +273,11 @@ class ClusterStatus:
     INSTALLING_PENDING_USER_ACTION = "installing-pending-user-action"
 
 
+class ClusterDiskSnapshotPhase:
+    DISCOVERED = "discovered"
+    INSTALLED = "installed"
+
+
 class HostsProgressStages:
     START_INSTALLATION = "Starting installation"
     INSTALLING = "Installing"
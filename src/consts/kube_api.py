@@ -16,3 +16,7 @@ DEFAULT_WAIT_FOR_AGENTS_TIMEOUT = 5 * MINUTE
 DEFAULT_WAIT_FOR_INSTALLATION_COMPLETE_TIMEOUT = 2 * HOUR
 DEFAULT_WAIT_FOR_ISO_URL_TIMEOUT = 5 * MINUTE
 DEFAULT_WAIT_FOR_KUBECONFIG_TIMEOUT = 5 * MINUTE
+DEFAULT_WAIT_FOR_CRD_DELETION_TIMEOUT = 5 * MINUTE
+DEFAULT_KUBE_WATCH_TIMEOUT = 5 * MINUTE
+DEFAULT_KUBE_LIST_PAGE_SIZE = 500
+DEFAULT_KUBE_TEARDOWN_WORKERS = 8
@@ -1,15 +1,20 @@
 #!/usr/bin/env python3
+import itertools
 import json
+import locale
+import os
 import re
 import uuid
 from argparse import ArgumentParser
-from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional, Set, Tuple
 
-from junit_xml import TestCase, TestSuite, to_xml_report_string
+from junit_xml import TestCase
 
 from service_client import SuppressAndLog, log
+from service_client.junit_writer import JunitStreamWriter
 
 
 @dataclass
@@ -43,26 +48,74 @@ LOG_FORMAT = (
 
 LEADER_ELECTION_LOG_FORMAT = r"(?P<level>[IEW](\d{4})) (?P<time>.*?) .*? \d (?P<file>.*?)] (?P<msg>.*)"
 
+LOG_PATTERN = re.compile(LOG_FORMAT)
+LEADER_ELECTION_LOG_PATTERN = re.compile(LEADER_ELECTION_LOG_FORMAT)
+
+# Only lines that may hold an exported (fatal or error) entry are matched against the log formats: either the level of
+# a service log line starts with e/f, or the line is an error line of the leader election log format
+EXPORTED_LEVEL_PATTERN = re.compile(r"level=[eEfF]")
+LEADER_ELECTION_ERROR_PREFIX = "E"
+
 EXPORTED_LOG_LEVELS = ("fatal", "error")
 EXPORTED_EVENT_LEVELS = ("critical", "error")
 
+# Logs larger than that are split into chunks, parsed by a pool of processes
+PARALLEL_PARSING_MIN_SIZE = 64 * 1024**2
 
-class LogsConverter:
-    @classmethod
-    def _is_duplicate_entry(cls, entry: LogEntry, entry_message: str, fail_cases: Dict[str, List[TestCase]]) -> bool:
-        for case in fail_cases.get(entry.func, []):
-            if case.failures and case.failures[0].message == entry_message:
-                return True
-        return False
 
+@dataclass
+class FailureCaseEntries:
+    """The first exported log entry of a function, followed by the failure messages of all its exported entries"""
+
+    entry: LogEntry
+    messages: List[str] = field(default_factory=list)
+
+
+def _may_be_exported(line: str) -> bool:
+    return line.startswith(LEADER_ELECTION_ERROR_PREFIX) or EXPORTED_LEVEL_PATTERN.search(line) is not None
+
+
+def _universal_lines(raw_line: bytes, encoding: str) -> List[str]:
+    # Same lines as reading the file in text mode, where a lone carriage return also ends a line
+    line = raw_line.decode(encoding)
+    if "\r" not in line:
+        return [line]
+    return line.replace("\r\n", "\n").replace("\r", "\n").splitlines(keepends=True)
+
+
+def _parse_log_chunk(log_file_name: Path, start: int, end: int) -> Dict[str, FailureCaseEntries]:
+    """Collect the failure entries of the lines that start within the byte range [start, end) of the log file"""
+    entries: Dict[str, FailureCaseEntries] = dict()
+    encoding = locale.getpreferredencoding(False)
+
+    with open(log_file_name, "rb") as f:
+        # A line that started before the chunk belongs to the previous one
+        f.seek(max(start - 1, 0))
+        position = f.tell() + (len(f.readline()) if start else 0)
+        f.seek(position)
+
+        while position < end:
+            raw_line = f.readline()
+            if not raw_line:
+                break
+            position += len(raw_line)
+            for line in _universal_lines(raw_line, encoding):
+                LogsConverter.collect_failure_entry(line, entries)
+
+    return entries
+
+
+class LogsConverter:
     @classmethod
     def get_log_entry_case(
-        cls, entry: LogEntry, fail_cases: Dict[str, List[TestCase]], suite_name: str, failure_message: str
+        cls, entry: LogEntry, suite_name: str, failure_message: str, seen_failures: Set[Tuple[str, str]] = None
     ) -> List[TestCase]:
         fail_case: List[TestCase] = list()
 
-        if cls._is_duplicate_entry(entry, failure_message, fail_cases):
-            return []
+        if seen_failures is not None:
+            if (entry.func, failure_message) in seen_failures:
+                return []
+            seen_failures.add((entry.func, failure_message))
 
         test_case = TestCase(name=entry.func, classname=suite_name, category=suite_name, timestamp=entry.time)
         test_case.failures.append(CaseFailure(message=failure_message, output=failure_message, type=entry.level))
@@ -81,7 +134,7 @@ class LogsConverter:
 
     @classmethod
     def get_log_entry(cls, line: str):
-        values_match = re.match(LOG_FORMAT, line) or re.match(LEADER_ELECTION_LOG_FORMAT, line)
+        values_match = LOG_PATTERN.match(line) or LEADER_ELECTION_LOG_PATTERN.match(line)
         if values_match is None:
             return None
         values = values_match.groupdict()
@@ -94,57 +147,94 @@ class LogsConverter:
         return LogEntry(**values)
 
     @classmethod
-    def get_failure_cases(cls, log_file_name: Path, suite_name: str) -> List[TestCase]:
-        fail_cases: Dict[str, List[TestCase]] = dict()
+    def collect_failure_entry(cls, line: str, entries: Dict[str, FailureCaseEntries]) -> None:
+        if not _may_be_exported(line):
+            return
 
-        with open(log_file_name) as f:
-            for line in f:
-                entry = cls.get_log_entry(line)
-                if entry is None or (entry.level not in EXPORTED_LOG_LEVELS):
-                    continue
+        entry = cls.get_log_entry(line)
+        if entry is None or (entry.level not in EXPORTED_LOG_LEVELS):
+            return
 
-                failure_message = f"{entry.msg}\n{entry.error if entry.error else ''}"
+        if entry.func not in entries:
+            entries[entry.func] = FailureCaseEntries(entry)
+        entries[entry.func].messages.append(f"{entry.msg}\n{entry.error if entry.error else ''}")
 
-                if entry.func not in fail_cases:
-                    fail_cases[entry.func] = cls.get_log_entry_case(entry, fail_cases, suite_name, failure_message)
-                else:
-                    for case in fail_cases[entry.func]:
-                        if case.is_failure():
-                            failure = case.failures[0]
-                            failure.message += f"\n{failure_message}"
-                            failure.output += f"\n{failure_message}"
+    @classmethod
+    def _collect_failure_entries(cls, log_file_name: Path, workers: Optional[int]) -> Dict[str, FailureCaseEntries]:
+        size = os.path.getsize(log_file_name)
+        workers = workers or os.cpu_count() or 1
+        if size < PARALLEL_PARSING_MIN_SIZE or workers == 1:
+            entries: Dict[str, FailureCaseEntries] = dict()
+            with open(log_file_name) as f:
+                for line in f:
+                    cls.collect_failure_entry(line, entries)
+            return entries
+
+        chunk_size = -(-size // workers)
+        log.info(f"Parsing {log_file_name} ({size} bytes) in {workers} chunks")
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunks = executor.map(
+                _parse_log_chunk,
+                itertools.repeat(log_file_name),
+                range(0, size, chunk_size),
+                range(chunk_size, size + chunk_size, chunk_size),
+            )
+
+            # Merging the chunks in file order yields the same entries as parsing the whole file sequentially
+            entries: Dict[str, FailureCaseEntries] = dict()
+            for chunk in chunks:
+                for func, chunk_entries in chunk.items():
+                    if func in entries:
+                        entries[func].messages.extend(chunk_entries.messages)
+                    else:
+                        entries[func] = chunk_entries
+
+        return entries
+
+    @classmethod
+    def iter_failure_cases(
+        cls, log_file_name: Path, suite_name: str, workers: Optional[int] = None
+    ) -> Iterator[TestCase]:
+        seen_failures: Set[Tuple[str, str]] = set()
 
-        log.info(f"Found {len(fail_cases)} failures on {suite_name} suite")
+        entries = cls._collect_failure_entries(log_file_name, workers)
+        log.info(f"Found {len(entries)} failures on {suite_name} suite")
 
-        return [c for cases in fail_cases.values() for c in cases]
+        # The failure message of a function is only joined when its cases are written
+        for func in list(entries):
+            func_entries = entries.pop(func)
+            failure_message = "\n".join(func_entries.messages)
+            yield from cls.get_log_entry_case(func_entries.entry, suite_name, failure_message, seen_failures)
+
+    @classmethod
+    def get_failure_cases(cls, log_file_name: Path, suite_name: str, workers: Optional[int] = None) -> List[TestCase]:
+        return list(cls.iter_failure_cases(log_file_name, suite_name, workers))
 
     @classmethod
     def export_service_logs_to_junit_suites(cls, source_dir: Path, report_dir: Path):
-        suites = list()
-        for file in source_dir.glob("logs_assisted-service*.log"):
-            suite_name = "assisted-logs"
-            log.info(f"Creating test suite from {suite_name}.log")
-            test_cases = cls.get_failure_cases(file, suite_name)
-            timestamp = test_cases[0].timestamp if test_cases else None
-            suites.append(TestSuite(name=suite_name, test_cases=test_cases, timestamp=timestamp))
+        report_path = report_dir.joinpath(f"junit_log_parser_{str(uuid.uuid4())[:8]}.xml")
+        with JunitStreamWriter(report_path) as writer:
+            suites = 0
+            for file in source_dir.glob("logs_assisted-service*.log"):
+                suite_name = "assisted-logs"
+                log.info(f"Creating test suite from {suite_name}.log")
+                writer.suite(suite_name, first_case_timestamp=True).add_all(cls.iter_failure_cases(file, suite_name))
+                suites += 1
 
-        log.info(f"Generating xml file for {len(suites)} suites")
-        xml_report = to_xml_report_string(suites)
-        with open(report_dir.joinpath(f"junit_log_parser_{str(uuid.uuid4())[:8]}.xml"), "w") as f:
-            log.info(f"Exporting {len(suites)} suites xml-report with {len(xml_report)} characters to {f.name}")
-            f.write(xml_report)
+            log.info(f"Exporting {suites} suites xml-report to {report_path}")
 
 
 class EventsConverter:
     @classmethod
-    def get_event_test_cases(cls, events_data: dict) -> List[TestCase]:
-        test_cases = list()
+    def iter_event_test_cases(cls, events_data: dict) -> Iterator[TestCase]:
         for event in events_data["items"]:
             test_case = cls.get_event_test_case(event)
             if test_case is not None:
-                test_cases.append(test_case)
+                yield test_case
 
-        return test_cases
+    @classmethod
+    def get_event_test_cases(cls, events_data: dict) -> List[TestCase]:
+        return list(cls.iter_event_test_cases(events_data))
 
     @classmethod
     def get_event_test_case(cls, event: dict) -> Optional[TestCase]:
@@ -170,13 +260,11 @@ class EventsConverter:
             events_data = json.load(f)
 
         log.info(f"Creating test suite from service events json file - {events_file_name}")
-        test_cases = cls.get_event_test_cases(events_data)
-
-        log.info("Generating events xml file")
-        xml_report = to_xml_report_string(test_suites=[TestSuite(name="EVENTS", test_cases=test_cases)])
-        with open(report_dir.joinpath(f"junit_events_parser_{str(uuid.uuid4())[:8]}.xml"), "w") as f:
-            log.info(f"Exporting events xml-report with {len(test_cases)} events to {f.name}")
-            f.write(xml_report)
+        report_path = report_dir.joinpath(f"junit_events_parser_{str(uuid.uuid4())[:8]}.xml")
+        with JunitStreamWriter(report_path) as writer:
+            suite = writer.suite("EVENTS")
+            suite.add_all(cls.iter_event_test_cases(events_data))
+            log.info(f"Exporting events xml-report with {suite.tests} events to {report_path}")
 
 
 def main():
@@ -1,23 +1,36 @@
 # -*- coding: utf-8 -*-
 import base64
 import contextlib
+import copy
 import enum
+import functools
 import ipaddress
 import json
 import os
 import time
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
 from urllib.parse import urlparse
 
 import requests
 import waiting
 from assisted_service_client import ApiClient, Configuration, CreateManifestParams, Manifest, api, models
-from junit_report import CaseFormatKeys, JsonJunitExporter
+from junit_report import CaseFormatKeys
 from netaddr import IPAddress, IPNetwork
 from pydantic import BaseModel
 from retry import retry
 
 import consts
+from service_client.cluster_snapshot import ClusterSnapshot, ClusterSnapshotCache
+from service_client.connection_pool import ConnectionPoolStats, get_shared_pool
+from service_client.file_download import (
+    DownloadJob,
+    DownloadResult,
+    download_concurrently,
+    range_header,
+    stream_to_file,
+)
+from service_client.json_stream import JsonArrayWriter, iter_json_array
+from service_client.junit_writer import StreamingJsonJunitExporter
 from service_client.logger import log
 
 
@@ -43,6 +56,19 @@ class AuthenticationMethod(enum.Enum):
     REFRESH_TOKEN = "REFRESH_TOKEN"
 
 
+def invalidates_cluster_snapshots(func):
+    """Mark an InventoryClient method as mutating, cached cluster snapshots are dropped once it was called"""
+
+    @functools.wraps(func)
+    def wrapper(self: "InventoryClient", *args, **kwargs):
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            self.cluster_snapshots.invalidate()
+
+    return wrapper
+
+
 class InventoryClient(object):
     def __init__(
         self,
@@ -51,8 +77,10 @@ class InventoryClient(object):
         service_account: Optional[ServiceAccount],
         refresh_token: Optional[str],
         pull_secret: str,
+        cluster_snapshot_ttl: float = consts.CLUSTER_SNAPSHOT_TTL,
     ):
         self.inventory_url = inventory_url
+        self.cluster_snapshots = ClusterSnapshotCache(ttl=cluster_snapshot_ttl)
         configs = Configuration()
         configs.host = self.get_host(configs)
         configs.verify_ssl = False
@@ -62,6 +90,7 @@ class InventoryClient(object):
         self._set_x_secret_key(configs, pull_secret)
 
         self.api = ApiClient(configuration=configs)
+        get_shared_pool().attach(self.api)
         self.client = api.InstallerApi(api_client=self.api)
         self.events = api.EventsApi(api_client=self.api)
         self.versions = api.VersionsApi(api_client=self.api)
@@ -72,7 +101,7 @@ class InventoryClient(object):
         fmt = CaseFormatKeys(
             case_name="cluster-event-test", static_case_name=True, severity_key="severity", case_timestamp="event_time"
         )
-        self._events_junit_exporter = JsonJunitExporter(fmt)
+        self._events_junit_exporter = StreamingJsonJunitExporter(fmt)
 
     def get_host(self, configs: Configuration) -> str:
         parsed_host = urlparse(configs.host)
@@ -143,7 +172,7 @@ class InventoryClient(object):
                 log.error("The environment variable SSO_URL is mandatory but was not supplied")
                 raise
             else:
-                response = requests.post(sso_url, data=params)
+                response = get_shared_pool().session.post(sso_url, data=params)
 
             response.raise_for_status()
 
@@ -161,6 +190,10 @@ class InventoryClient(object):
         log.info("Setting X-Secret-Key")
         c.api_key["X-Secret-Key"] = json.loads(pull_secret)["auths"]["cloud.openshift.com"]["auth"]
 
+    @staticmethod
+    def connection_pool_stats() -> ConnectionPoolStats:
+        return get_shared_pool().stats()
+
     def wait_for_api_readiness(self, timeout: int) -> None:
         log.info("Waiting for inventory api to be ready")
         waiting.wait(
@@ -194,8 +227,7 @@ class InventoryClient(object):
         return result
 
     def get_cluster_hosts(self, cluster_id: str, get_unregistered_clusters: bool = False) -> List[Dict[str, Any]]:
-        cluster_details = self.cluster_get(cluster_id, get_unregistered_clusters=get_unregistered_clusters)
-        return list(map(lambda host: host.to_dict(), cluster_details.hosts))
+        return self.get_cluster_snapshot(cluster_id, get_unregistered_clusters).copy_hosts()
 
     def get_infra_env_hosts(self, infra_env_id: str) -> List[Dict[str, Any]]:
         return self.client.v2_list_hosts(infra_env_id=infra_env_id)
@@ -203,6 +235,7 @@ class InventoryClient(object):
     def get_infra_env(self, infra_env_id: str) -> models.infra_env.InfraEnv:
         return self.client.get_infra_env(infra_env_id=infra_env_id)
 
+    @invalidates_cluster_snapshots
     def delete_infra_env(self, infra_env_id: str) -> None:
         log.info("Deleting infra_env %s", infra_env_id)
         self.client.deregister_infra_env(infra_env_id=infra_env_id)
@@ -227,16 +260,31 @@ class InventoryClient(object):
         return self.client.v2_list_clusters(get_unregistered_clusters=True)
 
     def cluster_get(self, cluster_id: str, get_unregistered_clusters: bool = False) -> models.cluster.Cluster:
-        return self.client.v2_get_cluster(cluster_id=cluster_id, get_unregistered_clusters=get_unregistered_clusters)
+        cluster = self.client.v2_get_cluster(cluster_id=cluster_id, get_unregistered_clusters=get_unregistered_clusters)
+        self.cluster_snapshots.put(cluster_id, cluster, get_unregistered_clusters)
+        return cluster
+
+    def get_cluster_snapshot(self, cluster_id: str, get_unregistered_clusters: bool = False) -> ClusterSnapshot:
+        """Get the cluster together with its parsed hosts, reusing the last fetch if it is younger than the
+        snapshot ttl"""
+        snapshot = self.cluster_snapshots.get(cluster_id, get_unregistered_clusters)
+        if snapshot is None:
+            cluster = self.client.v2_get_cluster(
+                cluster_id=cluster_id, get_unregistered_clusters=get_unregistered_clusters
+            )
+            snapshot = self.cluster_snapshots.put(cluster_id, cluster, get_unregistered_clusters)
+        return snapshot
 
     def get_infra_envs_by_cluster_id(self, cluster_id: str) -> List[Union[models.infra_env.InfraEnv, Dict[str, Any]]]:
         infra_envs = self.infra_envs_list()
         return [infra_env for infra_env in infra_envs if infra_env.get("cluster_id") == cluster_id]
 
+    @invalidates_cluster_snapshots
     def update_infra_env(self, infra_env_id: str, infra_env_update_params):
         log.info("Updating infra env %s with values %s", infra_env_id, infra_env_update_params)
         self.client.update_infra_env(infra_env_id=infra_env_id, infra_env_update_params=infra_env_update_params)
 
+    @invalidates_cluster_snapshots
     def update_host(
         self,
         infra_env_id: str,
@@ -254,6 +302,7 @@ class InventoryClient(object):
         )
         self.client.v2_update_host(infra_env_id=infra_env_id, host_id=host_id, host_update_params=host_update_params)
 
+    @invalidates_cluster_snapshots
     def select_installation_disk(self, infra_env_id: str, host_id: str, disk_paths: List[dict]) -> None:
         log.info("Setting installation disk for host %s in infra_env %s", host_id, infra_env_id)
 
@@ -273,95 +322,159 @@ class InventoryClient(object):
         update_params = models.V2ClusterUpdateParams(pull_secret=pull_secret)
         return self.update_cluster(cluster_id=cluster_id, update_params=update_params)
 
+    @invalidates_cluster_snapshots
     def update_cluster(self, cluster_id, update_params) -> models.cluster.Cluster:
         log.info("Updating cluster %s with params %s", cluster_id, update_params)
         return self.client.v2_update_cluster(cluster_id=cluster_id, cluster_update_params=update_params)
 
+    @invalidates_cluster_snapshots
     def delete_cluster(self, cluster_id: str):
         log.info("Deleting cluster %s", cluster_id)
         self.client.v2_deregister_cluster(cluster_id=cluster_id)
 
+    @invalidates_cluster_snapshots
     def deregister_host(self, infra_env_id: str, host_id: str):
         log.info(f"Deleting host {host_id} in infra_env {infra_env_id}")
         self.client.v2_deregister_host(infra_env_id=infra_env_id, host_id=host_id)
 
+    @invalidates_cluster_snapshots
+    def update_host_installer_args(self, infra_env_id: str, host_id: str, installer_args_params) -> None:
+        log.info(f"Updating host {host_id} in infra_env {infra_env_id} with installer args: {installer_args_params}")
+        self.client.v2_update_host_installer_args(
+            infra_env_id=infra_env_id, host_id=host_id, installer_args_params=installer_args_params
+        )
+
+    @invalidates_cluster_snapshots
+    def set_ignored_validations(self, cluster_id: str, ignored_validations: models.IgnoredValidations, **kwargs):
+        return self.client.v2_set_ignored_validations(cluster_id, ignored_validations, **kwargs)
+
+    def get_ignored_validations(self, cluster_id: str, **kwargs) -> models.IgnoredValidations:
+        return self.client.v2_get_ignored_validations(cluster_id, **kwargs)
+
     def get_hosts_id_with_macs(self, cluster_id: str) -> Dict[Any, List[str]]:
-        hosts = self.get_cluster_hosts(cluster_id)
-        hosts_data = {}
-        for host in hosts:
-            inventory = json.loads(host.get("inventory", '{"interfaces":[]}'))
-            hosts_data[host["id"]] = [interface["mac_address"] for interface in inventory["interfaces"]]
-        return hosts_data
+        inventories = self.get_cluster_snapshot(cluster_id).inventories
+        return {
+            host_id: [interface["mac_address"] for interface in inventory["interfaces"]]
+            for host_id, inventory in inventories.items()
+        }
 
     def get_host_by_mac(self, cluster_id: str, mac: str) -> Dict[str, Any]:
-        hosts = self.get_cluster_hosts(cluster_id)
+        host = self.get_cluster_snapshot(cluster_id).index.by_mac(mac)
+        return copy.deepcopy(host) if host is not None else None
 
-        for host in hosts:
-            inventory = json.loads(host.get("inventory", '{"interfaces":[]}'))
-            if mac.lower() in [interface["mac_address"].lower() for interface in inventory["interfaces"]]:
-                return host
+    def get_hosts_by_macs(self, cluster_id: str, macs: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """Get the host of each given mac address (None if it was not found) out of a single cluster fetch"""
+        index = self.get_cluster_snapshot(cluster_id).index
+        return [copy.deepcopy(index.by_mac(mac)) for mac in macs]
+
+    def get_host_by_id(self, cluster_id: str, host_id: str) -> Optional[Dict[str, Any]]:
+        host = self.get_cluster_snapshot(cluster_id).index.by_id(host_id)
+        return copy.deepcopy(host) if host is not None else None
 
     def get_host_by_name(self, cluster_id: str, host_name: str) -> Dict[str, Any]:
-        hosts = self.get_cluster_hosts(cluster_id)
+        host = self.get_cluster_snapshot(cluster_id).index.by_name(host_name)
+        if host is not None:
+            log.info(f"Requested host by name: {host_name}, host details: {host}")
+            return copy.deepcopy(host)
 
-        for host in hosts:
-            hostname = host.get("requested_hostname")
-            if hostname == host_name:
-                log.info(f"Requested host by name: {host_name}, host details: {host}")
-                return host
+    def _download(
+        self,
+        resource_path: str,
+        output_file: str,
+        path_params: Dict[str, str],
+        query_params: Optional[List[tuple]] = None,
+        auth_settings: Optional[List[str]] = None,
+    ) -> DownloadResult:
+        """Stream a file endpoint into output_file, resuming it with a byte range request if the connection drops.
+        The generated api methods can't send extra headers, so the request is sent with ApiClient.call_api"""
+
+        def _open_stream(offset: int):
+            return self.api.call_api(
+                resource_path,
+                "GET",
+                path_params=path_params,
+                query_params=query_params or [],
+                header_params={"Accept": "application/octet-stream", **range_header(offset)},
+                auth_settings=auth_settings or ["agentAuth", "urlAuth", "userAuth"],
+                _return_http_data_only=True,
+                _preload_content=False,
+            )
+
+        result = stream_to_file(_open_stream, output_file)
+        log.debug(f"Downloaded {result.size} bytes to {output_file}, sha256 {result.sha256}")
+        return result
 
     def download_and_save_file(self, cluster_id: str, file_name: str, file_path: str) -> None:
         log.info("Downloading %s to %s", file_name, file_path)
-        response = self.client.v2_download_cluster_files(
-            cluster_id=cluster_id, file_name=file_name, _preload_content=False
+        self._download(
+            "/v2/clusters/{cluster_id}/downloads/files",
+            file_path,
+            path_params={"cluster_id": cluster_id},
+            query_params=[("file_name", file_name)],
         )
-        with open(file_path, "wb") as _file:
-            _file.write(response.data)
 
     def download_and_save_infra_env_file(self, infra_env_id: str, file_name: str, file_path: str) -> None:
         log.info(f"Downloading {file_name} to {file_path}")
-        response = self.client.v2_download_infra_env_files(
-            infra_env_id=infra_env_id, file_name=file_name, _preload_content=False
+        self._download(
+            "/v2/infra-envs/{infra_env_id}/downloads/files",
+            os.path.join(file_path, f"{file_name}-{infra_env_id}"),
+            path_params={"infra_env_id": infra_env_id},
+            query_params=[("file_name", file_name)],
+            auth_settings=["agentAuth", "imageAuth", "imageURLAuth", "urlAuth", "userAuth"],
         )
-        with open(os.path.join(file_path, f"{file_name}-{infra_env_id}"), "wb") as _file:
-            _file.write(response.data)
 
     def download_manifests(self, cluster_id: str, dir_path: str) -> None:
         log.info(f"Downloading manifests for cluster {cluster_id} into {dir_path}")
         response = self.manifest.v2_list_cluster_manifests(
             cluster_id=cluster_id, include_system_generated=True, _preload_content=False
         )
-        for record in json.loads(response.data):
-            response = self.manifest.v2_download_cluster_manifest(
-                cluster_id=cluster_id, file_name=record["file_name"], folder=record["folder"], _preload_content=False
+
+        def _manifest_job(record: Dict[str, str]) -> DownloadJob:
+            return DownloadJob(
+                lambda destination: self._download(
+                    "/v2/clusters/{cluster_id}/manifests/files",
+                    destination,
+                    path_params={"cluster_id": cluster_id},
+                    query_params=[("folder", record["folder"]), ("file_name", record["file_name"])],
+                    auth_settings=["userAuth"],
+                ),
+                os.path.join(dir_path, record["file_name"]),
             )
-            with open(os.path.join(dir_path, record["file_name"]), "wb") as _file:
-                _file.write(response.data)
+
+        results = download_concurrently([_manifest_job(record) for record in json.loads(response.data)])
+        failed = [result for result in results if not result.ok]
+        if failed:
+            raise failed[0].error
 
     def download_kubeconfig_no_ingress(self, cluster_id: str, kubeconfig_path: str) -> None:
         log.info("Downloading kubeconfig-noingress to %s", kubeconfig_path)
-        response = self.client.v2_download_cluster_credentials(
-            cluster_id=cluster_id, file_name="kubeconfig-noingress", _preload_content=False
+        self._download(
+            "/v2/clusters/{cluster_id}/downloads/credentials",
+            kubeconfig_path,
+            path_params={"cluster_id": cluster_id},
+            query_params=[("file_name", "kubeconfig-noingress")],
+            auth_settings=["agentAuth", "userAuth"],
         )
-        with open(kubeconfig_path, "wb") as _file:
-            _file.write(response.data)
 
     def download_host_ignition(self, infra_env_id: str, host_id: str, destination: str) -> None:
         log.info("Downloading host %s infra_env %s ignition files to %s", host_id, infra_env_id, destination)
 
-        response = self.client.v2_download_host_ignition(
-            infra_env_id=infra_env_id, host_id=host_id, _preload_content=False
+        self._download(
+            "/v2/infra-env/{infra_env_id}/hosts/{host_id}/downloads/ignition",
+            os.path.join(destination, f"host_{host_id}.ign"),
+            path_params={"infra_env_id": infra_env_id, "host_id": host_id},
+            auth_settings=["agentAuth", "userAuth"],
         )
-        with open(os.path.join(destination, f"host_{host_id}.ign"), "wb") as _file:
-            _file.write(response.data)
 
     def download_kubeconfig(self, cluster_id: str, kubeconfig_path: str) -> None:
         log.info("Downloading kubeconfig to %s", kubeconfig_path)
-        response = self.client.v2_download_cluster_credentials(
-            cluster_id=cluster_id, file_name="kubeconfig", _preload_content=False
+        self._download(
+            "/v2/clusters/{cluster_id}/downloads/credentials",
+            kubeconfig_path,
+            path_params={"cluster_id": cluster_id},
+            query_params=[("file_name", "kubeconfig")],
+            auth_settings=["agentAuth", "userAuth"],
         )
-        with open(kubeconfig_path, "wb") as _file:
-            _file.write(response.data)
 
     def download_metrics(self, dest: str) -> None:
         log.info("Downloading metrics to %s", dest)
@@ -369,29 +482,35 @@ class InventoryClient(object):
         url = self.inventory_url
         if not (url.startswith("http://") or url.startswith("https://")):
             url = f"http://{url}"
-        response = requests.get(f"{url}/metrics")
+        response = get_shared_pool().session.get(f"{url}/metrics")
         response.raise_for_status()
 
         with open(dest, "w") as _file:
             _file.write(response.text)
 
+    @invalidates_cluster_snapshots
     def install_cluster(self, cluster_id: str) -> models.cluster.Cluster:
         log.info("Installing cluster %s", cluster_id)
         return self.client.v2_install_cluster(cluster_id=cluster_id)
 
+    @invalidates_cluster_snapshots
     def install_day2_cluster(self, cluster_id: str) -> models.cluster.Cluster:
         log.info("Installing day2 cluster %s", cluster_id)
         return self.client.install_hosts(cluster_id=cluster_id)
 
+    @invalidates_cluster_snapshots
     def install_day2_host(self, infra_env_id: str, host_id: str) -> models.cluster.Cluster:
         log.info("Installing day2 host %s, infra_env_id %s", host_id, infra_env_id)
         return self.client.v2_install_host(infra_env_id=infra_env_id, host_id=host_id)
 
     def download_cluster_logs(self, cluster_id: str, output_file: str) -> None:
         log.info("Downloading cluster logs to %s", output_file)
-        response = self.client.v2_download_cluster_logs(cluster_id=cluster_id, _preload_content=False)
-        with open(output_file, "wb") as _file:
-            _file.write(response.data)
+        self._download(
+            "/v2/clusters/{cluster_id}/logs",
+            output_file,
+            path_params={"cluster_id": cluster_id},
+            auth_settings=["urlAuth", "userAuth"],
+        )
 
     def get_events(
         self,
@@ -415,44 +534,81 @@ class InventoryClient(object):
 
         return json.loads(response.data)
 
+    def iter_events(
+        self,
+        cluster_id: Optional[str] = "",
+        host_id: Optional[str] = "",
+        infra_env_id: Optional[str] = "",
+        categories=None,
+        **kwargs,
+    ) -> Iterator[Dict[str, str]]:
+        """Same as get_events, the events are decoded one at a time while the response is read"""
+        if categories is None:
+            categories = ["user"]
+        response = self.events.v2_list_events(
+            cluster_id=cluster_id,
+            host_id=host_id,
+            infra_env_id=infra_env_id,
+            categories=categories,
+            _preload_content=False,
+            **kwargs,
+        )
+        try:
+            yield from iter_json_array(response.stream(consts.DOWNLOAD_CHUNK_SIZE))
+        finally:
+            response.release_conn()
+
+    @staticmethod
+    def _write_events(events: Iterable[Dict[str, str]], output_file: str) -> Iterator[Dict[str, str]]:
+        with open(output_file, "w") as _file, JsonArrayWriter(_file) as writer:
+            for event in events:
+                writer.write(event)
+                yield event
+
     def download_cluster_events(self, cluster_id: str, output_file: str, categories=None) -> None:
         if categories is None:
             categories = ["user"]
         log.info("Downloading cluster events to %s", output_file)
 
-        with open(output_file, "wb") as _file:
-            events = self.get_events(cluster_id, categories=categories)
-            _file.write(json.dumps(events, indent=4).encode())
-            self._events_junit_exporter.collect(events, suite_name="cluster_events", xml_suffix=cluster_id)
+        # Each event is written to the output file and to the junit report as soon as it was read
+        events = self._write_events(self.iter_events(cluster_id, categories=categories), output_file)
+        self._events_junit_exporter.collect(events, suite_name="cluster_events", xml_suffix=cluster_id)
 
     def download_infraenv_events(self, infra_env_id: str, output_file: str, categories: str = None) -> None:
         if categories is None:
             categories = ["user"]
         log.info("Downloading infraenv events to %s", output_file)
 
-        with open(output_file, "wb") as _file:
-            events = self.get_events(infra_env_id=infra_env_id, categories=categories)
-            _file.write(json.dumps(events, indent=4).encode())
+        for _ in self._write_events(self.iter_events(infra_env_id=infra_env_id, categories=categories), output_file):
+            pass
 
     def download_host_logs(self, cluster_id: str, host_id: str, output_file) -> None:
         log.info("Downloading host logs to %s", output_file)
-        response = self.client.v2_download_cluster_logs(cluster_id=cluster_id, host_id=host_id, _preload_content=False)
-        with open(output_file, "wb") as _file:
-            _file.write(response.data)
+        self._download(
+            "/v2/clusters/{cluster_id}/logs",
+            output_file,
+            path_params={"cluster_id": cluster_id},
+            query_params=[("host_id", host_id)],
+            auth_settings=["urlAuth", "userAuth"],
+        )
 
+    @invalidates_cluster_snapshots
     def cancel_cluster_install(self, cluster_id: str) -> models.cluster.Cluster:
         log.info("Canceling installation of cluster %s", cluster_id)
         return self.client.v2_cancel_installation(cluster_id=cluster_id)
 
+    @invalidates_cluster_snapshots
     def reset_cluster_install(self, cluster_id: str) -> models.cluster.Cluster:
         log.info("Reset installation of cluster %s", cluster_id)
         return self.client.v2_reset_cluster(cluster_id=cluster_id)
 
+    @invalidates_cluster_snapshots
     def bind_host(self, infra_env_id: str, host_id: str, cluster_id: str) -> None:
         log.info(f"Enabling host: {host_id}, from infra_env {infra_env_id}, in cluster id: {cluster_id}")
         bind_host_params = models.BindHostParams(cluster_id=cluster_id)
         self.client.bind_host(infra_env_id=infra_env_id, host_id=host_id, bind_host_params=bind_host_params)
 
+    @invalidates_cluster_snapshots
     def unbind_host(self, infra_env_id: str, host_id: str) -> None:
         log.info(f"Disabling host: {host_id}, from infra_env {infra_env_id}")
         self.client.unbind_host(infra_env_id=infra_env_id, host_id=host_id)
@@ -468,6 +624,7 @@ class InventoryClient(object):
         log.info("Getting install-config for cluster %s", cluster_id)
         return self.client.v2_get_cluster_install_config(cluster_id=cluster_id)
 
+    @invalidates_cluster_snapshots
     def update_cluster_install_config(self, cluster_id: str, install_config_params: dict, **kwargs) -> None:
         """v2_update_cluster_install_config
         Override values in the install config.
@@ -482,6 +639,7 @@ class InventoryClient(object):
         infra_env = self.get_infra_env(infra_env_id=infra_env_id)
         return infra_env.ingition_config_override
 
+    @invalidates_cluster_snapshots
     def register_host(self, infra_env_id: str, host_id: str) -> None:
         log.info(f"Registering host: {host_id} to cluster: {infra_env_id}")
         host_params = models.HostCreateParams(host_id=host_id)
@@ -491,10 +649,12 @@ class InventoryClient(object):
         log.info(f"Getting next step for host: {host_id} in cluster: {infra_env_id}")
         return self.client.v2_get_next_steps(infra_env_id=infra_env_id, host_id=host_id)
 
+    @invalidates_cluster_snapshots
     def host_post_step_result(self, infra_env_id: str, host_id: str, **kwargs) -> None:
         reply = models.StepReply(**kwargs)
         self.client.v2_post_step_reply(infra_env_id=infra_env_id, host_id=host_id, reply=reply)
 
+    @invalidates_cluster_snapshots
     def host_update_progress(
         self, infra_env_id: str, host_id: str, current_stage: models.HostStage, progress_info=None
     ) -> None:
@@ -503,6 +663,7 @@ class InventoryClient(object):
             infra_env_id=infra_env_id, host_id=host_id, host_progress=host_progress
         )
 
+    @invalidates_cluster_snapshots
     def complete_cluster_installation(self, cluster_id: str, is_success: bool, error_info=None) -> None:
         completion_params = models.CompletionParams(is_success=is_success, error_info=error_info)
         self.client.v2_complete_installation(cluster_id=cluster_id, completion_params=completion_params)
@@ -599,6 +760,10 @@ class InventoryClient(object):
 
     @staticmethod
     def get_inventory_host_nics_data(host: dict, ipv4_first=True) -> List[Dict[str, str]]:
+        return InventoryClient._get_nics_data(json.loads(host["inventory"]), ipv4_first)
+
+    @staticmethod
+    def _get_nics_data(inventory: Dict[str, Any], ipv4_first: bool = True) -> List[Dict[str, str]]:
         def get_network_interface_ip(interface):
             addresses = (
                 interface.ipv4_addresses + interface.ipv6_addresses
@@ -607,7 +772,7 @@ class InventoryClient(object):
             )
             return addresses[0].split("/")[0] if len(addresses) > 0 else None
 
-        inventory = models.Inventory(**json.loads(host["inventory"]))
+        inventory = models.Inventory(**inventory)
         interfaces_list = [models.Interface(**interface) for interface in inventory.interfaces]
 
         return [
@@ -624,11 +789,20 @@ class InventoryClient(object):
     def get_hosts_nics_data(self, hosts: List[Union[dict, models.Host]], ipv4_first: bool = True):
         return [self.get_inventory_host_nics_data(h, ipv4_first=ipv4_first) for h in hosts]
 
+    def get_cluster_hosts_nics_data(self, cluster_id: str, ipv4_first: bool = True) -> Dict[str, List[Dict[str, str]]]:
+        """Get the nics data of every cluster host keyed by host id, out of the cached cluster snapshot"""
+        inventories = self.get_cluster_snapshot(cluster_id).inventories
+        return {
+            host_id: self._get_nics_data(inventory, ipv4_first=ipv4_first) for host_id, inventory in inventories.items()
+        }
+
     def get_ips_for_role(self, cluster_id, network, role) -> List[str]:
-        cluster_info = self.cluster_get(cluster_id).to_dict()
+        snapshot = self.get_cluster_snapshot(cluster_id)
         ret = []
         net = IPNetwork(network)
-        hosts_interfaces = self.get_hosts_nics_data([h for h in cluster_info["hosts"] if h["role"] == role])
+        hosts_interfaces = [
+            self._get_nics_data(snapshot.inventories[host["id"]]) for host in snapshot.hosts if host["role"] == role
+        ]
         for host_interfaces in hosts_interfaces:
             for intf in host_interfaces:
                 ip = IPAddress(intf["ip"])
@@ -0,0 +1,241 @@
+import asyncio
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiohttp
+from assisted_service_client import models
+from assisted_service_client.rest import ApiException
+
+import consts
+from service_client.assisted_service_api import InventoryClient
+from service_client.logger import log
+
+
+class _RawResponse:
+    """Minimal stand-in for the swagger RESTResponse, enough for ApiClient.deserialize"""
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+
+class AsyncInventoryClient:
+    """asyncio counterpart of InventoryClient for the read-only and wait parts of its surface.
+
+    Requests are sent with aiohttp over one bounded connection pool, while configuration, authentication
+    (including the SSO token refresh hook) and models deserialization are taken from the given sync client,
+    so both clients always use the same credentials.
+
+    Usage:
+        async with AsyncInventoryClient(client) as async_client:
+            clusters = await asyncio.gather(*[async_client.cluster_get(cid) for cid in cluster_ids])
+    """
+
+    _DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, sync_client: InventoryClient, max_connections: int = consts.HTTP_POOL_MAXSIZE):
+        self._sync_client = sync_client
+        self._api = sync_client.api
+        self._configuration = sync_client.api.configuration
+        self._max_connections = max_connections
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._auth_lock: Optional[asyncio.Lock] = None
+
+    async def __aenter__(self) -> "AsyncInventoryClient":
+        return self
+
+    async def __aexit__(self, *_) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self._max_connections, ssl=self._configuration.verify_ssl)
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._auth_lock = asyncio.Lock()
+        return self._session
+
+    def _sync_auth_params(self) -> Tuple[Dict[str, str], List[Tuple[str, str]]]:
+        # auth_settings() triggers the refresh_api_key_hook of the sync client when the token is about to expire
+        headers, query = dict(self._api.default_headers), []
+        for auth in self._configuration.auth_settings().values():
+            if not auth.get("value"):
+                continue
+            if auth["in"] == "header":
+                headers[auth["key"]] = auth["value"]
+            elif auth["in"] == "query":
+                query.append((auth["key"], auth["value"]))
+        return headers, query
+
+    async def _auth_params(self) -> Tuple[Dict[str, str], List[Tuple[str, str]]]:
+        async with self._auth_lock:
+            return await asyncio.to_thread(self._sync_auth_params)
+
+    @staticmethod
+    def _to_query(params: Optional[Dict[str, Any]]) -> List[Tuple[str, str]]:
+        query = []
+        for key, value in (params or {}).items():
+            if value is None or value == "":
+                continue
+            if isinstance(value, bool):
+                value = str(value).lower()
+            elif isinstance(value, (list, tuple)):
+                # The list parameters of the service (e.g. the events categories, host_ids and severities) are all
+                # declared with collectionFormat csv in the swagger spec
+                value = ",".join(str(v) for v in value)
+            query.append((key, str(value)))
+        return query
+
+    async def _request(
+        self, path: str, params: Optional[Dict[str, Any]] = None, headers: Optional[Dict[str, str]] = None
+    ) -> aiohttp.ClientResponse:
+        session = self._get_session()
+        auth_headers, auth_query = await self._auth_params()
+        url = f"{self._configuration.host}{path}"
+
+        response = await session.get(
+            url, params=self._to_query(params) + auth_query, headers={**auth_headers, **(headers or {})}
+        )
+        if response.status >= 400:
+            body = await response.text()
+            response.release()
+            e = ApiException(status=response.status, reason=response.reason)
+            e.body = body
+            raise e
+        return response
+
+    async def _get(self, path: str, response_type: Optional[str] = None, **kwargs) -> Any:
+        response = await self._request(path, **kwargs)
+        async with response:
+            data = await response.read()
+
+        if response_type is None:
+            return json.loads(data)
+        return self._api.deserialize(_RawResponse(data), response_type)
+
+    async def _download(self, path: str, output_file: str, **kwargs) -> None:
+        response = await self._request(path, **kwargs)
+        async with response:
+            with open(output_file, "wb") as _file:
+                async for chunk in response.content.iter_chunked(self._DOWNLOAD_CHUNK_SIZE):
+                    _file.write(chunk)
+
+    async def clusters_list(self) -> List[Dict[str, Any]]:
+        return await self._get("/v2/clusters")
+
+    async def get_all_clusters(self) -> List[Dict[str, Any]]:
+        return await self._get("/v2/clusters", headers={"get_unregistered_clusters": "true"})
+
+    async def cluster_get(self, cluster_id: str, get_unregistered_clusters: bool = False) -> models.cluster.Cluster:
+        headers = {"get_unregistered_clusters": "true"} if get_unregistered_clusters else None
+        return await self._get(f"/v2/clusters/{cluster_id}", "Cluster", headers=headers)
+
+    async def get_cluster_hosts(self, cluster_id: str, get_unregistered_clusters: bool = False) -> List[Dict[str, Any]]:
+        cluster = await self.cluster_get(cluster_id, get_unregistered_clusters=get_unregistered_clusters)
+        return [host.to_dict() for host in cluster.hosts or []]
+
+    async def infra_envs_list(self) -> List[Dict[str, Any]]:
+        return await self._get("/v2/infra-envs")
+
+    async def get_infra_env(self, infra_env_id: str) -> models.infra_env.InfraEnv:
+        return await self._get(f"/v2/infra-envs/{infra_env_id}", "InfraEnv")
+
+    async def get_infra_env_hosts(self, infra_env_id: str) -> List[Dict[str, Any]]:
+        return await self._get(f"/v2/infra-envs/{infra_env_id}/hosts")
+
+    async def get_infra_envs_by_cluster_id(self, cluster_id: str) -> List[Dict[str, Any]]:
+        return await self._get("/v2/infra-envs", params={"cluster_id": cluster_id})
+
+    async def get_events(
+        self,
+        cluster_id: Optional[str] = "",
+        host_id: Optional[str] = "",
+        infra_env_id: Optional[str] = "",
+        categories=None,
+        **kwargs,
+    ) -> List[Dict[str, str]]:
+        if categories is None:
+            categories = ["user"]
+        params = dict(cluster_id=cluster_id, host_id=host_id, infra_env_id=infra_env_id, categories=categories)
+        return await self._get("/v2/events", params={**params, **kwargs})
+
+    async def download_and_save_file(self, cluster_id: str, file_name: str, file_path: str) -> None:
+        log.info("Downloading %s to %s", file_name, file_path)
+        await self._download(f"/v2/clusters/{cluster_id}/downloads/files", file_path, params={"file_name": file_name})
+
+    async def download_and_save_infra_env_file(self, infra_env_id: str, file_name: str, file_path: str) -> None:
+        log.info(f"Downloading {file_name} to {file_path}")
+        await self._download(
+            f"/v2/infra-envs/{infra_env_id}/downloads/files",
+            os.path.join(file_path, f"{file_name}-{infra_env_id}"),
+            params={"file_name": file_name},
+        )
+
+    async def download_kubeconfig(self, cluster_id: str, kubeconfig_path: str) -> None:
+        log.info("Downloading kubeconfig to %s", kubeconfig_path)
+        await self._download(
+            f"/v2/clusters/{cluster_id}/downloads/credentials", kubeconfig_path, params={"file_name": "kubeconfig"}
+        )
+
+    async def download_host_ignition(self, infra_env_id: str, host_id: str, destination: str) -> None:
+        log.info("Downloading host %s infra_env %s ignition files to %s", host_id, infra_env_id, destination)
+        await self._download(
+            f"/v2/infra-env/{infra_env_id}/hosts/{host_id}/downloads/ignition",
+            os.path.join(destination, f"host_{host_id}.ign"),
+        )
+
+    async def download_cluster_logs(self, cluster_id: str, output_file: str) -> None:
+        log.info("Downloading cluster logs to %s", output_file)
+        await self._download(f"/v2/clusters/{cluster_id}/logs", output_file)
+
+    async def download_host_logs(self, cluster_id: str, host_id: str, output_file: str) -> None:
+        log.info("Downloading host logs to %s", output_file)
+        await self._download(f"/v2/clusters/{cluster_id}/logs", output_file, params={"host_id": host_id})
+
+    async def download_cluster_events(self, cluster_id: str, output_file: str, categories=None) -> None:
+        log.info("Downloading cluster events to %s", output_file)
+        events = await self.get_events(cluster_id, categories=categories)
+        with open(output_file, "wb") as _file:
+            _file.write(json.dumps(events, indent=4).encode())
+
+    async def wait_for_cluster_status(
+        self,
+        cluster_id: str,
+        statuses: List[str],
+        timeout: float = consts.NODES_REGISTERED_TIMEOUT,
+        interval: float = consts.DEFAULT_CHECK_STATUSES_INTERVAL,
+    ) -> models.cluster.Cluster:
+        log.info("Wait till cluster %s is in status %s", cluster_id, statuses)
+        deadline = time.monotonic() + timeout
+        while True:
+            cluster = await self.cluster_get(cluster_id)
+            if cluster.status in statuses:
+                return cluster
+            if time.monotonic() >= deadline:
+                raise TimeoutError(
+                    f"Timeout waiting for cluster {cluster_id} to be in status {statuses}, current: {cluster.status}"
+                )
+            await asyncio.sleep(interval)
+
+    async def wait_for_hosts_status(
+        self,
+        cluster_id: str,
+        nodes_count: int,
+        statuses: List[str],
+        timeout: float = consts.CLUSTER_INSTALLATION_TIMEOUT,
+        interval: float = consts.DEFAULT_CHECK_STATUSES_INTERVAL,
+    ) -> List[Dict[str, Any]]:
+        log.info("Wait till %s nodes of cluster %s are in one of the statuses %s", nodes_count, cluster_id, statuses)
+        deadline = time.monotonic() + timeout
+        while True:
+            hosts = await self.get_cluster_hosts(cluster_id)
+            if len([host for host in hosts if host["status"] in statuses]) >= nodes_count:
+                return hosts
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Timeout waiting for {nodes_count} hosts of {cluster_id} to be in {statuses}")
+            await asyncio.sleep(interval)
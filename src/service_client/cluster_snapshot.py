@@ -0,0 +1,134 @@
+import copy
+import json
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from assisted_service_client import models
+
+EMPTY_INVENTORY = '{"interfaces":[]}'
+
+
+class HostIndex:
+    """Constant time lookups of cluster hosts by MAC address, requested hostname, inventory hostname and id.
+    Built once from a single cluster fetch, MAC addresses are matched case-insensitively."""
+
+    def __init__(self, hosts: List[Dict[str, Any]], inventories: Dict[str, Dict[str, Any]]):
+        self._by_id: Dict[str, Dict[str, Any]] = {}
+        self._by_mac: Dict[str, Dict[str, Any]] = {}
+        self._by_requested_hostname: Dict[str, Dict[str, Any]] = {}
+        self._by_inventory_hostname: Dict[str, Dict[str, Any]] = {}
+
+        # Iterate in reverse so the first matching host wins, same as a linear scan would
+        for host in reversed(hosts):
+            self._by_id[host["id"]] = host
+            if host.get("requested_hostname"):
+                self._by_requested_hostname[host["requested_hostname"]] = host
+
+            inventory = inventories.get(host["id"], {})
+            if inventory.get("hostname"):
+                self._by_inventory_hostname[inventory["hostname"]] = host
+            for interface in inventory.get("interfaces", []):
+                if interface.get("mac_address"):
+                    self._by_mac[interface["mac_address"].lower()] = host
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def by_id(self, host_id: str) -> Optional[Dict[str, Any]]:
+        return self._by_id.get(host_id)
+
+    def by_mac(self, mac: str) -> Optional[Dict[str, Any]]:
+        return self._by_mac.get(mac.lower())
+
+    def by_requested_hostname(self, hostname: str) -> Optional[Dict[str, Any]]:
+        return self._by_requested_hostname.get(hostname)
+
+    def by_inventory_hostname(self, hostname: str) -> Optional[Dict[str, Any]]:
+        return self._by_inventory_hostname.get(hostname)
+
+    def by_name(self, hostname: str) -> Optional[Dict[str, Any]]:
+        """Lookup by requested hostname, falling back to the hostname the host reported in its inventory"""
+        return self.by_requested_hostname(hostname) or self.by_inventory_hostname(hostname)
+
+
+class ClusterSnapshot:
+    """A single cluster fetch, together with its hosts as dicts and their parsed inventories.
+    Hosts and inventories are converted lazily, once per snapshot."""
+
+    def __init__(self, cluster: models.cluster.Cluster, fetched_at: Optional[float] = None):
+        self.cluster = cluster
+        self.fetched_at = time.monotonic() if fetched_at is None else fetched_at
+        self._lock = threading.Lock()
+        self._hosts: Optional[List[Dict[str, Any]]] = None
+        self._inventories: Optional[Dict[str, Dict[str, Any]]] = None
+        self._index: Optional[HostIndex] = None
+
+    def is_expired(self, ttl: float) -> bool:
+        return time.monotonic() - self.fetched_at >= ttl
+
+    @property
+    def hosts(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            if self._hosts is None:
+                self._hosts = [host.to_dict() for host in self.cluster.hosts or []]
+            return self._hosts
+
+    @property
+    def inventories(self) -> Dict[str, Dict[str, Any]]:
+        hosts = self.hosts
+        with self._lock:
+            if self._inventories is None:
+                self._inventories = {host["id"]: json.loads(host.get("inventory") or EMPTY_INVENTORY) for host in hosts}
+            return self._inventories
+
+    @property
+    def index(self) -> HostIndex:
+        hosts, inventories = self.hosts, self.inventories
+        with self._lock:
+            if self._index is None:
+                self._index = HostIndex(hosts, inventories)
+            return self._index
+
+    def copy_hosts(self) -> List[Dict[str, Any]]:
+        # Callers are allowed to modify the returned hosts, the cached ones must stay intact
+        return copy.deepcopy(self.hosts)
+
+
+class ClusterSnapshotCache:
+    """Thread safe cache of ClusterSnapshot objects keyed by cluster id, with a time to live.
+    A ttl of 0 disables caching."""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._snapshots: Dict[Tuple[str, bool], ClusterSnapshot] = {}
+
+    def get(self, cluster_id: str, get_unregistered_clusters: bool = False) -> Optional[ClusterSnapshot]:
+        if self.ttl <= 0:
+            return None
+
+        with self._lock:
+            snapshot = self._snapshots.get((cluster_id, get_unregistered_clusters))
+            if snapshot is None or snapshot.is_expired(self.ttl):
+                return None
+            return snapshot
+
+    def put(
+        self, cluster_id: str, cluster: models.cluster.Cluster, get_unregistered_clusters: bool = False
+    ) -> ClusterSnapshot:
+        snapshot = ClusterSnapshot(cluster)
+        if self.ttl > 0:
+            with self._lock:
+                self._snapshots[(cluster_id, get_unregistered_clusters)] = snapshot
+        return snapshot
+
+    def invalidate(self, cluster_id: Optional[str] = None) -> None:
+        """Drop the snapshots of the given cluster, or of all clusters if cluster_id is not set"""
+        with self._lock:
+            if cluster_id is None:
+                self._snapshots.clear()
+                return
+
+            for key in [key for key in self._snapshots if key[0] == cluster_id]:
+                del self._snapshots[key]
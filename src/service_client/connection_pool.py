@@ -0,0 +1,157 @@
+import ssl
+import threading
+from typing import Dict, Iterable, Optional
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from consts import consts
+from service_client.logger import log
+
+
+class ConnectionPoolStats:
+    """Snapshot of the connection reuse counters of the shared pool.
+    A hit is a request that was served over an already open (kept-alive) connection,
+    a miss is a request that required a new TCP/TLS connection setup."""
+
+    def __init__(self, requests_count: int = 0, connections_count: int = 0):
+        self.requests = requests_count
+        self.connections = connections_count
+
+    @property
+    def hits(self) -> int:
+        return max(self.requests - self.connections, 0)
+
+    @property
+    def misses(self) -> int:
+        return self.connections
+
+    def to_dict(self) -> Dict[str, int]:
+        return {"requests": self.requests, "hits": self.hits, "misses": self.misses}
+
+    def __repr__(self):
+        return f"ConnectionPoolStats(requests={self.requests}, hits={self.hits}, misses={self.misses})"
+
+
+class SharedConnectionPool:
+    """Keep-alive HTTP connection pool shared by all InventoryClient instances of the process.
+
+    Both the swagger generated ApiClient (urllib3 based) and plain `requests` calls (SSO token refresh, metrics)
+    go through pools owned by this object, so connections, and their TLS handshakes, are reused across clients
+    instead of being set up per call. Only idempotent methods are retried on read errors, non-idempotent
+    requests (e.g. POST) are retried only when the connection could not be established at all.
+    """
+
+    def __init__(
+        self,
+        num_pools: int = consts.HTTP_POOL_NUM_POOLS,
+        maxsize: int = consts.HTTP_POOL_MAXSIZE,
+        retries: int = consts.HTTP_POOL_RETRIES,
+        backoff_factor: float = consts.HTTP_POOL_BACKOFF_FACTOR,
+    ):
+        self._num_pools = num_pools
+        self._maxsize = maxsize
+        self._retries = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=0,
+            backoff_factor=backoff_factor,
+            allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+            raise_on_status=False,
+        )
+        self._lock = threading.Lock()
+        self._pool_manager: Optional[urllib3.PoolManager] = None
+        self._session: Optional[requests.Session] = None
+
+    @property
+    def pool_manager(self) -> urllib3.PoolManager:
+        with self._lock:
+            if self._pool_manager is None:
+                log.debug(f"Creating shared urllib3 pool manager with {self._num_pools} pools of {self._maxsize}")
+                self._pool_manager = urllib3.PoolManager(
+                    num_pools=self._num_pools,
+                    maxsize=self._maxsize,
+                    block=False,
+                    retries=self._retries,
+                    cert_reqs=ssl.CERT_NONE,
+                )
+            return self._pool_manager
+
+    @property
+    def session(self) -> requests.Session:
+        with self._lock:
+            if self._session is None:
+                adapter = HTTPAdapter(
+                    pool_connections=self._num_pools, pool_maxsize=self._maxsize, max_retries=self._retries
+                )
+                self._session = requests.Session()
+                self._session.mount("http://", adapter)
+                self._session.mount("https://", adapter)
+            return self._session
+
+    def attach(self, api_client) -> None:
+        """Make a swagger ApiClient send its requests through the shared pool manager"""
+        configuration = api_client.configuration
+        if configuration.proxy:
+            log.debug("Skipping shared connection pool for a proxied api client")
+            return
+
+        api_client.rest_client.pool_manager = self.pool_manager
+
+    @staticmethod
+    def _iter_pools(pool_manager: urllib3.PoolManager) -> Iterable[urllib3.HTTPConnectionPool]:
+        pools = pool_manager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is not None:
+                yield pool
+
+    def stats(self) -> ConnectionPoolStats:
+        stats = ConnectionPoolStats()
+        managers = []
+        with self._lock:
+            if self._pool_manager is not None:
+                managers.append(self._pool_manager)
+            if self._session is not None:
+                managers.extend({id(a.poolmanager): a.poolmanager for a in self._session.adapters.values()}.values())
+
+        for manager in managers:
+            for pool in self._iter_pools(manager):
+                stats.requests += pool.num_requests
+                stats.connections += pool.num_connections
+        return stats
+
+    def clear(self) -> None:
+        with self._lock:
+            if self._pool_manager is not None:
+                self._pool_manager.clear()
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+
+_shared_pool: Optional[SharedConnectionPool] = None
+_shared_pool_lock = threading.Lock()
+
+
+def get_shared_pool() -> SharedConnectionPool:
+    global _shared_pool
+
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = SharedConnectionPool()
+        return _shared_pool
+
+
+def configure_shared_pool(**kwargs) -> SharedConnectionPool:
+    """Replace the process wide pool, e.g. for changing the pool size. Must be called before creating clients"""
+    global _shared_pool
+
+    with _shared_pool_lock:
+        if _shared_pool is not None:
+            _shared_pool.clear()
+        _shared_pool = SharedConnectionPool(**kwargs)
+        return _shared_pool
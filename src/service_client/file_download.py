@@ -0,0 +1,209 @@
+import hashlib
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional
+
+import urllib3
+from urllib3.exceptions import HTTPError as Urllib3HTTPError
+
+from consts import consts
+from service_client.logger import log
+
+HTTP_PARTIAL_CONTENT = 206
+_CONTENT_RANGE_START = re.compile(r"bytes (\d+)-")
+
+# The umask can only be read by replacing it, for the whole process. It is read once, on import, before any worker
+# thread that creates files is started.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+DEFAULT_FILE_MODE = 0o666 & ~_UMASK
+
+
+class DownloadError(Exception):
+    pass
+
+
+# Process wide bound on the number of responses streamed to disk at the same time, whichever pool they come from
+_streams_limiter = threading.BoundedSemaphore(consts.DOWNLOAD_MAX_CONCURRENT_STREAMS)
+
+
+def limit_concurrent_streams(max_streams: int) -> None:
+    """Change the number of downloads that may stream at the same time, must be called before downloading"""
+    global _streams_limiter
+    _streams_limiter = threading.BoundedSemaphore(max_streams)
+
+
+class DownloadResult:
+    def __init__(self, path: str, size: int, sha256: str, resumes: int):
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+        self.resumes = resumes
+
+    def __repr__(self):
+        return f"DownloadResult(path={self.path}, size={self.size}, sha256={self.sha256}, resumes={self.resumes})"
+
+
+def range_header(offset: int) -> dict:
+    return {"Range": f"bytes={offset}-"} if offset else {}
+
+
+def _resumed_at(response: urllib3.HTTPResponse) -> int:
+    # A server that ignores the Range header answers 200 with the whole content
+    if response.status != HTTP_PARTIAL_CONTENT:
+        return 0
+    match = _CONTENT_RANGE_START.match(response.headers.get("Content-Range", ""))
+    return int(match.group(1)) if match else 0
+
+
+def stream_to_file(
+    open_stream: Callable[[int], urllib3.HTTPResponse],
+    destination: str,
+    chunk_size: int = consts.DOWNLOAD_CHUNK_SIZE,
+    max_resumes: int = consts.DOWNLOAD_MAX_RESUMES,
+    expected_sha256: Optional[str] = None,
+) -> DownloadResult:
+    """Stream a response body into destination, chunk by chunk, without holding it in memory.
+
+    open_stream is called with the offset to continue from, and must return an unread (_preload_content=False)
+    urllib3 response, requesting a byte range (see range_header) when the offset is not 0. The content is written
+    into a temporary file next to destination and hashed while written; if the connection drops, the download is
+    resumed from the last written byte. The temporary file is renamed to destination only once it is complete,
+    so destination never holds a partial download. Like a file created with open(), it's readable according to the
+    umask (mkstemp would otherwise leave it readable by its owner only).
+    """
+    with _streams_limiter:
+        return _stream_to_file(open_stream, destination, chunk_size, max_resumes, expected_sha256)
+
+
+def _stream_to_file(
+    open_stream: Callable[[int], urllib3.HTTPResponse],
+    destination: str,
+    chunk_size: int,
+    max_resumes: int,
+    expected_sha256: Optional[str],
+) -> DownloadResult:
+    directory = os.path.dirname(os.path.abspath(destination))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(destination)}.", suffix=".part")
+    digest, offset, resumes = hashlib.sha256(), 0, 0
+
+    try:
+        with os.fdopen(fd, "wb") as _file:
+            os.fchmod(_file.fileno(), DEFAULT_FILE_MODE)
+            while True:
+                response = None
+                try:
+                    # Reconnecting may fail as well, e.g. while the server that dropped the connection restarts
+                    response = open_stream(offset)
+                    if _resumed_at(response) != offset:
+                        log.debug(f"Download of {destination} could not be resumed at {offset}, starting over")
+                        _file.seek(0)
+                        _file.truncate()
+                        digest, offset = hashlib.sha256(), 0
+
+                    for chunk in response.stream(chunk_size):
+                        _file.write(chunk)
+                        digest.update(chunk)
+                        offset += len(chunk)
+                    break
+                except (Urllib3HTTPError, ConnectionError) as e:
+                    if resumes >= max_resumes:
+                        raise DownloadError(f"Download of {destination} failed after {resumes} resumes") from e
+                    resumes += 1
+                    log.warning(f"Download of {destination} was interrupted at {offset} bytes ({e}), resuming")
+                finally:
+                    if response is not None:
+                        response.release_conn()
+
+            _file.flush()
+            os.fsync(_file.fileno())
+
+        sha256 = digest.hexdigest()
+        if expected_sha256 is not None and sha256 != expected_sha256:
+            raise DownloadError(f"Checksum mismatch for {destination}: expected {expected_sha256}, got {sha256}")
+
+        os.replace(temp_path, destination)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    return DownloadResult(destination, offset, sha256, resumes)
+
+
+class DownloadJob:
+    """A file to fetch, download is called with the destination path and is expected to write it"""
+
+    def __init__(self, download: Callable[[str], Any], destination: str):
+        self.download = download
+        self.destination = destination
+
+
+class DownloadJobResult:
+    def __init__(self, destination: str, size: int, duration: float, attempts: int, error: Optional[Exception]):
+        self.destination = destination
+        self.size = size
+        self.duration = duration
+        self.attempts = attempts
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def __repr__(self):
+        return (
+            f"DownloadJobResult(destination={self.destination}, size={self.size}, duration={self.duration:.2f}, "
+            f"attempts={self.attempts}, error={self.error!r})"
+        )
+
+
+def is_retryable(error: Exception) -> bool:
+    # Client errors (e.g. a file that does not exist) won't go away by asking again
+    status = getattr(error, "status", None)
+    if status is not None:
+        return not 400 <= status < 500
+    return isinstance(error, (DownloadError, Urllib3HTTPError, ConnectionError))
+
+
+def _run_download_job(job: DownloadJob, tries: int, backoff: float) -> DownloadJobResult:
+    started = time.monotonic()
+    error = None
+    attempt = 0
+    for attempt in range(1, tries + 1):
+        try:
+            job.download(job.destination)
+            error = None
+            break
+        except Exception as e:
+            error = e
+            if attempt == tries or not is_retryable(e):
+                break
+            # Full jitter keeps concurrent jobs that failed together from retrying in lockstep
+            delay = random.uniform(0, backoff * 2 ** (attempt - 1))
+            log.warning(f"Downloading {job.destination} failed ({e}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+    size = os.path.getsize(job.destination) if error is None and os.path.exists(job.destination) else 0
+    return DownloadJobResult(job.destination, size, time.monotonic() - started, attempt, error)
+
+
+def download_concurrently(
+    jobs: List[DownloadJob],
+    max_workers: int = consts.DOWNLOAD_MAX_WORKERS,
+    tries: int = consts.DOWNLOAD_JOB_TRIES,
+    backoff: float = consts.DOWNLOAD_JOB_BACKOFF,
+) -> List[DownloadJobResult]:
+    """Run the download jobs with at most max_workers in parallel, retrying failed ones with a jittered backoff.
+    A failed job does not affect the others, the results are returned in the order of the jobs"""
+    if not jobs:
+        return []
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(jobs)), thread_name_prefix="download") as executor:
+        futures = [executor.submit(_run_download_job, job, tries, backoff) for job in jobs]
+        return [future.result() for future in futures]
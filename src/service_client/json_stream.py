@@ -0,0 +1,83 @@
+import codecs
+import json
+import textwrap
+from typing import IO, Any, Iterable, Iterator
+
+_WHITESPACE = " \t\n\r"
+_ITEM_END = _WHITESPACE + ",]"
+
+
+def iter_json_array(chunks: Iterable[bytes]) -> Iterator[Any]:
+    """Decode the items of a utf-8 encoded JSON array one at a time, as its chunks arrive, so only the item being
+    decoded is held in memory and never the whole array"""
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer, position, started, after_item, items = "", 0, False, False, 0
+
+    def final_chunks() -> Iterator[bytes]:
+        yield from chunks
+        yield b""
+
+    for chunk in final_chunks():
+        final = not chunk
+        buffer = buffer[position:] + text_decoder.decode(chunk, final=final)
+        position = 0
+
+        while True:
+            while position < len(buffer) and buffer[position] in _WHITESPACE:
+                position += 1
+            if position == len(buffer):
+                break
+
+            char = buffer[position]
+            if not started:
+                if char != "[":
+                    raise json.JSONDecodeError("Expecting '['", buffer, position)
+                started = True
+                position += 1
+            elif char == "]" and (after_item or items == 0):
+                return
+            elif after_item:
+                if char != ",":
+                    raise json.JSONDecodeError("Expecting ',' delimiter", buffer, position)
+                after_item = False
+                position += 1
+            else:
+                try:
+                    item, end = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    if final:
+                        raise
+                    break  # The item continues in the next chunk
+
+                # A number may continue in the next chunk as well, an item is only complete once what follows it is
+                if not final and (end == len(buffer) or buffer[end] not in _ITEM_END):
+                    break
+                yield item
+                position, after_item, items = end, True, items + 1
+
+    raise json.JSONDecodeError("Unterminated array", buffer, position)
+
+
+class JsonArrayWriter:
+    """Writes items one at a time into the same text json.dump(items, f, indent=4) would produce"""
+
+    def __init__(self, output: IO[str]):
+        self._output = output
+        self.count = 0
+
+    def __enter__(self) -> "JsonArrayWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        # An interrupted array is left unterminated, so it's not mistaken for a complete one
+        if exc_type is None:
+            self.close()
+
+    def write(self, item: Any) -> None:
+        self._output.write("[\n" if self.count == 0 else ",\n")
+        self._output.write(textwrap.indent(json.dumps(item, indent=4), "    ", lambda _: True))
+        self.count += 1
+
+    def close(self) -> None:
+        self._output.write("\n]" if self.count else "[]")
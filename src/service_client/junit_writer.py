@@ -0,0 +1,180 @@
+import datetime
+import re
+import shutil
+import tempfile
+from io import StringIO
+from pathlib import Path
+from typing import IO, Dict, Iterable, List, Optional
+from xml.dom import minidom
+from xml.etree import ElementTree
+from xml.sax.saxutils import quoteattr
+
+from junit_report import JsonJunitExporter
+from junit_report.utils import Utils
+from junit_xml import TestCase, TestSuite
+
+# Same ranges junit_xml strips out of the whole report, compiled once as the cases are cleaned one by one
+_ILLEGAL_XML_CHARS = re.compile(
+    "[%s]"
+    % "".join(
+        f"{chr(low)}-{chr(high)}"
+        for low, high in (
+            (0x00, 0x08),
+            (0x0B, 0x1F),
+            (0x7F, 0x84),
+            (0x86, 0x9F),
+            (0xD800, 0xDFFF),
+            (0xFDD0, 0xFDDF),
+            (0xFFFE, 0xFFFF),
+            *((plane + 0xFFFE, plane + 0xFFFF) for plane in range(0x10000, 0x110000, 0x10000)),
+        )
+    )
+)
+
+_SPOOL_MAX_SIZE = 16 * 1024**2
+_COPY_CHUNK_SIZE = 1024**2
+
+
+def _attributes(attributes: Dict[str, str]) -> str:
+    return "".join(f" {key}={quoteattr(_ILLEGAL_XML_CHARS.sub('', value))}" for key, value in attributes.items())
+
+
+def _case_xml(case: TestCase) -> str:
+    # junit_xml builds the element of a case the same way whether the suite has one case or many, then pretty prints
+    # the whole report with minidom. The case is pretty printed alone, at the depth it has in the report.
+    element = TestSuite(name="", test_cases=[case]).build_xml_doc().find("testcase")
+    case_xml = _ILLEGAL_XML_CHARS.sub("", ElementTree.tostring(element, encoding="unicode"))
+    document, output = minidom.parseString(case_xml.encode()), StringIO()
+    document.documentElement.writexml(output, indent="\t\t", addindent="\t", newl="\n")
+    # Break the cycles between the nodes, the garbage collector would only reclaim them every so many cases
+    document.unlink()
+    return output.getvalue()
+
+
+class JunitSuiteWriter:
+    """
+    Writes the test cases of a single suite, one by one, as they are added.
+    The suite element carries the counts of its cases, so the cases are
+    spooled into a temporary file (kept in memory while small) and copied
+    after the suite element once the suite is closed.
+    """
+
+    def __init__(self, name: str, timestamp: Optional[str] = None, first_case_timestamp: bool = False):
+        self.name = name
+        self.timestamp = timestamp
+        self._first_case_timestamp = first_case_timestamp
+        self.tests = 0
+        self.disabled = 0
+        self.errors = 0
+        self.failures = 0
+        self.skipped = 0
+        self.time = 0
+        self._cases = tempfile.SpooledTemporaryFile(max_size=_SPOOL_MAX_SIZE, mode="w+", encoding="utf-8")
+
+    def add(self, case: TestCase) -> None:
+        if self.tests == 0 and self._first_case_timestamp and self.timestamp is None:
+            self.timestamp = case.timestamp
+
+        self._cases.write(_case_xml(case))
+        self.tests += 1
+        self.disabled += not case.is_enabled
+        self.errors += case.is_error()
+        self.failures += case.is_failure()
+        self.skipped += case.is_skipped()
+        if case.elapsed_sec:
+            self.time += case.elapsed_sec
+
+    def add_all(self, cases: Iterable[TestCase]) -> None:
+        for case in cases:
+            self.add(case)
+
+    def write_to(self, output: IO[str]) -> None:
+        attributes = {
+            "disabled": str(self.disabled),
+            "errors": str(self.errors),
+            "failures": str(self.failures),
+            "name": self.name,
+            "skipped": str(self.skipped),
+            "tests": str(self.tests),
+            "time": str(self.time),
+        }
+        if self.timestamp:
+            attributes["timestamp"] = str(self.timestamp)
+
+        output.write(f"\t<testsuite{_attributes(attributes)}>\n")
+        self._cases.seek(0)
+        shutil.copyfileobj(self._cases, output, _COPY_CHUNK_SIZE)
+        output.write("\t</testsuite>\n")
+        self._cases.close()
+
+
+class JunitStreamWriter:
+    """
+    Streaming replacement of junit_xml.to_xml_report_string. Cases are
+    serialized as soon as they are added instead of building the object graph
+    of the whole report, so memory does not grow with the number of cases.
+
+        with JunitStreamWriter(path) as writer:
+            writer.suite("assisted-logs").add_all(cases)
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._suites: List[JunitSuiteWriter] = []
+
+    def __enter__(self) -> "JunitStreamWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            for suite in self._suites:
+                suite._cases.close()
+
+    def suite(self, name: str, timestamp: Optional[str] = None, first_case_timestamp: bool = False) -> JunitSuiteWriter:
+        """Add a suite, if first_case_timestamp is set a suite without a timestamp takes the one of its first case"""
+        suite = JunitSuiteWriter(name, timestamp, first_case_timestamp)
+        self._suites.append(suite)
+        return suite
+
+    def close(self) -> None:
+        attributes = {
+            key: str(sum(getattr(suite, key) for suite in self._suites))
+            for key in ("disabled", "errors", "failures", "tests")
+        }
+        attributes["time"] = str(float(sum(suite.time for suite in self._suites)))
+        with open(self.path, "w", encoding="utf-8") as output:
+            output.write('<?xml version="1.0" ?>\n')
+            output.write(f"<testsuites{_attributes(attributes)}>\n")
+            for suite in self._suites:
+                suite.write_to(output)
+            output.write("</testsuites>\n")
+
+
+class StreamingJsonJunitExporter(JsonJunitExporter):
+    """JsonJunitExporter that writes the cases of the entries one at a time instead of building the whole report"""
+
+    def collect(
+        self,
+        entries: Iterable[Dict[str, str]],
+        suite_name: str,
+        report_dir: Optional[Path] = None,
+        xml_suffix: str = "",
+    ) -> str:
+        report_dir = Utils.get_report_dir(report_dir)
+        report_dir.mkdir(exist_ok=True)
+        report_path = report_dir.joinpath(
+            f"{self._report_prefix}_{suite_name}{f'_{xml_suffix}' if xml_suffix else ''}.xml"
+        )
+
+        with JunitStreamWriter(report_path) as writer:
+            suite = writer.suite(suite_name, first_case_timestamp=True)
+            for entry in entries:
+                test_case = self._get_test_case(entry, entry.get(self._format.severity_key, None))
+                if test_case is not None:
+                    suite.add(test_case)
+            if suite.timestamp is None:
+                suite.timestamp = str(datetime.datetime.now())
+
+        return str(report_path)
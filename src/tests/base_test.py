@@ -37,6 +37,7 @@ from assisted_test_infra.test_infra.controllers import (
 )
 from assisted_test_infra.test_infra.controllers.node_controllers.kvm_s390x_controller import KVMs390xController
 from assisted_test_infra.test_infra.controllers.node_controllers.libvirt_controller import collect_virsh_logs
+from assisted_test_infra.test_infra.controllers.node_controllers.node_pool import NodePool
 from assisted_test_infra.test_infra.helper_classes import kube_helpers
 from assisted_test_infra.test_infra.helper_classes.cluster import Cluster, get_supported_cluster_platforms
 from assisted_test_infra.test_infra.helper_classes.config import BaseConfig, BaseNodesConfig
@@ -447,6 +448,16 @@ class BaseTest:
     def infraenv_nodes(self, infraenv_controller: NodeController) -> Nodes:
         return Nodes(infraenv_controller)
 
+    @pytest.fixture
+    def node_pool(self) -> NodePool:
+        """Pre-defined libvirt domains to lease, the ones still leased by the test are returned on teardown"""
+        pool = NodePool(libvirt_uri=global_variables.libvirt_uri)
+        try:
+            yield pool
+        finally:
+            pool.release_owned()
+            pool.close()
+
     @pytest.fixture
     @JunitFixtureTestCase()
     def prepare_nodes(self, nodes: Nodes, cluster_configuration: ClusterConfig) -> Nodes:
@@ -640,7 +651,17 @@ class BaseTest:
     @pytest.fixture
     @JunitFixtureTestCase()
     def prepared_cluster(self, cluster):
-        cluster.prepare_for_installation()
+        # A cluster that is reused (e.g. by setting CLUSTER_ID) gets its nodes back from the snapshot captured by a
+        # previous run, instead of preparing them again
+        disk_snapshots = global_variables.cluster_disk_snapshots and isinstance(
+            cluster.nodes.controller, LibvirtController
+        )
+        if disk_snapshots and cluster.restore_disk_snapshot(consts.ClusterDiskSnapshotPhase.DISCOVERED):
+            cluster.wait_for_ready_to_install()
+        else:
+            cluster.prepare_for_installation()
+            if disk_snapshots:
+                cluster.capture_disk_snapshot(consts.ClusterDiskSnapshotPhase.DISCOVERED)
         yield cluster
 
     @classmethod
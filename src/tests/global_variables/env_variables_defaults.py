@@ -100,6 +100,9 @@ class _EnvVariables(DataPool, ABC):
     test_teardown: EnvVar = EnvVar(
         ["TEST_TEARDOWN"], loader=lambda x: bool(strtobool(x)), default=env_defaults.DEFAULT_TEST_TEARDOWN
     )
+    cluster_disk_snapshots: EnvVar = EnvVar(
+        ["CLUSTER_DISK_SNAPSHOTS"], loader=lambda x: bool(strtobool(x)), default=False
+    )
 
     namespace: EnvVar = EnvVar(["NAMESPACE"], default=consts.DEFAULT_NAMESPACE)
     configmap: EnvVar = EnvVar(["CONFIGMAP"], default=consts.DEFAULT_CONFIGMAP)
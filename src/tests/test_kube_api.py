@@ -347,20 +347,20 @@ class TestKubeAPI(BaseKubeAPI):
             expected_exceptions=Exception,
         )
         hypershift.wait_for_control_plane_ready()
-        self.set_node_count_and_wait_for_ready_nodes(cluster_deployment, hypershift, spoke_namespace, node_count=1)
-        self.set_node_count_and_wait_for_ready_nodes(cluster_deployment, hypershift, spoke_namespace, node_count=2)
-        self.scale_down_nodepool_and_wait_for_unbounded_agent(
-            cluster_deployment, hypershift, spoke_namespace, node_count=1
-        )
+        self.set_node_count_and_wait_for_ready_nodes(cluster_deployment, hypershift, infra_env, node_count=1)
+        self.set_node_count_and_wait_for_ready_nodes(cluster_deployment, hypershift, infra_env, node_count=2)
+        self.scale_down_nodepool_and_wait_for_unbounded_agent(cluster_deployment, hypershift, infra_env, node_count=1)
 
     @classmethod
     def set_node_count_and_wait_for_ready_nodes(
-        cls, cluster_deployment: ClusterDeployment, hypershift: HyperShift, spoke_namespace: str, node_count: int
+        cls, cluster_deployment: ClusterDeployment, hypershift: HyperShift, infra_env: InfraEnv, node_count: int
     ):
         log.info("Setting node count to %s", node_count)
         hypershift.set_nodepool_replicas(node_count)
         log.info("waiting for capi provider to set clusterDeployment ref on the agent")
-        agents = cluster_deployment.wait_for_agents(node_count, agents_namespace=spoke_namespace)
+        agents = cluster_deployment.wait_for_agents(
+            node_count, agents_namespace=infra_env.ref.namespace, label_selector=infra_env.agents_label_selector
+        )
         log.info("Waiting for agents status verification")
         Agent.wait_for_agents_to_install(agents)
         log.info("Waiting for node to join the cluster")
@@ -370,13 +370,15 @@ class TestKubeAPI(BaseKubeAPI):
 
     @classmethod
     def scale_down_nodepool_and_wait_for_unbounded_agent(
-        cls, cluster_deployment: ClusterDeployment, hypershift: HyperShift, spoke_namespace: str, node_count: int
+        cls, cluster_deployment: ClusterDeployment, hypershift: HyperShift, infra_env: InfraEnv, node_count: int
     ):
-        agents = cluster_deployment.list_agents()
+        agents = cluster_deployment.list_agents(label_selector=infra_env.agents_label_selector)
         log.info("Setting node count to %s", node_count)
         hypershift.set_nodepool_replicas(node_count)
         log.info("waiting for capi provider to remove clusterDeployment ref from the agent")
-        updated_agents = cluster_deployment.wait_for_agents(node_count, agents_namespace=spoke_namespace)
+        updated_agents = cluster_deployment.wait_for_agents(
+            node_count, agents_namespace=infra_env.ref.namespace, label_selector=infra_env.agents_label_selector
+        )
         removed_agent = set(agents) - set(updated_agents)
         log.info("Agent: {} removed")
         log.info("Waiting for agent to unbind")
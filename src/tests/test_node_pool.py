@@ -0,0 +1,37 @@
+import pytest
+from junit_report import JunitTestSuite
+
+from assisted_test_infra.test_infra.controllers.node_controllers import NodePool, NodeShape
+from assisted_test_infra.test_infra.helper_classes.config import BaseNodesConfig
+from consts import consts
+from service_client import log
+from tests.base_test import BaseTest
+from tests.config import global_variables
+
+
+class TestNodePool(BaseTest):
+    @pytest.fixture
+    def pooled_nodes_override_nodes_count(self, prepared_controller_configuration: BaseNodesConfig):
+        """The nodes are leased from the node pool, terraform only creates the network they are attached to"""
+        prepared_controller_configuration.masters_count = 0
+        prepared_controller_configuration.workers_count = 0
+        yield prepared_controller_configuration
+
+    @JunitTestSuite()
+    @pytest.mark.override_controller_configuration(pooled_nodes_override_nodes_count.__name__)
+    def test_pooled_nodes_are_discovered(self, cluster, node_pool: NodePool):
+        nodes_count = global_variables.masters_count + global_variables.workers_count
+        iso_path = cluster.generate_and_download_infra_env()
+        cluster.nodes.prepare_nodes()
+
+        shape = NodeShape(
+            vcpus=global_variables.master_vcpu,
+            ram_mib=global_variables.master_memory,
+            disk_size_gib=global_variables.master_disk // consts.GB,
+            network_name=cluster.nodes.controller.network_name,
+        )
+        for name in node_pool.acquire(shape, nodes_count, str(iso_path)):
+            node_pool.connection.lookupByName(name).create()
+
+        cluster.wait_until_hosts_are_discovered(nodes_count=nodes_count, allow_insufficient=True)
+        log.info(f"Node pool: {node_pool.accounting()}, {node_pool.hits} hits and {node_pool.misses} misses")
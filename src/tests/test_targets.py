@@ -8,6 +8,7 @@ from assisted_service_client import PlatformType
 from junit_report import JunitTestSuite
 
 from assisted_test_infra.test_infra import ClusterName
+from assisted_test_infra.test_infra.controllers.node_controllers import NodePool
 from assisted_test_infra.test_infra.helper_classes.cluster import Cluster
 from assisted_test_infra.test_infra.helper_classes.config import BaseNodesConfig
 from consts import consts
@@ -53,6 +54,10 @@ class TestMakefileTargets(BaseTest):
     def test_target_download_iso(self, cluster):
         cluster.download_image()
 
+    @JunitTestSuite()
+    def test_target_drain_node_pool(self, node_pool: NodePool):
+        node_pool.drain()
+
     @JunitTestSuite()
     def test_target_download_ipxe_script(self, cluster):
         cluster.download_ipxe_script()
@@ -0,0 +1,60 @@
+import random
+from pathlib import Path
+
+FUNCS = [f"github.com/openshift/assisted-service/internal/host.(*Manager).Func{i}" for i in range(40)]
+MESSAGES = [
+    "failed to refresh host status",
+    'host "worker-0" is not ready',
+    "can't reach the api vip 192.168.127.100",
+    "disk /dev/vda is too small, requires at least 100 GiB",
+    "unexpected ünicode ñame in inventory",
+    "validation <ntp-synced> & friends failed",
+]
+
+
+def _service_line(rng: random.Random, index: int) -> str:
+    level = rng.choices(["info", "debug", "warning", "error", "fatal"], weights=[60, 20, 10, 9, 1])[0]
+    func = rng.choice(FUNCS)
+    line = (
+        f'time="2026-10-17T10:{index // 60 % 60:02d}:{index % 60:02d}Z" level={level} '
+        f'msg="{rng.choice(MESSAGES)} ({index % 7})" func={func} file="/go/src/host/host.go:{rng.randint(1, 999)}"'
+    )
+    if level in ("error", "fatal") and rng.random() < 0.5:
+        line += f' error="{rng.choice(MESSAGES)}"'
+    return line
+
+
+def _leader_election_line(rng: random.Random, index: int) -> str:
+    level = rng.choice("IEW")
+    return (
+        f"{level}1017 10:{index // 60 % 60:02d}:{index % 60:02d}.000000       1 "
+        f"leaderelection.go:{rng.randint(1, 400)}] {rng.choice(MESSAGES)}"
+    )
+
+
+def iter_service_log_lines(seed: int = 0) -> str:
+    rng = random.Random(seed)
+    index = 0
+    while True:
+        index += 1
+        kind = rng.random()
+        if kind < 0.9:
+            line = _service_line(rng, index)
+        elif kind < 0.97:
+            line = _leader_election_line(rng, index)
+        else:
+            line = "panic: runtime error: invalid memory address"
+        # Also old mac style line endings, a lone carriage return ends a line when the log is read in text mode
+        yield line + ("\r" if rng.random() < 0.01 else "\n")
+
+
+def write_service_log(path: Path, size: int, seed: int = 0) -> Path:
+    """Write a synthetic assisted-service log of about size bytes"""
+    written = 0
+    with open(path, "w", newline="") as f:
+        for line in iter_service_log_lines(seed):
+            f.write(line)
+            written += len(line)
+            if written >= size:
+                break
+    return path
@@ -0,0 +1,194 @@
+import json
+import random
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+import pytest
+
+pytest.importorskip("libvirt")
+
+from netaddr import IPAddress, IPNetwork  # noqa: E402
+
+import consts  # noqa: E402
+from assisted_test_infra.test_infra.tools.assets import LibvirtNetworkAssets, _AddressRanges  # noqa: E402
+from service_client import log  # noqa: E402
+
+BASE_ASSET = {
+    "machine_cidr": "192.168.127.0/24",
+    "machine_cidr6": "1001:db9::/120",
+    "provisioning_cidr": "192.168.145.0/24",
+    "provisioning_cidr6": "3001:db9::/120",
+    "libvirt_network_if": "tt0",
+    "libvirt_secondary_network_if": "stt0",
+}
+
+
+def _ranges(ranges: _AddressRanges) -> List[Tuple[int, int]]:
+    return list(zip(ranges._firsts, ranges._lasts))
+
+
+@pytest.mark.parametrize(
+    "added, expected",
+    [
+        ([(10, 20), (30, 40)], [(10, 20), (30, 40)]),
+        # Adjacent on either side
+        ([(10, 20), (21, 30)], [(10, 30)]),
+        ([(21, 30), (10, 20)], [(10, 30)]),
+        # Overlapping, contained and containing
+        ([(10, 20), (15, 25)], [(10, 25)]),
+        ([(10, 20), (12, 18)], [(10, 20)]),
+        ([(12, 18), (10, 20)], [(10, 20)]),
+        ([(10, 20), (10, 20)], [(10, 20)]),
+        # Spanning several ranges and the gaps between them
+        ([(10, 20), (30, 40), (50, 60), (15, 55)], [(10, 60)]),
+        ([(10, 20), (30, 40), (50, 60), (21, 49)], [(10, 60)]),
+        ([(10, 20), (30, 40), (50, 60), (22, 28)], [(10, 20), (22, 28), (30, 40), (50, 60)]),
+        # Single addresses
+        ([(5, 5), (7, 7), (6, 6)], [(5, 7)]),
+        ([(0, 0), (2**128 - 1, 2**128 - 1)], [(0, 0), (2**128 - 1, 2**128 - 1)]),
+    ],
+)
+def test_add_merges_ranges(added, expected):
+    ranges = _AddressRanges()
+    for first, last in added:
+        ranges.add(first, last)
+    assert _ranges(ranges) == expected
+
+
+def test_ranges_match_a_set_of_addresses():
+    rng = random.Random(0)
+    for _ in range(200):
+        ranges = _AddressRanges()
+        taken = set()
+        for _ in range(rng.randint(1, 30)):
+            first = rng.randrange(200)
+            last = first + rng.randrange(10)
+            ranges.add(first, last)
+            taken.update(range(first, last + 1))
+
+        # Sorted, disjoint and not adjacent
+        pairs = _ranges(ranges)
+        assert all(first <= last for first, last in pairs)
+        assert all(previous[1] + 1 < current[0] for previous, current in zip(pairs, pairs[1:]))
+        assert {address for first, last in pairs for address in range(first, last + 1)} == taken
+
+        for _ in range(20):
+            first = rng.randrange(220)
+            last = first + rng.randrange(10)
+            overlapping = ranges.overlapping_last(first, last)
+            if taken.isdisjoint(range(first, last + 1)):
+                assert overlapping is None
+            else:
+                assert overlapping is not None and overlapping in taken and overlapping + 1 not in taken
+                assert any(first <= address <= last for address in range(overlapping, -1, -1) if address in taken)
+
+
+@pytest.fixture
+def assets_file(tmp_path: Path) -> Path:
+    return tmp_path / "tf_network_pool.json"
+
+
+@pytest.fixture
+def leases(monkeypatch) -> list:
+    """The addresses leased by libvirt networks, and the ones of the host interfaces"""
+    addresses = []
+
+    def fill_virsh_allocated_ips_and_bridges(assets: LibvirtNetworkAssets):
+        for address in addresses:
+            assets._add_allocated_ip(IPAddress(address))
+
+    monkeypatch.setattr(
+        LibvirtNetworkAssets, "_fill_virsh_allocated_ips_and_bridges", fill_virsh_allocated_ips_and_bridges
+    )
+    monkeypatch.setattr(LibvirtNetworkAssets, "_fill_allocated_ips_and_bridges_by_interface", lambda assets: None)
+    return addresses
+
+
+def _assets(assets_file: Path) -> LibvirtNetworkAssets:
+    return LibvirtNetworkAssets(
+        assets_file=str(assets_file), lock_file=f"{assets_file}.lock", base_asset=BASE_ASSET, libvirt_uri="test:///"
+    )
+
+
+def _assert_disjoint(networks: List[IPNetwork]) -> None:
+    for version in (4, 6):
+        ranges = sorted((network.first, network.last) for network in networks if network.version == version)
+        assert all(previous[1] < current[0] for previous, current in zip(ranges, ranges[1:]))
+
+
+def test_assets_never_overlap(assets_file: Path, leases: list):
+    leases.extend(["192.168.127.10", "192.168.129.200", "1001:db9::20"])
+    assets = [_assets(assets_file).get() for _ in range(50)]
+
+    networks = [IPNetwork(asset[field]) for asset in assets for field in consts.IP_NETWORK_ASSET_FIELDS]
+    _assert_disjoint(networks)
+    assert not any(IPAddress(lease) in network for lease in leases for network in networks)
+    bridges = {asset.libvirt_network_if for asset in assets} | {asset.libvirt_secondary_network_if for asset in assets}
+    assert len(bridges) == 100
+
+
+def test_released_assets_are_taken_again(assets_file: Path, leases: list):
+    first = _assets(assets_file)
+    taken = first.get()
+    second = _assets(assets_file).get()
+    first.release_all()
+
+    assert _assets(assets_file).get() == taken
+    assert json.loads(assets_file.read_text()) == [second, taken]
+
+
+def test_candidate_nested_in_an_allocated_network_is_skipped(assets_file: Path, leases: list):
+    # A /16 asset of another run contains the base /24 networks
+    assets_file.write_text(json.dumps([{**BASE_ASSET, "machine_cidr": "192.168.0.0/16"}]))
+    asset = _assets(assets_file).get()
+
+    assert IPNetwork(asset.machine_cidr) == IPNetwork("192.169.0.0/24")
+
+
+def _linear_next_available_ip_network(allocated: List[Tuple[int, int]], ip_network: IPNetwork) -> IPNetwork:
+    """Steps one network at a time, checking the candidate against every allocated range, like the assets used to"""
+    step = LibvirtNetworkAssets._ip_network_step(ip_network)
+    first = ip_network.first
+    while any(first <= last and taken_first <= first + ip_network.size - 1 for taken_first, last in allocated):
+        first += step
+    return IPNetwork(f"{IPAddress(first, ip_network.version)}/{ip_network.prefixlen}")
+
+
+def test_allocation_benchmark():
+    rng = random.Random(0)
+    assets = _assets(Path("/nonexistent"))
+    allocated = {4: [], 6: []}
+    # Scattered leases, as on a host that runs many clusters
+    for _ in range(200):
+        lease = IPAddress(int(IPNetwork("192.168.0.0/16").first) + rng.randrange(2**16))
+        assets._add_allocated_ip(lease)
+        allocated[4].append((int(lease), int(lease)))
+
+    candidates = [IPNetwork(BASE_ASSET[field]) for field in consts.IP_NETWORK_ASSET_FIELDS]
+    started = time.monotonic()
+    taken = []
+    for i in range(1000):
+        network = assets._next_available_ip_network(candidates[i % len(candidates)])
+        assets._add_allocated_ip(network)
+        taken.append(network)
+        if i == 199:
+            prefix_duration = time.monotonic() - started
+    duration = time.monotonic() - started
+
+    _assert_disjoint(taken)
+    # The linear search is compared on a prefix of the allocations only, it's quadratic
+    reference = []
+    started = time.monotonic()
+    for i in range(200):
+        network = _linear_next_available_ip_network(allocated[candidates[i % 4].version], candidates[i % 4])
+        allocated[network.version].append((network.first, network.last))
+        reference.append(network)
+    reference_duration = time.monotonic() - started
+
+    log.info(
+        f"1000 allocations took {duration:.3f}s with the ranges, the first 200 took {reference_duration:.3f}s with a "
+        f"linear search"
+    )
+    assert taken[:200] == reference
+    assert prefix_duration < reference_duration
@@ -0,0 +1,110 @@
+import asyncio
+import collections
+import time
+import uuid
+from types import SimpleNamespace
+from unittest import mock
+
+import aiohttp
+from aiohttp import web
+from assisted_service_client import ApiClient, Configuration
+
+from service_client.async_assisted_service_api import AsyncInventoryClient
+
+
+def test_to_query_joins_lists_as_csv():
+    query = AsyncInventoryClient._to_query(
+        {"cluster_id": "c", "host_id": "", "categories": ["user", "metrics"], "get_unregistered_clusters": True}
+    )
+    assert query == [("cluster_id", "c"), ("categories", "user,metrics"), ("get_unregistered_clusters", "true")]
+
+
+def test_get_cluster_hosts_of_cluster_without_hosts():
+    sync_client = SimpleNamespace(api=SimpleNamespace(configuration=None))
+    client = AsyncInventoryClient(sync_client)
+    with mock.patch.object(client, "cluster_get", mock.AsyncMock(return_value=SimpleNamespace(hosts=None))):
+        assert asyncio.run(client.get_cluster_hosts("cluster-id")) == []
+
+
+class FakeService:
+    """Serves the clusters, each of them installed once it was polled a few times"""
+
+    def __init__(self, polls_to_install: int, delay: float):
+        self.polls_to_install = polls_to_install
+        self.delay = delay
+        self.polls = collections.Counter()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.connections = set()
+
+    async def get_cluster(self, request: web.Request) -> web.Response:
+        cluster_id = request.match_info["cluster_id"]
+        self.connections.add(request.transport.get_extra_info("peername"))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+
+        self.polls[cluster_id] += 1
+        status = "installed" if self.polls[cluster_id] >= self.polls_to_install else "installing"
+        return web.json_response(
+            {
+                "id": cluster_id,
+                "kind": "Cluster",
+                "href": f"/api/assisted-install/v2/clusters/{cluster_id}",
+                "image_info": {},
+                "status": status,
+                "status_info": status,
+                "hosts": [],
+            }
+        )
+
+
+def test_concurrent_polls_share_a_bounded_session():
+    service = FakeService(polls_to_install=3, delay=0.02)
+    cluster_ids = [str(uuid.UUID(int=i)) for i in range(100)]
+    sessions = []
+    client_session = aiohttp.ClientSession
+
+    def counting_client_session(*args, **kwargs) -> aiohttp.ClientSession:
+        sessions.append(client_session(*args, **kwargs))
+        return sessions[-1]
+
+    async def poll_all():
+        app = web.Application()
+        app.router.add_get("/v2/clusters/{cluster_id}", service.get_cluster)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        try:
+            port = site._server.sockets[0].getsockname()[1]
+            configuration = Configuration()
+            configuration.host = f"http://127.0.0.1:{port}"
+            sync_client = SimpleNamespace(api=ApiClient(configuration))
+
+            async with AsyncInventoryClient(sync_client, max_connections=10) as client:
+                return await asyncio.gather(
+                    *[
+                        client.wait_for_cluster_status(cid, ["installed"], timeout=60, interval=0.01)
+                        for cid in cluster_ids
+                    ]
+                )
+        finally:
+            await runner.cleanup()
+
+    with mock.patch.object(aiohttp, "ClientSession", counting_client_session):
+        started = time.monotonic()
+        clusters = asyncio.run(poll_all())
+        duration = time.monotonic() - started
+
+    assert [cluster.id for cluster in clusters] == cluster_ids
+    assert all(cluster.status == "installed" for cluster in clusters)
+    assert set(service.polls.values()) == {3}
+    assert len(sessions) == 1
+    assert service.max_in_flight == 10
+    assert len(service.connections) <= 10
+    # 300 requests of 20ms each, 10 at a time
+    assert duration < 300 * service.delay / 2
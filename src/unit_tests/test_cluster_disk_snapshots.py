@@ -0,0 +1,231 @@
+import json
+import os
+from pathlib import Path
+from typing import Dict
+from xml.etree.ElementTree import SubElement, fromstring, tostring
+
+import pytest
+
+libvirt = pytest.importorskip("libvirt")
+
+from assisted_test_infra.test_infra import utils  # noqa: E402
+from assisted_test_infra.test_infra.controllers.node_controllers import cluster_disk_snapshots  # noqa: E402
+from assisted_test_infra.test_infra.controllers.node_controllers.cluster_disk_snapshots import (  # noqa: E402
+    ClusterDiskSnapshots,
+)
+
+VERSIONS = {"service": {"assisted-installer-service": "v2.40.0"}, "openshift_version": "4.19"}
+METADATA = {"cluster_id": "11111111-1111-1111-1111-111111111111", "status": "ready", "host_ids": []}
+
+# Stands for qemu-img, an image is a JSON file with the content written to it and the image it's backed by
+FAKE_QEMU_IMG = """#!/usr/bin/env python3
+import json, os, sys
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+def content(path):
+    image = load(path)
+    return image["content"] if image["content"] is not None else content(image["backing"])
+
+def save(path, image):
+    with open(path, "w") as f:
+        json.dump(image, f)
+
+args = sys.argv[1:]
+if args[0] == "create":
+    save(args[-1], {"backing": args[args.index("-b") + 1], "content": None})
+elif args[0] == "convert":
+    save(args[-1], {"backing": None, "content": content(args[-2])})
+elif args[0] == "info":
+    chain, path = [], args[-1]
+    while path:
+        if not os.path.exists(path):
+            sys.exit(f"Could not open '{path}'")
+        chain.append({"filename": path})
+        path = load(path)["backing"]
+    print(json.dumps(chain))
+"""
+
+
+def _write_disk(path: str, content: str, backing: str = None) -> None:
+    Path(path).write_text(json.dumps({"backing": backing, "content": content}))
+
+
+def _read_disk(path: str) -> str:
+    image = json.loads(Path(path).read_text())
+    return image["content"] if image["content"] is not None else _read_disk(image["backing"])
+
+
+class FakeDomain:
+    def __init__(self, connection: "FakeConnection", xml: str):
+        self._connection = connection
+        self.xml = xml
+        self.active = True
+
+    def name(self) -> str:
+        return fromstring(self.xml).find("name").text
+
+    def XMLDesc(self, flags: int) -> str:  # noqa: N802
+        return self.xml
+
+    def isActive(self) -> bool:  # noqa: N802
+        return self.active
+
+    def destroy(self) -> None:
+        self.active = False
+
+    def create(self) -> None:
+        self.active = True
+
+    @property
+    def disk(self) -> str:
+        return fromstring(self.xml).find("./devices/disk[@device='disk']/source").get("file")
+
+    def snapshotCreateXML(self, xml: str, flags: int) -> None:  # noqa: N802
+        root = fromstring(self.xml)
+        for disk in fromstring(xml).findall("./disks/disk[@snapshot='external']"):
+            overlay = disk.find("source").get("file")
+            source = root.find(f"./devices/disk/target[@dev='{disk.get('name')}']/../source")
+            utils.run_command(f"qemu-img create -f qcow2 -F qcow2 -b {source.get('file')} {overlay}", shell=True)
+            source.set("file", overlay)
+        self.xml = tostring(root, encoding="unicode")
+
+
+class FakeConnection:
+    def __init__(self):
+        self.domains: Dict[str, FakeDomain] = {}
+
+    def listAllDomains(self):  # noqa: N802
+        return list(self.domains.values())
+
+    def lookupByName(self, name: str) -> FakeDomain:  # noqa: N802
+        if name not in self.domains:
+            raise libvirt.libvirtError(f"Domain not found: no domain with matching name '{name}'")
+        return self.domains[name]
+
+    def defineXML(self, xml: str) -> FakeDomain:  # noqa: N802
+        name = fromstring(xml).find("name").text
+        if name in self.domains:
+            self.domains[name].xml = xml
+        else:
+            self.domains[name] = FakeDomain(self, xml)
+        return self.domains[name]
+
+    def close(self) -> None:
+        pass
+
+    def deploy(self, name: str, volume: str) -> None:
+        """Define a domain booting from the given terraform volume, like terraform apply does"""
+        domain = fromstring(f"<domain type='kvm'><name>{name}</name><devices/></domain>")
+        devices = domain.find("devices")
+        disk = SubElement(devices, "disk", type="file", device="disk")
+        SubElement(disk, "driver", name="qemu", type="qcow2")
+        SubElement(disk, "source", file=volume)
+        SubElement(disk, "target", dev="vda", bus="virtio")
+        cdrom = SubElement(devices, "disk", type="file", device="cdrom")
+        SubElement(cdrom, "target", dev="sda", bus="sata")
+        self.defineXML(tostring(domain, encoding="unicode"))
+
+
+@pytest.fixture
+def connection(tmp_path: Path, monkeypatch) -> FakeConnection:
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    (bin_dir / "qemu-img").write_text(FAKE_QEMU_IMG)
+    (bin_dir / "qemu-img").chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+
+    connection = FakeConnection()
+    monkeypatch.setattr(cluster_disk_snapshots.libvirt, "open", lambda uri: connection)
+    return connection
+
+
+@pytest.fixture
+def volumes_dir(tmp_path: Path) -> Path:
+    volumes = tmp_path / "storage_pool"
+    volumes.mkdir()
+    return volumes
+
+
+@pytest.fixture
+def snapshots(tmp_path: Path, connection: FakeConnection) -> ClusterDiskSnapshots:
+    return ClusterDiskSnapshots(snapshots_dir=str(tmp_path / "cluster-snapshots"))
+
+
+def _deploy_cluster(connection: FakeConnection, volumes_dir: Path, cluster_name: str, content: str) -> list:
+    names = [f"{cluster_name}-master-{i}" for i in range(3)]
+    for name in names:
+        volume = str(volumes_dir / f"{name}.qcow2")
+        _write_disk(volume, content)
+        connection.deploy(name, volume)
+    return names
+
+
+def _teardown_cluster(connection: FakeConnection, volumes_dir: Path, names: list) -> None:
+    """Undefine the domains and delete their volumes, like terraform destroy does"""
+    for name in names:
+        del connection.domains[name]
+        os.remove(volumes_dir / f"{name}.qcow2")
+
+
+def test_restore_discards_the_writes_since_the_capture(snapshots, connection, volumes_dir):
+    names = _deploy_cluster(connection, volumes_dir, "test-infra-cluster-a1b2c3", "discovered")
+    snapshots.capture("test-infra-cluster-a1b2c3", "discovered", names, VERSIONS, METADATA)
+    for name in names:
+        _write_disk(connection.domains[name].disk, "installing")
+    previous_disks = [connection.domains[name].disk for name in names]
+
+    record = snapshots.find("test-infra-cluster-a1b2c3", "discovered", VERSIONS)
+    snapshots.restore(record)
+
+    for name, previous_disk in zip(names, previous_disks):
+        assert _read_disk(connection.domains[name].disk) == "discovered"
+        assert connection.domains[name].active
+        assert not os.path.exists(previous_disk)
+
+
+def test_snapshot_outlives_the_terraform_volumes(snapshots, connection, volumes_dir):
+    cluster_name = "test-infra-cluster-a1b2c3"
+    names = _deploy_cluster(connection, volumes_dir, cluster_name, "discovered")
+    snapshots.capture(cluster_name, "discovered", names, VERSIONS, METADATA)
+
+    # A later run redeploys the cluster, on new volumes
+    _teardown_cluster(connection, volumes_dir, names)
+    _deploy_cluster(connection, volumes_dir, cluster_name, "")
+
+    record = snapshots.find(cluster_name, "discovered", VERSIONS)
+    assert record is not None
+    snapshots.restore(record)
+    for name in names:
+        assert _read_disk(connection.domains[name].disk) == "discovered"
+
+
+def test_snapshots_of_gone_clusters_are_dropped(snapshots, connection, volumes_dir, tmp_path):
+    gone = _deploy_cluster(connection, volumes_dir, "test-infra-cluster-a1b2c3", "discovered")
+    snapshots.capture("test-infra-cluster-a1b2c3", "discovered", gone, VERSIONS, METADATA)
+    kept = _deploy_cluster(connection, volumes_dir, "test-infra-cluster-d4e5f6", "discovered")
+    snapshots.capture("test-infra-cluster-d4e5f6", "discovered", kept, VERSIONS, METADATA)
+    _teardown_cluster(connection, volumes_dir, gone)
+
+    assert snapshots.find("test-infra-cluster-d4e5f6", "discovered", VERSIONS) is not None
+    assert [record.cluster_name for record in snapshots.records()] == ["test-infra-cluster-d4e5f6"]
+    key = snapshots.key("test-infra-cluster-a1b2c3", "discovered", VERSIONS)
+    assert not (tmp_path / "cluster-snapshots" / key).exists()
+
+
+def test_snapshots_of_other_versions_are_dropped(snapshots, connection, volumes_dir):
+    names = _deploy_cluster(connection, volumes_dir, "test-infra-cluster-a1b2c3", "discovered")
+    snapshots.capture("test-infra-cluster-a1b2c3", "discovered", names, VERSIONS, METADATA)
+
+    assert snapshots.find("test-infra-cluster-a1b2c3", "discovered", {**VERSIONS, "openshift_version": "4.20"}) is None
+    assert snapshots.records() == []
+
+
+def test_changed_snapshot_images_are_dropped(snapshots, connection, volumes_dir):
+    names = _deploy_cluster(connection, volumes_dir, "test-infra-cluster-a1b2c3", "discovered")
+    record = snapshots.capture("test-infra-cluster-a1b2c3", "discovered", names, VERSIONS, METADATA)
+    _write_disk(record.domains[names[0]][0].path, "tampered")
+
+    assert snapshots.find("test-infra-cluster-a1b2c3", "discovered", VERSIONS) is None
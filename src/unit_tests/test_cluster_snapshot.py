@@ -0,0 +1,206 @@
+import json
+import time
+from types import SimpleNamespace
+from typing import List
+from unittest import mock
+
+import pytest
+from assisted_service_client import models
+
+from service_client import InventoryClient, log
+from service_client.cluster_snapshot import ClusterSnapshot
+
+CLUSTER_ID = "11111111-1111-1111-1111-111111111111"
+INFRA_ENV_ID = "22222222-2222-2222-2222-222222222222"
+
+
+class FakeHost:
+    def __init__(self, host_id: str, hostname: str, mac: str, ip: str, role: str = "master"):
+        inventory = {
+            "hostname": hostname,
+            "interfaces": [
+                {"name": "eth0", "mac_address": mac, "ipv4_addresses": [f"{ip}/24"], "ipv6_addresses": []},
+            ],
+        }
+        self._host = {
+            "id": host_id,
+            "infra_env_id": INFRA_ENV_ID,
+            "cluster_id": CLUSTER_ID,
+            "status": "known",
+            "role": role,
+            "requested_hostname": hostname,
+            "inventory": json.dumps(inventory),
+        }
+
+    def to_dict(self):
+        return dict(self._host)
+
+
+class FakeInstallerApi:
+    """Counts the backend calls the InventoryClient makes instead of sending them"""
+
+    def __init__(self):
+        self.calls = {}
+        self.cluster = SimpleNamespace(
+            id=CLUSTER_ID,
+            hosts=[
+                FakeHost("a", "master-0", "52:54:00:00:00:01", "192.168.127.10"),
+                FakeHost("b", "worker-0", "52:54:00:00:00:02", "192.168.127.20", role="worker"),
+            ],
+        )
+
+    def _count(self, name: str) -> None:
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def v2_get_cluster(self, cluster_id, get_unregistered_clusters=False):
+        self._count("v2_get_cluster")
+        return self.cluster
+
+    def v2_update_host(self, **kwargs):
+        self._count("v2_update_host")
+
+    def v2_update_host_installer_args(self, **kwargs):
+        self._count("v2_update_host_installer_args")
+
+    def v2_set_ignored_validations(self, *args, **kwargs):
+        self._count("v2_set_ignored_validations")
+
+    def v2_deregister_host(self, **kwargs):
+        self._count("v2_deregister_host")
+
+    def deregister_infra_env(self, **kwargs):
+        self._count("deregister_infra_env")
+
+
+@pytest.fixture
+def fake_api() -> FakeInstallerApi:
+    return FakeInstallerApi()
+
+
+@pytest.fixture
+def client(fake_api: FakeInstallerApi) -> InventoryClient:
+    inventory_client = InventoryClient(
+        inventory_url="http://assisted-service.local:8090",
+        offline_token=None,
+        service_account=None,
+        refresh_token=None,
+        pull_secret="",
+        cluster_snapshot_ttl=60,
+    )
+    inventory_client.client = fake_api
+    return inventory_client
+
+
+def test_reads_share_a_single_fetch(client: InventoryClient, fake_api: FakeInstallerApi):
+    assert len(client.get_cluster_hosts(CLUSTER_ID)) == 2
+    assert client.get_host_by_mac(CLUSTER_ID, "52:54:00:00:00:01")["id"] == "a"
+    assert client.get_host_by_name(CLUSTER_ID, "worker-0")["id"] == "b"
+    assert client.get_hosts_id_with_macs(CLUSTER_ID) == {"a": ["52:54:00:00:00:01"], "b": ["52:54:00:00:00:02"]}
+    assert client.get_cluster_hosts_nics_data(CLUSTER_ID)["a"][0]["ip"] == "192.168.127.10"
+    assert client.get_ips_for_role(CLUSTER_ID, "192.168.127.0/24", "worker") == ["192.168.127.20"]
+
+    assert fake_api.calls == {"v2_get_cluster": 1}
+
+
+def test_returned_hosts_do_not_leak_into_the_cache(client: InventoryClient, fake_api: FakeInstallerApi):
+    client.get_cluster_hosts(CLUSTER_ID)[0]["status"] = "modified"
+    assert client.get_cluster_hosts(CLUSTER_ID)[0]["status"] == "known"
+    assert fake_api.calls == {"v2_get_cluster": 1}
+
+
+def test_cluster_get_always_fetches(client: InventoryClient, fake_api: FakeInstallerApi):
+    client.cluster_get(CLUSTER_ID)
+    client.cluster_get(CLUSTER_ID)
+    client.get_cluster_hosts(CLUSTER_ID)
+    assert fake_api.calls == {"v2_get_cluster": 2}
+
+
+@pytest.mark.parametrize(
+    "mutate",
+    [
+        lambda c: c.update_host(infra_env_id=INFRA_ENV_ID, host_id="a", host_name="new-name"),
+        lambda c: c.update_host_installer_args(infra_env_id=INFRA_ENV_ID, host_id="a", installer_args_params=None),
+        lambda c: c.set_ignored_validations(CLUSTER_ID, models.IgnoredValidations()),
+        lambda c: c.deregister_host(infra_env_id=INFRA_ENV_ID, host_id="a"),
+        lambda c: c.delete_infra_env(INFRA_ENV_ID),
+    ],
+)
+def test_mutating_calls_invalidate_snapshots(client: InventoryClient, fake_api: FakeInstallerApi, mutate):
+    client.get_cluster_hosts(CLUSTER_ID)
+    mutate(client)
+    client.get_cluster_hosts(CLUSTER_ID)
+    assert fake_api.calls["v2_get_cluster"] == 2
+
+
+def test_snapshot_expires_after_ttl(client: InventoryClient, fake_api: FakeInstallerApi):
+    with mock.patch("service_client.cluster_snapshot.time.monotonic", return_value=0):
+        client.get_cluster_hosts(CLUSTER_ID)
+    with mock.patch("service_client.cluster_snapshot.time.monotonic", return_value=59):
+        client.get_cluster_hosts(CLUSTER_ID)
+    with mock.patch("service_client.cluster_snapshot.time.monotonic", return_value=60):
+        client.get_cluster_hosts(CLUSTER_ID)
+    assert fake_api.calls == {"v2_get_cluster": 2}
+
+
+def test_zero_ttl_disables_caching(client: InventoryClient, fake_api: FakeInstallerApi):
+    client.cluster_snapshots.ttl = 0
+    client.get_cluster_hosts(CLUSTER_ID)
+    client.get_host_by_mac(CLUSTER_ID, "52:54:00:00:00:01")
+    assert fake_api.calls == {"v2_get_cluster": 2}
+
+
+def test_host_lookups_by_id_and_name(client: InventoryClient, fake_api: FakeInstallerApi):
+    # A host that did not get a requested hostname is found by the hostname of its inventory
+    unnamed = FakeHost("c", "worker-1", "52:54:00:00:00:03", "192.168.127.21", role="worker")
+    unnamed._host["requested_hostname"] = None
+    fake_api.cluster.hosts.append(unnamed)
+
+    assert client.get_host_by_id(CLUSTER_ID, "b")["requested_hostname"] == "worker-0"
+    assert client.get_host_by_id(CLUSTER_ID, "missing") is None
+    assert client.get_host_by_name(CLUSTER_ID, "worker-1")["id"] == "c"
+    assert client.get_host_by_name(CLUSTER_ID, "missing") is None
+    assert fake_api.calls == {"v2_get_cluster": 1}
+
+    client.get_host_by_id(CLUSTER_ID, "b")["status"] = "modified"
+    assert client.get_host_by_id(CLUSTER_ID, "b")["status"] == "known"
+
+
+def _linear_lookups(snapshot: ClusterSnapshot, macs: List[str], names: List[str]) -> list:
+    """The lookups as they were done before the hosts were indexed, scanning the hosts every time"""
+    found = []
+    for mac in macs:
+        for host in snapshot.hosts:
+            inventory = snapshot.inventories[host["id"]]
+            if mac.lower() in [interface["mac_address"].lower() for interface in inventory["interfaces"]]:
+                found.append(host)
+                break
+    for name in names:
+        found.append(next(host for host in snapshot.hosts if host.get("requested_hostname") == name))
+    return found
+
+
+def test_index_benchmark():
+    hosts = [
+        FakeHost(
+            f"host-{i}", f"worker-{i}", f"52:54:00:00:{i // 256:02x}:{i % 256:02x}", f"192.168.{i // 250}.{i % 250}"
+        )
+        for i in range(500)
+    ]
+    snapshot = ClusterSnapshot(SimpleNamespace(id=CLUSTER_ID, hosts=hosts))
+    macs = [f"52:54:00:00:{i // 256:02X}:{i % 256:02X}" for i in range(500)]
+    names = [f"worker-{i}" for i in range(500)]
+    # Parsing the inventories is shared by both
+    assert len(snapshot.inventories) == 500
+
+    started = time.monotonic()
+    expected = _linear_lookups(snapshot, macs, names)
+    linear_duration = time.monotonic() - started
+
+    started = time.monotonic()
+    index = snapshot.index
+    found = [index.by_mac(mac) for mac in macs] + [index.by_name(name) for name in names]
+    index_duration = time.monotonic() - started
+
+    log.info(f"1000 lookups among 500 hosts took {linear_duration:.3f}s scanning, {index_duration:.3f}s indexed")
+    assert found == expected
+    assert index_duration * 10 < linear_duration
@@ -0,0 +1,150 @@
+import threading
+import time
+
+import pytest
+import waiting
+from assisted_service_client.rest import ApiException
+
+from assisted_test_infra.test_infra.utils.cluster_status_poller import ClusterStatusPoller, get_infra_env_poller
+
+
+def _poller(key, fetch) -> ClusterStatusPoller:
+    return ClusterStatusPoller.get_or_create(key, fetch, state_of=lambda snapshot: snapshot)
+
+
+def test_waiters_share_one_fetch_loop():
+    release = threading.Event()
+    states = iter(range(1000))
+
+    def fetch():
+        release.wait(5)
+        return next(states)
+
+    poller = _poller("shared", fetch)
+    results = []
+    waiters = [
+        threading.Thread(target=lambda: results.append(poller.wait(lambda s: s >= 1, timeout=10, interval=0.01)))
+        for _ in range(5)
+    ]
+    for waiter in waiters:
+        waiter.start()
+    release.set()
+    for waiter in waiters:
+        waiter.join(10)
+
+    assert len(results) == 5
+    assert poller.fetch_count < 5 * 2
+
+
+def test_retired_poller_does_not_start_a_second_loop():
+    poller = _poller("retired", lambda: 1)
+    assert poller.wait(lambda s: s, timeout=5) == 1
+    waiting.wait(lambda: "retired" not in ClusterStatusPoller._registry, timeout_seconds=5, sleep_seconds=0.01)
+
+    # A caller still holding the retired instance is served by the poller registered since then
+    new_poller = _poller("retired", lambda: 2)
+    assert poller.wait(lambda s: s, timeout=5) == 2
+    assert poller.fetch_count == 1
+    assert new_poller.fetch_count == 1
+
+
+def _fetch_times(snapshots):
+    """A fetch returning the snapshots in turn, and the times it was called at"""
+    times = []
+
+    def fetch():
+        times.append(time.monotonic())
+        return snapshots[min(len(times), len(snapshots)) - 1]
+
+    return fetch, times
+
+
+def test_polling_backs_off_until_the_state_changes():
+    # The state changes on the 7th fetch
+    snapshots = [(i, i >= 6) for i in range(9)]
+    fetch, times = _fetch_times(snapshots)
+    poller = ClusterStatusPoller("backoff", fetch, state_of=lambda snapshot: snapshot[1], fast_interval=0.02)
+
+    assert poller.wait(lambda snapshot: snapshot[0] == 8, timeout=5, interval=0.16)
+
+    # Doubled up to the interval of the subscriber, and back to the fast one after the change
+    expected = [0.02, 0.04, 0.08, 0.16, 0.16, 0.16, 0.02, 0.04]
+    gaps = [end - start for start, end in zip(times, times[1:])]
+    assert len(gaps) == len(expected)
+    for gap, interval in zip(gaps, expected):
+        assert interval <= gap < interval * 1.5 + 0.005
+
+
+def _flaky_fetch(failures: int):
+    calls = []
+
+    def fetch():
+        calls.append(None)
+        if len(calls) <= failures:
+            raise ApiException(status=503, reason="Service Unavailable")
+        return len(calls)
+
+    return fetch
+
+
+def test_fetch_error_fails_the_waiters():
+    poller = ClusterStatusPoller("fetch-error", _flaky_fetch(1), state_of=lambda snapshot: snapshot)
+
+    with pytest.raises(ApiException, match="Service Unavailable"):
+        poller.wait(lambda snapshot: snapshot, timeout=5)
+    assert poller.fetch_count == 1
+
+
+def test_fetch_errors_are_ignored_on_request():
+    poller = ClusterStatusPoller(
+        "ignored-fetch-errors", _flaky_fetch(3), state_of=lambda snapshot: snapshot, fast_interval=0.01
+    )
+
+    assert poller.wait(lambda snapshot: snapshot, timeout=5, interval=0.01, ignore_fetch_errors=True) == 4
+    assert poller.fetch_count == 4
+
+
+def test_fetch_error_only_fails_the_waiters_not_ignoring_it():
+    failing = threading.Event()
+    failing.set()
+
+    def fetch():
+        if failing.is_set():
+            raise ApiException(status=503, reason="Service Unavailable")
+        return "ready"
+
+    poller = ClusterStatusPoller("mixed-fetch-errors", fetch, state_of=lambda snapshot: snapshot, fast_interval=0.01)
+    results = []
+    ignoring = threading.Thread(
+        target=lambda: results.append(poller.wait(lambda s: s, timeout=5, interval=0.05, ignore_fetch_errors=True))
+    )
+    ignoring.start()
+    waiting.wait(lambda: poller.fetch_count > 0, timeout_seconds=5, sleep_seconds=0.01)
+
+    with pytest.raises(ApiException, match="Service Unavailable"):
+        poller.wait(lambda snapshot: snapshot, timeout=5)
+    assert ignoring.is_alive()
+
+    failing.clear()
+    ignoring.join(5)
+    assert results == ["ready"]
+
+
+class FakeClient:
+    def __init__(self, hosts):
+        self.hosts = hosts
+
+    def get_infra_env_hosts(self, infra_env_id: str):
+        return self.hosts
+
+
+def test_each_client_is_polled_by_a_poller_of_its_own():
+    client, other = FakeClient([]), FakeClient([])
+    poller = get_infra_env_poller(client, "infra-env")
+
+    assert get_infra_env_poller(client, "infra-env") is poller
+    assert get_infra_env_poller(other, "infra-env") is not poller
+    # The registry holds the client itself, a client created once it is collected can't be matched by its id
+    assert poller.key[0] is client
+    ClusterStatusPoller._registry.pop(poller.key)
+    ClusterStatusPoller._registry.pop((other, "infra_env", "infra-env"))
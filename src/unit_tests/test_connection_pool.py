@@ -0,0 +1,101 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Set, Tuple
+
+import pytest
+
+from service_client import InventoryClient, connection_pool
+from service_client.connection_pool import SharedConnectionPool, configure_shared_pool
+
+
+class KeepAliveServer(ThreadingHTTPServer):
+    """Answers every request with an empty list over kept-alive connections, and records the client connections"""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), KeepAliveRequestHandler)
+        self.connections: Set[Tuple[str, int]] = set()
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class KeepAliveRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):  # noqa: N802
+        with self.server.lock:
+            self.server.connections.add(self.client_address)
+            self.server.requests += 1
+
+        content = b"[]"
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server() -> KeepAliveServer:
+    server = KeepAliveServer()
+    thread = threading.Thread(target=server.serve_forever, args=(0.01,), daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def shared_pool(monkeypatch) -> SharedConnectionPool:
+    # A pool of its own, the process wide one is restored afterwards
+    monkeypatch.setattr(connection_pool, "_shared_pool", None)
+    pool = configure_shared_pool()
+    yield pool
+    pool.clear()
+
+
+def _client(server: KeepAliveServer) -> InventoryClient:
+    return InventoryClient(
+        inventory_url=server.url, offline_token=None, service_account=None, refresh_token=None, pull_secret=""
+    )
+
+
+def test_clients_share_one_pool_manager(server: KeepAliveServer, shared_pool: SharedConnectionPool):
+    clients = [_client(server) for _ in range(5)]
+    assert len({id(client.api.rest_client.pool_manager) for client in clients}) == 1
+    assert clients[0].api.rest_client.pool_manager is shared_pool.pool_manager
+
+    for _ in range(4):
+        for client in clients:
+            assert client.clusters_list() == []
+
+    stats = InventoryClient.connection_pool_stats()
+    assert server.requests == 20
+    assert len(server.connections) == 1
+    assert stats.to_dict() == {"requests": 20, "hits": 19, "misses": 1}
+
+
+def test_session_requests_are_counted(server: KeepAliveServer, shared_pool: SharedConnectionPool):
+    _client(server).clusters_list()
+    for _ in range(3):
+        shared_pool.session.get(f"{server.url}/metrics").raise_for_status()
+
+    # The swagger clients and the requests session each keep a connection of their own
+    assert len(server.connections) == 2
+    assert shared_pool.stats().to_dict() == {"requests": 4, "hits": 2, "misses": 2}
+
+
+def test_connections_are_set_up_per_client_without_the_shared_pool(server: KeepAliveServer, monkeypatch):
+    monkeypatch.setattr(SharedConnectionPool, "attach", lambda pool, api_client: None)
+    clients = [_client(server) for _ in range(5)]
+    for client in clients:
+        client.clusters_list()
+        client.clusters_list()
+
+    assert len(server.connections) == 5
@@ -0,0 +1,164 @@
+import pytest
+import waiting
+
+libvirt = pytest.importorskip("libvirt")
+
+from assisted_test_infra.test_infra.controllers.node_controllers import libvirt_event_loop  # noqa: E402
+from assisted_test_infra.test_infra.controllers.node_controllers.domain_cache import DomainCache  # noqa: E402
+from assisted_test_infra.test_infra.controllers.node_controllers.node import Node  # noqa: E402
+
+DOMAIN_XML = """
+<domain type="test">
+  <name>{name}</name>
+  <memory unit="KiB">1048576</memory>
+  <currentMemory unit="KiB">1048576</currentMemory>
+  <vcpu>2</vcpu>
+  <os><type arch="x86_64">hvm</type></os>
+</domain>
+"""
+
+
+@pytest.fixture
+def connection():
+    # Events are only delivered on connections opened after the event loop was registered
+    libvirt_event_loop.start()
+    connection = libvirt.open("test:///default")
+    yield connection
+    connection.close()
+
+
+@pytest.fixture
+def cache(connection) -> DomainCache:
+    cache = DomainCache(connection)
+    yield cache
+    cache.close()
+
+
+@pytest.fixture
+def xml_descs(monkeypatch) -> list:
+    calls = []
+    xml_desc = libvirt.virDomain.XMLDesc
+
+    def counting_xml_desc(domain, flags=0):
+        calls.append(domain.name())
+        return xml_desc(domain, flags)
+
+    monkeypatch.setattr(libvirt.virDomain, "XMLDesc", counting_xml_desc)
+    return calls
+
+
+def _wait_until_invalidated(cache: DomainCache, name: str) -> None:
+    waiting.wait(lambda: name not in cache._xmls, timeout_seconds=10, sleep_seconds=0.05, waiting_for="an event")
+
+
+def test_description_is_fetched_once(cache: DomainCache, xml_descs: list):
+    assert cache.enabled
+    first = cache.xml("test")
+    second = cache.xml("test")
+
+    assert first is second
+    assert first.find("name").text == "test"
+    assert xml_descs == ["test"]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_lifecycle_events_invalidate_the_description(cache: DomainCache, connection, xml_descs: list):
+    cache.xml("test")
+    domain = connection.lookupByName("test")
+
+    domain.suspend()
+    _wait_until_invalidated(cache, "test")
+    cache.xml("test")
+    domain.resume()
+    _wait_until_invalidated(cache, "test")
+    cache.xml("test")
+
+    assert xml_descs == ["test"] * 3
+
+
+def test_undefined_domain_is_forgotten(cache: DomainCache, connection):
+    domain = connection.defineXML(DOMAIN_XML.format(name="test-infra-cluster-master-0"))
+    assert cache.domain("test-infra-cluster-master-0").UUIDString() == domain.UUIDString()
+    cache.xml("test-infra-cluster-master-0")
+
+    domain.undefine()
+    waiting.wait(
+        lambda: "test-infra-cluster-master-0" not in cache._domains,
+        timeout_seconds=10,
+        sleep_seconds=0.05,
+        waiting_for="the undefined event",
+    )
+    assert "test-infra-cluster-master-0" not in cache._xmls
+    with pytest.raises(libvirt.libvirtError):
+        cache.domain("test-infra-cluster-master-0")
+
+
+def test_device_events_invalidate_the_description(cache: DomainCache, connection, xml_descs: list):
+    cache.xml("test")
+    cache._on_device_event(connection, connection.lookupByName("test"), "ua-TestInfraDisk1", None)
+    cache.xml("test")
+
+    assert xml_descs == ["test", "test"]
+
+
+def test_description_changed_while_fetched_is_not_cached(cache: DomainCache, connection, monkeypatch):
+    xml_desc = libvirt.virDomain.XMLDesc
+
+    def xml_desc_racing_an_event(domain, flags=0):
+        cache.invalidate(domain.name())
+        return xml_desc(domain, flags)
+
+    monkeypatch.setattr(libvirt.virDomain, "XMLDesc", xml_desc_racing_an_event)
+    cache.xml("test")
+
+    assert "test" not in cache._xmls
+
+
+class FailingEventsConnection:
+    """A connection that can't deliver events, e.g. opened before the event loop was registered"""
+
+    def __init__(self, connection):
+        self._connection = connection
+
+    def domainEventRegisterAny(self, *args):  # noqa: N802
+        raise libvirt.libvirtError("this function is not supported by the connection driver")
+
+    def lookupByName(self, name: str):  # noqa: N802
+        return self._connection.lookupByName(name)
+
+
+def test_nothing_is_cached_without_events(connection, xml_descs: list):
+    cache = DomainCache(FailingEventsConnection(connection))
+    cache.xml("test")
+    cache.xml("test")
+
+    assert not cache.enabled
+    assert xml_descs == ["test", "test"]
+
+
+class CountingNodeController:
+    def __init__(self):
+        self.cpu_cores = {"test-infra-cluster-master-0": 4}
+        self.reads = []
+
+    def get_cpu_cores(self, name: str) -> int:
+        self.reads.append(name)
+        return self.cpu_cores[name]
+
+    def set_cpu_cores(self, name: str, core_count: int) -> None:
+        self.cpu_cores[name] = core_count
+
+
+def test_node_original_values_are_read_lazily():
+    controller = CountingNodeController()
+    node = Node("test-infra-cluster-master-0", controller)
+    assert controller.reads == []
+
+    node.set_cpu_cores(8)
+    assert controller.reads == ["test-infra-cluster-master-0"]
+    node.set_cpu_cores(16)
+    node.reset_cpu_cores()
+
+    assert controller.cpu_cores["test-infra-cluster-master-0"] == 4
+    assert node.original_vcpu_count == 4
+    assert controller.reads == ["test-infra-cluster-master-0"]
@@ -0,0 +1,113 @@
+import threading
+import time
+
+import pytest
+
+libvirt = pytest.importorskip("libvirt")
+
+from assisted_test_infra.test_infra.controllers.node_controllers import domain_operations  # noqa: E402
+from assisted_test_infra.test_infra.controllers.node_controllers.domain_operations import (  # noqa: E402
+    BulkDomainExecutor,
+)
+from service_client import log  # noqa: E402
+
+NAMES = [f"test-infra-cluster-{role}-{i}" for role in ("master", "worker") for i in range(8)]
+OPERATION_DELAY = 0.2
+
+
+class FakeDomain:
+    def __init__(self, name: str):
+        self._name = name
+
+    def name(self) -> str:
+        return self._name
+
+
+class FakeConnection:
+    def __init__(self, opened: list):
+        self.thread = threading.current_thread().name
+        self.closed = False
+        opened.append(self)
+
+    def lookupByName(self, name: str) -> FakeDomain:  # noqa: N802
+        if name not in NAMES:
+            raise libvirt.libvirtError(f"Domain not found: no domain with matching name '{name}'")
+        return FakeDomain(name)
+
+    def close(self) -> None:
+        self.closed = True
+
+
+@pytest.fixture
+def connections(monkeypatch) -> list:
+    opened = []
+    monkeypatch.setattr(domain_operations.libvirt, "open", lambda uri: FakeConnection(opened))
+    return opened
+
+
+def _slow_create(domain: FakeDomain) -> None:
+    # Stands for the time virDomainCreate takes to boot a domain
+    time.sleep(OPERATION_DELAY)
+
+
+def test_concurrent_operations_are_faster(connections: list):
+    started = time.monotonic()
+    sequential = BulkDomainExecutor("test:///default", max_workers=1).run(NAMES, _slow_create)
+    sequential_duration = time.monotonic() - started
+
+    started = time.monotonic()
+    concurrent = BulkDomainExecutor("test:///default", max_workers=8).run(NAMES, _slow_create)
+    concurrent_duration = time.monotonic() - started
+
+    log.info(
+        f"{len(NAMES)} operations of {OPERATION_DELAY}s took {sequential_duration:.2f}s sequentially, "
+        f"{concurrent_duration:.2f}s with 8 workers"
+    )
+    assert all(result.ok for result in sequential + concurrent)
+    assert sequential_duration >= len(NAMES) * OPERATION_DELAY
+    assert sequential_duration / concurrent_duration > 4
+
+
+def test_results_keep_the_order_of_the_names(connections: list):
+    # The first domains take the longest, they finish last
+    delays = {name: OPERATION_DELAY * (len(NAMES) - i) / len(NAMES) for i, name in enumerate(NAMES)}
+    finished = []
+
+    def operation(domain: FakeDomain) -> None:
+        time.sleep(delays[domain.name()])
+        finished.append(domain.name())
+
+    results = BulkDomainExecutor("test:///default", max_workers=len(NAMES)).run(NAMES, operation)
+
+    assert finished != NAMES
+    assert [result.name for result in results] == NAMES
+
+
+def test_failing_domain_does_not_abort_the_others(connections: list):
+    done = []
+
+    def operation(domain: FakeDomain) -> None:
+        if domain.name() == NAMES[3]:
+            raise libvirt.libvirtError("Requested operation is not valid: domain is already running")
+        time.sleep(0.01)
+        done.append(domain.name())
+
+    names = NAMES + ["test-infra-cluster-worker-missing"]
+    results = BulkDomainExecutor("test:///default", max_workers=4).run(names, operation)
+
+    assert [result.name for result in results if not result.ok] == [NAMES[3], "test-infra-cluster-worker-missing"]
+    assert all(isinstance(result.error, libvirt.libvirtError) for result in results if not result.ok)
+    assert sorted(done) == sorted(name for name in NAMES if name != NAMES[3])
+
+
+def test_each_worker_uses_its_own_connection(connections: list):
+    BulkDomainExecutor("test:///default", max_workers=4).run(NAMES, _slow_create)
+
+    assert len(connections) == 4
+    assert len({connection.thread for connection in connections}) == 4
+    assert all(connection.closed for connection in connections)
+
+
+def test_no_names_opens_no_connection(connections: list):
+    assert BulkDomainExecutor("test:///default").run([], _slow_create) == []
+    assert connections == []
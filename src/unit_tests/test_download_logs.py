@@ -0,0 +1,221 @@
+import functools
+import json
+import tarfile
+import threading
+import time
+from pathlib import Path
+
+import pytest
+from assisted_service_client.rest import ApiException
+
+pytest.importorskip("libvirt")
+
+from assisted_test_infra.download_logs import download_logs  # noqa: E402
+from service_client.file_download import download_concurrently  # noqa: E402
+
+CLUSTER_FILES = ["bootstrap.ign", "master.ign", "worker.ign", "install-config.yaml"]
+HOSTS = [{"id": f"host-{i}", "infra_env_id": "infra-env"} for i in range(4)]
+CLUSTER = {"id": "cluster", "hosts": HOSTS}
+DESTINATIONS = CLUSTER_FILES + [f"host_{host['id']}.ign" for host in HOSTS]
+
+
+class StubClient:
+    """Writes the cluster files, the ones listed first take the longest so they finish last"""
+
+    def __init__(self, failures=None):
+        self.failures = failures or {}
+        self.finished = []
+        self.lock = threading.Lock()
+
+    def _write(self, name: str, path: str) -> None:
+        time.sleep(0.02 * (len(DESTINATIONS) - DESTINATIONS.index(name)))
+        failure = self.failures.get(name)
+        if failure is not None:
+            raise failure
+
+        content = {"pullSecret": "secret", "name": name} if name.endswith(".yaml") else {"ignition": {}, "name": name}
+        Path(path).write_text(json.dumps(content))
+        with self.lock:
+            self.finished.append(name)
+
+    def download_and_save_file(self, cluster_id: str, file_name: str, file_path: str) -> None:
+        self._write(file_name, file_path)
+
+    def download_host_ignition(self, infra_env_id: str, host_id: str, destination: str) -> None:
+        self._write(f"host_{host_id}.ign", str(Path(destination) / f"host_{host_id}.ign"))
+
+
+@pytest.fixture
+def censored(monkeypatch) -> list:
+    censored = []
+    censor_sensitive_sources = download_logs.censor_sensitive_sources
+    censor_install_config = download_logs._censor_install_config
+
+    def recording_censor_sensitive_sources(json_path: str):
+        censored.append(Path(json_path).name)
+        censor_sensitive_sources(json_path)
+
+    def recording_censor_install_config(install_config: Path):
+        censored.append(install_config.name)
+        censor_install_config(install_config)
+
+    monkeypatch.setattr(download_logs, "censor_sensitive_sources", recording_censor_sensitive_sources)
+    monkeypatch.setattr(download_logs, "_censor_install_config", recording_censor_install_config)
+    monkeypatch.setattr(download_logs, "download_concurrently", functools.partial(download_concurrently, backoff=0.01))
+    return censored
+
+
+@pytest.fixture
+def output_folder(tmp_path: Path) -> Path:
+    (tmp_path / "cluster_files").mkdir()
+    return tmp_path
+
+
+def test_files_are_processed_in_the_order_of_the_jobs(output_folder: Path, censored: list):
+    client = StubClient()
+    download_logs.download_cluster_files(client, CLUSTER, str(output_folder))
+
+    assert client.finished != DESTINATIONS
+    assert censored == DESTINATIONS
+    assert sorted(path.name for path in (output_folder / "cluster_files").iterdir()) == sorted(DESTINATIONS)
+    install_config = json.loads((output_folder / "cluster_files" / "install-config.yaml").read_text())
+    assert install_config["pullSecret"] == "censored"
+
+
+def test_failing_file_does_not_cancel_the_others(output_folder: Path, censored: list):
+    client = StubClient(failures={"master.ign": ApiException(status=404, reason="Not Found")})
+    download_logs.download_cluster_files(client, CLUSTER, str(output_folder))
+
+    expected = [name for name in DESTINATIONS if name != "master.ign"]
+    assert censored == expected
+    assert sorted(path.name for path in (output_folder / "cluster_files").iterdir()) == sorted(expected)
+
+
+def test_unexpected_error_is_raised_once_the_others_are_done(output_folder: Path, censored: list):
+    client = StubClient(failures={"bootstrap.ign": OSError("No space left on device")})
+    with pytest.raises(OSError, match="No space left on device"):
+        download_logs.download_cluster_files(client, CLUSTER, str(output_folder))
+
+    assert sorted(client.finished) == sorted(name for name in DESTINATIONS if name != "bootstrap.ign")
+    # Files after the failing one are kept as downloaded, they were not processed
+    assert censored == []
+
+
+def test_cluster_files_are_downloaded_concurrently(output_folder: Path, censored: list):
+    started = time.monotonic()
+    download_logs.download_cluster_files(StubClient(), CLUSTER, str(output_folder))
+    duration = time.monotonic() - started
+
+    # Sequentially the downloads take 0.02 * (1 + ... + 8) = 0.72s, the longest one takes 0.16s
+    assert duration < 0.72 / 2
+
+
+def test_progress_is_persisted(tmp_path: Path):
+    progress = download_logs.DownloadProgress(str(tmp_path))
+    assert not progress.is_resumable()
+
+    progress.reset()
+    progress.mark_done("metadata")
+    progress.mark_done("cluster_files")
+
+    resumed = download_logs.DownloadProgress(str(tmp_path))
+    assert resumed.is_resumable()
+    assert resumed.completed_stages == ["metadata", "cluster_files"]
+    assert resumed.is_done("cluster_files") and not resumed.is_done("events")
+
+    resumed.mark_complete()
+    assert not download_logs.DownloadProgress(str(tmp_path)).is_resumable()
+    assert sorted(path.name for path in tmp_path.iterdir()) == [download_logs.DownloadProgress.FILE_NAME]
+
+
+class StagesClient:
+    def get_infra_envs_by_cluster_id(self, cluster_id: str) -> list:
+        return []
+
+    def download_kubeconfig_no_ingress(self, cluster_id: str, kubeconfig_path: str) -> None:
+        Path(kubeconfig_path).write_text("kubeconfig")
+
+    def get_api_vip(self, cluster: dict, cluster_id: str) -> str:
+        return "192.168.127.100"
+
+
+class Stages:
+    """Stands for the download stages, recording the ones that ran. A stage fails while it is in failing"""
+
+    def __init__(self):
+        self.ran = []
+        self.failing = set()
+
+    def stage(self, name: str):
+        def run(*args, **kwargs):
+            if name in self.failing:
+                raise OSError(f"{name} was interrupted")
+            self.ran.append(name)
+
+        return run
+
+
+def _run_command(command: str, **kwargs) -> None:
+    # oc adm must-gather writes into the directory it is given
+    if "adm must-gather" in command:
+        must_gather_dir = command.split("--dest-dir ")[1].split()[0]
+        (Path(must_gather_dir) / "timestamp").write_text(str(time.monotonic()))
+
+
+@pytest.fixture
+def stages(monkeypatch) -> Stages:
+    stages = Stages()
+    monkeypatch.setattr(download_logs, "write_metadata_file", stages.stage("metadata"))
+    monkeypatch.setattr(download_logs, "download_cluster_files", stages.stage("cluster_files"))
+    monkeypatch.setattr(download_logs, "_download_manifests_stage", stages.stage("manifests"))
+    monkeypatch.setattr(download_logs, "gather_event_files", stages.stage("events"))
+    monkeypatch.setattr(download_logs, "_download_cluster_logs_stage", stages.stage("cluster_logs"))
+    monkeypatch.setattr(download_logs, "run_oc_describe_cluster_operators", stages.stage("describe_operators"))
+    monkeypatch.setattr(download_logs, "config_etc_hosts", lambda *args: None)
+    monkeypatch.setattr(download_logs, "run_command", _run_command)
+    return stages
+
+
+CLUSTER_TO_DOWNLOAD = {
+    "id": "cluster",
+    "name": "test-infra-cluster",
+    "base_dns_domain": "redhat.com",
+    "hosts": HOSTS,
+    "install_started_at": "2026-10-17T10:00:00Z",
+}
+
+
+def test_interrupted_download_is_resumed(tmp_path: Path, stages: Stages):
+    stages.failing.add("events")
+    with pytest.raises(OSError, match="events was interrupted"):
+        download_logs.download_logs(StagesClient(), dict(CLUSTER_TO_DOWNLOAD), str(tmp_path), must_gather=False)
+    (output_folder,) = tmp_path.iterdir()
+    (output_folder / "cluster_files" / "bootstrap.ign").write_text("{}")
+
+    stages.failing.clear()
+    download_logs.download_logs(StagesClient(), dict(CLUSTER_TO_DOWNLOAD), str(tmp_path), must_gather=False)
+
+    assert stages.ran == ["metadata", "cluster_files", "manifests", "events", "cluster_logs"]
+    # The files of the completed stages are kept
+    assert (output_folder / "cluster_files" / "bootstrap.ign").exists()
+    assert not download_logs.DownloadProgress(str(output_folder)).is_resumable()
+
+
+def test_failed_must_gather_stage_runs_again(tmp_path: Path, stages: Stages):
+    # Interrupted once the must-gather was gathered, before it was archived
+    stages.failing.add("describe_operators")
+    with pytest.raises(OSError, match="describe_operators was interrupted"):
+        download_logs.download_logs(StagesClient(), dict(CLUSTER_TO_DOWNLOAD), str(tmp_path), must_gather=True)
+    (output_folder,) = tmp_path.iterdir()
+    assert (output_folder / "must-gather-dir" / "timestamp").exists()
+    (output_folder / "must-gather.tar.gz.part").write_bytes(b"partial")
+
+    stages.failing.clear()
+    download_logs.download_logs(StagesClient(), dict(CLUSTER_TO_DOWNLOAD), str(tmp_path), must_gather=True)
+
+    assert stages.ran == ["metadata", "cluster_files", "manifests", "events", "cluster_logs", "describe_operators"]
+    assert not (output_folder / "must-gather-dir").exists()
+    assert not (output_folder / "must-gather.tar.gz.part").exists()
+    with tarfile.open(output_folder / "must-gather.tar.gz") as tar:
+        assert sorted(name.strip("/") for name in tar.getnames()) == ["", "timestamp"]
+    assert download_logs.DownloadProgress(str(output_folder)).completed_stages[-1] == "must_gather"
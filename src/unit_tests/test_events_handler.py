@@ -0,0 +1,120 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+import pytest
+
+from assisted_test_infra.test_infra.helper_classes.events_handler import EventsCursor
+
+CLUSTER_ID = "11111111-1111-1111-1111-111111111111"
+HOST_IDS = [f"22222222-2222-2222-2222-{i:012d}" for i in range(5)]
+STARTED = datetime(2026, 10, 17, 10, 0, 0)
+
+
+class FakeEventsClient:
+    """Stands for InventoryClient.get_events, with the paging and host deletion semantics of the events API"""
+
+    def __init__(self):
+        self.events: List[Dict[str, Any]] = []
+        self.deleted_hosts = set()
+        self.requests = 0
+
+    def add(self, count: int, host_id: str = None, seconds: float = None) -> List[Dict[str, Any]]:
+        added = []
+        for _ in range(count):
+            elapsed = timedelta(seconds=len(self.events) if seconds is None else seconds)
+            event = {
+                "cluster_id": CLUSTER_ID,
+                "host_id": host_id or HOST_IDS[len(self.events) % len(HOST_IDS)],
+                "severity": "info",
+                "name": "host_status_updated",
+                "event_time": (STARTED + elapsed).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z",
+                "message": f"Host status updated ({len(self.events)})",
+            }
+            self.events.append(event)
+            added.append(event)
+        return added
+
+    def get_events(
+        self, cluster_id="", host_id="", infra_env_id="", categories=None, order="ascending", limit=None, offset=0
+    ) -> List[Dict[str, Any]]:
+        self.requests += 1
+        # The service hides the events of deleted hosts unless deleted_hosts is set
+        events = [event for event in self.events if event["host_id"] not in self.deleted_hosts]
+        events.sort(key=lambda event: event["event_time"])
+        if order == "descending":
+            events.reverse()
+        return events[offset:][:limit]
+
+
+@pytest.fixture
+def client() -> FakeEventsClient:
+    client = FakeEventsClient()
+    client.add(10_000)
+    return client
+
+
+@pytest.fixture
+def cursor(client: FakeEventsClient) -> EventsCursor:
+    return EventsCursor(client, cluster_id=CLUSTER_ID)
+
+
+def test_first_poll_returns_all_events_in_order(cursor: EventsCursor, client: FakeEventsClient):
+    assert cursor.poll() == client.events
+    assert client.requests == 11
+    assert cursor.last_event_time == client.events[-1]["event_time"]
+
+
+def test_later_polls_return_only_new_events(cursor: EventsCursor, client: FakeEventsClient):
+    cursor.poll()
+    client.requests = 0
+
+    assert cursor.poll() == []
+    added = client.add(5)
+    assert cursor.poll() == added
+    assert client.requests == 2
+    assert len(cursor) == 10_005
+
+
+def test_events_are_not_skipped_when_the_list_shrinks(cursor: EventsCursor, client: FakeEventsClient):
+    cursor.poll()
+
+    # A fifth of the events belong to the deleted host and are hidden from now on
+    client.deleted_hosts.add(HOST_IDS[0])
+    added = client.add(30, host_id=HOST_IDS[1])
+
+    assert cursor.poll() == added
+
+
+def test_events_sharing_an_event_time_are_deduplicated(cursor: EventsCursor, client: FakeEventsClient):
+    seconds = len(client.events)
+    first = client.add(3, seconds=seconds)
+    assert cursor.poll()[-3:] == first
+
+    # Later events with the same event_time as the last seen ones
+    second = client.add(3, seconds=seconds)
+    assert cursor.poll() == second
+    assert cursor.poll() == []
+
+
+def test_shrinking_while_paging_does_not_skip_events(cursor: EventsCursor, client: FakeEventsClient):
+    get_events = client.get_events
+
+    def get_events_deleting_a_host(**kwargs):
+        if kwargs["offset"]:
+            # Hides 200 of the events of the first page, more than the pages overlap
+            client.deleted_hosts.add(HOST_IDS[0])
+        return get_events(**kwargs)
+
+    client.get_events = get_events_deleting_a_host
+    events = cursor.poll()
+
+    visible = [event for event in client.events if event["host_id"] != HOST_IDS[0]]
+    assert [event for event in events if event["host_id"] != HOST_IDS[0]] == visible
+
+
+def test_buffer_is_bounded(client: FakeEventsClient):
+    cursor = EventsCursor(client, cluster_id=CLUSTER_ID, max_events=100)
+    assert len(cursor.poll()) == 10_000
+    assert cursor.events == client.events[-100:]
+    assert len(cursor.by_host(HOST_IDS[0])) == 20
+    assert cursor.poll() == []
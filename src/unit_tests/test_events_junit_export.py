@@ -0,0 +1,104 @@
+import json
+import tracemalloc
+from pathlib import Path
+
+import pytest
+from junit_report import CaseFormatKeys, JsonJunitExporter
+
+from service_client import InventoryClient, junit_writer
+
+CLUSTER_ID = "11111111-1111-1111-1111-111111111111"
+
+
+def _events(count: int):
+    for i in range(count):
+        yield {
+            "cluster_id": CLUSTER_ID,
+            "event_time": f"2026-10-17T10:{i // 60 % 60:02d}:{i % 60:02d}.000Z",
+            "message": f"Host worker-{i % 5}: updated status from known to installing (event {i}) <&>",
+            "name": "host_status_updated",
+            "severity": ("info", "warning", "error", "critical")[i % 4],
+        }
+
+
+class FakeEventsResponse:
+    def __init__(self, count: int, chunk_size: int = 64 * 1024):
+        self._count = count
+        self._chunk_size = chunk_size
+
+    def stream(self, _):
+        # Serialized lazily, like a response read from the socket
+        pending = b"["
+        for i, event in enumerate(_events(self._count)):
+            pending += (b"," if i else b"") + json.dumps(event).encode()
+            if len(pending) >= self._chunk_size:
+                yield pending
+                pending = b""
+        yield pending + b"]"
+
+    def release_conn(self):
+        pass
+
+
+class FakeEventsApi:
+    def __init__(self, count: int):
+        self.count = count
+
+    def v2_list_events(self, **kwargs):
+        assert kwargs["_preload_content"] is False
+        return FakeEventsResponse(self.count)
+
+
+@pytest.fixture
+def client() -> InventoryClient:
+    return InventoryClient(
+        inventory_url="http://assisted-service.local:8090",
+        offline_token=None,
+        service_account=None,
+        refresh_token=None,
+        pull_secret="",
+    )
+
+
+def test_cluster_events_files_are_unchanged(client: InventoryClient, tmp_path: Path, monkeypatch):
+    monkeypatch.setenv("JUNIT_REPORT_DIR", str(tmp_path / "streamed"))
+    client.events = FakeEventsApi(200)
+    events_file = tmp_path / "cluster_events.json"
+    client.download_cluster_events(CLUSTER_ID, str(events_file))
+
+    events = list(_events(200))
+    assert events_file.read_text() == json.dumps(events, indent=4)
+
+    fmt = CaseFormatKeys(
+        case_name="cluster-event-test", static_case_name=True, severity_key="severity", case_timestamp="event_time"
+    )
+    expected_report = JsonJunitExporter(fmt).collect(
+        events, suite_name="cluster_events", report_dir=tmp_path / "expected", xml_suffix=CLUSTER_ID
+    )
+    (report,) = (tmp_path / "streamed").glob("*.xml")
+    assert report.read_text() == Path(expected_report).read_text()
+
+
+def _download_peak_memory(client: InventoryClient, events_count: int, output_file: Path) -> int:
+    client.events = FakeEventsApi(events_count)
+    tracemalloc.start()
+    try:
+        client.download_cluster_events(CLUSTER_ID, str(output_file))
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_cluster_events_memory_does_not_grow_with_the_events(client: InventoryClient, tmp_path: Path, monkeypatch):
+    monkeypatch.setenv("JUNIT_REPORT_DIR", str(tmp_path))
+    # Shrink the fixed size buffers, the written cases are otherwise kept in memory up to the spool size
+    monkeypatch.setattr(junit_writer, "_SPOOL_MAX_SIZE", 64 * 1024)
+    monkeypatch.setattr(junit_writer, "_COPY_CHUNK_SIZE", 64 * 1024)
+
+    # The first download allocates the lazily created objects of the libraries (e.g. their imports)
+    _download_peak_memory(client, 100, tmp_path / "warmup.json")
+    small = _download_peak_memory(client, 1_000, tmp_path / "small.json")
+    large = _download_peak_memory(client, 8_000, tmp_path / "large.json")
+
+    assert (tmp_path / "large.json").stat().st_size > 8 * (tmp_path / "small.json").stat().st_size * 0.9
+    assert large < small * 1.5
@@ -0,0 +1,177 @@
+import hashlib
+import os
+import socket
+import stat
+import threading
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import urllib3
+from urllib3.exceptions import ProtocolError
+
+from assisted_test_infra.test_infra.utils.utils import download_file
+from service_client.file_download import DEFAULT_FILE_MODE, DownloadError, range_header, stream_to_file
+
+CONTENT = b"0123456789" * 1000
+
+
+class FakeResponse:
+    def __init__(self, offset: int, fail_at: int = None):
+        self.status = 206 if offset else 200
+        self.headers = {"Content-Range": f"bytes {offset}-{len(CONTENT) - 1}/{len(CONTENT)}"} if offset else {}
+        self._offset = offset
+        self._fail_at = fail_at
+
+    def stream(self, chunk_size):
+        for start in range(self._offset, len(CONTENT), chunk_size):
+            if self._fail_at is not None and start >= self._fail_at:
+                raise ProtocolError("connection dropped")
+            yield CONTENT[start : start + chunk_size]
+
+    def release_conn(self):
+        pass
+
+
+def test_resumes_an_interrupted_download(tmp_path):
+    requests = []
+
+    def open_stream(offset: int) -> urllib3.HTTPResponse:
+        requests.append(range_header(offset))
+        return FakeResponse(offset, fail_at=4096 if offset == 0 else None)
+
+    destination = tmp_path / "file.iso"
+    result = stream_to_file(open_stream, str(destination), chunk_size=1024)
+
+    assert destination.read_bytes() == CONTENT
+    assert result.resumes == 1
+    assert requests == [{}, {"Range": "bytes=4096-"}]
+    assert os.listdir(tmp_path) == ["file.iso"]
+
+
+def test_downloaded_file_mode_respects_the_umask(tmp_path):
+    destination = tmp_path / "kubeconfig"
+    stream_to_file(lambda offset: FakeResponse(offset), str(destination))
+
+    assert stat.S_IMODE(os.stat(destination).st_mode) == DEFAULT_FILE_MODE
+    assert DEFAULT_FILE_MODE & stat.S_IRUSR
+
+
+SERVED_SIZE = 32 * 1024**2
+# Served over and over, so neither the server nor the test hold the whole content
+SERVED_BLOCK = hashlib.sha256(b"block").digest() * (1024**2 // 32)
+
+
+def _served_sha256() -> str:
+    digest = hashlib.sha256()
+    for _ in range(SERVED_SIZE // len(SERVED_BLOCK)):
+        digest.update(SERVED_BLOCK)
+    return digest.hexdigest()
+
+
+class DroppingServer(ThreadingHTTPServer):
+    """Serves SERVED_SIZE bytes with byte range support, the first response is cut in the middle of the body"""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), DroppingRequestHandler)
+        self.ranges = []
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/file.iso"
+
+
+class DroppingRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):  # noqa: N802
+        start = int(self.headers["Range"][len("bytes=") : -1]) if self.headers["Range"] else 0
+        self.server.ranges.append(start)
+        self.send_response(206 if start else 200)
+        if start:
+            self.send_header("Content-Range", f"bytes {start}-{SERVED_SIZE - 1}/{SERVED_SIZE}")
+        self.send_header("Content-Length", str(SERVED_SIZE - start))
+        self.end_headers()
+
+        end = SERVED_SIZE // 2 if len(self.server.ranges) == 1 else SERVED_SIZE
+        block_size = len(SERVED_BLOCK)
+        for offset in range(start, end, 64 * 1024):
+            position = offset % block_size
+            self.wfile.write(SERVED_BLOCK[position : min(position + 64 * 1024, block_size, position + end - offset)])
+        if end < SERVED_SIZE:
+            self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server() -> DroppingServer:
+    server = DroppingServer()
+    threading.Thread(target=server.serve_forever, args=(0.01,), daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _closed_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_resumes_a_dropped_connection_with_bounded_memory(server: DroppingServer, tmp_path):
+    pool = urllib3.PoolManager(retries=False)
+    destination = tmp_path / "file.iso"
+
+    def open_stream(offset: int) -> urllib3.HTTPResponse:
+        return pool.request("GET", server.url, headers=range_header(offset), preload_content=False)
+
+    tracemalloc.start()
+    try:
+        result = stream_to_file(open_stream, str(destination), chunk_size=64 * 1024)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert result.resumes == 1
+    assert server.ranges[0] == 0 and 0 < server.ranges[1] <= SERVED_SIZE // 2
+    assert result.size == os.path.getsize(destination) == SERVED_SIZE
+    assert result.sha256 == _served_sha256()
+    assert peak < 4 * 1024**2
+
+
+def test_resumes_when_reconnecting_fails(server: DroppingServer, tmp_path):
+    pool = urllib3.PoolManager(retries=False)
+    # The second connection is refused, as by a restarting server
+    urls = iter([server.url, f"http://127.0.0.1:{_closed_port()}/file.iso"])
+
+    def open_stream(offset: int) -> urllib3.HTTPResponse:
+        url = next(urls, server.url)
+        return pool.request("GET", url, headers=range_header(offset), preload_content=False)
+
+    result = stream_to_file(open_stream, str(tmp_path / "file.iso"), chunk_size=64 * 1024)
+
+    assert result.resumes == 2
+    assert result.sha256 == _served_sha256()
+
+
+def test_gives_up_after_max_resumes(server: DroppingServer, tmp_path):
+    pool = urllib3.PoolManager(retries=False)
+    urls = iter([server.url])
+    closed = f"http://127.0.0.1:{_closed_port()}/file.iso"
+
+    def open_stream(offset: int) -> urllib3.HTTPResponse:
+        return pool.request("GET", next(urls, closed), headers=range_header(offset), preload_content=False)
+
+    with pytest.raises(DownloadError):
+        stream_to_file(open_stream, str(tmp_path / "file.iso"), max_resumes=3)
+    assert os.listdir(tmp_path) == []
+
+
+def test_download_file_resumes_a_dropped_connection(server: DroppingServer, tmp_path):
+    destination = tmp_path / "file.iso"
+    download_file(server.url, str(destination), verify_ssl=False, tries=1)
+
+    assert len(server.ranges) == 2
+    assert hashlib.sha256(destination.read_bytes()).hexdigest() == _served_sha256()
@@ -0,0 +1,154 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict
+
+import pytest
+from assisted_service_client import models
+
+from assisted_test_infra.test_infra.utils.iso_cache import IsoCache
+
+INFRA_ENV_ID = "11111111-1111-1111-1111-111111111111"
+
+
+class IsoServer(ThreadingHTTPServer):
+    """Serves an ISO per path, made of the path itself, and counts the requests of each path"""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), IsoRequestHandler)
+        self.hits: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}{path}"
+
+
+class IsoRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):  # noqa: N802
+        path = self.path.split("?")[0]
+        with self.server.lock:
+            self.server.hits[path] = self.server.hits.get(path, 0) + 1
+
+        content = path.encode() * 1000
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server() -> IsoServer:
+    server = IsoServer()
+    thread = threading.Thread(target=server.serve_forever, args=(0.01,), daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def cache(tmp_path: Path) -> IsoCache:
+    return IsoCache(cache_dir=str(tmp_path / "cache"))
+
+
+def _infra_env(server: IsoServer, **fields) -> models.InfraEnv:
+    fields.setdefault("id", INFRA_ENV_ID)
+    fields.setdefault("type", "minimal-iso")
+    download_url = server.url(f"/images/{fields['id']}?arch=x86_64&type={fields['type']}&version=4.19&api_key=token")
+    return models.InfraEnv(
+        kind="InfraEnv",
+        href=f"/api/assisted-install/v2/infra-envs/{fields['id']}",
+        name="test-infra-env",
+        openshift_version="4.19",
+        cpu_architecture="x86_64",
+        download_url=download_url,
+        created_at="2026-10-17T10:00:00.000Z",
+        updated_at="2026-10-17T10:00:00.000Z",
+        **fields,
+    )
+
+
+def _get(cache: IsoCache, infra_env: models.InfraEnv, destination: Path) -> Path:
+    return cache.get(IsoCache.key_of(infra_env, "pull-secret"), infra_env.download_url, str(destination), False)
+
+
+def test_image_is_downloaded_once(cache: IsoCache, server: IsoServer, tmp_path: Path):
+    infra_env = _infra_env(server)
+    (tmp_path / "first").mkdir()
+    first = _get(cache, infra_env, tmp_path / "first" / "installer-image.iso")
+    second = _get(cache, infra_env, tmp_path / "installer-image.iso")
+
+    assert server.hits == {f"/images/{INFRA_ENV_ID}": 1}
+    assert first.read_bytes() == second.read_bytes() == f"/images/{INFRA_ENV_ID}".encode() * 1000
+    # Materialized by a hardlink, the cache and the destinations share the same file
+    assert os.stat(first).st_ino == os.stat(second).st_ino
+    assert sorted(os.listdir(tmp_path)) == ["cache", "first", "installer-image.iso"]
+
+
+def test_tokens_are_not_part_of_the_key(server: IsoServer):
+    infra_env = _infra_env(server)
+    refreshed = _infra_env(server)
+    refreshed.download_url = refreshed.download_url.replace("api_key=token", "api_key=refreshed")
+
+    assert IsoCache.key_of(infra_env, "pull-secret") == IsoCache.key_of(refreshed, "pull-secret")
+
+
+@pytest.mark.parametrize(
+    "fields",
+    [
+        {"id": "22222222-2222-2222-2222-222222222222"},
+        {"type": "full-iso"},
+        {"ssh_authorized_key": "ssh-rsa AAAA"},
+        {"proxy": models.Proxy(http_proxy="http://proxy:3128")},
+        {"static_network_config": "[{'network_yaml': 'interfaces: []'}]"},
+        {"kernel_arguments": [models.KernelArgument(operation="append", value="rd.debug")]},
+        {"ignition_config_override": '{"ignition": {"version": "3.1.0"}}'},
+    ],
+)
+def test_iso_affecting_fields_change_the_key(server: IsoServer, fields: dict):
+    key = IsoCache.key_of(_infra_env(server), "pull-secret")
+    assert IsoCache.key_of(_infra_env(server, **fields), "pull-secret") != key
+
+
+def test_pull_secret_changes_the_key(server: IsoServer):
+    infra_env = _infra_env(server)
+    assert IsoCache.key_of(infra_env, "pull-secret") != IsoCache.key_of(infra_env, "another-pull-secret")
+
+
+def test_concurrent_downloads_of_an_image_share_one_request(cache: IsoCache, server: IsoServer, tmp_path: Path):
+    infra_env = _infra_env(server)
+    destinations = [tmp_path / f"worker-{i}" / "installer-image.iso" for i in range(8)]
+    for destination in destinations:
+        destination.parent.mkdir()
+
+    with ThreadPoolExecutor(max_workers=len(destinations)) as executor:
+        paths = list(executor.map(lambda destination: _get(cache, infra_env, destination), destinations))
+
+    assert server.hits == {f"/images/{INFRA_ENV_ID}": 1}
+    assert len({path.read_bytes() for path in paths}) == 1
+
+
+def test_least_recently_used_images_are_evicted(tmp_path: Path, server: IsoServer):
+    infra_envs = [_infra_env(server, id=f"22222222-2222-2222-2222-{i:012d}") for i in range(3)]
+    image_size = len(f"/images/{infra_envs[0].id}".encode() * 1000)
+    cache = IsoCache(cache_dir=str(tmp_path / "cache"), max_size=2 * image_size)
+
+    _get(cache, infra_envs[0], tmp_path / "0.iso")
+    _get(cache, infra_envs[1], tmp_path / "1.iso")
+    # Used again, the second image is now the least recently used one
+    cached_first = os.path.join(cache.cache_dir, f"{IsoCache.key_of(infra_envs[0], 'pull-secret')}.iso")
+    os.utime(cached_first, (os.path.getmtime(cached_first) + 10,) * 2)
+    _get(cache, infra_envs[2], tmp_path / "2.iso")
+
+    cached = sorted(name for name in os.listdir(cache.cache_dir) if name.endswith(".iso"))
+    assert cached == sorted(f"{IsoCache.key_of(infra_envs[i], 'pull-secret')}.iso" for i in (0, 2))
+    # Evicting an image does not remove the copies already materialized
+    assert (tmp_path / "1.iso").exists()
+
+    _get(cache, infra_envs[0], tmp_path / "0.iso")
+    assert server.hits[f"/images/{infra_envs[0].id}"] == 1
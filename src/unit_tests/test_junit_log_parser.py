@@ -0,0 +1,72 @@
+import filecmp
+import os
+import shutil
+import time
+from pathlib import Path
+
+import pytest
+
+import junit_log_parser
+from junit_log_parser import LogsConverter
+from service_client import log
+from unit_tests.synthetic_logs import write_service_log
+
+DATA_DIR = Path(__file__).parent / "data"
+GOLDEN_REPORT = DATA_DIR / "junit_log_parser_golden.xml"
+
+# The benchmark parses a synthetic log of that many bytes, set the variable for the large log case (e.g. to 2147483648)
+BENCHMARK_LOG_SIZE = int(os.environ.get("JUNIT_LOG_PARSER_BENCHMARK_SIZE", str(8 * 1024**2)))
+
+
+def _export(source_dir: Path, report_dir: Path) -> Path:
+    report_dir.mkdir(exist_ok=True)
+    LogsConverter.export_service_logs_to_junit_suites(source_dir, report_dir)
+    (report,) = report_dir.glob("junit_log_parser_*.xml")
+    return report
+
+
+@pytest.fixture
+def source_dir(tmp_path: Path) -> Path:
+    # The golden report was generated from this log by the junit_xml based implementation the parser replaced
+    source = tmp_path / "logs"
+    source.mkdir()
+    shutil.copy(DATA_DIR / "logs_assisted-service.log", source)
+    return source
+
+
+def test_report_matches_golden_output(source_dir: Path, tmp_path: Path):
+    assert _export(source_dir, tmp_path / "report").read_text() == GOLDEN_REPORT.read_text()
+
+
+@pytest.mark.parametrize("workers", [2, 3, 8])
+def test_parallel_parsing_matches_golden_output(source_dir: Path, tmp_path: Path, monkeypatch, workers: int):
+    monkeypatch.setattr(junit_log_parser, "PARALLEL_PARSING_MIN_SIZE", 0)
+    monkeypatch.setattr(junit_log_parser.os, "cpu_count", lambda: workers)
+    assert _export(source_dir, tmp_path / "report").read_text() == GOLDEN_REPORT.read_text()
+
+
+@pytest.fixture(scope="session")
+def benchmark_log(tmp_path_factory) -> Path:
+    source = tmp_path_factory.mktemp("benchmark")
+    write_service_log(source / "logs_assisted-service.log", BENCHMARK_LOG_SIZE)
+    return source
+
+
+def test_benchmark_large_log(benchmark_log: Path, tmp_path: Path, monkeypatch):
+    # Split even the small default log between the processes
+    monkeypatch.setattr(junit_log_parser, "PARALLEL_PARSING_MIN_SIZE", min(BENCHMARK_LOG_SIZE, 64 * 1024**2))
+    started = time.monotonic()
+    parallel_report = _export(benchmark_log, tmp_path / "parallel")
+    parallel_duration = time.monotonic() - started
+
+    monkeypatch.setattr(junit_log_parser, "PARALLEL_PARSING_MIN_SIZE", BENCHMARK_LOG_SIZE + 1)
+    started = time.monotonic()
+    sequential_report = _export(benchmark_log, tmp_path / "sequential")
+    sequential_duration = time.monotonic() - started
+
+    log.info(
+        f"Parsed {BENCHMARK_LOG_SIZE} bytes in {sequential_duration:.1f}s sequentially, "
+        f"{parallel_duration:.1f}s with {os.cpu_count()} processes"
+    )
+    # The reports of a large log are compared on disk, they may not fit in memory
+    assert filecmp.cmp(parallel_report, sequential_report, shallow=False)
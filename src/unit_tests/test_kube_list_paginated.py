@@ -0,0 +1,104 @@
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+import pytest
+
+from assisted_test_infra.test_infra.helper_classes.kube_helpers import Agent, ClusterDeployment, InfraEnv
+
+
+def _agent(name: str, namespace: str, infra_env: str, cluster_deployment: Optional[str] = None) -> dict:
+    spec = {}
+    if cluster_deployment is not None:
+        spec["clusterDeploymentName"] = {"name": cluster_deployment, "namespace": "clusters-hosted"}
+    return {
+        "metadata": {
+            "name": name,
+            "namespace": namespace,
+            "labels": {"infraenvs.agent-install.openshift.io": infra_env},
+        },
+        "spec": spec,
+    }
+
+
+class FakeCustomObjectsApi:
+    """Serves the objects in pages of at most limit items, like the API server does with limit and continue"""
+
+    def __init__(self, items: List[dict]):
+        self.api_client = SimpleNamespace()
+        self.items = items
+        self.requests: List[Dict] = []
+
+    def _select(self, namespace: Optional[str], label_selector: Optional[str]) -> List[dict]:
+        items = [item for item in self.items if namespace is None or item["metadata"]["namespace"] == namespace]
+        if label_selector:
+            key, value = label_selector.split("=")
+            items = [item for item in items if item["metadata"]["labels"].get(key) == value]
+        return items
+
+    def _page(self, namespace: Optional[str], limit: int, label_selector: Optional[str] = None, **kwargs) -> dict:
+        self.requests.append(dict(namespace=namespace, limit=limit, label_selector=label_selector, **kwargs))
+        items = self._select(namespace, label_selector)
+        start = int(kwargs.get("_continue", "0"))
+        end = start + limit
+        metadata = {"continue": str(end)} if end < len(items) else {}
+        return {"items": items[start:end], "metadata": metadata}
+
+    def list_namespaced_custom_object(self, group, version, plural, namespace, limit, **kwargs) -> dict:
+        return self._page(namespace, limit, **kwargs)
+
+    def list_cluster_custom_object(self, group, version, plural, limit, **kwargs) -> dict:
+        return self._page(None, limit, **kwargs)
+
+
+@pytest.fixture
+def crd_api() -> FakeCustomObjectsApi:
+    agents = [_agent(f"agent-{i}", "spoke", "hosted-infra-env", "hosted") for i in range(7)]
+    agents += [_agent(f"other-{i}", "spoke", "other-infra-env", "other") for i in range(5)]
+    agents += [_agent(f"unbound-{i}", "spoke", "hosted-infra-env") for i in range(2)]
+    agents += [_agent(f"elsewhere-{i}", "elsewhere", "hosted-infra-env", "hosted") for i in range(3)]
+    return FakeCustomObjectsApi(agents)
+
+
+def test_pages_are_followed_with_continue_tokens(crd_api: FakeCustomObjectsApi):
+    names = [item["metadata"]["name"] for item in Agent.list_paginated(crd_api, namespace="spoke", limit=5)]
+
+    assert names == [item["metadata"]["name"] for item in crd_api.items if item["metadata"]["namespace"] == "spoke"]
+    assert [request.get("_continue") for request in crd_api.requests] == [None, "5", "10"]
+    assert all(request["limit"] == 5 for request in crd_api.requests)
+
+
+def test_pages_are_fetched_as_they_are_consumed(crd_api: FakeCustomObjectsApi):
+    items = Agent.list_paginated(crd_api, limit=5)
+    assert crd_api.requests == []
+
+    for _ in range(5):
+        next(items)
+    assert len(crd_api.requests) == 1
+    next(items)
+    assert len(crd_api.requests) == 2
+
+
+def test_all_namespaces_are_listed_without_a_namespace(crd_api: FakeCustomObjectsApi):
+    assert len(list(Agent.list_paginated(crd_api, limit=4))) == len(crd_api.items)
+    assert {request["namespace"] for request in crd_api.requests} == {None}
+
+
+def test_empty_listing(crd_api: FakeCustomObjectsApi):
+    assert list(Agent.list_paginated(crd_api, namespace="empty")) == []
+    assert len(crd_api.requests) == 1
+
+
+def test_agents_are_selected_by_the_server(crd_api: FakeCustomObjectsApi):
+    infra_env = InfraEnv(SimpleNamespace(), "hosted-infra-env", "spoke")
+    infra_env.crd_api = crd_api
+    cluster_deployment = ClusterDeployment(SimpleNamespace(), "hosted", "clusters-hosted")
+    cluster_deployment.crd_api = crd_api
+
+    agents = cluster_deployment.list_agents("spoke", label_selector=infra_env.agents_label_selector)
+
+    assert [agent.ref.name for agent in agents] == [f"agent-{i}" for i in range(7)]
+    assert {request["label_selector"] for request in crd_api.requests} == {
+        "infraenvs.agent-install.openshift.io=hosted-infra-env"
+    }
+    # Only the agents of the infra-env were sent, the unbound ones are still filtered out by the client
+    assert len(crd_api.requests) == 1
@@ -0,0 +1,270 @@
+import io
+import os
+import tarfile
+import tempfile
+import tracemalloc
+from pathlib import Path
+from typing import Dict, Optional
+
+import pytest
+
+from assisted_test_infra.test_infra.utils import logs_utils
+
+CLUSTER = "test-infra-cluster-6c2d0ab7"
+NODE_LOGS = ["agent.logs", "installer.logs", "mount.logs", "report.logs"]
+MASTER_IPS = ["192.168.127.10", "192.168.127.11"]
+
+
+def _tar_bytes(members: Dict[str, Optional[bytes]], mode: str = "w") -> bytes:
+    """An archive of the members content, None stands for a directory"""
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode=mode) as tar:
+        for name, content in members.items():
+            info = tarfile.TarInfo(name)
+            if content is None:
+                info.type = tarfile.DIRTYPE
+                tar.addfile(info)
+            else:
+                info.size = len(content)
+                tar.addfile(info, io.BytesIO(content))
+    return buffer.getvalue()
+
+
+def _log(name: str) -> bytes:
+    return f"{name} log line\n".encode() * 4
+
+
+def _host_archive(host: str, logs=NODE_LOGS) -> bytes:
+    log_host = _tar_bytes({f"log_host_{host}/{name}": _log(f"{host}/{name}") for name in logs}, mode="w:gz")
+    return _tar_bytes({f"{host}.tar.gz": log_host})
+
+
+def _bootstrap_archive(host: str, control_plane: Dict[str, list]) -> bytes:
+    members = {f"log-bundle-{host}/control-plane": None}
+    for ip, names in control_plane.items():
+        members[f"log-bundle-{host}/control-plane/{ip}"] = None
+        members.update({f"log-bundle-{host}/control-plane/{ip}/{name}": _log(f"{ip}/{name}") for name in names})
+    return _tar_bytes(
+        {
+            f"{host}/bootkube.logs": _log("bootkube"),
+            f"{host}/dmesg.logs": _log("dmesg"),
+            f"log-bundle-{host}.tar.gz": _tar_bytes(members, mode="w:gz"),
+        }
+    )
+
+
+def _controller_archive(components) -> bytes:
+    """The controller logs, holding the must-gather in an archive whose name has to contain "controller" """
+    must_gather = _tar_bytes({f"{component}/namespaces": _log(component) for component in components}, mode="w:gz")
+    return _tar_bytes(
+        {
+            "controller_logs/assisted-installer-controller.logs": _log("controller"),
+            "controller_must_gather.tar.gz": must_gather,
+        },
+        mode="w:gz",
+    )
+
+
+def _cluster_members(**overrides) -> Dict[str, Optional[bytes]]:
+    members = {
+        "cluster_events.json": b'[{"message": "installing"}]',
+        "cluster_metadata.json": b'{"name": "test-infra-cluster"}',
+        "controller_logs.tar.gz": _controller_archive(["must-gather.local.1234"]),
+        f"{CLUSTER}_master_{CLUSTER}-master-0.tar": _host_archive(f"{CLUSTER}-master-0"),
+        f"{CLUSTER}_master_{CLUSTER}-master-2.tar": _host_archive(f"{CLUSTER}-master-2"),
+        f"{CLUSTER}_bootstrap_{CLUSTER}-master-1.tar": _host_archive(
+            f"{CLUSTER}-master-1", NODE_LOGS + ["bootkube.logs"]
+        ),
+    }
+    members.update(overrides)
+    return {name: content for name, content in members.items() if content is not None}
+
+
+def _write_cluster_tar(tmp_path: Path, members: Dict[str, bytes]) -> str:
+    path = tmp_path / "cluster_logs.tar"
+    path.write_bytes(_tar_bytes(members))
+    return str(path)
+
+
+@pytest.fixture(autouse=True)
+def extractions(monkeypatch):
+    """Fails the tests that extract any archive member or create a temporary file or directory"""
+    calls = []
+
+    def recording(name):
+        def record(*args, **kwargs):
+            calls.append(name)
+            raise RuntimeError(f"{name} was called")
+
+        return record
+
+    for name in ("extract", "extractall"):
+        monkeypatch.setattr(tarfile.TarFile, name, recording(name))
+    for name in ("TemporaryDirectory", "NamedTemporaryFile", "TemporaryFile", "mkdtemp", "mkstemp"):
+        monkeypatch.setattr(tempfile, name, recording(name))
+
+    yield calls
+    assert calls == []
+
+
+def test_passing_logs(tmp_path: Path):
+    logs_utils.verify_logs_uploaded(
+        _write_cluster_tar(tmp_path, _cluster_members()), expected_min_log_num=6, installation_success=True
+    )
+
+
+@pytest.mark.parametrize(
+    "members, expected_min_log_num, message",
+    [
+        (_cluster_members(), 7, "logs are less than minimum of 7"),
+        (_cluster_members(**{"cluster_metadata.json": b'[{"message": "installing"}]'}), 6, "Repeated md5sum"),
+        (_cluster_members(**{"cluster_metadata.json": b" " * 1_000_001}), 6, "exceed size limit"),
+        (_cluster_members(**{"cluster_events.json.copy": b"[]"}), 6, "cluster_events.json in "),
+        (
+            _cluster_members(**{f"{CLUSTER}_master_{CLUSTER}-master-2.tar": _host_archive(f"{CLUSTER}-master-2", [])}),
+            6,
+            None,
+        ),
+        (
+            _cluster_members(
+                **{f"{CLUSTER}_master_{CLUSTER}-master-2.tar": _host_archive(f"{CLUSTER}-master-2", NODE_LOGS[1:])}
+            ),
+            6,
+            None,
+        ),
+        (
+            _cluster_members(
+                **{f"{CLUSTER}_bootstrap_{CLUSTER}-master-1.tar": _host_archive(f"{CLUSTER}-master-1", NODE_LOGS)}
+            ),
+            6,
+            None,
+        ),
+    ],
+    ids=[
+        "too-few",
+        "duplicate-content",
+        "oversized",
+        "contained-name",
+        "no-node-logs",
+        "missing-node-log",
+        "no-bootkube",
+    ],
+)
+def test_failing_logs(tmp_path: Path, members, expected_min_log_num: int, message: Optional[str]):
+    with pytest.raises(AssertionError, match=message):
+        logs_utils.verify_logs_uploaded(
+            _write_cluster_tar(tmp_path, members), expected_min_log_num=expected_min_log_num, installation_success=True
+        )
+
+
+def test_empty_node_log(tmp_path: Path):
+    log_host = _tar_bytes({f"log_host_0/{name}": b"-- No entries --" for name in NODE_LOGS}, mode="w:gz")
+    members = _cluster_members(
+        **{f"{CLUSTER}_master_{CLUSTER}-master-2.tar": _tar_bytes({"master-2.tar.gz": log_host})}
+    )
+
+    with pytest.raises(AssertionError, match="size is empty"):
+        logs_utils.verify_logs_uploaded(
+            _write_cluster_tar(tmp_path, members), expected_min_log_num=6, installation_success=True
+        )
+
+
+@pytest.mark.parametrize(
+    "control_plane, verify_control_plane, message",
+    [
+        ({ip: ["kubelet.log"] for ip in MASTER_IPS}, True, None),
+        ({MASTER_IPS[0]: ["kubelet.log"], MASTER_IPS[1]: []}, True, f"control-plane/{MASTER_IPS[1]} is empty"),
+        ({MASTER_IPS[0]: ["kubelet.log"]}, True, "to have 2 values"),
+        ({MASTER_IPS[0]: ["kubelet.log"]}, False, None),
+    ],
+)
+def test_bootstrap_errors(tmp_path: Path, control_plane, verify_control_plane: bool, message: Optional[str]):
+    bootstrap = _bootstrap_archive(f"{CLUSTER}-master-1", control_plane)
+    members = _cluster_members(**{f"{CLUSTER}_bootstrap_{CLUSTER}-master-1.tar": bootstrap})
+
+    def verify():
+        logs_utils.verify_logs_uploaded(
+            _write_cluster_tar(tmp_path, members),
+            expected_min_log_num=6,
+            installation_success=False,
+            verify_control_plane=verify_control_plane,
+            verify_bootstrap_errors=True,
+        )
+
+    if message is None:
+        verify()
+    else:
+        with pytest.raises(AssertionError, match=message):
+            verify()
+
+
+@pytest.mark.parametrize("components, passing", [(["must-gather.local.1234"], True), (["namespaces"], False)])
+def test_oc_logs(tmp_path: Path, components, passing: bool):
+    cluster_tar_path = _write_cluster_tar(
+        tmp_path, _cluster_members(**{"controller_logs.tar.gz": _controller_archive(components)})
+    )
+    if passing:
+        logs_utils.verify_logs_uploaded(cluster_tar_path, 6, installation_success=True, check_oc=True)
+        return
+
+    with pytest.raises(AssertionError, match="can not find must-gather in logs"):
+        logs_utils.verify_logs_uploaded(cluster_tar_path, 6, installation_success=True, check_oc=True)
+
+
+@pytest.mark.parametrize("components, passing", [(["must-gather.local.1234"], True), (["namespaces"], False)])
+def test_oc_logs_of_the_cluster_tar(tmp_path: Path, components, passing: bool):
+    # The controller logs archive downloaded once the logs are complete holds the must-gather at its top level
+    must_gather = _tar_bytes({f"{component}/namespaces": _log(component) for component in components}, mode="w:gz")
+    cluster_tar_path = _write_cluster_tar(tmp_path, {"controller_logs.tar.gz": must_gather})
+    if passing:
+        logs_utils._verify_oc_logs_uploaded(cluster_tar_path)
+        return
+
+    with pytest.raises(AssertionError, match="can not find must-gather in logs"):
+        logs_utils._verify_oc_logs_uploaded(cluster_tar_path)
+
+
+def test_logs_not_uploaded(tmp_path: Path):
+    cluster_tar_path = _write_cluster_tar(tmp_path, _cluster_members())
+
+    logs_utils.verify_logs_not_uploaded(cluster_tar_path, "must-gather")
+    with pytest.raises(AssertionError, match="cluster_events.json logs were found"):
+        logs_utils.verify_logs_not_uploaded(cluster_tar_path, "cluster_events.json")
+
+
+def _write_sparse_cluster_tar(tmp_path: Path, members: Dict[str, bytes], sparse_name: str, sparse_size: int) -> str:
+    """A cluster archive holding a member of zeros, that takes no space on the disk"""
+    path = tmp_path / "cluster_logs.tar"
+    with tarfile.open(path, "w") as tar:
+        for name, content in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            tar.addfile(info, io.BytesIO(content))
+
+        info = tarfile.TarInfo(sparse_name)
+        info.size = sparse_size
+        header = info.tobuf(tar.format, tar.encoding, tar.errors)
+        blocks = -(-sparse_size // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+        tar.fileobj.write(header)
+        # Seeking past the end leaves a hole, the end of archive blocks are written after it
+        tar.fileobj.seek(blocks, os.SEEK_CUR)
+        tar.offset += len(header) + blocks
+        tar.members.append(info)
+    return str(path)
+
+
+def test_large_member_is_verified_in_bounded_memory(tmp_path: Path):
+    sparse_size = 1024**3
+    cluster_tar_path = _write_sparse_cluster_tar(tmp_path, _cluster_members(), "must-gather.json", sparse_size)
+    assert os.stat(cluster_tar_path).st_blocks * 512 < sparse_size / 100
+
+    tracemalloc.start()
+    try:
+        with pytest.raises(AssertionError, match="exceed size limit"):
+            logs_utils.verify_logs_uploaded(cluster_tar_path, expected_min_log_num=7, installation_success=True)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert peak < 8 * 1024**2
+    assert os.listdir(tmp_path) == ["cluster_logs.tar"]
@@ -0,0 +1,181 @@
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Tuple
+
+import pytest
+import waiting
+
+libvirt = pytest.importorskip("libvirt")
+
+from assisted_test_infra.test_infra.controllers.node_controllers import libvirt_event_loop, node_events  # noqa: E402
+from assisted_test_infra.test_infra.controllers.node_controllers.node_events import (  # noqa: E402
+    LeaseFileWatcher,
+    NodeEventsNotifier,
+)
+
+
+class FakeConnection:
+    def __init__(self):
+        self.callbacks = []
+
+    def domainEventRegisterAny(self, domain, event_id: int, callback, opaque) -> int:  # noqa: N802
+        self.callbacks.append(callback)
+        return len(self.callbacks)
+
+    def domainEventDeregisterAny(self, callback_id: int) -> None:  # noqa: N802
+        pass
+
+
+class FakeNetwork:
+    def __init__(self, bridge: str):
+        self._bridge = bridge
+
+    def bridgeName(self) -> str:  # noqa: N802
+        return self._bridge
+
+
+@pytest.fixture
+def notifier() -> NodeEventsNotifier:
+    notifier = NodeEventsNotifier(FakeConnection())
+    yield notifier
+    notifier.close()
+
+
+def test_wait_wakes_on_notify_before_the_interval(notifier: NodeEventsNotifier):
+    ready = threading.Event()
+    evaluations = []
+
+    def predicate():
+        evaluations.append(time.monotonic())
+        return ready.is_set()
+
+    def make_ready():
+        time.sleep(0.2)
+        ready.set()
+        notifier.notify()
+
+    threading.Thread(target=make_ready).start()
+    started = time.monotonic()
+    assert notifier.wait_for(predicate, timeout=60, interval=30, waiting_for="the node")
+
+    assert time.monotonic() - started < 5
+    assert len(evaluations) == 2
+
+
+def test_notify_between_evaluation_and_wait_is_not_lost(notifier: NodeEventsNotifier):
+    evaluations = []
+
+    def predicate():
+        evaluations.append(None)
+        if len(evaluations) == 1:
+            # Notified before wait_for starts waiting, it must not sleep a whole interval
+            notifier.notify()
+        return len(evaluations) > 1
+
+    started = time.monotonic()
+    notifier.wait_for(predicate, timeout=60, interval=30, waiting_for="the node")
+    assert time.monotonic() - started < 5
+
+
+def test_wait_times_out(notifier: NodeEventsNotifier):
+    with pytest.raises(waiting.TimeoutExpired):
+        notifier.wait_for(lambda: False, timeout=0.3, interval=0.1, waiting_for="the node")
+
+
+def test_expected_exceptions_are_retried(notifier: NodeEventsNotifier):
+    results = iter([libvirt.libvirtError("domain is not running"), "ready"])
+
+    def predicate():
+        result = next(results)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    assert (
+        notifier.wait_for(
+            predicate, timeout=5, interval=0.05, waiting_for="the node", expected_exceptions=libvirt.libvirtError
+        )
+        == "ready"
+    )
+
+
+def test_lifecycle_events_wake_the_wait():
+    # Events are only delivered on connections opened after the event loop was registered
+    libvirt_event_loop.start()
+    connection = libvirt.open("test:///default")
+    notifier = NodeEventsNotifier(connection)
+    domain = connection.lookupByName("test")
+    try:
+        threading.Timer(0.2, domain.suspend).start()
+        started = time.monotonic()
+        notifier.wait_for(
+            lambda: domain.state()[0] == libvirt.VIR_DOMAIN_PAUSED, timeout=30, interval=20, waiting_for="the pause"
+        )
+        assert time.monotonic() - started < 10
+    finally:
+        domain.resume()
+        notifier.close()
+        connection.close()
+
+
+def _watch(path: Path) -> Tuple[LeaseFileWatcher, threading.Event]:
+    changed = threading.Event()
+    watcher = LeaseFileWatcher(str(path), changed.set)
+    assert watcher.start()
+    return watcher, changed
+
+
+def test_lease_watcher_fires_on_atomic_rename(tmp_path: Path):
+    watcher, changed = _watch(tmp_path / "virbr0.status")
+    try:
+        # dnsmasq writes the new leases next to the status file, then renames it over the status file
+        (tmp_path / "virbr0.status.new").write_text('[{"ip-address": "192.168.127.10"}]')
+        os.replace(tmp_path / "virbr0.status.new", tmp_path / "virbr0.status")
+        assert changed.wait(5)
+    finally:
+        watcher.stop()
+
+
+def test_lease_watcher_ignores_other_files(tmp_path: Path):
+    watcher, changed = _watch(tmp_path / "virbr0.status")
+    try:
+        (tmp_path / "virbr1.status").write_text("[]")
+        os.replace(tmp_path / "virbr1.status", tmp_path / "virbr2.status")
+        assert not changed.wait(1.5)
+    finally:
+        watcher.stop()
+
+
+def test_missing_leases_directory_is_not_watched(tmp_path: Path):
+    assert not LeaseFileWatcher(str(tmp_path / "missing" / "virbr0.status"), lambda: None).start()
+
+
+def test_one_lease_watcher_per_bridge(notifier: NodeEventsNotifier, tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(node_events.consts, "LIBVIRT_DNSMASQ_DIR", str(tmp_path))
+    started = []
+    start = LeaseFileWatcher.start
+
+    def counting_start(watcher: LeaseFileWatcher) -> bool:
+        started.append(os.path.basename(watcher.path))
+        # Widens the window in which another thread could start a second watcher for the bridge
+        time.sleep(0.05)
+        return start(watcher)
+
+    monkeypatch.setattr(LeaseFileWatcher, "start", counting_start)
+    threads = [
+        threading.Thread(target=notifier.watch_leases, args=(FakeNetwork(bridge),)) for bridge in ["tt0", "tt1"] * 8
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(started) == ["tt0.status", "tt1.status"]
+    assert sorted(notifier._lease_watchers) == ["tt0", "tt1"]
+
+    # A change of the leases of a watched network notifies the waiters
+    version = notifier._version
+    (tmp_path / "tt1.status").write_text("[]")
+    waiting.wait(lambda: notifier._version > version, timeout_seconds=5, sleep_seconds=0.05, waiting_for="a notify")
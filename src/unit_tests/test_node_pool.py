@@ -0,0 +1,107 @@
+import json
+from pathlib import Path
+from typing import Dict
+from xml.etree.ElementTree import fromstring
+
+import pytest
+
+pytest.importorskip("libvirt")
+
+from assisted_test_infra.test_infra import utils  # noqa: E402
+from assisted_test_infra.test_infra.controllers.node_controllers.node_pool import NodePool, NodeShape  # noqa: E402
+
+SHAPE = NodeShape(vcpus=4, ram_mib=16384, disk_size_gib=20, network_name="test-infra-net")
+
+
+class FakeDomain:
+    def __init__(self, xml: str):
+        self.xml = xml
+        self.active = False
+
+    def name(self) -> str:
+        return fromstring(self.xml).find("name").text
+
+    def isActive(self) -> bool:  # noqa: N802
+        return self.active
+
+    def destroy(self) -> None:
+        self.active = False
+
+    def XMLDesc(self, flags: int) -> str:  # noqa: N802
+        return self.xml
+
+
+class FakeConnection:
+    def __init__(self):
+        self.domains: Dict[str, FakeDomain] = {}
+        self.fail_define = False
+
+    def listAllDomains(self):  # noqa: N802
+        return list(self.domains.values())
+
+    def lookupByName(self, name: str) -> FakeDomain:  # noqa: N802
+        return self.domains[name]
+
+    def defineXML(self, xml: str) -> FakeDomain:  # noqa: N802
+        if self.fail_define:
+            raise RuntimeError("can't define the domain")
+        domain = FakeDomain(xml)
+        self.domains[domain.name()] = domain
+        return domain
+
+    def close(self) -> None:
+        pass
+
+
+@pytest.fixture
+def connection() -> FakeConnection:
+    return FakeConnection()
+
+
+@pytest.fixture
+def pool(tmp_path: Path, connection: FakeConnection, monkeypatch) -> NodePool:
+    monkeypatch.setattr(utils, "run_command", lambda *args, **kwargs: None)
+    pool = NodePool(pool_dir=str(tmp_path), state_file=str(tmp_path / "state.json"))
+    pool._connection = connection
+    return pool
+
+
+def _state(pool: NodePool) -> dict:
+    return json.loads(Path(pool._state_file).read_text())
+
+
+def test_released_domains_are_leased_again(pool: NodePool, connection: FakeConnection):
+    names = pool.acquire(SHAPE, 2, "/tmp/first.iso")
+    pool.release(names)
+
+    assert pool.acquire(SHAPE, 2, "/tmp/second.iso") == names
+    assert (pool.hits, pool.misses) == (2, 2)
+    for name in names:
+        assert (
+            fromstring(connection.domains[name].xml).find("./devices/disk/source[@file='/tmp/second.iso']") is not None
+        )
+
+
+def test_deleted_domains_are_dropped(pool: NodePool, connection: FakeConnection):
+    deleted, kept = pool.acquire(SHAPE, 2, "/tmp/first.iso")
+    pool.release([deleted, kept])
+    # e.g. virsh_cleanup of make clean
+    del connection.domains[deleted]
+
+    names = pool.acquire(SHAPE, 2, "/tmp/second.iso")
+
+    assert names[0] == kept
+    assert set(_state(pool)) == set(names) == set(connection.domains)
+    assert (pool.hits, pool.misses) == (1, 3)
+
+
+def test_domains_are_not_leased_when_rebinding_fails(pool: NodePool, connection: FakeConnection):
+    pool.fill(SHAPE, 2)
+    connection.fail_define = True
+
+    with pytest.raises(RuntimeError):
+        pool.acquire(SHAPE, 2, "/tmp/first.iso")
+
+    assert [accounting.free for accounting in pool.accounting()] == [2]
+    connection.fail_define = False
+    assert len(pool.acquire(SHAPE, 2, "/tmp/first.iso")) == 2
@@ -0,0 +1,256 @@
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+import pytest
+
+# The tools package imports libvirt
+pytest.importorskip("libvirt")
+
+from assisted_test_infra.test_infra.tools import terraform_utils  # noqa: E402
+from assisted_test_infra.test_infra.tools.terraform_utils import (  # noqa: E402
+    TerraformUtils,
+    TfvarsWriter,
+    VariablesSchemaCache,
+)
+from consts import consts  # noqa: E402
+from service_client import log  # noqa: E402
+
+TERRAFORM_FILES_DIR = Path(__file__).parents[2] / "terraform_files"
+
+
+@pytest.fixture(autouse=True)
+def schema_cache(monkeypatch):
+    monkeypatch.setattr(VariablesSchemaCache, "_entries", {})
+    parsed = []
+    parse = VariablesSchemaCache._parse
+
+    def counting_parse(tf_file: Path):
+        parsed.append(tf_file.name)
+        return parse(tf_file)
+
+    monkeypatch.setattr(VariablesSchemaCache, "_parse", staticmethod(counting_parse))
+    return parsed
+
+
+def _write_tf(path: Path, *variables: str) -> None:
+    path.write_text("".join(f'variable "{name}" {{\n  type = string\n}}\n\n' for name in variables))
+
+
+def test_variables_are_parsed_once(tmp_path: Path, schema_cache):
+    _write_tf(tmp_path / "variables.tf", "cluster_name", "master_count")
+    _write_tf(tmp_path / "main.tf")
+
+    assert sorted(VariablesSchemaCache.get_variables(str(tmp_path))) == ["cluster_name", "master_count"]
+    assert sorted(VariablesSchemaCache.get_variables(str(tmp_path))) == ["cluster_name", "master_count"]
+    assert sorted(schema_cache) == ["main.tf", "variables.tf"]
+
+
+def test_edited_file_is_parsed_again(tmp_path: Path, schema_cache):
+    tf_file = tmp_path / "variables.tf"
+    _write_tf(tf_file, "cluster_name")
+    VariablesSchemaCache.get_variables(str(tmp_path))
+    stat = tf_file.stat()
+
+    _write_tf(tf_file, "cluster_name", "worker_count")
+    # Keep the mtime, the size alone must invalidate the entry
+    os.utime(tf_file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    assert VariablesSchemaCache.get_variables(str(tmp_path)) == ["cluster_name", "worker_count"]
+    assert schema_cache == ["variables.tf", "variables.tf"]
+
+
+def test_touched_file_is_parsed_again(tmp_path: Path, schema_cache):
+    tf_file = tmp_path / "variables.tf"
+    _write_tf(tf_file, "cluster_name")
+    VariablesSchemaCache.get_variables(str(tmp_path))
+
+    stat = tf_file.stat()
+    os.utime(tf_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    assert VariablesSchemaCache.get_variables(str(tmp_path)) == ["cluster_name"]
+    assert schema_cache == ["variables.tf", "variables.tf"]
+
+
+def test_sidecar_is_shared_with_other_processes(tmp_path: Path, schema_cache, monkeypatch):
+    _write_tf(tmp_path / "variables.tf", "cluster_name")
+    VariablesSchemaCache.get_variables(str(tmp_path))
+    assert (tmp_path / consts.TF_VARIABLES_SCHEMA_CACHE_NAME).exists()
+
+    # Another process starts with an empty in memory cache
+    monkeypatch.setattr(VariablesSchemaCache, "_entries", {})
+    assert VariablesSchemaCache.get_variables(str(tmp_path)) == ["cluster_name"]
+    assert schema_cache == ["variables.tf"]
+
+    _write_tf(tmp_path / "variables.tf", "cluster_name", "worker_count")
+    monkeypatch.setattr(VariablesSchemaCache, "_entries", {})
+    assert VariablesSchemaCache.get_variables(str(tmp_path)) == ["cluster_name", "worker_count"]
+    assert schema_cache == ["variables.tf", "variables.tf"]
+
+
+def test_unreadable_sidecar_is_ignored(tmp_path: Path, schema_cache):
+    _write_tf(tmp_path / "variables.tf", "cluster_name")
+    (tmp_path / consts.TF_VARIABLES_SCHEMA_CACHE_NAME).write_text("{not json")
+
+    assert VariablesSchemaCache.get_variables(str(tmp_path)) == ["cluster_name"]
+    sidecar = json.loads((tmp_path / consts.TF_VARIABLES_SCHEMA_CACHE_NAME).read_text())
+    assert sidecar["variables.tf"][2] == ["cluster_name"]
+
+
+def test_schema_of_the_terraform_files(tmp_path: Path, schema_cache):
+    working_dirs = []
+    for source in sorted(path for path in TERRAFORM_FILES_DIR.iterdir() if list(path.glob("*.tf"))):
+        # Copied, so the sidecars are not written into the repository
+        working_dir = tmp_path / source.name
+        working_dir.mkdir()
+        for tf_file in source.glob("*.tf"):
+            shutil.copy2(tf_file, working_dir)
+        working_dirs.append(str(working_dir))
+
+    started = time.monotonic()
+    parsed = [VariablesSchemaCache.get_variables(working_dir) for working_dir in working_dirs]
+    cold = time.monotonic() - started
+
+    started = time.monotonic()
+    cached = [VariablesSchemaCache.get_variables(working_dir) for working_dir in working_dirs]
+    warm = time.monotonic() - started
+
+    VariablesSchemaCache._entries.clear()
+    started = time.monotonic()
+    from_sidecars = [VariablesSchemaCache.get_variables(working_dir) for working_dir in working_dirs]
+    sidecars = time.monotonic() - started
+
+    log.info(
+        f"Variables of {len(schema_cache)} .tf files in {len(working_dirs)} directories: parsed in {cold:.3f}s, "
+        f"cached in {warm:.3f}s, read from the sidecars in {sidecars:.3f}s"
+    )
+    assert parsed == cached == from_sidecars
+    assert len(schema_cache) == sum(len(list(Path(working_dir).glob("*.tf"))) for working_dir in working_dirs)
+
+
+def test_tfvars_changes_are_written_once(tmp_path: Path, monkeypatch):
+    path = tmp_path / consts.TFVARS_JSON_NAME
+    path.write_text(json.dumps({"cluster_name": "test", "master_count": 3}))
+    path.chmod(0o640)
+    writes = []
+    write = terraform_utils._write_json_atomically
+    monkeypatch.setattr(terraform_utils, "_write_json_atomically", lambda *args: writes.append(args) or write(*args))
+
+    writer = TfvarsWriter(str(path))
+    writer.update({"master_count": 1})
+    writer.update({"worker_count": 2})
+    writer.flush()
+    writer.flush()
+
+    assert len(writes) == 1
+    assert json.loads(path.read_text()) == {"cluster_name": "test", "master_count": 1, "worker_count": 2}
+    assert path.stat().st_mode & 0o777 == 0o640
+
+
+def test_tfvars_are_replaced(tmp_path: Path):
+    path = tmp_path / consts.TFVARS_JSON_NAME
+    path.write_text(json.dumps({"cluster_name": "test"}))
+
+    writer = TfvarsWriter(str(path))
+    writer.update({"master_count": 1})
+    writer.replace({"worker_count": 2})
+    writer.flush()
+
+    assert json.loads(path.read_text()) == {"worker_count": 2}
+    assert not list(tmp_path.glob(f".{consts.TFVARS_JSON_NAME}.*"))
+
+
+def test_new_tfvars_file_has_the_umask_permissions(tmp_path: Path):
+    path = tmp_path / consts.TFVARS_JSON_NAME
+    writer = TfvarsWriter(str(path))
+    writer.replace({"cluster_name": "test"})
+    writer.flush()
+
+    umask = os.umask(0)
+    os.umask(umask)
+    assert path.stat().st_mode & 0o777 == 0o666 & ~umask
+
+
+FAKE_TERRAFORM = """#!/bin/sh
+echo "$*" >> "$FAKE_TERRAFORM_LOG"
+case "$1" in
+    plan) exit "${FAKE_TERRAFORM_PLAN_EXIT_CODE:-2}" ;;
+    apply) echo "{\\"version\\": 4, \\"serial\\": $(wc -l < "$FAKE_TERRAFORM_LOG")}" > terraform.tfstate ;;
+esac
+"""
+
+
+@pytest.fixture
+def terraform(tmp_path: Path, monkeypatch) -> TerraformUtils:
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    (bin_dir / "terraform").write_text(FAKE_TERRAFORM)
+    (bin_dir / "terraform").chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("FAKE_TERRAFORM_LOG", str(tmp_path / "invocations.log"))
+
+    working_dir = tmp_path / "terraform"
+    working_dir.mkdir()
+    _write_tf(working_dir / "variables.tf", "cluster_name", "worker_count")
+    (working_dir / consts.TFVARS_JSON_NAME).write_text(json.dumps({"cluster_name": "test"}))
+    return TerraformUtils(str(working_dir), terraform_init=False)
+
+
+def _invocations(tmp_path: Path) -> list:
+    log_file = tmp_path / "invocations.log"
+    commands = [line.split()[0] for line in log_file.read_text().splitlines()] if log_file.exists() else []
+    log_file.unlink(missing_ok=True)
+    return commands
+
+
+def test_unchanged_inputs_are_not_applied_again(terraform: TerraformUtils, tmp_path: Path):
+    terraform.apply(refresh=False)
+    assert _invocations(tmp_path) == ["plan", "apply"]
+
+    terraform.apply(refresh=False)
+    assert _invocations(tmp_path) == []
+
+
+def test_refresh_always_runs_the_plan(terraform: TerraformUtils, tmp_path: Path, monkeypatch):
+    terraform.apply(refresh=False)
+    _invocations(tmp_path)
+
+    # Nothing drifted outside of terraform
+    monkeypatch.setenv("FAKE_TERRAFORM_PLAN_EXIT_CODE", "0")
+    terraform.apply(refresh=True)
+    assert _invocations(tmp_path) == ["plan"]
+
+    # Something did, e.g. a domain was deleted with virsh
+    monkeypatch.setenv("FAKE_TERRAFORM_PLAN_EXIT_CODE", "2")
+    terraform.apply(refresh=True)
+    assert _invocations(tmp_path) == ["plan", "apply"]
+
+
+def test_changed_variables_are_planned(terraform: TerraformUtils, tmp_path: Path, monkeypatch):
+    terraform.apply(refresh=False)
+    _invocations(tmp_path)
+
+    monkeypatch.setenv("FAKE_TERRAFORM_PLAN_EXIT_CODE", "0")
+    terraform.change_variables({"worker_count": 2}, refresh=False)
+    assert _invocations(tmp_path) == ["plan"]
+
+    # The empty plan was recorded as applied
+    terraform.apply(refresh=False)
+    assert _invocations(tmp_path) == []
+
+
+def test_failed_plan_falls_back_to_apply(terraform: TerraformUtils, tmp_path: Path, monkeypatch):
+    monkeypatch.setenv("FAKE_TERRAFORM_PLAN_EXIT_CODE", "1")
+    terraform.apply(refresh=False)
+    assert _invocations(tmp_path) == ["plan", "apply"]
+
+
+def test_destroy_forgets_the_fingerprint(terraform: TerraformUtils, tmp_path: Path):
+    terraform.apply(refresh=False)
+    terraform.destroy()
+    _invocations(tmp_path)
+
+    terraform.apply(refresh=False)
+    assert _invocations(tmp_path) == ["plan", "apply"]
@@ -0,0 +1,152 @@
+import random
+import subprocess
+
+import pytest
+
+libvirt = pytest.importorskip("libvirt")
+
+from virsh_cleanup import virsh_cleanup  # noqa: E402
+from virsh_cleanup.virsh_cleanup import DEFAULT_SKIP_LIST, _select, clean_virsh_resources  # noqa: E402
+
+# The test driver keeps a single state per process, shared by all the connections to it
+LIBVIRT_URI = "test:///default"
+SKIP_LIST = DEFAULT_SKIP_LIST + ["minikube", "minikube-net"]
+FILTERS = [
+    None,
+    ["test-infra"],
+    ["minikube"],
+    ["test-infra-cluster-[0-9a-f]{4}"],
+    ["master-[0-2]$", "worker"],
+    ["^test-infra-net", "secondary"],
+]
+
+
+def _resource_names(rng: random.Random, count: int):
+    prefixes = ["test-infra-cluster", "test-infra-net", "test-infra-secondary-network", "minikube", "other"]
+    suffixes = ["master-0", "master-1", "master-2", "worker-0", "worker-1", "pool", ""]
+    names = {"default", "minikube", "minikube-net"}
+    while len(names) < count:
+        name = f"{rng.choice(prefixes)}-{rng.randrange(16**8):08x}"
+        suffix = rng.choice(suffixes)
+        names.add(f"{name}-{suffix}" if suffix else name)
+    return sorted(names)
+
+
+def _grep_e(names, skip_list, resource_filter):
+    """The selection of the virsh listings piped through grep -E, as the cleanup did before"""
+    listing = "\n".join(names)
+    if resource_filter:
+        process = subprocess.run(
+            ["grep", "-E", "|".join(resource_filter)], input=listing, stdout=subprocess.PIPE, universal_newlines=True
+        )
+        listing = process.stdout.strip()
+    return sorted(name for name in listing.splitlines() if name and name not in skip_list)
+
+
+@pytest.mark.parametrize("resource_filter", FILTERS)
+def test_selection_matches_grep(resource_filter):
+    names = _resource_names(random.Random(0), 200)
+    assert _select(names, SKIP_LIST, resource_filter) == _grep_e(names, SKIP_LIST, resource_filter)
+
+
+def test_skip_list_wins_over_the_filter():
+    names = ["default", "minikube", "minikube-net", "minikube-master-0", ""]
+    assert _select(names, SKIP_LIST, ["minikube", "default"]) == ["minikube-master-0"]
+    assert _select(names, DEFAULT_SKIP_LIST, ["minikube"]) == ["minikube", "minikube-master-0", "minikube-net"]
+
+
+@pytest.fixture
+def resources(tmp_path):
+    """Defines 200 domains, networks and pools with a volume each on the test driver, in addition to its own"""
+    # The test driver has a network named default already
+    names = [name for name in _resource_names(random.Random(1), 201) if name != "default"]
+    connection = libvirt.open(LIBVIRT_URI)
+    defined = []
+    for i, name in enumerate(names):
+        kind = i % 3
+        if kind == 0:
+            resource = connection.defineXML(
+                f"<domain type='test'><name>{name}</name><memory>1024</memory><os><type>hvm</type></os></domain>"
+            )
+            resource.create()
+        elif kind == 1:
+            resource = connection.networkDefineXML(f"<network><name>{name}</name><bridge name='tt{i}'/></network>")
+            resource.create()
+        else:
+            resource = connection.storagePoolDefineXML(
+                f"<pool type='dir'><name>{name}</name><target><path>{tmp_path / name}</path></target></pool>"
+            )
+            resource.create()
+            resource.createXML(f"<volume><name>{name}.qcow2</name><capacity>1024</capacity></volume>", 0)
+        defined.append(name)
+
+    yield connection
+    _delete_all(connection, set(defined))
+    connection.close()
+
+
+def _delete_all(connection, names) -> None:
+    for resource in connection.listAllDomains() + connection.listAllNetworks() + connection.listAllStoragePools():
+        if resource.name() not in names:
+            continue
+        if resource.isActive():
+            resource.destroy()
+        resource.undefine()
+
+
+def _listing(connection):
+    pools = sorted(pool.name() for pool in connection.listAllStoragePools())
+    return dict(
+        domains=sorted(domain.name() for domain in connection.listAllDomains()),
+        pools=pools,
+        networks=sorted(network.name() for network in connection.listAllNetworks()),
+        volumes=sorted(
+            (pool.name(), volume.name())
+            for pool in connection.listAllStoragePools()
+            if pool.isActive()
+            for volume in pool.listAllVolumes()
+        ),
+    )
+
+
+@pytest.mark.parametrize("resource_filter", [["test-infra-cluster"], ["master-[0-2]$", "minikube"]])
+def test_dry_run_deletes_nothing(resources, resource_filter):
+    before = _listing(resources)
+    selected = clean_virsh_resources(SKIP_LIST, resource_filter, dry_run=True, libvirt_uri=LIBVIRT_URI)
+
+    assert _listing(resources) == before
+    for kind in ("domains", "pools", "networks"):
+        assert selected[kind] == _grep_e(before[kind], SKIP_LIST, resource_filter)
+    assert selected["volumes"] == [(pool, volume) for pool, volume in before["volumes"] if pool in selected["pools"]]
+
+
+@pytest.mark.parametrize("resource_filter", [["test-infra-cluster"], ["master-[0-2]$", "minikube"]])
+def test_cleanup_deletes_the_dry_run_selection(resources, resource_filter):
+    before = _listing(resources)
+    selected = clean_virsh_resources(SKIP_LIST, resource_filter, dry_run=True, libvirt_uri=LIBVIRT_URI)
+
+    assert clean_virsh_resources(SKIP_LIST, resource_filter, libvirt_uri=LIBVIRT_URI) == selected
+    after = _listing(resources)
+    for kind in ("domains", "pools", "networks"):
+        assert selected[kind]
+        assert after[kind] == sorted(set(before[kind]) - set(selected[kind]))
+    assert not set(selected["volumes"]) & set(after["volumes"])
+
+
+def test_failed_deletion_does_not_stop_the_cleanup(resources, monkeypatch):
+    selected = clean_virsh_resources(SKIP_LIST, ["test-infra-net"], dry_run=True, libvirt_uri=LIBVIRT_URI)
+    failing = selected["networks"][0]
+    delete_network = virsh_cleanup._delete_network
+
+    def failing_delete_network(connections, name, dry_run):
+        if name == failing:
+            # Looks the network up under a name that does not exist, as if it was deleted meanwhile
+            return delete_network(connections, f"{name}-gone", dry_run)
+        return delete_network(connections, name, dry_run)
+
+    monkeypatch.setattr(virsh_cleanup, "_delete_network", failing_delete_network)
+    assert clean_virsh_resources(SKIP_LIST, ["test-infra-net"], libvirt_uri=LIBVIRT_URI) == selected
+
+    networks = _listing(resources)["networks"]
+    assert failing in networks
+    assert not set(networks) & set(selected["networks"]) - {failing}
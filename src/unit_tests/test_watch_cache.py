@@ -0,0 +1,97 @@
+import threading
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+
+from assisted_test_infra.test_infra.helper_classes.kube_helpers import watch_cache
+from assisted_test_infra.test_infra.helper_classes.kube_helpers.watch_cache import WatchCache
+
+
+def _obj(name: str, resource_version: str) -> dict:
+    return {"metadata": {"name": name, "resourceVersion": resource_version}}
+
+
+class FakeCustomObjectsApi:
+    def __init__(self, items):
+        self.api_client = SimpleNamespace()
+        self.items = items
+        self.list_calls = 0
+
+    def list_namespaced_custom_object(self, **kwargs):
+        self.list_calls += 1
+        return {"items": list(self.items), "metadata": {"resourceVersion": str(self.list_calls)}}
+
+
+class FakeWatch:
+    """Replays one scripted batch of watch events per stream() call, then blocks like an idle watch"""
+
+    scripts = []
+    resource_versions = []
+
+    def __init__(self):
+        self._stopped = threading.Event()
+
+    def stream(self, func, **kwargs):
+        self.resource_versions.append(kwargs["resource_version"])
+        if self.scripts:
+            yield from self.scripts.pop(0)
+        self._stopped.wait(5)
+
+    def stop(self):
+        self._stopped.set()
+
+
+@pytest.fixture
+def fake_watch():
+    FakeWatch.scripts, FakeWatch.resource_versions = [], []
+    with mock.patch.object(watch_cache.watch, "Watch", FakeWatch):
+        yield FakeWatch
+    WatchCache.stop_all()
+
+
+def _cache(crd_api) -> WatchCache:
+    return WatchCache.of(crd_api, "agent-install.openshift.io", "v1beta1", "agents", "test-ns")
+
+
+def test_relists_after_410_gone(fake_watch):
+    crd_api = FakeCustomObjectsApi([_obj("a", "1")])
+    fake_watch.scripts = [
+        [{"type": "ERROR", "raw_object": {"code": 410, "reason": "Gone", "message": "too old resource version"}}],
+        [{"type": "ADDED", "raw_object": _obj("b", "3")}],
+    ]
+
+    cache = _cache(crd_api)
+    cache.wait_for(lambda: cache.get("b"), timeout=5)
+
+    assert crd_api.list_calls == 2
+    assert cache.relist_count == 2
+    assert set(cache.items()) == {"a", "b"}
+    # The watch is resumed from the resourceVersion of the second list, not the expired one
+    assert fake_watch.resource_versions[:2] == ["1", "2"]
+
+
+def test_predicate_runs_without_blocking_the_watch(fake_watch):
+    cache = _cache(FakeCustomObjectsApi([]))
+
+    def predicate():
+        # A watch event delivered while the predicate runs must not wait for it
+        event_thread = threading.Thread(
+            target=cache._handle_event, args=({"type": "ADDED", "raw_object": _obj("a", "5")},)
+        )
+        event_thread.start()
+        event_thread.join(2)
+        return not event_thread.is_alive()
+
+    assert cache.wait_for(predicate, timeout=5)
+
+
+def test_stop_all_is_scoped_to_the_api_client(fake_watch):
+    first, second = FakeCustomObjectsApi([]), FakeCustomObjectsApi([])
+    first_cache, second_cache = _cache(first), _cache(second)
+
+    WatchCache.stop_all(api_client=first.api_client)
+
+    assert first_cache._stopped.is_set()
+    assert not second_cache._stopped.is_set()
+    assert _cache(second) is second_cache
@@ -17,6 +17,7 @@ def _get_parsed_args() -> argparse.Namespace:
         type=str,
         default=None,
     )
+    parser.add_argument("--dry-run", help="Only list the resources that would be deleted", action="store_true")
     return parser.parse_args()
 
 
@@ -32,7 +33,7 @@ def main():
     else:
         skip_list.extend(["minikube", "minikube-net"])
 
-    clean_virsh_resources(skip_list, resource_filter)
+    clean_virsh_resources(skip_list, resource_filter, dry_run=p_args.dry_run)
 
 
 if __name__ == "__main__":
@@ -1,76 +1,155 @@
-import subprocess
+import re
+import threading
+from contextlib import suppress
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 
+import libvirt
+
+import consts
 from assisted_test_infra.test_infra import utils
+from assisted_test_infra.test_infra.tools.concurrently import run_concurrently
 from service_client import log
 
 DEFAULT_SKIP_LIST = ["default"]
 
 
-def _run_command(command, check=False, resource_filter=None):
-    if resource_filter:
-        joined = "|".join(resource_filter)
-        command += f'| grep -E "{joined}"'
-    process = subprocess.run(command, shell=True, check=check, stdout=subprocess.PIPE, universal_newlines=True)
-    output = process.stdout.strip()
-    return output
+class _ThreadConnections:
+    """One libvirt connection per worker thread, so deletions don't queue behind each other on a single connection"""
+
+    def __init__(self, libvirt_uri: str):
+        self._libvirt_uri = libvirt_uri
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: List[libvirt.virConnect] = []
+
+    def get(self) -> libvirt.virConnect:
+        if getattr(self._local, "connection", None) is None:
+            self._local.connection = libvirt.open(self._libvirt_uri)
+            with self._lock:
+                self._connections.append(self._local.connection)
+        return self._local.connection
+
+    def close(self) -> None:
+        for connection in self._connections:
+            with suppress(libvirt.libvirtError):
+                connection.close()
+        self._connections.clear()
+
+
+def _select(names: Iterable[str], skip_list: List[str], resource_filter: Optional[Iterable[str]]) -> List[str]:
+    # Same selection as grepping the virsh listing with the filters joined as an extended regular expression
+    pattern = re.compile("|".join(resource_filter)) if resource_filter else None
+    return sorted(
+        name for name in names if name and name not in skip_list and (pattern is None or pattern.search(name))
+    )
+
+
+def _run_phase(title: str, deletions: List[Tuple[Callable, ...]]) -> None:
+    log.info(f"---- CLEANING VIRSH {title} ----")
+    if deletions:
+        run_concurrently(deletions, max_workers=consts.LIBVIRT_BULK_OPERATION_WORKERS)
+    log.info(f"---- CLEANING VIRSH {title} DONE ----")
+
+
+def _ignoring_errors(description: str, delete: Callable[[], None]) -> None:
+    # Like the virsh commands this replaces, a resource that can't be deleted doesn't stop the cleanup
+    try:
+        delete()
+    except libvirt.libvirtError as e:
+        log.warning(f"Failed {description}: {e}")
+
+
+def _delete_domain(connections: _ThreadConnections, name: str, dry_run: bool) -> None:
+    log.info("Deleting domain %s", name)
+    if dry_run:
+        return
+
+    def delete():
+        domain = connections.get().lookupByName(name)
+        if domain.isActive():
+            domain.destroy()
+        domain.undefineFlags(libvirt.VIR_DOMAIN_UNDEFINE_NVRAM)
 
+    _ignoring_errors(f"deleting domain {name}", delete)
 
-def _clean_domains(skip_list, resource_filter):
-    log.info("---- CLEANING VIRSH DOMAINS ----")
-    domains = _run_command("virsh -c qemu:///system list --all --name", resource_filter=resource_filter)
-    domains = domains.splitlines()
-    for domain in domains:
-        log.info("Deleting domain %s", domain)
-        if domain and domain not in skip_list:
-            _run_command(f"virsh -c qemu:///system destroy {domain}", check=False)
-            _run_command(f"virsh -c qemu:///system undefine --nvram {domain}", check=False)
 
-    log.info("---- CLEANING VIRSH DOMAINS DONE ----")
+def _delete_volume(connections: _ThreadConnections, pool: str, volume: str, dry_run: bool) -> None:
+    log.info("Deleting volume %s in pool %s", volume, pool)
+    if dry_run:
+        return
 
+    def delete():
+        connections.get().storagePoolLookupByName(pool).storageVolLookupByName(volume).delete(0)
 
-def _clean_volumes(pool):
-    log.info("---- CLEANING VIRSH VOLUMES ----")
-    volumes_with_path = _run_command(f"virsh -c qemu:///system vol-list {pool} | tail -n +3").splitlines()
-    for volume_with_path in volumes_with_path:
-        volume, _ = volume_with_path.split()
-        if volume:
-            log.info("Deleting volume %s in pool %s", volume, pool)
-            _run_command(f"virsh -c qemu:///system vol-delete --pool {pool} {volume}", check=False)
+    _ignoring_errors(f"deleting volume {volume} in pool {pool}", delete)
 
-    log.info("---- CLEANING VIRSH VOLUMES DONE ----")
 
+def _delete_pool(connections: _ThreadConnections, name: str, dry_run: bool) -> None:
+    log.info("Deleting pool %s", name)
+    if dry_run:
+        return
 
-def _clean_pools(skip_list, resource_filter):
-    log.info("---- CLEANING VIRSH POOLS ----")
+    def delete():
+        pool = connections.get().storagePoolLookupByName(name)
+        if pool.isActive():
+            pool.destroy()
+        pool.undefine()
 
-    pools = _run_command("virsh -c qemu:///system pool-list --all --name", resource_filter=resource_filter)
-    pools = pools.splitlines()
-    for pool in pools:
-        if pool and pool not in skip_list:
-            _clean_volumes(pool)
-            log.info("Deleting pool %s", pool)
-            _run_command(f"virsh -c qemu:///system pool-destroy {pool}", check=False)
-            _run_command(f"virsh -c qemu:///system pool-undefine {pool}", check=False)
+    _ignoring_errors(f"deleting pool {name}", delete)
 
-    log.info("---- CLEANING VIRSH POOLS DONE ----")
 
+def _delete_network(connections: _ThreadConnections, name: str, dry_run: bool) -> None:
+    log.info("Deleting network %s", name)
+    if dry_run:
+        return
 
-def _clean_networks(skip_list, resource_filter):
-    log.info("---- CLEANING VIRSH NETWORKS ----")
+    def delete():
+        network = connections.get().networkLookupByName(name)
+        if network.isActive():
+            network.destroy()
+        network.undefine()
 
-    networks = _run_command("virsh -c qemu:///system net-list --all --name", resource_filter=resource_filter)
-    networks = networks.splitlines()
-    for net in networks:
-        if net and net not in skip_list:
-            log.info("Deleting network %s", net)
-            _run_command(f"virsh -c qemu:///system net-destroy {net}", check=False)
-            _run_command(f"virsh -c qemu:///system net-undefine {net}", check=False)
+    _ignoring_errors(f"deleting network {name}", delete)
 
-    log.info("---- CLEANING VIRSH NETWORKS DONE ----")
 
+def _list_volumes(connection: libvirt.virConnect, pools: List[str]) -> List[Tuple[str, str]]:
+    volumes = []
+    for name in pools:
+        with suppress(libvirt.libvirtError):
+            pool = connection.storagePoolLookupByName(name)
+            # The volumes of an inactive pool can't be listed, virsh vol-list fails on them as well
+            if pool.isActive():
+                volumes.extend((name, volume.name()) for volume in pool.listAllVolumes())
+    return sorted(volumes)
 
-def clean_virsh_resources(skip_list, resource_filter):
+
+def clean_virsh_resources(
+    skip_list: List[str],
+    resource_filter: Optional[Iterable[str]],
+    dry_run: bool = False,
+    libvirt_uri: str = consts.DEFAULT_LIBVIRT_URI,
+) -> Dict[str, List]:
+    """Delete the libvirt domains, storage pools (with all their volumes) and networks whose names match one of the
+    filters, if any, and are not in the skip list. Domains go first, then the volumes, then the pools and networks,
+    the resources of each phase are deleted concurrently. Returns the selected resources, a resource that failed to
+    be deleted is only logged (as the virsh commands this replaces ignored their failures)."""
+    connections = _ThreadConnections(libvirt_uri)
     with utils.file_lock_context():
-        _clean_domains(skip_list, resource_filter)
-        _clean_pools(skip_list, resource_filter)
-        _clean_networks(skip_list, resource_filter)
+        try:
+            connection = connections.get()
+            domains = _select((domain.name() for domain in connection.listAllDomains()), skip_list, resource_filter)
+            pools = _select((pool.name() for pool in connection.listAllStoragePools()), skip_list, resource_filter)
+            networks = _select((net.name() for net in connection.listAllNetworks()), skip_list, resource_filter)
+            volumes = _list_volumes(connection, pools)
+
+            _run_phase("DOMAINS", [(_delete_domain, connections, name, dry_run) for name in domains])
+            _run_phase("VOLUMES", [(_delete_volume, connections, pool, name, dry_run) for pool, name in volumes])
+            _run_phase(
+                "POOLS AND NETWORKS",
+                [(_delete_pool, connections, name, dry_run) for name in pools]
+                + [(_delete_network, connections, name, dry_run) for name in networks],
+            )
+        finally:
+            connections.close()
+
+    return dict(domains=domains, volumes=volumes, pools=pools, networks=networks)